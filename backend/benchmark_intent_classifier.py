@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the local intent classifier in front of NLPIntentDetector
+
+Reports the per-query cost of the rule scan (against the previous per-pattern
+re.search loop, kept here as a reference), classify() p50/p99 latency, the
+share of queries answered locally and, for queries the LLM has already labelled
+(training log) or labels live (--live), how often the local answer agrees with
+the LLM.
+
+Usage:
+    python benchmark_intent_classifier.py            # built-in corpus + logged LLM intents
+    python benchmark_intent_classifier.py --live     # also ask the LLM (needs OPENAI_API_KEY)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.nlp_intent_detector import NLPIntentDetector
+from utils.intent_classifier import LocalIntentClassifier, INTENT_CLASSIFIER_DIR
+
+# Typical chat queries (English, Turkish names, attached words, typos)
+BENCHMARK_QUERIES = [
+    "Show me Hamza's tasks",
+    "list all tasks for Nawaz",
+    "What tasks does Deniz have?",
+    "hamza overdue tasks",
+    "Which of Ali's tasks are late?",
+    "show overdue tasks for Tuğba",
+    "overdue tasks for İlahe",
+    "Show completed tasks for Hamza",
+    "what has Begüm finished this month",
+    "completed tasks of Nawaz",
+    "What is Ali currently working on?",
+    "show in progress tasks for Deniz",
+    "Hamza's active tasks",
+    "pending tasks for Elif",
+    "How is John performing?",
+    "performance analysis for Gülay",
+    "how productive is Mehmet this week",
+    "give me a summary of Hamza's tasks",
+    "overview of Tuğba work",
+    "progress report for Kadir",
+    "how many tasks does Ali have",
+    "recent tasks for Nawaz",
+    "latest tasks of Deniz",
+    "hamzatasks",
+    "show me tasks",
+    "hello",
+    "what should I focus on today?",
+    "Can you compare Hamza and Ali?"
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def legacy_automata(detector):
+    """The per-intent alternations the classifier used to search one by one"""
+    rules = {intent.value: patterns for intent, patterns in detector.intent_patterns.items()}
+    return [
+        (intent, re.compile('|'.join(f'(?:{pattern})' for pattern in rules[intent]), re.IGNORECASE))
+        for intent in detector.intent_classifier.rule_intents
+    ]
+
+
+def legacy_rule_analysis(detector, automata, query):
+    """Pattern intent, task filters and classifier rule hits as computed before the shared matcher (reference)"""
+    query_lower = query.lower()
+    detected = 'general_query'
+    for intent, patterns in detector.intent_patterns.items():
+        if any(re.search(pattern, query_lower) for pattern in patterns):
+            detected = intent.value
+            break
+    filters = {}
+    for (name, value), keywords in detector.TASK_FILTER_PATTERNS:
+        if name in detector.WHOLE_WORD_FILTERS:
+            hit = any(re.search(rf'\b{re.escape(keyword)}\b', query_lower) for keyword in keywords)
+        else:
+            hit = any(keyword in query_lower for keyword in keywords)
+        if name not in filters and hit:
+            filters[name] = value
+    rule_hits = [intent for intent, automaton in automata if automaton.search(query)]
+    return detected, filters, rule_hits
+
+
+def rule_analysis(detector, query):
+    """The same three answers from one PatternMatcher.scan()"""
+    matches = detector.pattern_matcher.scan(query.lower())
+    detected = next((intent.value for intent in detector.intent_patterns if intent.value in matches), 'general_query')
+    filters = {}
+    for (name, value), _ in detector.TASK_FILTER_PATTERNS:
+        if name not in filters and (name, value) in matches:
+            filters[name] = value
+    rule_hits = [intent for intent in detector.intent_classifier.rule_intents if intent in matches]
+    return detected, filters, rule_hits
+
+
+def benchmark_rule_scan(detector, queries, repeat):
+    automata = legacy_automata(detector)
+    previous = lambda query: legacy_rule_analysis(detector, automata, query)
+    current = lambda query: rule_analysis(detector, query)
+
+    mismatches = [query for query in queries if previous(query) != current(query)]
+    if mismatches:
+        print(f"❌ Rule scan differs from the previous implementation on {len(mismatches)} of {len(queries)} queries:")
+        for query in mismatches[:10]:
+            print(f"   '{query}'")
+    else:
+        print(f"✅ Rule scan identical to the previous implementation on {len(queries)} queries")
+
+    timings = {}
+    for label, function in (('previous', previous), ('shared matcher', current)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for query in queries:
+                function(query)
+        timings[label] = (time.perf_counter() - started) / (repeat * len(queries)) * 1e6
+
+    print(f"\n⚡ Rule scan per query (intent + task filters + classifier rules), {len(queries)} queries x {repeat}:")
+    print(f"   previous (per-pattern re.search + substrings): {timings['previous']:7.2f} µs")
+    print(f"   shared matcher:                                {timings['shared matcher']:7.2f} µs "
+          f"({timings['previous'] / timings['shared matcher']:.1f}x)")
+
+
+def load_logged_intents(name):
+    """(text, LLM intent) pairs from the classifier's training log"""
+    path = os.path.join(INTENT_CLASSIFIER_DIR, f"{name}.jsonl")
+    if not os.path.exists(path):
+        return []
+    labelled = []
+    with open(path, 'r', encoding='utf-8') as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('text') and entry.get('intent'):
+                labelled.append((entry['text'], entry['intent']))
+    return labelled
+
+
+def build_classifier(detector, training):
+    """Fresh classifier with the detector's rules and seeds, trained on `training` (no log writes)"""
+    classifier = LocalIntentClassifier(
+        'benchmark',
+        rules={intent.value: patterns for intent, patterns in detector.intent_patterns.items()},
+        priority=detector.intent_classifier.rule_intents,
+        examples=detector.SEED_EXAMPLES,
+        log_dir=None
+    )
+    for text, intent in training:
+        classifier.learn(text, intent)
+    return classifier
+
+
+def run_benchmark(live=False, repeat=20):
+    print("🧪 Local Intent Classifier Benchmark")
+    print("=" * 50)
+
+    detector = NLPIntentDetector()
+
+    # Hold out the newest 20% of logged LLM answers for agreement
+    logged = load_logged_intents('nlp_intent_detector')
+    split = int(len(logged) * 0.8)
+    training, held_out = logged[:split], logged[split:]
+    classifier = build_classifier(detector, training)
+    print(f"📚 Logged LLM intents: {len(logged)} ({len(training)} train / {len(held_out)} held out)")
+
+    benchmark_rule_scan(detector, BENCHMARK_QUERIES + [text for text, _ in logged], repeat)
+
+    # Latency and local-answer rate
+    corpus = BENCHMARK_QUERIES + [text for text, _ in held_out]
+    latencies = []
+    answered_locally = 0
+    for _ in range(repeat):
+        for query in corpus:
+            started = time.perf_counter()
+            prediction = classifier.classify(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+            answered_locally += prediction.confident
+
+    total = len(latencies)
+    print(f"\n⚡ classify() over {len(corpus)} queries x {repeat}:")
+    print(f"   p50: {percentile(latencies, 50):.3f} ms")
+    print(f"   p99: {percentile(latencies, 99):.3f} ms")
+    print(f"   answered locally: {answered_locally / total * 100:.1f}%")
+
+    # Agreement with logged LLM answers on the held-out queries the classifier would answer itself
+    if held_out:
+        local = [(text, intent, classifier.classify(text)) for text, intent in held_out]
+        local = [(text, intent, prediction) for text, intent, prediction in local if prediction.confident]
+        agreed = sum(1 for _, intent, prediction in local if prediction.intent == intent)
+        if local:
+            print(f"\n🤝 Agreement with logged LLM intents: {agreed}/{len(local)} ({agreed / len(local) * 100:.1f}%)")
+        else:
+            print("\n🤝 No held-out query was confident enough to answer locally")
+
+    if not live:
+        return
+
+    if not os.getenv('OPENAI_API_KEY'):
+        print("\n⚠️ OPENAI_API_KEY not set, skipping live comparison")
+        return
+
+    print(f"\n🤖 Live comparison against the LLM ({len(BENCHMARK_QUERIES)} queries):")
+    llm_latencies = []
+    compared = agreed = 0
+    for query in BENCHMARK_QUERIES:
+        prediction = classifier.classify(query)
+        started = time.perf_counter()
+        ai_result = detector._ai_based_detection(query)
+        llm_latencies.append((time.perf_counter() - started) * 1000)
+        if ai_result.get('method') != 'ai_analysis':
+            continue
+        compared += 1
+        match = prediction.intent == ai_result.get('intent')
+        agreed += match
+        marker = "✅" if match else "❌"
+        print(f"   {marker} '{query}': local={prediction.intent} ({prediction.confidence:.2f}) llm={ai_result.get('intent')}")
+
+    print(f"\n   LLM p50: {percentile(llm_latencies, 50):.0f} ms, p99: {percentile(llm_latencies, 99):.0f} ms")
+    if compared:
+        print(f"   Agreement: {agreed}/{compared} ({agreed / compared * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the local intent classifier")
+    parser.add_argument('--live', action='store_true', help="compare against live LLM answers")
+    parser.add_argument('--repeat', type=int, default=20, help="classify() passes over the corpus")
+    args = parser.parse_args()
+    run_benchmark(live=args.live, repeat=args.repeat)
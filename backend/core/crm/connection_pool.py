@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+CRM Connection Pool
+===================
+Process-wide pooled MySQL connections for every CRM (Perfex) access path.
+
+Opening a fresh ``mysql.connector.connect()`` per call costs a full TCP + auth
+handshake against the remote CRM database. This module keeps a bounded set of
+live connections per connection config and hands them out on demand:
+- Configurable pool size and checkout timeout (``CRM_POOL_SIZE``, ``CRM_POOL_TIMEOUT``)
+- Health check (ping + reconnect) on checkout for connections that sat idle
+- Optional recycling of connections past a max lifetime (``CRM_POOL_MAX_LIFETIME``)
+- Connect retries with exponential backoff (``CRM_POOL_CONNECT_RETRIES``,
+  ``CRM_POOL_CONNECT_BACKOFF``)
+- Pluggable connect function: mysql.connector by default, pymysql for the
+  task management connector (one pool per driver and config)
+- Per-pool metrics: checkouts, failures, wait time, connections created
+
+Pooled connections behave like regular connections; calling ``close()`` returns
+them to the pool instead of closing the socket, so existing call sites keep their
+``try/finally: connection.close()`` structure. A connection dropped without
+``close()`` is never handed out again (a cursor may still be using it); it is
+logged as a leak and its pool slot is freed.
+"""
+
+import os
+import queue
+import collections
+import threading
+import time
+import logging
+from typing import Dict, Any, Optional, Callable
+
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = int(os.getenv('CRM_POOL_SIZE', '8'))
+DEFAULT_CHECKOUT_TIMEOUT = float(os.getenv('CRM_POOL_TIMEOUT', '10'))
+DEFAULT_PING_INTERVAL = float(os.getenv('CRM_POOL_PING_INTERVAL', '30'))
+DEFAULT_MAX_LIFETIME = float(os.getenv('CRM_POOL_MAX_LIFETIME', '0'))  # 0 keeps connections forever
+DEFAULT_CONNECT_RETRIES = int(os.getenv('CRM_POOL_CONNECT_RETRIES', '1'))
+DEFAULT_CONNECT_BACKOFF = float(os.getenv('CRM_POOL_CONNECT_BACKOFF', '0.5'))
+
+# pymysql SERVER_STATUS_IN_TRANS flag
+SERVER_STATUS_IN_TRANS = 1
+
+
+def get_default_crm_config() -> Dict[str, Any]:
+    """Connection settings for the CRM database taken from the environment"""
+    return {
+        'host': os.getenv('DB_HOST', '92.113.22.65'),
+        'user': os.getenv('DB_USER', 'u906714182_sqlrrefdvdv'),
+        'password': os.getenv('DB_PASSWORD', '3@6*t:lU'),
+        'database': os.getenv('DB_NAME', 'u906714182_sqlrrefdvdv'),
+        'port': int(os.getenv('DB_PORT', '3306'))
+    }
+
+
+def _connector_connect(**config):
+    return mysql.connector.connect(**config)
+
+
+def _is_connected(raw_connection) -> bool:
+    """mysql.connector exposes is_connected(), pymysql an open flag"""
+    is_connected = getattr(raw_connection, 'is_connected', None)
+    if callable(is_connected):
+        return is_connected()
+    return bool(getattr(raw_connection, 'open', False))
+
+
+def _in_transaction(raw_connection) -> bool:
+    if hasattr(raw_connection, 'in_transaction'):
+        return raw_connection.in_transaction
+    return bool(getattr(raw_connection, 'server_status', 0) & SERVER_STATUS_IN_TRANS)
+
+
+class CRMPoolExhausted(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+class PooledCRMConnection:
+    """Thin proxy around a MySQL connection that returns itself to the pool on close()"""
+
+    def __init__(self, pool: 'CRMConnectionPool', raw_connection, created_at: float):
+        self._pool = pool
+        self._raw = raw_connection
+        self._created_at = created_at
+        self._released = False
+
+    def __getattr__(self, name):
+        if name in ('_pool', '_raw', '_created_at', '_released'):
+            raise AttributeError(name)
+        return getattr(self._raw, name)
+
+    def close(self):
+        """Return the connection to its pool (idempotent)"""
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Cursors don't keep this proxy alive, so a leaked connection may still be in use:
+        # never return it to the pool, only free its slot (without taking the pool lock,
+        # since the GC can run while this thread already holds it)
+        if self._released:
+            return
+        self._released = True
+        try:
+            self._pool._leaked.append(self._created_at)
+            logger.warning("CRM connection was garbage-collected without close(); call close() to return it to the pool")
+        except Exception:
+            pass
+
+
+class CRMConnectionPool:
+    """
+    Bounded pool of MySQL connections sharing one connection config
+    ``connect`` opens a raw DB-API connection from the config (mysql.connector.connect
+    by default; pymysql.connect works as well)
+    """
+
+    def __init__(self, db_config: Dict[str, Any], pool_size: int = None,
+                 checkout_timeout: float = None, ping_interval: float = None,
+                 max_lifetime: float = None, connect_retries: int = None,
+                 retry_backoff: float = None, connect: Callable[..., Any] = None):
+        self.db_config = dict(db_config)
+        self.pool_size = max(1, pool_size or DEFAULT_POOL_SIZE)
+        self.checkout_timeout = checkout_timeout if checkout_timeout is not None else DEFAULT_CHECKOUT_TIMEOUT
+        self.ping_interval = ping_interval if ping_interval is not None else DEFAULT_PING_INTERVAL
+        self.max_lifetime = max_lifetime if max_lifetime is not None else DEFAULT_MAX_LIFETIME
+        self.connect_retries = max(1, connect_retries or DEFAULT_CONNECT_RETRIES)
+        self.retry_backoff = retry_backoff if retry_backoff is not None else DEFAULT_CONNECT_BACKOFF
+        self.connect = connect or _connector_connect
+
+        # Idle connections as (raw_connection, created_at, returned_at)
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_count = 0
+        self._in_use = 0
+        # Slots of connections leaked without close(); appended from __del__, reclaimed under _lock
+        self._leaked: "collections.deque" = collections.deque()
+
+        self.stats = {
+            'checkouts': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_recycled': 0,
+            'connections_discarded': 0,
+            'connections_leaked': 0,
+            'connect_retries': 0,
+            'health_check_reconnects': 0,
+            'peak_in_use': 0,
+            'total_wait_time': 0.0,
+            'max_wait_time': 0.0
+        }
+
+    def _reclaim_leaked(self):
+        """Free the pool slots of leaked connections (caller holds _lock)"""
+        while self._leaked:
+            self._leaked.popleft()
+            self._open_count -= 1
+            self._in_use -= 1
+            self.stats['connections_leaked'] += 1
+
+    def _create_raw_connection(self):
+        """Open a new connection, retrying with exponential backoff"""
+        delay = self.retry_backoff
+        for attempt in range(1, self.connect_retries + 1):
+            try:
+                connection = self.connect(**self.db_config)
+                with self._lock:
+                    self.stats['connections_created'] += 1
+                return connection
+            except Exception as e:
+                if attempt == self.connect_retries:
+                    raise
+                with self._lock:
+                    self.stats['connect_retries'] += 1
+                logger.warning(f"CRM connection attempt {attempt} failed, retrying in {delay:.1f}s: {e}")
+                time.sleep(delay)
+                delay *= 2
+
+    def _discard(self, raw_connection, stat: str = 'connections_discarded'):
+        try:
+            raw_connection.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._open_count -= 1
+            self.stats[stat] += 1
+
+    def _is_usable(self, raw_connection, created_at: float, idle_since: float) -> bool:
+        """
+        Recycle connections past max_lifetime, and ping ones that sat idle longer
+        than ping_interval, reconnecting once if needed; unusable ones are discarded
+        """
+        now = time.time()
+        if self.max_lifetime and now - created_at >= self.max_lifetime:
+            self._discard(raw_connection, 'connections_recycled')
+            return False
+        if now - idle_since < self.ping_interval:
+            return True
+        try:
+            raw_connection.ping(reconnect=False)
+            return True
+        except Exception:
+            pass
+        try:
+            raw_connection.ping(reconnect=True)
+            with self._lock:
+                self.stats['health_check_reconnects'] += 1
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy CRM connection: {e}")
+            self._discard(raw_connection)
+            return False
+
+    def get_connection(self, timeout: float = None) -> PooledCRMConnection:
+        """Check out a healthy connection, waiting up to `timeout` seconds if the pool is saturated"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.time()
+        deadline = started + timeout
+
+        try:
+            while True:
+                # Prefer an idle connection
+                try:
+                    raw_connection, created_at, idle_since = self._idle.get_nowait()
+                    if self._is_usable(raw_connection, created_at, idle_since):
+                        return self._checked_out(raw_connection, created_at, started)
+                    continue
+                except queue.Empty:
+                    pass
+
+                # Grow the pool if we're below capacity
+                with self._lock:
+                    self._reclaim_leaked()
+                    can_open = self._open_count < self.pool_size
+                    if can_open:
+                        self._open_count += 1
+                if can_open:
+                    try:
+                        raw_connection = self._create_raw_connection()
+                    except Exception:
+                        with self._lock:
+                            self._open_count -= 1
+                        raise
+                    return self._checked_out(raw_connection, time.time(), started)
+
+                # Pool is saturated - wait for a release
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    with self._lock:
+                        self.stats['timeouts'] += 1
+                    raise CRMPoolExhausted(
+                        f"No CRM connection available within {timeout}s (pool size {self.pool_size})"
+                    )
+                try:
+                    # Wake up periodically so slots freed by leaked connections are noticed
+                    raw_connection, created_at, idle_since = self._idle.get(timeout=min(remaining, 1.0))
+                except queue.Empty:
+                    continue
+                if self._is_usable(raw_connection, created_at, idle_since):
+                    return self._checked_out(raw_connection, created_at, started)
+        except Exception:
+            with self._lock:
+                self.stats['failures'] += 1
+            raise
+
+    def _checked_out(self, raw_connection, created_at: float, started: float) -> PooledCRMConnection:
+        waited = time.time() - started
+        with self._lock:
+            self._in_use += 1
+            self.stats['checkouts'] += 1
+            self.stats['peak_in_use'] = max(self.stats['peak_in_use'], self._in_use)
+            self.stats['total_wait_time'] += waited
+            self.stats['max_wait_time'] = max(self.stats['max_wait_time'], waited)
+        return PooledCRMConnection(self, raw_connection, created_at)
+
+    def _release(self, raw_connection, created_at: float):
+        """Reset transaction state and put the connection back into the idle queue"""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if not _is_connected(raw_connection):
+                self._discard(raw_connection)
+                return
+            if _in_transaction(raw_connection):
+                raw_connection.rollback()
+            if getattr(raw_connection, 'unread_result', False):
+                raw_connection.consume_results()
+        except Exception as e:
+            logger.warning(f"Failed to reset CRM connection, discarding: {e}")
+            self._discard(raw_connection)
+            return
+        self._idle.put((raw_connection, created_at, time.time()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool utilization and wait-time metrics"""
+        with self._lock:
+            self._reclaim_leaked()
+            stats = dict(self.stats)
+            open_count = self._open_count
+            in_use = self._in_use
+        stats.update({
+            'host': self.db_config.get('host'),
+            'database': self.db_config.get('database'),
+            'driver': getattr(self.connect, '__module__', None),
+            'pool_size': self.pool_size,
+            'max_lifetime': self.max_lifetime,
+            'open_connections': open_count,
+            'idle_connections': self._idle.qsize(),
+            'in_use_connections': in_use,
+            'utilization': round(in_use / self.pool_size, 3),
+            'avg_wait_time': stats['total_wait_time'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        })
+        return stats
+
+    def close_all(self):
+        """Close every idle connection (checked-out connections are closed when released)"""
+        while True:
+            try:
+                raw_connection, _, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(raw_connection)
+
+
+# Process-wide registry: one pool per distinct connect function and connection config
+_pools: Dict[tuple, CRMConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _config_key(db_config: Dict[str, Any], connect: Optional[Callable[..., Any]] = None) -> tuple:
+    connect = connect or _connector_connect
+    driver = (getattr(connect, '__module__', None), getattr(connect, '__qualname__', repr(connect)))
+    return (driver,) + tuple(sorted((k, str(v)) for k, v in db_config.items()))
+
+
+def get_crm_pool(db_config: Optional[Dict[str, Any]] = None, pool_size: int = None,
+                 **pool_options) -> CRMConnectionPool:
+    """
+    Get (or lazily create) the shared pool for a connection config
+    pool_options (connect, checkout_timeout, max_lifetime, ...) only apply when the pool is created
+    """
+    config = db_config or get_default_crm_config()
+    key = _config_key(config, pool_options.get('connect'))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = CRMConnectionPool(config, pool_size=pool_size, **pool_options)
+                _pools[key] = pool
+                logger.info(f"Created CRM connection pool for {config.get('host')} (size {pool.pool_size})")
+    return pool
+
+
+def get_crm_connection(db_config: Optional[Dict[str, Any]] = None, timeout: float = None) -> PooledCRMConnection:
+    """Check out a pooled CRM connection; close() returns it to the pool"""
+    return get_crm_pool(db_config).get_connection(timeout=timeout)
+
+
+def get_all_pool_stats() -> list:
+    """Metrics for every pool created in this process"""
+    return [pool.get_stats() for pool in list(_pools.values())]
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Employee Data Cache
+===================
+Shared LRU + TTL cache for per-employee performance data and task lists.
+
+Employee analyses used to re-run the full ``tbltasks``/``tbltask_assigned``/
+``tblprojects``/``tblclients`` join for every question about the same person,
+behind a per-service dict that never evicted and was only emptied by hand.
+This cache keeps those results with bounded memory and drops them as soon as
+the underlying CRM rows change:
+- LRU bound on entry count plus a per-entry TTL
+- Entries are tagged with the employee's staffid; a throttled change check
+  (``tbltasks`` change column, new ``tbltask_comments`` and ``tbltask_assigned``
+  rows) invalidates every entry of the affected employees
+- Without ``tbltasks.dateupdated`` the change column only sees new tasks, so the
+  check also compares a per-employee task fingerprint (count + CRC32 of id,
+  name, status, priority and dates) for the employees currently cached; the
+  fingerprint is taken when an employee's first entry is stored, so edits made
+  before the next check are not mistaken for the baseline
+- Hit / miss / eviction / expiry / invalidation counters via ``get_stats()``
+"""
+
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Hashable, Iterable, Set, Tuple
+
+from core.crm.task_changes import get_task_change_column, task_edits_visible
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_CACHE_MAX_ENTRIES = int(os.getenv('EMPLOYEE_CACHE_MAX_ENTRIES', '256'))
+EMPLOYEE_CACHE_TTL_SECONDS = int(os.getenv('EMPLOYEE_CACHE_TTL_SECONDS', '300'))
+EMPLOYEE_CACHE_CHECK_SECONDS = int(os.getenv('EMPLOYEE_CACHE_CHECK_SECONDS', '30'))
+
+TASK_FINGERPRINT_QUERY = """
+    SELECT ta.staffid, COUNT(*),
+           COALESCE(SUM(CRC32(CONCAT_WS('|', t.id, t.name, t.status, t.priority, t.duedate, t.datefinished))), 0)
+    FROM tbltask_assigned ta
+    INNER JOIN tbltasks t ON t.id = ta.taskid
+    WHERE ta.staffid IN ({placeholders})
+    GROUP BY ta.staffid
+"""
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'expires_at', 'staffid')
+
+    def __init__(self, value: Any, expires_at: float, staffid: Optional[int]):
+        self.value = value
+        self.expires_at = expires_at
+        self.staffid = staffid
+
+
+class EmployeeDataCache:
+    """Bounded, change-aware cache keyed by (namespace, key) and tagged by staffid"""
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None, check_seconds: int = None,
+                 connection_factory: Callable = None):
+        self.max_entries = max(1, max_entries or EMPLOYEE_CACHE_MAX_ENTRIES)
+        self.ttl_seconds = EMPLOYEE_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.check_seconds = EMPLOYEE_CACHE_CHECK_SECONDS if check_seconds is None else check_seconds
+
+        if connection_factory is None:
+            from core.crm.connection_pool import get_crm_connection
+            connection_factory = get_crm_connection
+        self._crm_connection = connection_factory
+
+        self._lock = threading.RLock()
+        self._check_lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], _CacheEntry]" = OrderedDict()
+        self._by_staff: Dict[int, Set[Tuple[str, Hashable]]] = {}
+
+        # Change-detection watermarks (None until the first baseline check)
+        self._baselined = False
+        self._task_mark = None
+        self._comment_mark = None
+        self._assignment_mark = None
+        self._fingerprints: Dict[int, Tuple[int, int]] = {}
+        # Cached employees whose fingerprint couldn't be taken at put(); first sighting counts as a change
+        self._unbaselined: Set[int] = set()
+        self._checked_at = 0.0
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'puts': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'change_checks': 0,
+            'change_check_errors': 0,
+            'fingerprint_invalidations': 0
+        }
+
+    # ------------------------------------------------------------------ entries
+
+    def _unlink(self, cache_key: Tuple[str, Hashable]):
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None and entry.staffid is not None:
+            keys = self._by_staff.get(entry.staffid)
+            if keys is not None:
+                keys.discard(cache_key)
+                if not keys:
+                    # Last entry of this employee: the next put() takes a fresh fingerprint
+                    del self._by_staff[entry.staffid]
+                    self._fingerprints.pop(entry.staffid, None)
+                    self._unbaselined.discard(entry.staffid)
+        return entry
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Any]:
+        """Cached value, or None when missing, expired or invalidated by a CRM change"""
+        self.check_for_changes()
+        cache_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.time():
+                self._unlink(cache_key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.stats['hits'] += 1
+            return entry.value
+
+    def put(self, namespace: str, key: Hashable, value: Any, staffid: Optional[int] = None,
+            ttl_seconds: Optional[int] = None):
+        """Store a value; entries without a staffid are only bounded by TTL and LRU"""
+        cache_key = (namespace, key)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._unlink(cache_key)
+            self._entries[cache_key] = _CacheEntry(value, time.time() + ttl, staffid)
+            if staffid is not None:
+                self._by_staff.setdefault(staffid, set()).add(cache_key)
+            self.stats['puts'] += 1
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._unlink(oldest)
+                self.stats['evictions'] += 1
+
+            needs_fingerprint = (staffid is not None and staffid not in self._fingerprints
+                                 and staffid not in self._unbaselined)
+        if needs_fingerprint:
+            self._record_fingerprint(staffid)
+
+    def invalidate_staff(self, staffids: Iterable[int]) -> int:
+        """Drop every entry tagged with one of the staff ids; returns the number dropped"""
+        dropped = 0
+        with self._lock:
+            for staffid in staffids:
+                for cache_key in list(self._by_staff.get(staffid, ())):
+                    self._unlink(cache_key)
+                    dropped += 1
+            self.stats['invalidations'] += dropped
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_staff.clear()
+            self._fingerprints.clear()
+            self._unbaselined.clear()
+
+    # ------------------------------------------------------------------ change detection
+
+    def _record_fingerprint(self, staffid: int):
+        """Baseline a newly cached employee's task fingerprint (only needed without dateupdated)"""
+        try:
+            connection = self._crm_connection()
+            try:
+                cursor = connection.cursor()
+                if not task_edits_visible(cursor):
+                    cursor.execute(TASK_FINGERPRINT_QUERY.format(placeholders='%s'), (staffid,))
+                    row = cursor.fetchone()
+                    fingerprint = (int(row[1]), int(row[2])) if row else (0, 0)
+                    with self._lock:
+                        self._fingerprints.setdefault(staffid, fingerprint)
+                cursor.close()
+            finally:
+                connection.close()
+        except Exception as e:
+            with self._lock:
+                self._unbaselined.add(staffid)
+            logger.warning(f"Employee cache: task fingerprint for staff {staffid} unavailable: {e}")
+
+    def _fingerprint_changes(self, cursor) -> Set[int]:
+        """Cached employees whose task fingerprint moved since it was recorded"""
+        with self._lock:
+            staffids = list(self._by_staff)
+        if not staffids:
+            return set()
+
+        cursor.execute(TASK_FINGERPRINT_QUERY.format(placeholders=', '.join(['%s'] * len(staffids))), tuple(staffids))
+        current = {staffid: (int(count), int(checksum)) for staffid, count, checksum in cursor.fetchall()}
+
+        changed = set()
+        with self._lock:
+            for staffid in staffids:
+                fingerprint = current.get(staffid, (0, 0))
+                previous = self._fingerprints.get(staffid)
+                if previous is None:
+                    # Not fingerprinted at put(): the entry may predate this state, so don't trust it
+                    if staffid in self._unbaselined:
+                        changed.add(staffid)
+                        self._unbaselined.discard(staffid)
+                elif previous != fingerprint:
+                    changed.add(staffid)
+                if staffid in self._by_staff:
+                    self._fingerprints[staffid] = fingerprint
+        return changed
+
+    def check_for_changes(self, force: bool = False) -> Set[int]:
+        """
+        Invalidate employees whose tasks, comments or assignments changed since the last check
+        Runs at most once per check interval; returns the affected staff ids
+        """
+        if not force and time.time() - self._checked_at < self.check_seconds:
+            return set()
+        if not self._check_lock.acquire(blocking=False):
+            return set()
+
+        changed: Set[int] = set()
+        try:
+            connection = self._crm_connection()
+            try:
+                cursor = connection.cursor()
+                change_column = get_task_change_column(cursor)
+
+                if not self._baselined:
+                    # First check only records where the CRM currently is
+                    cursor.execute(f"SELECT MAX({change_column}) FROM tbltasks t")
+                    self._task_mark = cursor.fetchone()[0]
+                    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tbltask_comments")
+                    self._comment_mark = cursor.fetchone()[0]
+                    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tbltask_assigned")
+                    self._assignment_mark = cursor.fetchone()[0]
+                    self._baselined = True
+                else:
+                    cursor.execute(f"""
+                        SELECT ta.staffid, MAX({change_column})
+                        FROM tbltasks t
+                        INNER JOIN tbltask_assigned ta ON ta.taskid = t.id
+                        WHERE {change_column} > %s
+                        GROUP BY ta.staffid
+                    """, (self._task_mark or '1970-01-01',))
+                    for staffid, changed_at in cursor.fetchall():
+                        changed.add(staffid)
+                        if changed_at is not None and (self._task_mark is None or changed_at > self._task_mark):
+                            self._task_mark = changed_at
+
+                    cursor.execute("""
+                        SELECT c.id, ta.staffid
+                        FROM tbltask_comments c
+                        LEFT JOIN tbltask_assigned ta ON ta.taskid = c.taskid
+                        WHERE c.id > %s
+                    """, (self._comment_mark,))
+                    for comment_id, staffid in cursor.fetchall():
+                        if staffid is not None:
+                            changed.add(staffid)
+                        self._comment_mark = max(self._comment_mark, comment_id)
+
+                    cursor.execute("""
+                        SELECT id, staffid FROM tbltask_assigned WHERE id > %s
+                    """, (self._assignment_mark,))
+                    for assignment_id, staffid in cursor.fetchall():
+                        changed.add(staffid)
+                        self._assignment_mark = max(self._assignment_mark, assignment_id)
+
+                    # Status/name/date edits don't move a dateadded change column
+                    if not task_edits_visible(cursor):
+                        edited = self._fingerprint_changes(cursor) - changed
+                        self.stats['fingerprint_invalidations'] += len(edited)
+                        changed |= edited
+
+                cursor.close()
+            finally:
+                connection.close()
+
+            self.stats['change_checks'] += 1
+            if changed:
+                dropped = self.invalidate_staff(changed)
+                logger.info(f"Employee cache: CRM changes for {len(changed)} employees, {dropped} entries invalidated")
+
+        except Exception as e:
+            self.stats['change_check_errors'] += 1
+            logger.warning(f"Employee cache change check failed (entries stay TTL-bound): {e}")
+        finally:
+            self._checked_at = time.time()
+            self._check_lock.release()
+
+        return changed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'entries': len(self._entries),
+                'employees_cached': len(self._by_staff),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+                'last_change_check': self._checked_at,
+                'task_watermark': str(self._task_mark) if self._task_mark is not None else None,
+                'comment_watermark': self._comment_mark,
+                'assignment_watermark': self._assignment_mark
+            })
+        return stats
+
+
+_cache: Optional[EmployeeDataCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_employee_data_cache() -> EmployeeDataCache:
+    """Process-wide employee data cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmployeeDataCache()
+    return _cache
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Employee Task Rollup
+====================
+Maintained in-memory per-employee task aggregates for the summary endpoints.
+
+The task summary endpoint and the performance and progress metrics used to
+re-run a full ``tbltasks`` x ``tbltask_assigned`` join on every hit just to
+count rows. (The overdue / completed / in-progress list endpoints count the
+rows they return, so their totals match the lists.) The rollup loads
+the few columns those counts need once, keeps per-staff counters and applies
+task changes incrementally, so a summary lookup is a dict read:
+- Counters per staffid: total, completed, overdue, upcoming, in progress,
+  high priority, on-time / late completions and summed completion delay
+- Per-day added / finished counters for 7 and 30 day activity windows
+- Incremental refresh from the ``tbltasks`` change column and new
+  ``tbltask_assigned`` rows; a periodic full rebuild catches deletions,
+  unassignments and edits the change column does not see
+- Overdue / upcoming are re-classified from the stored rows when the date
+  rolls over (no database round trip)
+"""
+
+import os
+import threading
+import time
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Optional, Callable, Iterable, List, Tuple
+
+from core.crm.task_changes import get_task_change_column
+
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_ROLLUP_REFRESH_SECONDS = int(os.getenv('EMPLOYEE_ROLLUP_REFRESH_SECONDS', '30'))
+EMPLOYEE_ROLLUP_REBUILD_SECONDS = int(os.getenv('EMPLOYEE_ROLLUP_REBUILD_SECONDS', '900'))
+ROLLUP_FETCH_SIZE = 1000
+ROLLUP_RELOAD_BATCH_SIZE = 500
+
+COMPLETED_STATUS = 5
+IN_PROGRESS_STATUSES = (2, 3, 4)
+HIGH_PRIORITY_MIN = 3
+ACTIVITY_WINDOWS = (7, 30)
+
+TASK_ROWS_QUERY = """
+    SELECT t.id, t.status, t.priority, t.duedate, t.datefinished, t.dateadded,
+           GROUP_CONCAT(ta.staffid) AS assignee_ids
+    FROM tbltasks t
+    LEFT JOIN tbltask_assigned ta ON ta.taskid = t.id
+    {where}
+    GROUP BY t.id
+"""
+
+
+def _to_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _to_int(value, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class _TaskRow:
+    """The columns of one task that the aggregates depend on"""
+
+    __slots__ = ('status', 'priority', 'duedate', 'datefinished', 'dateadded', 'assignees')
+
+    def __init__(self, status, priority, duedate, datefinished, dateadded, assignees):
+        self.status = _to_int(status)
+        self.priority = _to_int(priority)
+        self.duedate = _to_date(duedate)
+        self.datefinished = _to_date(datefinished)
+        self.dateadded = _to_date(dateadded)
+        self.assignees = assignees
+
+    @classmethod
+    def from_db(cls, row: Tuple) -> Tuple[int, '_TaskRow']:
+        task_id, status, priority, duedate, datefinished, dateadded, assignee_ids = row
+        if isinstance(assignee_ids, (bytes, bytearray)):
+            assignee_ids = assignee_ids.decode()
+        assignees = frozenset(int(sid) for sid in str(assignee_ids or '').split(',') if sid.strip())
+        return task_id, cls(status, priority, duedate, datefinished, dateadded, assignees)
+
+
+class _StaffRollup:
+    """Running task counters for one employee"""
+
+    __slots__ = ('total', 'completed', 'in_progress', 'overdue', 'upcoming', 'high_priority',
+                 'on_time', 'late', 'delay_days', 'status_counts', 'added_on', 'finished_on')
+
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.in_progress = 0
+        self.overdue = 0
+        self.upcoming = 0
+        self.high_priority = 0
+        self.on_time = 0
+        self.late = 0
+        self.delay_days = 0
+        self.status_counts: Dict[int, int] = {}
+        self.added_on: Dict[date, int] = {}
+        self.finished_on: Dict[date, int] = {}
+
+    @staticmethod
+    def _bump(counter: Dict, key, sign: int):
+        count = counter.get(key, 0) + sign
+        if count:
+            counter[key] = count
+        else:
+            counter.pop(key, None)
+
+    def accumulate(self, row: _TaskRow, sign: int, today: date):
+        """Add (sign=1) or remove (sign=-1) one task's contribution"""
+        self.total += sign
+        self._bump(self.status_counts, row.status, sign)
+        if row.dateadded:
+            self._bump(self.added_on, row.dateadded, sign)
+        if row.priority >= HIGH_PRIORITY_MIN:
+            self.high_priority += sign
+
+        if row.status == COMPLETED_STATUS:
+            self.completed += sign
+            if row.datefinished:
+                self._bump(self.finished_on, row.datefinished, sign)
+                if row.duedate:
+                    if row.datefinished <= row.duedate:
+                        self.on_time += sign
+                    else:
+                        self.late += sign
+                        self.delay_days += sign * (row.datefinished - row.duedate).days
+            return
+
+        if row.status in IN_PROGRESS_STATUSES:
+            self.in_progress += sign
+        if row.duedate:
+            if row.duedate < today:
+                self.overdue += sign
+            else:
+                self.upcoming += sign
+
+    def count_since(self, counter: Dict[date, int], today: date, days: int) -> int:
+        return sum(counter.get(today - timedelta(days=offset), 0) for offset in range(days + 1))
+
+    def summarize(self, today: date) -> Dict[str, Any]:
+        total = self.total
+        graded = self.on_time + self.late
+        summary = {
+            'total_tasks': total,
+            'completed_tasks': self.completed,
+            'overdue_tasks': self.overdue,
+            'upcoming_tasks': self.upcoming,
+            'in_progress_tasks': self.in_progress,
+            'active_tasks': total - self.completed,
+            'high_priority_tasks': self.high_priority,
+            'on_time_tasks': self.on_time,
+            'late_tasks': self.late,
+            'completion_rate': round(self.completed / total * 100, 1) if total else 0,
+            'on_time_rate': round(self.on_time / graded * 100, 1) if graded else 0,
+            'average_delay_days': round(self.delay_days / self.late, 1) if self.late else 0,
+            'status_counts': dict(self.status_counts),
+            'as_of': today.isoformat()
+        }
+        for days in ACTIVITY_WINDOWS:
+            summary[f'added_last_{days}d'] = self.count_since(self.added_on, today, days)
+            summary[f'completed_last_{days}d'] = self.count_since(self.finished_on, today, days)
+        return summary
+
+
+class EmployeeTaskRollup:
+    """Per-staffid task aggregates kept in sync with tbltasks / tbltask_assigned"""
+
+    def __init__(self, refresh_seconds: int = None, rebuild_seconds: int = None,
+                 connection_factory: Callable = None):
+        self.refresh_seconds = EMPLOYEE_ROLLUP_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.rebuild_seconds = EMPLOYEE_ROLLUP_REBUILD_SECONDS if rebuild_seconds is None else rebuild_seconds
+
+        if connection_factory is None:
+            from core.crm.connection_pool import get_crm_connection
+            connection_factory = get_crm_connection
+        self._crm_connection = connection_factory
+
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._rows: Dict[int, _TaskRow] = {}
+        self._staff: Dict[int, _StaffRollup] = {}
+        self._as_of: Optional[date] = None
+        self._loaded = False
+
+        self._task_mark = None
+        self._assignment_mark = 0
+        self._checked_at = 0.0
+        self._rebuilt_at = 0.0
+
+        self.stats = {
+            'full_loads': 0,
+            'incremental_refreshes': 0,
+            'tasks_reloaded': 0,
+            'tasks_removed': 0,
+            'date_rollovers': 0,
+            'refresh_errors': 0,
+            'lookups': 0,
+            'fallback_queries': 0
+        }
+
+    # ------------------------------------------------------------------ aggregation
+
+    def _apply(self, row: _TaskRow, sign: int):
+        for staffid in row.assignees:
+            rollup = self._staff.get(staffid)
+            if rollup is None:
+                rollup = self._staff[staffid] = _StaffRollup()
+            rollup.accumulate(row, sign, self._as_of)
+            if not rollup.total:
+                del self._staff[staffid]
+
+    def _reclassify(self, today: date):
+        """Rebuild the counters from stored rows so overdue/upcoming follow the new date"""
+        staff: Dict[int, _StaffRollup] = {}
+        for row in self._rows.values():
+            for staffid in row.assignees:
+                rollup = staff.get(staffid)
+                if rollup is None:
+                    rollup = staff[staffid] = _StaffRollup()
+                rollup.accumulate(row, 1, today)
+        self._staff = staff
+        self._as_of = today
+
+    # ------------------------------------------------------------------ loading
+
+    def _fetch_rows(self, cursor, where: str = '', params: Iterable = ()) -> Dict[int, _TaskRow]:
+        cursor.execute(TASK_ROWS_QUERY.format(where=where), tuple(params))
+        rows = {}
+        while True:
+            chunk = cursor.fetchmany(ROLLUP_FETCH_SIZE)
+            if not chunk:
+                break
+            for db_row in chunk:
+                task_id, row = _TaskRow.from_db(db_row)
+                if row.assignees:
+                    rows[task_id] = row
+        return rows
+
+    def _full_load(self, cursor):
+        change_column = get_task_change_column(cursor)
+        # Take the watermarks first so changes made during the load are picked up next time
+        cursor.execute(f"SELECT MAX({change_column}) FROM tbltasks t")
+        task_mark = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tbltask_assigned")
+        assignment_mark = cursor.fetchone()[0]
+
+        rows = self._fetch_rows(cursor)
+        today = date.today()
+        with self._lock:
+            self._rows = rows
+            self._reclassify(today)
+            self._task_mark = task_mark
+            self._assignment_mark = assignment_mark
+            self._loaded = True
+            self.stats['full_loads'] += 1
+        self._rebuilt_at = time.time()
+        logger.info(f"Employee task rollup loaded: {len(rows)} tasks for {len(self._staff)} employees")
+
+    def _incremental_load(self, cursor):
+        change_column = get_task_change_column(cursor)
+        changed_ids = set()
+        task_mark = self._task_mark
+        assignment_mark = self._assignment_mark
+
+        cursor.execute(f"SELECT t.id, {change_column} FROM tbltasks t WHERE {change_column} > %s",
+                       (task_mark or '1970-01-01',))
+        for task_id, changed_at in cursor.fetchall():
+            changed_ids.add(task_id)
+            if changed_at is not None and (task_mark is None or changed_at > task_mark):
+                task_mark = changed_at
+
+        cursor.execute("SELECT id, taskid FROM tbltask_assigned WHERE id > %s", (assignment_mark,))
+        for assignment_id, task_id in cursor.fetchall():
+            changed_ids.add(task_id)
+            assignment_mark = max(assignment_mark, assignment_id)
+
+        reloaded: Dict[int, _TaskRow] = {}
+        ids = sorted(changed_ids)
+        for start in range(0, len(ids), ROLLUP_RELOAD_BATCH_SIZE):
+            batch = ids[start:start + ROLLUP_RELOAD_BATCH_SIZE]
+            placeholders = ','.join(['%s'] * len(batch))
+            reloaded.update(self._fetch_rows(cursor, f"WHERE t.id IN ({placeholders})", batch))
+
+        with self._lock:
+            for task_id in ids:
+                old = self._rows.pop(task_id, None)
+                if old is not None:
+                    self._apply(old, -1)
+                new = reloaded.get(task_id)
+                if new is not None:
+                    self._rows[task_id] = new
+                    self._apply(new, 1)
+                elif old is not None:
+                    self.stats['tasks_removed'] += 1
+            self._task_mark = task_mark
+            self._assignment_mark = assignment_mark
+            self.stats['incremental_refreshes'] += 1
+            self.stats['tasks_reloaded'] += len(reloaded)
+
+        if ids:
+            logger.info(f"Employee task rollup: applied {len(ids)} task changes")
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Pull task changes into the rollup
+        force=True (or an elapsed rebuild interval) reloads everything; returns False on failure
+        """
+        blocking = force or not self._loaded
+        if not self._refresh_lock.acquire(blocking=blocking):
+            return self._loaded
+        try:
+            connection = self._crm_connection()
+            try:
+                cursor = connection.cursor()
+                if force or not self._loaded or time.time() - self._rebuilt_at >= self.rebuild_seconds:
+                    self._full_load(cursor)
+                else:
+                    self._incremental_load(cursor)
+                cursor.close()
+            finally:
+                connection.close()
+            return True
+        except Exception as e:
+            self.stats['refresh_errors'] += 1
+            logger.warning(f"Employee task rollup refresh failed: {e}")
+            return self._loaded
+        finally:
+            self._checked_at = time.time()
+            self._refresh_lock.release()
+
+    def _ensure_fresh(self) -> bool:
+        if not self._loaded:
+            return self.refresh(force=True)
+        if time.time() - self._checked_at >= self.refresh_seconds:
+            self.refresh()
+        today = date.today()
+        if self._as_of != today:
+            with self._lock:
+                if self._as_of != today:
+                    self._reclassify(today)
+                    self.stats['date_rollovers'] += 1
+        return True
+
+    # ------------------------------------------------------------------ lookups
+
+    def _query_summary(self, staffid: int) -> Dict[str, Any]:
+        """Aggregate one employee straight from the database when the rollup is unavailable"""
+        self.stats['fallback_queries'] += 1
+        today = date.today()
+        rollup = _StaffRollup()
+        connection = self._crm_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("""
+                SELECT t.id, t.status, t.priority, t.duedate, t.datefinished, t.dateadded, ta.staffid
+                FROM tbltasks t
+                INNER JOIN tbltask_assigned ta ON ta.taskid = t.id
+                WHERE ta.staffid = %s
+            """, (staffid,))
+            for db_row in cursor.fetchall():
+                _, row = _TaskRow.from_db(db_row)
+                rollup.accumulate(row, 1, today)
+            cursor.close()
+        finally:
+            connection.close()
+        return rollup.summarize(today)
+
+    def get_summary(self, staffid: int) -> Dict[str, Any]:
+        """Task counters for one employee (zeros when they have no assigned tasks)"""
+        staffid = _to_int(staffid, None)
+        self.stats['lookups'] += 1
+        if not self._ensure_fresh():
+            summary = self._query_summary(staffid)
+        else:
+            with self._lock:
+                rollup = self._staff.get(staffid) or _StaffRollup()
+                summary = rollup.summarize(self._as_of)
+        summary['staffid'] = staffid
+        return summary
+
+    def get_summaries(self, staffids: Iterable[int] = None) -> Dict[int, Dict[str, Any]]:
+        """Counters for several employees at once (all employees with tasks when staffids is None)"""
+        if not self._ensure_fresh():
+            return {staffid: self._query_summary(staffid) for staffid in staffids or ()}
+        with self._lock:
+            ids: List[int] = list(self._staff) if staffids is None else [_to_int(sid, None) for sid in staffids]
+            return {staffid: (self._staff.get(staffid) or _StaffRollup()).summarize(self._as_of)
+                    for staffid in ids}
+
+    def invalidate(self):
+        """Force a full rebuild on the next lookup"""
+        self._rebuilt_at = 0.0
+        self._checked_at = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'loaded': self._loaded,
+                'tasks': len(self._rows),
+                'employees': len(self._staff),
+                'as_of': self._as_of.isoformat() if self._as_of else None,
+                'last_refresh': self._checked_at,
+                'last_full_load': self._rebuilt_at,
+                'task_watermark': str(self._task_mark) if self._task_mark is not None else None,
+                'assignment_watermark': self._assignment_mark
+            })
+        return stats
+
+
+_rollup: Optional[EmployeeTaskRollup] = None
+_rollup_lock = threading.Lock()
+
+
+def get_employee_task_rollup() -> EmployeeTaskRollup:
+    """Process-wide employee task rollup"""
+    global _rollup
+    if _rollup is None:
+        with _rollup_lock:
+            if _rollup is None:
+                _rollup = EmployeeTaskRollup()
+    return _rollup
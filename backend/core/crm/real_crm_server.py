@@ -6,13 +6,18 @@ Bypasses ChromaDB/OpenAI issues and connects directly to database
 
 from flask import Flask, request, jsonify, make_response
 from flask_cors import CORS
-import mysql.connector
 import os
+import re
 from dotenv import load_dotenv
 import json
 from datetime import datetime
 import openai
 from services.enhanced_ai_query_service import enhanced_ai_service
+from core.crm.connection_pool import get_crm_connection
+from core.crm.staff_directory import get_staff_directory, normalize_name, FIND_MIN_SCORE
+from core.crm.search_index import get_crm_search_index
+from utils.intent_classifier import get_intent_classifier
+from utils.analysis_cache import get_analysis_cache
 
 # Import the intelligent table mapper
 try:
@@ -33,6 +38,12 @@ openai.api_key = os.getenv('OPENAI_API_KEY')
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
+# Local intent classifier and analysis cache in front of analyze_user_intent_with_openai
+intent_classifier = get_intent_classifier('crm_intent')
+analysis_cache = get_analysis_cache()
+# Bump when the analyze_user_intent_with_openai prompt changes so cached analyses are dropped
+INTENT_PROMPT_VERSION = '1'
+
 # Conversation history storage - simple in-memory storage for demo
 # In production, you'd want to use Redis, database sessions, or similar
 conversation_history = {}
@@ -185,16 +196,15 @@ def update_conversation_context(context, intent_analysis, results):
     return context
 
 def get_database_connection():
-    """Get MySQL database connection"""
+    """Get a pooled MySQL database connection (close() returns it to the pool)"""
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST'),
-            database=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            port=int(os.getenv('DB_PORT', 3306))
-        )
-        return connection
+        return get_crm_connection({
+            'host': os.getenv('DB_HOST'),
+            'database': os.getenv('DB_NAME'),
+            'user': os.getenv('DB_USER'),
+            'password': os.getenv('DB_PASSWORD'),
+            'port': int(os.getenv('DB_PORT', 3306))
+        })
     except Exception as e:
         print(f"Database connection error: {e}")
         return None
@@ -286,8 +296,108 @@ def analyze_hamza_performance(projects, tasks_data=None):
     """Analyze Hamza's work performance - backward compatibility"""
     return analyze_employee_performance(projects, "Hamza", tasks_data)
 
+def expand_search_terms(query_lower, include_substrings=True):
+    """Expand a query into search terms (suffix stripping, substrings, typo variants, synonyms)"""
+    search_terms = []
+    words = query_lower.split()
+    
+    # Strategy 1: Original words
+    for word in words:
+        if len(word) > 1:  # Accept even 2-letter words
+            search_terms.append(word)
+    
+    # Strategy 2: Remove common suffixes/prefixes
+    for word in words:
+        if len(word) > 3:
+            # Remove plural 's', 'es', 'ies'
+            if word.endswith('s') and not word.endswith('ss'):
+                search_terms.append(word[:-1])
+            if word.endswith('es'):
+                search_terms.append(word[:-2])
+            if word.endswith('ies'):
+                search_terms.append(word[:-3] + 'y')
+            # Remove 'ing', 'ed', 'er', 'ly'
+            if word.endswith('ing'):
+                search_terms.append(word[:-3])
+            if word.endswith('ed'):
+                search_terms.append(word[:-2])
+            if word.endswith('er'):
+                search_terms.append(word[:-2])
+            if word.endswith('ly'):
+                search_terms.append(word[:-2])
+    
+    # Strategy 3: Partial words (substrings) - the n-gram index covers these itself
+    for word in words:
+        if include_substrings and len(word) > 4:
+            # Add 3-character and 4-character substrings
+            for i in range(len(word) - 2):
+                if i + 3 <= len(word):
+                    search_terms.append(word[i:i+3])
+                if i + 4 <= len(word):
+                    search_terms.append(word[i:i+4])
+    
+    # Strategy 4: Phonetic and typo variations
+    typo_variants = {
+        'z': 's', 's': 'z', 'c': 'k', 'k': 'c', 'ph': 'f', 'f': 'ph',
+        'i': 'y', 'y': 'i', 'ei': 'ie', 'ie': 'ei'
+    }
+    for word in words:
+        if len(word) > 3:
+            for old, new in typo_variants.items():
+                if old in word:
+                    search_terms.append(word.replace(old, new))
+    
+    # Strategy 5: Work-related synonyms expansion
+    work_synonyms = {
+        'work': ['project', 'task', 'assignment', 'job', 'activity', 'effort'],
+        'project': ['work', 'assignment', 'initiative', 'development', 'job'],
+        'task': ['work', 'assignment', 'todo', 'activity', 'item'],
+        'performance': ['progress', 'status', 'achievement', 'result', 'output'],
+        'doing': ['working', 'performing', 'executing', 'handling', 'managing'],
+        'status': ['progress', 'condition', 'state', 'situation', 'update'],
+        'busy': ['occupied', 'working', 'active', 'engaged', 'loaded'],
+        'team': ['staff', 'employees', 'workers', 'people', 'members'],
+        'show': ['display', 'list', 'view', 'get', 'find', 'see'],
+        'stuff': ['things', 'items', 'work', 'activities', 'projects']
+    }
+    
+    for word in words:
+        if word in work_synonyms:
+            search_terms.extend(work_synonyms[word])
+    
+    # Remove duplicates and very short terms
+    search_terms = list(set([term for term in search_terms if len(term) > 1]))
+    return words, search_terms
+
 def comprehensive_crm_search(query_text):
-    """Ultra-comprehensive search across all CRM tables with 1000+ matching strategies"""
+    """Search employees, projects and tasks from the local n-gram index; SQL only while the index is cold or failing"""
+    query_lower = query_text.lower().strip()
+    
+    try:
+        search_index = get_crm_search_index()
+        search_index.ensure_fresh()
+        if search_index.is_warm():
+            words, index_terms = expand_search_terms(query_lower, include_substrings=False)
+            hits = search_index.search(index_terms, query_lower)
+            # A warm index is authoritative: no hits means no matches, not a SQL rescan
+            results = {
+                'employees': hits['employees'],
+                'projects': hits['projects'],
+                'tasks': hits['tasks'],
+                'found_matches': any(hits.values()),
+                'search_terms': index_terms,
+                'match_strategies': ['search_index']
+            }
+            print(f"✅ Search index results: {len(results['employees'])} employees, {len(results['projects'])} projects, {len(results['tasks'])} tasks")
+            return results
+    except Exception as e:
+        print(f"Search index unavailable, falling back to SQL search: {e}")
+    
+    return comprehensive_crm_sql_search(query_text)
+
+def comprehensive_crm_sql_search(query_text):
+    """Ultra-comprehensive LIKE-based search across all CRM tables (fallback while the search index is cold or failing)"""
+    connection = None
     try:
         query_lower = query_text.lower().strip()
         results = {
@@ -300,75 +410,7 @@ def comprehensive_crm_search(query_text):
         }
         
         # ULTRA-COMPREHENSIVE SEARCH TERM EXTRACTION
-        search_terms = []
-        words = query_lower.split()
-        
-        # Strategy 1: Original words
-        for word in words:
-            if len(word) > 1:  # Accept even 2-letter words
-                search_terms.append(word)
-        
-        # Strategy 2: Remove common suffixes/prefixes
-        for word in words:
-            if len(word) > 3:
-                # Remove plural 's', 'es', 'ies'
-                if word.endswith('s') and not word.endswith('ss'):
-                    search_terms.append(word[:-1])
-                if word.endswith('es'):
-                    search_terms.append(word[:-2])
-                if word.endswith('ies'):
-                    search_terms.append(word[:-3] + 'y')
-                # Remove 'ing', 'ed', 'er', 'ly'
-                if word.endswith('ing'):
-                    search_terms.append(word[:-3])
-                if word.endswith('ed'):
-                    search_terms.append(word[:-2])
-                if word.endswith('er'):
-                    search_terms.append(word[:-2])
-                if word.endswith('ly'):
-                    search_terms.append(word[:-2])
-        
-        # Strategy 3: Partial words (substrings)
-        for word in words:
-            if len(word) > 4:
-                # Add 3-character and 4-character substrings
-                for i in range(len(word) - 2):
-                    if i + 3 <= len(word):
-                        search_terms.append(word[i:i+3])
-                    if i + 4 <= len(word):
-                        search_terms.append(word[i:i+4])
-        
-        # Strategy 4: Phonetic and typo variations
-        typo_variants = {
-            'z': 's', 's': 'z', 'c': 'k', 'k': 'c', 'ph': 'f', 'f': 'ph',
-            'i': 'y', 'y': 'i', 'ei': 'ie', 'ie': 'ei'
-        }
-        for word in words:
-            if len(word) > 3:
-                for old, new in typo_variants.items():
-                    if old in word:
-                        search_terms.append(word.replace(old, new))
-        
-        # Strategy 5: Work-related synonyms expansion
-        work_synonyms = {
-            'work': ['project', 'task', 'assignment', 'job', 'activity', 'effort'],
-            'project': ['work', 'assignment', 'initiative', 'development', 'job'],
-            'task': ['work', 'assignment', 'todo', 'activity', 'item'],
-            'performance': ['progress', 'status', 'achievement', 'result', 'output'],
-            'doing': ['working', 'performing', 'executing', 'handling', 'managing'],
-            'status': ['progress', 'condition', 'state', 'situation', 'update'],
-            'busy': ['occupied', 'working', 'active', 'engaged', 'loaded'],
-            'team': ['staff', 'employees', 'workers', 'people', 'members'],
-            'show': ['display', 'list', 'view', 'get', 'find', 'see'],
-            'stuff': ['things', 'items', 'work', 'activities', 'projects']
-        }
-        
-        for word in words:
-            if word in work_synonyms:
-                search_terms.extend(work_synonyms[word])
-        
-        # Remove duplicates and very short terms
-        search_terms = list(set([term for term in search_terms if len(term) > 1]))
+        words, search_terms = expand_search_terms(query_lower)
         results['search_terms'] = search_terms
         
         connection = get_database_connection()
@@ -632,6 +674,20 @@ def generate_comprehensive_search_response(search_results, original_query):
 
 def analyze_user_intent_with_openai(user_query):
     """Use OpenAI to intelligently understand user intent with ultra-comprehensive patterns"""
+    cached_intent = analysis_cache.get('crm_intent', user_query, INTENT_PROMPT_VERSION)
+    if cached_intent is not None:
+        return cached_intent
+    
+    # Rule-based analysis first; OpenAI is only consulted when the local classifier isn't confident
+    local_intent = rule_based_intent_analysis(user_query)
+    prediction = intent_classifier.classify(
+        user_query, rule_intent=local_intent['intent_type'], rule_confidence=local_intent['confidence']
+    )
+    if prediction.confident and prediction.intent == local_intent['intent_type']:
+        local_intent['confidence'] = round(prediction.confidence, 3)
+        local_intent['analysis_source'] = 'local_classifier'
+        return local_intent
+    
     try:
         # Use the old OpenAI API style (compatible with v1.3.7)
         response = openai.ChatCompletion.create(
@@ -748,422 +804,309 @@ def analyze_user_intent_with_openai(user_query):
         # Parse OpenAI response (old API style) 
         content = response.choices[0].message.content
         intent_data = json.loads(content)
+        intent_classifier.learn(user_query, intent_data.get('intent_type'), prediction)
+        analysis_cache.put('crm_intent', user_query, INTENT_PROMPT_VERSION, intent_data)
         return intent_data
         
     except Exception as e:
         print(f"OpenAI analysis error: {e}")
-        
-        # ULTRA-COMPREHENSIVE FALLBACK LOGIC - 1000+ patterns
-        user_lower = user_query.lower().strip()
-        words = user_lower.split()
-        
-        # GREETING DETECTION - 50+ patterns
-        greeting_patterns = [
-            'hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening', 
-            'how are you', 'whats up', 'sup', 'yo', 'greetings', 'howdy', 'hola',
-            'bonjour', 'guten tag', 'konnichiwa', 'namaste', 'salaam', 'shalom',
-            'ciao', 'aloha', 'g\'day', 'top of the morning', 'good day', 'nice to see you'
-        ]
-        if any(greeting in user_lower for greeting in greeting_patterns):
-            return {
-                "intent_type": "greeting",
-                "target": None,
-                "wants_list": False,
-                "wants_details": False,
-                "wants_performance": False,
-                "search_terms": [],
-                "alternative_names": [],
-                "confidence": 0.95,
-                "explanation": "Greeting detected with comprehensive pattern matching"
-            }
-        
-        # EMPLOYEE NAME DETECTION - 500+ patterns and variations
-        known_names = [
-            # Full names and variations
-            'hamza', 'hamza haseeb', 'haseeb', 'h haseeb', 'h.haseeb',
-            'nawaz', 'nawaz muhammed', 'muhammed', 'n muhammed', 'n.muhammed',
-            'abdelrehman', 'abdelrehman sweidean', 'sweidean', 'abdel', 'rehman',
-            'aiza', 'aiza kiran', 'kiran', 'danish', 'danish ali', 'ali',
-            'elif', 'elif kesici', 'kesici', 'engin', 'engin özkan', 'özkan',
-            'gerald', 'gerald takunda', 'takunda', 'gülay', 'gülay şencer', 'şencer',
-            'halil', 'halil keser', 'keser', 'hasan', 'hasan erdoğan', 'erdoğan',
-            'hilal', 'hilal özçelik', 'özçelik', 'hüseyin', 'hüseyin erkek', 'erkek',
-            'ihsan', 'ihsan keskin', 'keskin', 'kadir', 'kadir beşkardeş', 'beşkardeş',
-            'kevser', 'kevser gündoğdu', 'gündoğdu', 'mansoor', 'mansoor rehman', 'rehman',
-            'mehmet', 'mehmet önk', 'önk', 'fatih', 'metin', 'metin ağaçdelen', 'ağaçdelen',
-            'miray', 'miray akkoçan', 'akkoçan', 'mohsin', 'mohsin abbass', 'abbass',
-            'muhammad', 'muhammad zain', 'zain', 'ömer', 'ömer yalçın', 'yalçın',
-            'prakhar', 'prakhar saxena', 'saxena', 'rabia', 'rabia yel', 'yel',
-            'rukiye', 'rukiye mıngır', 'mıngır', 'shahbaz', 'shahbaz ali',
-            'shazif', 'shazif abbas', 'tuğba', 'tuğba çalıkoğlu', 'çalıkoğlu',
-            'tunahan', 'tunahan kılıç', 'kılıç', 'umut', 'umut güney', 'güney',
-            'yunus', 'yunus katırcı', 'katırcı', 'yusuf', 'yusuf saygı', 'saygı',
-            'zahra', 'begüm', 'begüm şen', 'şen', 'deniz', 'deniz üstündağ', 'üstündağ',
-            'esen', 'esen döşemeciler', 'döşemeciler', 'habibe', 'habibe ceylan', 'ceylan',
-            'tuğçe', 'tuğçe açıkyürek', 'açıkyürek', 'mert', 'mert tatar', 'tatar',
-            # Common variations and typos
-            'john', 'jon', 'johnny', 'sarah', 'sara', 'mike', 'michael', 'mick',
-            'david', 'dave', 'davey', 'lisa', 'liza', 'alex', 'alexander', 'alexandra',
-            'maria', 'marie', 'mary', 'james', 'jim', 'jimmy', 'emma', 'emily',
-            'ahmed', 'ahmad', 'muhammad', 'mohammad', 'hassan', 'hasan', 'fatima', 'aisha'
-        ]
-        
-        # Find any name mentions
-        detected_names = []
-        for name in sorted(known_names, key=len, reverse=True):  # Longest first
-            if name in user_lower:
-                detected_names.append(name.title())
-                break  # Take the longest match
-        
-        # EMPLOYEE-SPECIFIC PATTERNS - 200+ ways to ask about people
-        employee_indicators = [
-            'projects', 'project', 'work', 'working', 'doing', 'performance', 'progress',
-            'status', 'update', 'info', 'details', 'activities', 'assignments', 'tasks',
-            'busy', 'free', 'available', 'workload', 'schedule', 'timeline', 'deadline',
-            'responsibilities', 'role', 'job', 'position', 'duties', 'occupation',
-            'accomplishments', 'achievements', 'results', 'output', 'productivity',
-            'efficiency', 'quality', 'goals', 'objectives', 'targets', 'metrics',
-            'reports', 'summary', 'overview', 'analysis', 'evaluation', 'assessment'
-        ]
-        
-        # PRIORITY CHECK: DISTINGUISH BETWEEN EMPLOYEE PROJECT LISTS vs ALL PROJECT LISTS
-        # Check if user wants a list even if they mention employee names
-        list_indicators = [
-            'list', 'names', 'directory', 'show list', 'project names', 'projects names', 
-            'name list', 'names list', 'project directory', 'project catalog', 'project roster'
-        ]
-        
-        # ALL projects indicators (no employee specificity)
-        all_projects_indicators = [
-            'show all projects', 'give me all projects', 'display all projects',
-            'all projects', 'complete project list', 'entire project list'
-        ]
-        
-        wants_list = any(indicator in user_lower for indicator in list_indicators)
-        wants_all_projects = any(indicator in user_lower for indicator in all_projects_indicators)
-        
-        if detected_names and any(indicator in user_lower for indicator in employee_indicators):
-            # Check if this is actually a general "all projects" request (ignoring employee names)
-            if wants_all_projects:
-                return {
-                    "intent_type": "projects_list",
-                    "target": None,  # All projects, ignore employee name
-                    "wants_list": True,
-                    "wants_details": False,
-                    "wants_performance": False,
-                    "search_terms": ["projects", "list", "names", "all"],
-                    "alternative_names": [],
-                    "confidence": 0.9,
-                    "explanation": f"All projects list request (ignoring mentioned {detected_names[0]})"
-                }
-            # Check if this is employee-specific project list
-            elif wants_list and any(proj_word in user_lower for proj_word in ['project', 'projects']):
-                return {
-                    "intent_type": "employee_projects_list",
-                    "target": detected_names[0],  # Target specific employee
-                    "wants_list": True,
-                    "wants_details": False,
-                    "wants_performance": False,
-                    "search_terms": [detected_names[0].lower(), "projects", "list"],
-                    "alternative_names": detected_names,
-                    "confidence": 0.95,
-                    "explanation": f"Employee-specific projects list for {detected_names[0]}"
-                }
-            else:
-                # Regular employee-specific performance query  
-                return {
-                    "intent_type": "specific_employee",
-                    "target": detected_names[0],
-                    "wants_list": False,
-                    "wants_details": True,
-                    "wants_performance": True,
-                    "search_terms": [detected_names[0].lower()] + [w for w in words if len(w) > 2],
-                    "alternative_names": detected_names,
-                    "confidence": 0.85,
-                    "explanation": f"Employee-specific query detected for {detected_names[0]}"
-                }
-        
-        # EMPLOYEE LIST PATTERNS - 100+ ways to ask for staff list
-        employee_list_patterns = [
-            'employee', 'employees', 'staff', 'team', 'people', 'workers', 'colleagues',
-            'workforce', 'personnel', 'crew', 'members', 'roster', 'directory', 'list',
-            'who works', 'who is', 'show all', 'everyone', 'everybody', 'all people',
-            'company people', 'team members', 'staff members', 'human resources',
-            'org chart', 'organization', 'department', 'division', 'group', 'squad'
-        ]
-        
-        employee_list_verbs = ['show', 'list', 'display', 'get', 'find', 'see', 'view', 'check']
-        
-        if (any(pattern in user_lower for pattern in employee_list_patterns) and 
-            any(verb in user_lower for verb in employee_list_verbs)) or \
-           any(phrase in user_lower for phrase in ['who works here', 'all employees', 'staff list', 'team list']):
+        return local_intent
+
+def rule_based_intent_analysis(user_query):
+    """Rule-based intent analysis (also the fallback when OpenAI is unavailable)"""
+    # ULTRA-COMPREHENSIVE FALLBACK LOGIC - 1000+ patterns
+    user_lower = user_query.lower().strip()
+    words = user_lower.split()
+    
+    # GREETING DETECTION - 50+ patterns
+    greeting_patterns = [
+        'hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening', 
+        'how are you', 'whats up', 'sup', 'yo', 'greetings', 'howdy', 'hola',
+        'bonjour', 'guten tag', 'konnichiwa', 'namaste', 'salaam', 'shalom',
+        'ciao', 'aloha', 'g\'day', 'top of the morning', 'good day', 'nice to see you'
+    ]
+    # Whole words only ("hi" must not match inside "this" or "which")
+    if re.search(r"\b(?:" + '|'.join(re.escape(greeting) for greeting in greeting_patterns) + r")\b", user_lower):
+        return {
+            "intent_type": "greeting",
+            "target": None,
+            "wants_list": False,
+            "wants_details": False,
+            "wants_performance": False,
+            "search_terms": [],
+            "alternative_names": [],
+            "confidence": 0.95,
+            "explanation": "Greeting detected with comprehensive pattern matching"
+        }
+    
+    # EMPLOYEE NAME DETECTION - 500+ patterns and variations
+    known_names = [
+        # Full names and variations
+        'hamza', 'hamza haseeb', 'haseeb', 'h haseeb', 'h.haseeb',
+        'nawaz', 'nawaz muhammed', 'muhammed', 'n muhammed', 'n.muhammed',
+        'abdelrehman', 'abdelrehman sweidean', 'sweidean', 'abdel', 'rehman',
+        'aiza', 'aiza kiran', 'kiran', 'danish', 'danish ali', 'ali',
+        'elif', 'elif kesici', 'kesici', 'engin', 'engin özkan', 'özkan',
+        'gerald', 'gerald takunda', 'takunda', 'gülay', 'gülay şencer', 'şencer',
+        'halil', 'halil keser', 'keser', 'hasan', 'hasan erdoğan', 'erdoğan',
+        'hilal', 'hilal özçelik', 'özçelik', 'hüseyin', 'hüseyin erkek', 'erkek',
+        'ihsan', 'ihsan keskin', 'keskin', 'kadir', 'kadir beşkardeş', 'beşkardeş',
+        'kevser', 'kevser gündoğdu', 'gündoğdu', 'mansoor', 'mansoor rehman', 'rehman',
+        'mehmet', 'mehmet önk', 'önk', 'fatih', 'metin', 'metin ağaçdelen', 'ağaçdelen',
+        'miray', 'miray akkoçan', 'akkoçan', 'mohsin', 'mohsin abbass', 'abbass',
+        'muhammad', 'muhammad zain', 'zain', 'ömer', 'ömer yalçın', 'yalçın',
+        'prakhar', 'prakhar saxena', 'saxena', 'rabia', 'rabia yel', 'yel',
+        'rukiye', 'rukiye mıngır', 'mıngır', 'shahbaz', 'shahbaz ali',
+        'shazif', 'shazif abbas', 'tuğba', 'tuğba çalıkoğlu', 'çalıkoğlu',
+        'tunahan', 'tunahan kılıç', 'kılıç', 'umut', 'umut güney', 'güney',
+        'yunus', 'yunus katırcı', 'katırcı', 'yusuf', 'yusuf saygı', 'saygı',
+        'zahra', 'begüm', 'begüm şen', 'şen', 'deniz', 'deniz üstündağ', 'üstündağ',
+        'esen', 'esen döşemeciler', 'döşemeciler', 'habibe', 'habibe ceylan', 'ceylan',
+        'tuğçe', 'tuğçe açıkyürek', 'açıkyürek', 'mert', 'mert tatar', 'tatar',
+        # Common variations and typos
+        'john', 'jon', 'johnny', 'sarah', 'sara', 'mike', 'michael', 'mick',
+        'david', 'dave', 'davey', 'lisa', 'liza', 'alex', 'alexander', 'alexandra',
+        'maria', 'marie', 'mary', 'james', 'jim', 'jimmy', 'emma', 'emily',
+        'ahmed', 'ahmad', 'muhammad', 'mohammad', 'hassan', 'hasan', 'fatima', 'aisha'
+    ]
+    
+    # Find any name mentions
+    detected_names = []
+    for name in sorted(known_names, key=len, reverse=True):  # Longest first
+        if name in user_lower:
+            detected_names.append(name.title())
+            break  # Take the longest match
+    
+    # EMPLOYEE-SPECIFIC PATTERNS - 200+ ways to ask about people
+    employee_indicators = [
+        'projects', 'project', 'work', 'working', 'doing', 'performance', 'progress',
+        'status', 'update', 'info', 'details', 'activities', 'assignments', 'tasks',
+        'busy', 'free', 'available', 'workload', 'schedule', 'timeline', 'deadline',
+        'responsibilities', 'role', 'job', 'position', 'duties', 'occupation',
+        'accomplishments', 'achievements', 'results', 'output', 'productivity',
+        'efficiency', 'quality', 'goals', 'objectives', 'targets', 'metrics',
+        'reports', 'summary', 'overview', 'analysis', 'evaluation', 'assessment'
+    ]
+    
+    # PRIORITY CHECK: DISTINGUISH BETWEEN EMPLOYEE PROJECT LISTS vs ALL PROJECT LISTS
+    # Check if user wants a list even if they mention employee names
+    list_indicators = [
+        'list', 'names', 'directory', 'show list', 'project names', 'projects names', 
+        'name list', 'names list', 'project directory', 'project catalog', 'project roster'
+    ]
+    
+    # ALL projects indicators (no employee specificity)
+    all_projects_indicators = [
+        'show all projects', 'give me all projects', 'display all projects',
+        'all projects', 'complete project list', 'entire project list'
+    ]
+    
+    wants_list = any(indicator in user_lower for indicator in list_indicators)
+    wants_all_projects = any(indicator in user_lower for indicator in all_projects_indicators)
+    
+    if detected_names and any(indicator in user_lower for indicator in employee_indicators):
+        # Check if this is actually a general "all projects" request (ignoring employee names)
+        if wants_all_projects:
             return {
-                "intent_type": "employee_list",
-                "target": None,
+                "intent_type": "projects_list",
+                "target": None,  # All projects, ignore employee name
                 "wants_list": True,
                 "wants_details": False,
                 "wants_performance": False,
-                "search_terms": ["employees", "staff", "team"],
+                "search_terms": ["projects", "list", "names", "all"],
                 "alternative_names": [],
                 "confidence": 0.9,
-                "explanation": "Employee list request detected"
+                "explanation": f"All projects list request (ignoring mentioned {detected_names[0]})"
             }
-        
-        # PROJECTS LIST PATTERNS - 150+ ways to ask about projects
-        project_patterns = [
-            'project', 'projects', 'work', 'assignment', 'assignments', 'job', 'jobs',
-            'task', 'tasks', 'initiative', 'initiatives', 'campaign', 'campaigns',
-            'development', 'developments', 'client work', 'business', 'portfolio',
-            'active work', 'ongoing work', 'current work', 'pending work', 'future work',
-            'deliverable', 'deliverables', 'milestone', 'milestones', 'deadline',
-            'deadlines', 'timeline', 'schedule', 'planning', 'roadmap', 'backlog'
-        ]
-        
-        project_verbs = ['show', 'list', 'display', 'get', 'find', 'see', 'view', 'about', 'what']
-        
-        if (any(pattern in user_lower for pattern in project_patterns) and 
-            any(verb in user_lower for verb in project_verbs)) or \
-           any(phrase in user_lower for phrase in ['about projects', 'project overview', 'all projects']):
+        # Check if this is employee-specific project list
+        elif wants_list and any(proj_word in user_lower for proj_word in ['project', 'projects']):
             return {
-                "intent_type": "projects_list",
-                "target": None,
+                "intent_type": "employee_projects_list",
+                "target": detected_names[0],  # Target specific employee
                 "wants_list": True,
                 "wants_details": False,
                 "wants_performance": False,
-                "search_terms": ["projects", "work", "assignments"],
-                "alternative_names": [],
-                "confidence": 0.85,
-                "explanation": "Projects list request detected"
+                "search_terms": [detected_names[0].lower(), "projects", "list"],
+                "alternative_names": detected_names,
+                "confidence": 0.95,
+                "explanation": f"Employee-specific projects list for {detected_names[0]}"
             }
-        
-        # PERFORMANCE/STATUS PATTERNS - 100+ ways to ask about status
-        performance_patterns = [
-            'overdue', 'behind', 'late', 'delayed', 'problem', 'problems', 'issue', 'issues',
-            'stuck', 'blocked', 'bottleneck', 'bottlenecks', 'concern', 'concerns',
-            'performance', 'progress', 'status', 'health', 'overview', 'summary',
-            'dashboard', 'report', 'analytics', 'metrics', 'kpi', 'kpis',
-            'happening', 'going on', 'whats up', 'situation', 'update', 'news'
-        ]
-        
-        if any(pattern in user_lower for pattern in performance_patterns):
+        else:
+            # Regular employee-specific performance query  
             return {
-                "intent_type": "performance_analysis",
-                "target": None,
+                "intent_type": "specific_employee",
+                "target": detected_names[0],
                 "wants_list": False,
-                "wants_details": False,
+                "wants_details": True,
                 "wants_performance": True,
-                "search_terms": [w for w in words if len(w) > 2],
-                "alternative_names": [],
-                "confidence": 0.8,
-                "explanation": "Performance/status analysis requested"
-            }
-        
-        # TASK-FOCUSED PATTERNS - 120+ ways to ask about tasks
-        task_patterns = [
-            'task', 'tasks', 'todo', 'todos', 'assignment', 'assignments', 'work item',
-            'action item', 'deliverable', 'deliverables', 'milestone', 'milestones',
-            'deadline', 'deadlines', 'schedule', 'timeline', 'calendar', 'agenda',
-            'task list', 'tasks list', 'task lists', 'show tasks', 'list tasks',
-            'coordination tasks', 'agent tasks', 'coordination agent tasks'
-        ]
-        
-        # Also check for project-specific task queries
-        project_task_indicators = [
-            'coordination agent', 'ai coordination', 'coordination tasks',
-            'agent tasks', 'project tasks'
-        ]
-        
-        has_task_word = any(pattern in user_lower for pattern in task_patterns)
-        has_project_task = any(indicator in user_lower for indicator in project_task_indicators)
-        
-        if has_task_word or has_project_task:
-            # Extract project name if mentioned
-            project_target = None
-            if 'ai coordination' in user_lower or 'coordination agent' in user_lower:
-                project_target = 'ai coordination agent'
-            elif 'dds focus pro' in user_lower:
-                project_target = 'dds focus pro'
-            
-            return {
-                "intent_type": "project_tasks",
-                "target": project_target,  # Include project name if detected
-                "wants_list": True,
-                "wants_details": False,
-                "wants_performance": False,
-                "search_terms": ["tasks", "assignments", "work"] + ([project_target] if project_target else []),
-                "alternative_names": [],
+                "search_terms": [detected_names[0].lower()] + [w for w in words if len(w) > 2],
+                "alternative_names": detected_names,
                 "confidence": 0.85,
-                "explanation": f"Task-focused query detected{' for ' + project_target if project_target else ''}"
+                "explanation": f"Employee-specific query detected for {detected_names[0]}"
             }
-        
-        # GENERAL SEARCH - catch everything else with maximum search terms
-        # Extract ALL meaningful words as potential search terms
-        meaningful_words = []
-        stop_words = {'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'i', 'me', 'my', 'you', 'your', 'he', 'him', 'his', 'she', 'her', 'it', 'its', 'we', 'us', 'our', 'they', 'them', 'their'}
-        
-        for word in words:
-            if len(word) > 2 and word not in stop_words:
-                meaningful_words.append(word)
-                # Add variations for better matching
-                if word.endswith('s') and len(word) > 3:
-                    meaningful_words.append(word[:-1])  # Remove plural 's'
-                if word.endswith('ing') and len(word) > 5:
-                    meaningful_words.append(word[:-3])  # Remove 'ing'
-        
+    
+    # EMPLOYEE LIST PATTERNS - 100+ ways to ask for staff list
+    employee_list_patterns = [
+        'employee', 'employees', 'staff', 'team', 'people', 'workers', 'colleagues',
+        'workforce', 'personnel', 'crew', 'members', 'roster', 'directory', 'list',
+        'who works', 'who is', 'show all', 'everyone', 'everybody', 'all people',
+        'company people', 'team members', 'staff members', 'human resources',
+        'org chart', 'organization', 'department', 'division', 'group', 'squad'
+    ]
+    
+    employee_list_verbs = ['show', 'list', 'display', 'get', 'find', 'see', 'view', 'check']
+    
+    if (any(pattern in user_lower for pattern in employee_list_patterns) and 
+        any(verb in user_lower for verb in employee_list_verbs)) or \
+       any(phrase in user_lower for phrase in ['who works here', 'all employees', 'staff list', 'team list']):
+        return {
+            "intent_type": "employee_list",
+            "target": None,
+            "wants_list": True,
+            "wants_details": False,
+            "wants_performance": False,
+            "search_terms": ["employees", "staff", "team"],
+            "alternative_names": [],
+            "confidence": 0.9,
+            "explanation": "Employee list request detected"
+        }
+    
+    # PROJECTS LIST PATTERNS - 150+ ways to ask about projects
+    project_patterns = [
+        'project', 'projects', 'work', 'assignment', 'assignments', 'job', 'jobs',
+        'task', 'tasks', 'initiative', 'initiatives', 'campaign', 'campaigns',
+        'development', 'developments', 'client work', 'business', 'portfolio',
+        'active work', 'ongoing work', 'current work', 'pending work', 'future work',
+        'deliverable', 'deliverables', 'milestone', 'milestones', 'deadline',
+        'deadlines', 'timeline', 'schedule', 'planning', 'roadmap', 'backlog'
+    ]
+    
+    project_verbs = ['show', 'list', 'display', 'get', 'find', 'see', 'view', 'about', 'what']
+    
+    if (any(pattern in user_lower for pattern in project_patterns) and 
+        any(verb in user_lower for verb in project_verbs)) or \
+       any(phrase in user_lower for phrase in ['about projects', 'project overview', 'all projects']):
         return {
-            "intent_type": "general_search",
+            "intent_type": "projects_list",
+            "target": None,
+            "wants_list": True,
+            "wants_details": False,
+            "wants_performance": False,
+            "search_terms": ["projects", "work", "assignments"],
+            "alternative_names": [],
+            "confidence": 0.85,
+            "explanation": "Projects list request detected"
+        }
+    
+    # PERFORMANCE/STATUS PATTERNS - 100+ ways to ask about status
+    performance_patterns = [
+        'overdue', 'behind', 'late', 'delayed', 'problem', 'problems', 'issue', 'issues',
+        'stuck', 'blocked', 'bottleneck', 'bottlenecks', 'concern', 'concerns',
+        'performance', 'progress', 'status', 'health', 'overview', 'summary',
+        'dashboard', 'report', 'analytics', 'metrics', 'kpi', 'kpis',
+        'happening', 'going on', 'whats up', 'situation', 'update', 'news'
+    ]
+    
+    if any(pattern in user_lower for pattern in performance_patterns):
+        return {
+            "intent_type": "performance_analysis",
             "target": None,
             "wants_list": False,
             "wants_details": False,
+            "wants_performance": True,
+            "search_terms": [w for w in words if len(w) > 2],
+            "alternative_names": [],
+            "confidence": 0.8,
+            "explanation": "Performance/status analysis requested"
+        }
+    
+    # TASK-FOCUSED PATTERNS - 120+ ways to ask about tasks
+    task_patterns = [
+        'task', 'tasks', 'todo', 'todos', 'assignment', 'assignments', 'work item',
+        'action item', 'deliverable', 'deliverables', 'milestone', 'milestones',
+        'deadline', 'deadlines', 'schedule', 'timeline', 'calendar', 'agenda',
+        'task list', 'tasks list', 'task lists', 'show tasks', 'list tasks',
+        'coordination tasks', 'agent tasks', 'coordination agent tasks'
+    ]
+    
+    # Also check for project-specific task queries
+    project_task_indicators = [
+        'coordination agent', 'ai coordination', 'coordination tasks',
+        'agent tasks', 'project tasks'
+    ]
+    
+    has_task_word = any(pattern in user_lower for pattern in task_patterns)
+    has_project_task = any(indicator in user_lower for indicator in project_task_indicators)
+    
+    if has_task_word or has_project_task:
+        # Extract project name if mentioned
+        project_target = None
+        if 'ai coordination' in user_lower or 'coordination agent' in user_lower:
+            project_target = 'ai coordination agent'
+        elif 'dds focus pro' in user_lower:
+            project_target = 'dds focus pro'
+        
+        return {
+            "intent_type": "project_tasks",
+            "target": project_target,  # Include project name if detected
+            "wants_list": True,
+            "wants_details": False,
             "wants_performance": False,
-            "search_terms": meaningful_words + words,  # Include both processed and original
-            "alternative_names": detected_names,
-            "confidence": 0.6,
-            "explanation": f"General search with comprehensive term extraction: {meaningful_words}"
+            "search_terms": ["tasks", "assignments", "work"] + ([project_target] if project_target else []),
+            "alternative_names": [],
+            "confidence": 0.85,
+            "explanation": f"Task-focused query detected{' for ' + project_target if project_target else ''}"
         }
+    
+    # GENERAL SEARCH - catch everything else with maximum search terms
+    # Extract ALL meaningful words as potential search terms
+    meaningful_words = []
+    stop_words = {'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by', 'a', 'an', 'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'could', 'should', 'may', 'might', 'can', 'this', 'that', 'these', 'those', 'i', 'me', 'my', 'you', 'your', 'he', 'him', 'his', 'she', 'her', 'it', 'its', 'we', 'us', 'our', 'they', 'them', 'their'}
+    
+    for word in words:
+        if len(word) > 2 and word not in stop_words:
+            meaningful_words.append(word)
+            # Add variations for better matching
+            if word.endswith('s') and len(word) > 3:
+                meaningful_words.append(word[:-1])  # Remove plural 's'
+            if word.endswith('ing') and len(word) > 5:
+                meaningful_words.append(word[:-3])  # Remove 'ing'
+    
+    return {
+        "intent_type": "general_search",
+        "target": None,
+        "wants_list": False,
+        "wants_details": False,
+        "wants_performance": False,
+        "search_terms": meaningful_words + words,  # Include both processed and original
+        "alternative_names": detected_names,
+        "confidence": 0.6,
+        "explanation": f"General search with comprehensive term extraction: {meaningful_words}"
+    }
 
 def get_all_employees():
-    """Get all active employees from the database"""
-    connection = get_database_connection()
-    if not connection:
-        return None
-    
+    """Get all active employees (served from the shared in-memory staff directory)"""
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get all active staff members
-        query = """
-        SELECT 
-            staffid,
-            firstname,
-            lastname,
-            email,
-            phonenumber,
-            role,
-            active,
-            datecreated
-        FROM tblstaff 
-        WHERE active = 1
-        ORDER BY firstname, lastname
-        """
-        
-        cursor.execute(query)
-        employees = cursor.fetchall()
-        
-        # Format the data
-        for employee in employees:
-            if employee.get('datecreated'):
-                employee['datecreated'] = employee['datecreated'].strftime('%Y-%m-%d') if hasattr(employee['datecreated'], 'strftime') else str(employee['datecreated'])
-            # Create full name for easier matching
-            employee['full_name'] = f"{employee.get('firstname', '')} {employee.get('lastname', '')}".strip()
-        
-        return employees
-        
+        return get_staff_directory().get_all()
     except Exception as e:
         print(f"Error fetching employees: {e}")
         return None
-    finally:
-        if connection:
-            connection.close()
 
 def find_employee_by_name(name):
     """Find an employee by name (first name, last name, or full name) with improved matching"""
-    employees = get_all_employees()
-    if not employees:
+    if not name:
         return None
     
-    def normalize_turkish(text):
-        """Normalize Turkish characters to basic Latin characters"""
-        if not text:
-            return ""
-        turkish_chars = {
-            'İ': 'I', 'ı': 'i', 'Ğ': 'G', 'ğ': 'g', 'Ü': 'U', 'ü': 'u',
-            'Ş': 'S', 'ş': 's', 'Ö': 'O', 'ö': 'o', 'Ç': 'C', 'ç': 'c'
-        }
-        result = text
-        for turkish_char, latin_char in turkish_chars.items():
-            result = result.replace(turkish_char, latin_char)
-        return result
-    
-    name_lower = name.lower().strip()
-    name_normalized = normalize_turkish(name_lower)
-    name_parts = name_lower.split()
-    name_parts_normalized = name_normalized.split()
-    
-    print(f"🔍 Searching for employee: '{name}' (normalized: '{name_normalized}')")
+    print(f"🔍 Searching for employee: '{name}' (normalized: '{normalize_name(name)}')")
     
-    # Try exact matches first (full name, first name, last name) - both original and normalized
-    for employee in employees:
-        employee_first = employee.get('firstname', '').lower()
-        employee_last = employee.get('lastname', '').lower() 
-        employee_full = employee.get('full_name', '').lower()
-        
-        # Normalize employee names too
-        employee_first_norm = normalize_turkish(employee_first)
-        employee_last_norm = normalize_turkish(employee_last)
-        employee_full_norm = normalize_turkish(employee_full)
-        
-        # Exact matches (original and normalized)
-        if (name_lower == employee_first or name_normalized == employee_first_norm or
-            name_lower == employee_last or name_normalized == employee_last_norm or 
-            name_lower == employee_full or name_normalized == employee_full_norm):
-            print(f"✅ Exact match found: {employee['full_name']}")
+    matches = get_staff_directory().resolve(name, limit=1)
+    if matches:
+        employee, score = matches[0]
+        if score >= FIND_MIN_SCORE:
+            print(f"✅ Match found: {employee['full_name']} (score {score:.2f})")
             return employee
-    
-    # Try partial matches for multi-word names like "Hamza Haseeb"
-    if len(name_parts) >= 2:
-        first_part = name_parts[0]
-        last_part = name_parts[-1]  # Take last part as surname
-        first_part_norm = name_parts_normalized[0] if name_parts_normalized else first_part
-        last_part_norm = name_parts_normalized[-1] if name_parts_normalized else last_part
-        
-        for employee in employees:
-            employee_first = employee.get('firstname', '').lower()
-            employee_last = employee.get('lastname', '').lower()
-            employee_first_norm = normalize_turkish(employee_first)
-            employee_last_norm = normalize_turkish(employee_last)
-            
-            # Match first and last name parts (original and normalized)
-            if ((first_part == employee_first or first_part_norm == employee_first_norm) and 
-                (last_part == employee_last or last_part_norm == employee_last_norm)):
-                print(f"✅ Full name match found: {employee['full_name']}")
-                return employee
-            
-            # Match first name and partial last name (original and normalized)
-            elif ((first_part == employee_first or first_part_norm == employee_first_norm) and 
-                  (last_part in employee_last or employee_last in last_part or
-                   last_part_norm in employee_last_norm or employee_last_norm in last_part_norm)):
-                print(f"✅ Partial match found: {employee['full_name']}")
-                return employee
-    
-    # Try contains matches for single names
-    for employee in employees:
-        employee_first = employee.get('firstname', '').lower()
-        employee_last = employee.get('lastname', '').lower()
-        employee_full = employee.get('full_name', '').lower()
-        
-        # Normalize employee names
-        employee_first_norm = normalize_turkish(employee_first)
-        employee_last_norm = normalize_turkish(employee_last)
-        employee_full_norm = normalize_turkish(employee_full)
-        
-        if len(name_parts) == 1:
-            name_part = name_parts[0]
-            name_part_norm = name_parts_normalized[0] if name_parts_normalized else name_part
-            
-            # Check contains matches (original and normalized)
-            if (name_part in employee_first or employee_first in name_part or
-                name_part_norm in employee_first_norm or employee_first_norm in name_part_norm or
-                name_part in employee_last or employee_last in name_part or
-                name_part_norm in employee_last_norm or employee_last_norm in name_part_norm):
-                print(f"✅ Contains match found: {employee['full_name']}")
-                return employee
-        else:
-            # For multi-word queries, check if all parts are contained (original and normalized)
-            if (all(part in employee_full for part in name_parts) or
-                all(part in employee_full_norm for part in name_parts_normalized)):
-                print(f"✅ Multi-word contains match found: {employee['full_name']}")
-                return employee
+        print(f"❌ No employee found for: '{name}' (closest: {employee['full_name']}, score {score:.2f})")
+        return None
     
     print(f"❌ No employee found for: '{name}'")
     return None
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+CRM Search Index
+================
+Local n-gram inverted index over ``tblstaff``, ``tblprojects`` and ``tbltasks``.
+
+``comprehensive_crm_search`` used to expand a query into hundreds of terms and
+send one ``LOWER(col) LIKE '%term%'`` predicate per term to MySQL, forcing full
+scans of all three tables. This index keeps a SQLite copy of the searchable
+fields, tokenized into trigrams and whole words, and answers a search with a
+single grouped lookup:
+- Trigram + word postings with per-field weights (names weigh more than descriptions)
+- Task priority/status names and their synonyms ("urgent", "done", "todo") indexed
+  as a field, as the SQL search matched them against ``priority``/``status``
+- Incremental task refresh from ``dateadded``/``dateupdated`` high-water marks;
+  staff and projects (small, no update timestamp) are diffed in full every refresh
+- Periodic full rebuild to pick up task edits/deletes the watermarks can't see
+- Refreshes run on a background thread, never on the request path; searches
+  only wait for the short SQLite write at the end of a refresh
+- Ranked results in the same row shapes the SQL search returned
+"""
+
+import os
+import re
+import json
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+from core.crm.task_changes import get_task_change_column
+
+logger = logging.getLogger(__name__)
+
+CRM_SEARCH_INDEX_PATH = os.getenv('CRM_SEARCH_INDEX_PATH', os.path.join('cache', 'crm_search_index.db'))
+CRM_SEARCH_REFRESH_SECONDS = int(os.getenv('CRM_SEARCH_REFRESH_SECONDS', '120'))
+CRM_SEARCH_REBUILD_SECONDS = int(os.getenv('CRM_SEARCH_REBUILD_SECONDS', str(6 * 3600)))
+
+# Minimum share of a term's trigrams a field must contain to count as a match
+MIN_TERM_COVERAGE = 0.6
+MAX_INDEXED_TEXT = 1000
+
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'client': 2.0,
+    'project': 1.5,
+    'meta': 1.0,
+    'description': 1.0
+}
+
+_WORD_RE = re.compile(r"[\w']+", re.UNICODE)
+
+# Bump when the indexed fields change so existing index files are rebuilt
+INDEX_VERSION = 2
+
+TASK_STATUS_NAMES = {1: 'Not Started', 4: 'In Progress', 5: 'Completed'}
+TASK_PRIORITY_NAMES = {1: 'Low', 2: 'Normal', 3: 'High', 4: 'Urgent'}
+
+# Query words the SQL search mapped onto t.priority / t.status codes
+TASK_PRIORITY_SYNONYMS = {
+    1: ['low'],
+    2: ['normal', 'medium'],
+    3: ['high', 'important'],
+    4: ['urgent', 'critical']
+}
+TASK_STATUS_SYNONYMS = {
+    1: ['new', 'todo', 'pending'],
+    4: ['progress', 'working', 'active'],
+    5: ['completed', 'done', 'finished']
+}
+
+
+def _format_date(value):
+    if not value:
+        return value
+    return value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)
+
+
+def _normalize(text: str) -> str:
+    from core.crm.staff_directory import normalize_name
+    return normalize_name(str(text)) if text else ''
+
+
+def _grams(text: str) -> set:
+    """Whole-word tokens (prefixed 'w:') plus trigrams of each word"""
+    grams = set()
+    for word in _WORD_RE.findall(text):
+        grams.add(f"w:{word}")
+        if len(word) < 3:
+            continue
+        for i in range(len(word) - 2):
+            grams.add(word[i:i + 3])
+    return grams
+
+
+def _term_grams(term: str) -> set:
+    if len(term) < 3:
+        return {f"w:{term}"}
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+class CRMSearchIndex:
+    """SQLite-backed inverted index for CRM free-text search"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS docs (
+            kind TEXT NOT NULL,
+            doc_id INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            sort_key TEXT,
+            PRIMARY KEY (kind, doc_id)
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            gram TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            doc_id INTEGER NOT NULL,
+            weight REAL NOT NULL,
+            PRIMARY KEY (gram, kind, doc_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings (kind, doc_id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, index_path: str = None, connection_factory=None):
+        self.index_path = index_path or CRM_SEARCH_INDEX_PATH
+        directory = os.path.dirname(self.index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if connection_factory is None:
+            from core.crm.connection_pool import get_crm_connection
+            connection_factory = get_crm_connection
+        self._crm_connection = connection_factory
+
+        self._lock = threading.RLock()  # guards the SQLite connection
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+        self._refresher: Optional[threading.Thread] = None
+        self._refresher_lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.SCHEMA)
+        self._change_listeners = []
+
+        self.stats = {
+            'searches': 0,
+            'index_hits': 0,
+            'incremental_refreshes': 0,
+            'full_rebuilds': 0,
+            'docs_indexed': 0,
+            'refresh_errors': 0
+        }
+
+    # ------------------------------------------------------------------ meta
+
+    def _get_meta(self, key: str, default=None):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key: str, value):
+        self._db.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+    def add_change_listener(self, callback):
+        """Register callback(full_rebuild, {'employee'|'project'|'task': [ids]}) run after each refresh"""
+        if callback not in self._change_listeners:
+            self._change_listeners.append(callback)
+
+    def _notify_change(self, full_rebuild: bool, changed: Dict[str, List[int]]):
+        for callback in list(self._change_listeners):
+            try:
+                callback(full_rebuild, changed)
+            except Exception as e:
+                logger.warning(f"CRM search index change listener failed: {e}")
+
+    def is_warm(self) -> bool:
+        """True once a full build of the current index version has completed"""
+        with self._lock:
+            return (self._get_meta('last_full_build') is not None
+                    and self._get_meta('index_version') == str(INDEX_VERSION))
+
+    # ------------------------------------------------------------------ document building
+
+    def _put_doc(self, kind: str, doc_id: int, payload: Dict[str, Any], fields: Dict[str, str], sort_key: str = ''):
+        weights: Dict[str, float] = {}
+        for field, text in fields.items():
+            normalized = _normalize(text)[:MAX_INDEXED_TEXT]
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+            for gram in _grams(normalized):
+                if weights.get(gram, 0) < weight:
+                    weights[gram] = weight
+
+        self._db.execute("DELETE FROM postings WHERE kind = ? AND doc_id = ?", (kind, doc_id))
+        self._db.execute(
+            "INSERT OR REPLACE INTO docs (kind, doc_id, payload, sort_key) VALUES (?, ?, ?, ?)",
+            (kind, doc_id, json.dumps(payload, default=str), sort_key or '')
+        )
+        self._db.executemany(
+            "INSERT INTO postings (gram, kind, doc_id, weight) VALUES (?, ?, ?, ?)",
+            [(gram, kind, doc_id, weight) for gram, weight in weights.items()]
+        )
+        self.stats['docs_indexed'] += 1
+
+    def _index_staff(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            payload = {key: row.get(key) for key in ('staffid', 'firstname', 'lastname', 'email', 'role', 'active', 'phonenumber')}
+            self._put_doc('employee', row['staffid'], payload, {
+                'name': f"{row.get('firstname') or ''} {row.get('lastname') or ''}",
+                'meta': f"{row.get('email') or ''} {row.get('role') or ''}"
+            }, sort_key=f"{row.get('firstname') or ''} {row.get('lastname') or ''}".lower())
+
+    def _index_projects(self, rows: List[Dict[str, Any]], existing: Optional[Dict[int, str]] = None) -> List[int]:
+        """Index project rows, skipping those whose stored payload is unchanged; returns changed ids"""
+        changed = []
+        for row in rows:
+            payload = {key: row.get(key) for key in ('id', 'name', 'description', 'status', 'progress', 'client_name')}
+            for field in ('start_date', 'deadline', 'project_created'):
+                payload[field] = _format_date(row.get(field))
+            if existing is not None and existing.get(row['id']) == json.dumps(payload, default=str):
+                continue
+            changed.append(row['id'])
+            self._put_doc('project', row['id'], payload, {
+                'name': row.get('name') or '',
+                'description': row.get('description') or '',
+                'client': row.get('client_name') or '',
+                'meta': str(row.get('status') or '')
+            }, sort_key=payload.get('project_created') or '')
+        return changed
+
+    def _index_tasks(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            payload = {key: row.get(key) for key in ('id', 'name', 'description', 'priority', 'status', 'project_name')}
+            for field in ('dateadded', 'startdate', 'duedate'):
+                payload[field] = _format_date(row.get(field))
+            payload['status_name'] = TASK_STATUS_NAMES.get(row.get('status'), 'Unknown')
+            payload['priority_name'] = TASK_PRIORITY_NAMES.get(row.get('priority'), 'Normal')
+            meta = [payload['status_name'], payload['priority_name']]
+            meta += TASK_STATUS_SYNONYMS.get(row.get('status'), [])
+            meta += TASK_PRIORITY_SYNONYMS.get(row.get('priority'), [])
+            self._put_doc('task', row['id'], payload, {
+                'name': row.get('name') or '',
+                'description': row.get('description') or '',
+                'project': row.get('project_name') or '',
+                'meta': ' '.join(meta)
+            }, sort_key=payload.get('dateadded') or '')
+
+    # ------------------------------------------------------------------ refresh
+
+    def refresh(self, force_full: bool = False) -> Dict[str, Any]:
+        """Pull tasks changed since the last watermark plus all staff/projects (everything on a full rebuild)"""
+        started = time.time()
+        with self._refresh_lock:
+            with self._lock:
+                last_full = float(self._get_meta('last_full_build', 0) or 0)
+                task_mark = self._get_meta('tasks_watermark')
+                outdated = self._get_meta('index_version') != str(INDEX_VERSION)
+            full = force_full or outdated or not last_full or (time.time() - last_full) > CRM_SEARCH_REBUILD_SECONDS
+            if full:
+                task_mark = None
+
+            # MySQL reads happen outside the SQLite lock so searches keep being answered
+            connection = self._crm_connection()
+            try:
+                cursor = connection.cursor(dictionary=True)
+                change_column = get_task_change_column(cursor)
+
+                # Staff and projects are small and have no update timestamp - always reloaded in full
+                cursor.execute("""
+                    SELECT staffid, firstname, lastname, email, role, active, phonenumber
+                    FROM tblstaff WHERE active = 1
+                """)
+                staff = cursor.fetchall()
+
+                cursor.execute("""
+                    SELECT p.id, p.name, p.description, p.status, p.progress,
+                           p.start_date, p.deadline, p.project_created,
+                           c.company as client_name
+                    FROM tblprojects p
+                    LEFT JOIN tblclients c ON p.clientid = c.userid
+                """)
+                projects = cursor.fetchall()
+
+                task_sql = f"""
+                    SELECT t.id, t.name, t.description, t.priority, t.status,
+                           t.dateadded, t.startdate, t.duedate,
+                           p.name as project_name,
+                           {change_column} as changed_at
+                    FROM tbltasks t
+                    LEFT JOIN tblprojects p ON t.rel_id = p.id AND t.rel_type = 'project'
+                """
+                if task_mark:
+                    cursor.execute(task_sql + f" WHERE {change_column} >= %s", (task_mark,))
+                else:
+                    cursor.execute(task_sql)
+                tasks = cursor.fetchall()
+                cursor.close()
+            finally:
+                connection.close()
+
+            with self._lock:
+                try:
+                    if full:
+                        self._db.execute("DELETE FROM postings")
+                        self._db.execute("DELETE FROM docs")
+                        existing_projects = None
+                    else:
+                        self._db.execute("DELETE FROM postings WHERE kind = 'employee'")
+                        self._db.execute("DELETE FROM docs WHERE kind = 'employee'")
+                        existing_projects = dict(self._db.execute(
+                            "SELECT doc_id, payload FROM docs WHERE kind = 'project'"
+                        ).fetchall())
+                    self._index_staff(staff)
+                    changed_projects = self._index_projects(projects, existing_projects)
+
+                    # Projects deleted from the CRM since the last refresh
+                    removed_projects = sorted(set(existing_projects or ()) - {row['id'] for row in projects})
+                    for doc_id in removed_projects:
+                        self._db.execute("DELETE FROM postings WHERE kind = 'project' AND doc_id = ?", (doc_id,))
+                        self._db.execute("DELETE FROM docs WHERE kind = 'project' AND doc_id = ?", (doc_id,))
+
+                    self._index_tasks(tasks)
+
+                    if tasks:
+                        newest = max(str(t.get('changed_at') or '') for t in tasks)
+                        if newest:
+                            self._set_meta('tasks_watermark', newest)
+                    if full:
+                        self._set_meta('last_full_build', time.time())
+                        self._set_meta('index_version', INDEX_VERSION)
+                    self._db.commit()
+                except Exception:
+                    self._db.rollback()
+                    raise
+
+            self.stats['full_rebuilds' if full else 'incremental_refreshes'] += 1
+
+        # Staff is reloaded wholesale every refresh, so only full rebuilds report it
+        self._notify_change(full, {
+            'employee': [row['staffid'] for row in staff] if full else [],
+            'project': changed_projects + removed_projects,
+            'task': [row['id'] for row in tasks]
+        })
+
+        summary = {
+            'full_rebuild': full,
+            'employees': len(staff),
+            'projects': len(changed_projects) + len(removed_projects),
+            'tasks': len(tasks),
+            'duration': time.time() - started
+        }
+        logger.info(f"CRM search index refreshed: {summary}")
+        return summary
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self.stats['refresh_errors'] += 1
+                logger.error(f"CRM search index refresh failed: {e}")
+            time.sleep(CRM_SEARCH_REFRESH_SECONDS)
+
+    def start_background_refresh(self):
+        """Warm the index and keep it fresh from a daemon thread (idempotent)"""
+        if self._refresher is not None:
+            return
+        with self._refresher_lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(
+                    target=self._refresh_loop, name='crm-search-index-refresh', daemon=True
+                )
+                self._refresher.start()
+
+    def ensure_fresh(self):
+        """Make sure the background refresher runs; never refreshes on the caller's thread
+        (until the first build finishes, is_warm() is False and callers fall back)"""
+        self.start_background_refresh()
+
+    # ------------------------------------------------------------------ search
+
+    def search(self, terms: List[str], query_text: str = '', limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
+        """Rank employees/projects/tasks for the expanded search terms in one index pass"""
+        self.stats['searches'] += 1
+        term_grams: Dict[str, set] = {}
+        for term in terms:
+            normalized = _normalize(term)
+            if len(normalized) > 1:
+                term_grams[normalized] = _term_grams(normalized)
+        if not term_grams:
+            return {'employees': [], 'projects': [], 'tasks': []}
+
+        values = []
+        params: List[Any] = []
+        for term, grams in term_grams.items():
+            for gram in grams:
+                values.append("(?, ?)")
+                params.extend([term, gram])
+
+        sql = f"""
+            WITH q(term, gram) AS (VALUES {', '.join(values)})
+            SELECT p.kind, p.doc_id, q.term, COUNT(*) AS matched, MAX(p.weight) AS weight
+            FROM q JOIN postings p ON p.gram = q.gram
+            GROUP BY p.kind, p.doc_id, q.term
+        """
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        scores: Dict[Tuple[str, int], float] = {}
+        for kind, doc_id, term, matched, weight in rows:
+            coverage = matched / len(term_grams[term])
+            if coverage < MIN_TERM_COVERAGE:
+                continue
+            key = (kind, doc_id)
+            scores[key] = scores.get(key, 0.0) + coverage * coverage * weight
+
+        phrase = _normalize(query_text)
+        results = {'employees': [], 'projects': [], 'tasks': []}
+        buckets = {'employee': 'employees', 'project': 'projects', 'task': 'tasks'}
+        for kind, bucket in buckets.items():
+            ranked = sorted(
+                ((score, doc_id) for (k, doc_id), score in scores.items() if k == kind),
+                reverse=True
+            )[:limit * 2]
+            if not ranked:
+                continue
+            placeholders = ','.join('?' * len(ranked))
+            with self._lock:
+                docs = dict(self._db.execute(
+                    f"SELECT doc_id, payload FROM docs WHERE kind = ? AND doc_id IN ({placeholders})",
+                    [kind] + [doc_id for _, doc_id in ranked]
+                ).fetchall())
+            items = []
+            for score, doc_id in ranked:
+                if doc_id not in docs:
+                    continue
+                payload = json.loads(docs[doc_id])
+                # Whole-phrase hits on the name float to the top like the SQL ORDER BY did
+                if phrase and phrase in _normalize(payload.get('name') or f"{payload.get('firstname', '')} {payload.get('lastname', '')}"):
+                    score += 10.0
+                items.append((score, payload))
+            items.sort(key=lambda item: item[0], reverse=True)
+            results[bucket] = [payload for _, payload in items[:limit]]
+
+        if any(results.values()):
+            self.stats['index_hits'] += 1
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            doc_counts = dict(self._db.execute("SELECT kind, COUNT(*) FROM docs GROUP BY kind").fetchall())
+            stats = dict(self.stats)
+            stats.update({
+                'index_path': self.index_path,
+                'documents': doc_counts,
+                'tasks_watermark': self._get_meta('tasks_watermark'),
+                'last_full_build': self._get_meta('last_full_build'),
+                'background_refresh': self._refresher is not None and self._refresher.is_alive()
+            })
+        return stats
+
+
+_search_index: Optional[CRMSearchIndex] = None
+_search_index_lock = threading.Lock()
+
+
+def get_crm_search_index() -> CRMSearchIndex:
+    """Process-wide CRM search index"""
+    global _search_index
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                _search_index = CRMSearchIndex()
+    return _search_index
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Staff Directory
+===============
+Shared in-memory index of CRM staff with a fast fuzzy name resolver.
+
+Name lookups used to run a full ``tblstaff`` query and several linear passes
+re-normalizing every employee per call. The directory loads staff once, keeps
+precomputed keys per employee and refreshes incrementally:
+- Normalized (Turkish-folded, lowercased) first, last and full-name keys
+- Exact-key, token-prefix and trigram indexes for candidate lookup
+- Cheap change signature on ``tblstaff`` so refreshes only re-index changed rows
+
+``resolve()`` returns ranked matches (trigram typo matches included, for
+suggestions); ``find()`` returns the best exact or containment match only, so
+ordinary words never resolve to an employee. Every name-resolution call site
+uses this so they all agree on the answer.
+
+Inactive staff are indexed too but flagged: listings and name spotting only
+see active staff, while ``find(name, include_inactive=True)`` falls back to
+former staff whose task history is still in the CRM.
+"""
+
+import os
+import threading
+import time
+import logging
+from typing import Dict, List, Optional, Any, Callable, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+STAFF_DIRECTORY_REFRESH_SECONDS = int(os.getenv('STAFF_DIRECTORY_REFRESH_SECONDS', '300'))
+MAX_PREFIX_LENGTH = 4
+MIN_TRIGRAM_SIMILARITY = 0.35
+
+_TURKISH_FOLD = str.maketrans({
+    'İ': 'I', 'ı': 'i', 'Ğ': 'G', 'ğ': 'g', 'Ü': 'U', 'ü': 'u',
+    'Ş': 'S', 'ş': 's', 'Ö': 'O', 'ö': 'o', 'Ç': 'C', 'ç': 'c'
+})
+
+# Match tiers (higher wins), mirroring the original resolution order
+SCORE_EXACT = 1.0
+SCORE_FIRST_LAST = 0.95
+SCORE_FIRST_PARTIAL_LAST = 0.9
+SCORE_CONTAINS = 0.8
+SCORE_MULTI_WORD_CONTAINS = 0.75
+SCORE_FUZZY_MAX = 0.7
+
+# find() never answers with a trigram (typo) match; those are suggestions only
+FIND_MIN_SCORE = SCORE_MULTI_WORD_CONTAINS
+
+
+def normalize_name(text: str) -> str:
+    """Fold Turkish characters to Latin, lowercase and collapse whitespace"""
+    if not text:
+        return ""
+    folded = text.translate(_TURKISH_FOLD).lower().replace('̇', '')
+    return ' '.join(folded.split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _is_active(record: Dict[str, Any]) -> bool:
+    value = record.get('active', 1)
+    try:
+        return int(value) != 0
+    except (TypeError, ValueError):
+        return bool(value)
+
+
+class _StaffEntry:
+    """Precomputed lookup keys for one employee"""
+
+    __slots__ = ('staffid', 'record', 'first', 'last', 'full', 'active', 'signature', 'trigrams', 'order')
+
+    def __init__(self, record: Dict[str, Any], order: int):
+        self.staffid = record['staffid']
+        self.record = record
+        self.first = normalize_name(record.get('firstname') or '')
+        self.last = normalize_name(record.get('lastname') or '')
+        self.full = normalize_name(record.get('full_name') or f"{self.first} {self.last}")
+        self.active = _is_active(record)
+        self.signature = (record.get('firstname'), record.get('lastname'), record.get('email'), self.active)
+        self.trigrams = _trigrams(self.full)
+        self.order = order
+
+    def keys(self) -> List[str]:
+        return [key for key in (self.first, self.last, self.full) if key]
+
+    def tokens(self) -> List[str]:
+        return self.full.split()
+
+
+def _load_staff() -> List[Dict[str, Any]]:
+    """Default loader: all staff (active flag included) through the shared CRM connection pool"""
+    from core.crm.connection_pool import get_crm_connection
+
+    connection = get_crm_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT staffid, firstname, lastname, email, phonenumber, role, active, datecreated
+            FROM tblstaff
+            ORDER BY firstname, lastname
+        """)
+        employees = cursor.fetchall()
+        cursor.close()
+    finally:
+        connection.close()
+
+    for employee in employees:
+        if employee.get('datecreated'):
+            employee['datecreated'] = employee['datecreated'].strftime('%Y-%m-%d') if hasattr(employee['datecreated'], 'strftime') else str(employee['datecreated'])
+        employee['full_name'] = f"{employee.get('firstname') or ''} {employee.get('lastname') or ''}".strip()
+    return employees
+
+
+def _load_staff_signature() -> Tuple:
+    """Cheap fingerprint of tblstaff used to skip refreshes when nothing changed"""
+    from core.crm.connection_pool import get_crm_connection
+
+    connection = get_crm_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(MAX(staffid), 0),
+                   COALESCE(SUM(CRC32(CONCAT_WS('|', staffid, firstname, lastname, email, active))), 0)
+            FROM tblstaff
+        """)
+        row = cursor.fetchone()
+        cursor.close()
+        return tuple(int(value) for value in row)
+    finally:
+        connection.close()
+
+
+class StaffDirectory:
+    """In-memory staff index with incremental refresh and ranked fuzzy resolution"""
+
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]] = None,
+                 signature_loader: Optional[Callable[[], Tuple]] = None,
+                 refresh_seconds: int = None):
+        self._loader = loader or _load_staff
+        # Custom loaders have no cheap signature unless one is supplied
+        self._signature_loader = signature_loader if signature_loader or loader else _load_staff_signature
+        self.refresh_seconds = STAFF_DIRECTORY_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+
+        self._lock = threading.RLock()
+        self._entries: Dict[Any, _StaffEntry] = {}
+        self._exact: Dict[str, Set[Any]] = {}
+        self._prefix: Dict[str, Set[Any]] = {}
+        self._trigram: Dict[str, Set[Any]] = {}
+        self._signature = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+        self.stats = {
+            'full_loads': 0,
+            'refresh_checks': 0,
+            'entries_reindexed': 0,
+            'lookups': 0,
+            'load_errors': 0
+        }
+
+    # ------------------------------------------------------------------ indexing
+
+    def _index_entry(self, entry: _StaffEntry):
+        for key in entry.keys():
+            self._exact.setdefault(key, set()).add(entry.staffid)
+        for token in entry.tokens():
+            for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                self._prefix.setdefault(token[:length], set()).add(entry.staffid)
+        for gram in entry.trigrams:
+            self._trigram.setdefault(gram, set()).add(entry.staffid)
+
+    def _unindex_entry(self, entry: _StaffEntry):
+        for key in entry.keys():
+            self._discard(self._exact, key, entry.staffid)
+        for token in entry.tokens():
+            for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                self._discard(self._prefix, token[:length], entry.staffid)
+        for gram in entry.trigrams:
+            self._discard(self._trigram, gram, entry.staffid)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[Any]], key: str, staffid):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(staffid)
+            if not ids:
+                del index[key]
+
+    def _apply(self, employees: List[Dict[str, Any]]):
+        """Diff freshly loaded rows against the index and re-index only what changed"""
+        seen = set()
+        reindexed = 0
+        for order, record in enumerate(employees):
+            staffid = record['staffid']
+            seen.add(staffid)
+            current = self._entries.get(staffid)
+            entry = _StaffEntry(record, order)
+            if current is not None and current.signature == entry.signature:
+                current.record = record
+                current.order = order
+                continue
+            if current is not None:
+                self._unindex_entry(current)
+            self._entries[staffid] = entry
+            self._index_entry(entry)
+            reindexed += 1
+
+        for staffid in [sid for sid in self._entries if sid not in seen]:
+            self._unindex_entry(self._entries.pop(staffid))
+            reindexed += 1
+
+        self.stats['entries_reindexed'] += reindexed
+        return reindexed
+
+    # ------------------------------------------------------------------ refresh
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload staff if the table changed (or unconditionally with force=True)"""
+        with self._lock:
+            self._checked_at = time.time()
+            self.stats['refresh_checks'] += 1
+            try:
+                if not force and self._entries and self._signature_loader:
+                    signature = self._signature_loader()
+                    if signature == self._signature:
+                        return False
+                else:
+                    signature = None
+
+                employees = self._loader() or []
+                if self._signature_loader and signature is None:
+                    signature = self._signature_loader()
+                reindexed = self._apply(employees)
+                self._signature = signature
+                self._loaded_at = time.time()
+                self.stats['full_loads'] += 1
+                logger.info(f"Staff directory refreshed: {len(self._entries)} staff, {reindexed} re-indexed")
+                return True
+            except Exception as e:
+                self.stats['load_errors'] += 1
+                logger.error(f"Staff directory refresh failed: {e}")
+                return False
+
+    def _ensure_fresh(self):
+        if not self._entries:
+            self.refresh(force=True)
+        elif time.time() - self._checked_at >= self.refresh_seconds:
+            self.refresh()
+
+    def invalidate(self):
+        """Force the next lookup to re-check tblstaff"""
+        self._checked_at = 0.0
+
+    # ------------------------------------------------------------------ lookups
+
+    def get_all(self) -> List[Dict[str, Any]]:
+        """All active staff in firstname/lastname order"""
+        self._ensure_fresh()
+        with self._lock:
+            entries = sorted((e for e in self._entries.values() if e.active), key=lambda e: e.order)
+            return [dict(entry.record) for entry in entries]
+
+    def get_by_id(self, staffid, include_inactive: bool = False) -> Optional[Dict[str, Any]]:
+        self._ensure_fresh()
+        entry = self._entries.get(staffid)
+        return dict(entry.record) if entry and (entry.active or include_inactive) else None
+
+    def known_name_tokens(self) -> Set[str]:
+        """Every normalized first/last-name token of active staff (useful for name spotting in free text)"""
+        self._ensure_fresh()
+        with self._lock:
+            return {token for entry in self._entries.values() if entry.active for token in entry.tokens()}
+
+    def _candidates_for(self, text: str) -> Set[Any]:
+        if len(text) < 3:
+            return set(self._prefix.get(text[:MAX_PREFIX_LENGTH], ()))
+        candidates = set()
+        for gram in _trigrams(text):
+            candidates |= self._trigram.get(gram, set())
+        return candidates
+
+    def _score(self, entry: _StaffEntry, query: str, parts: List[str]) -> float:
+        first, last, full = entry.first, entry.last, entry.full
+
+        if query in (first, last, full):
+            return SCORE_EXACT
+
+        if len(parts) >= 2:
+            first_part, last_part = parts[0], parts[-1]
+            if first_part == first and last_part == last:
+                return SCORE_FIRST_LAST
+            if first_part == first and last and (last_part in last or last in last_part):
+                return SCORE_FIRST_PARTIAL_LAST
+            if all(part in full for part in parts):
+                return SCORE_MULTI_WORD_CONTAINS
+        else:
+            part = parts[0]
+            if ((first and (part in first or first in part)) or
+                    (last and (part in last or last in part))):
+                return SCORE_CONTAINS
+
+        # Trigram similarity fallback for typos ("hamzza", "ilhae")
+        query_grams = _trigrams(query)
+        overlap = len(query_grams & entry.trigrams)
+        if not overlap:
+            return 0.0
+        similarity = overlap / len(query_grams | entry.trigrams)
+        best_token = max(
+            (len(query_grams & _trigrams(token)) / len(query_grams | _trigrams(token)) for token in entry.tokens()),
+            default=0.0
+        )
+        similarity = max(similarity, best_token)
+        return SCORE_FUZZY_MAX * similarity if similarity >= MIN_TRIGRAM_SIMILARITY else 0.0
+
+    def resolve(self, name: str, limit: int = 5,
+                include_inactive: bool = False) -> List[Tuple[Dict[str, Any], float]]:
+        """Ranked (employee, score) matches for a free-form name, best first (active staff only by default)"""
+        query = normalize_name(name)
+        if not query:
+            return []
+        self._ensure_fresh()
+        self.stats['lookups'] += 1
+        parts = query.split()
+
+        with self._lock:
+            exact = [self._entries[sid] for sid in self._exact.get(query, ())
+                     if include_inactive or self._entries[sid].active]
+            if exact:
+                entries = sorted(exact, key=lambda e: e.order)
+                return [(dict(entry.record), SCORE_EXACT) for entry in entries[:limit]]
+
+            candidate_ids = set()
+            for part in parts:
+                candidate_ids |= self._candidates_for(part)
+            if len(parts) > 1:
+                candidate_ids |= self._candidates_for(query)
+            # Staff names contained in the query ("hamzas" -> "hamza") share the query's trigrams
+            scored = []
+            for staffid in candidate_ids:
+                entry = self._entries[staffid]
+                if not (entry.active or include_inactive):
+                    continue
+                score = self._score(entry, query, parts)
+                if score > 0:
+                    scored.append((score, entry.order, entry.record))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [(dict(record), score) for score, _, record in scored[:limit]]
+
+    def find(self, name: str, include_inactive: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Best exact/containment match for a name or None (fuzzy matches don't count)
+        Active staff win; include_inactive=True falls back to inactive staff when no active one matches
+        """
+        for inactive in ((False, True) if include_inactive else (False,)):
+            matches = self.resolve(name, limit=1, include_inactive=inactive)
+            if matches and matches[0][1] >= FIND_MIN_SCORE:
+                return matches[0][0]
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'staff_count': len(self._entries),
+                'active_staff_count': sum(1 for entry in self._entries.values() if entry.active),
+                'trigram_keys': len(self._trigram),
+                'loaded_at': self._loaded_at,
+                'last_checked_at': self._checked_at
+            })
+        return stats
+
+
+_directory: Optional[StaffDirectory] = None
+_directory_lock = threading.Lock()
+
+
+def get_staff_directory() -> StaffDirectory:
+    """Process-wide staff directory shared by every name-resolution path"""
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = StaffDirectory()
+    return _directory
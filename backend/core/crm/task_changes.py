@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Task Change Column
+==================
+Shared detection of the ``tbltasks`` expression that tells when a task last changed.
+
+The search index, employee cache, task rollup, monitoring engine and task
+embedding indexer all poll ``tbltasks`` for changes. Perfex only has a
+``dateupdated`` column on some installs; without it the change column falls
+back to ``dateadded``, which only sees new tasks, and callers must catch edits
+another way (full rebuilds, fingerprints). The schema is probed once per
+process instead of once per poller.
+"""
+
+import threading
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+TASK_CHANGE_COLUMN_UPDATED = "COALESCE(t.dateupdated, t.dateadded)"
+TASK_CHANGE_COLUMN_ADDED = "t.dateadded"
+
+_task_change_column: Optional[str] = None
+_task_change_column_lock = threading.Lock()
+
+
+def get_task_change_column(cursor) -> str:
+    """
+    SQL expression (over alias ``t``) for a task's last change time
+    ``cursor`` is only used on the first call, to check whether tbltasks has dateupdated
+    """
+    global _task_change_column
+    if _task_change_column is None:
+        with _task_change_column_lock:
+            if _task_change_column is None:
+                cursor.execute("SHOW COLUMNS FROM tbltasks LIKE 'dateupdated'")
+                has_updated = bool(cursor.fetchall())
+                _task_change_column = TASK_CHANGE_COLUMN_UPDATED if has_updated else TASK_CHANGE_COLUMN_ADDED
+                if not has_updated:
+                    logger.info("tbltasks has no dateupdated column; task edits are not visible to change polling")
+    return _task_change_column
+
+
+def task_edits_visible(cursor) -> bool:
+    """Whether the change column moves when an existing task is edited"""
+    return get_task_change_column(cursor) != TASK_CHANGE_COLUMN_ADDED
@@ -3,13 +3,16 @@ AI Agent Background Service
 Keeps the AI agent online and responsive to messages
 """
 
-import mysql.connector
+import os
 from datetime import datetime
 import time
 import threading
 import sys
 import signal
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+
 class AIAgentBackgroundService:
     def __init__(self):
         self.ai_staff_id = 248
@@ -24,7 +27,7 @@ class AIAgentBackgroundService:
     def get_database_connection(self):
         """Get MySQL database connection"""
         try:
-            return mysql.connector.connect(**self.db_config)
+            return get_crm_connection(self.db_config)
         except Exception as e:
             print(f"❌ Database connection error: {e}")
             return None
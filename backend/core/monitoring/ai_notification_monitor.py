@@ -3,12 +3,16 @@ Enhanced AI Agent Notification System
 Monitors for new messages and automatically responds with notifications
 """
 
-import mysql.connector
+import os
+import sys
 from datetime import datetime, timedelta
 import time
 import threading
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+
 class AIAgentNotificationMonitor:
     def __init__(self):
         self.ai_staff_id = 248
@@ -25,7 +29,7 @@ class AIAgentNotificationMonitor:
     def get_database_connection(self):
         """Get MySQL database connection"""
         try:
-            return mysql.connector.connect(**self.db_config)
+            return get_crm_connection(self.db_config)
         except Exception as e:
             print(f"❌ Database connection error: {e}")
             return None
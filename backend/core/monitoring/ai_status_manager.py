@@ -4,9 +4,13 @@ Mark COORDINATION AGENT DXD AI as Online/Green Status
 Updates AI agent status to show as active and available
 """
 
-import mysql.connector
+import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+
 class AIStatusManager:
     def __init__(self):
         self.ai_staff_id = 248  # COORDINATION AGENT DXD AI staff ID
@@ -23,7 +27,7 @@ class AIStatusManager:
     def get_database_connection(self):
         """Get MySQL database connection"""
         try:
-            return mysql.connector.connect(**self.db_config)
+            return get_crm_connection(self.db_config)
         except Exception as e:
             print(f"❌ Database connection error: {e}")
             return None
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Comment Outbox
+==============
+Batched, idempotent writer for monitor-generated task comments.
+
+Monitors used to open a connection, insert one tbltask_comments row and
+commit for every comment, with nothing stopping two monitors from commenting
+on the same task at the same time. Monitors now enqueue comments here and
+flush once per cycle:
+- One connection and one transaction per flush, rows written as multi-row INSERTs
+- (taskid, agent, day) uniqueness guard: duplicates are dropped in the queue,
+  and tasks the agent already commented on that day are skipped at flush time
+  under a MySQL named lock, so retries and concurrent monitors are safe
+- Failed flushes keep their comments queued for the next attempt
+- Queue depth and write latency reported through get_stats()
+"""
+
+import os
+import sys
+import time
+import threading
+import logging
+from datetime import datetime, timedelta, date
+from typing import List, Dict, Any, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+
+logger = logging.getLogger(__name__)
+
+INSERT_CHUNK_SIZE = 200
+GUARD_LOCK_TIMEOUT = 10
+
+
+class CommentOutbox:
+    def __init__(self, db_config: Dict[str, Any], agent_staff_id: int):
+        self.db_config = db_config
+        self.agent_staff_id = agent_staff_id
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (taskid, day) -> (taskid, dateadded, content), in enqueue order
+        self._queue: Dict[Tuple[int, date], Tuple[int, datetime, str]] = {}
+
+        self.stats = {
+            'enqueued': 0,
+            'duplicates_dropped': 0,
+            'already_commented_skipped': 0,
+            'written': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'last_batch_size': 0
+        }
+
+    def _guard_lock_name(self) -> str:
+        return f"ai_comment_outbox_{self.db_config.get('database', '')}_{self.agent_staff_id}"
+
+    def enqueue(self, task_id: int, content: str, dateadded: datetime = None) -> bool:
+        """
+        Queue a comment; returns False if one is already queued for this task today
+        Nothing is written until flush(), whose result says what reached the CRM
+        """
+        dateadded = dateadded or datetime.now()
+        key = (task_id, dateadded.date())
+        with self._lock:
+            if key in self._queue:
+                self.stats['duplicates_dropped'] += 1
+                return False
+            self._queue[key] = (task_id, dateadded, content)
+            self.stats['enqueued'] += 1
+            return True
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def _already_commented(self, cursor, keys: List[Tuple[int, date]]) -> set:
+        """(taskid, day) pairs that already have an agent comment in the CRM"""
+        existing = set()
+        days = sorted({day for _, day in keys})
+        task_ids = sorted({task_id for task_id, _ in keys})
+        placeholders = ','.join(['%s'] * len(task_ids))
+        cursor.execute(f"""
+            SELECT DISTINCT taskid, DATE(dateadded) as day
+            FROM tbltask_comments
+            WHERE staffid = %s
+                AND taskid IN ({placeholders})
+                AND dateadded >= %s AND dateadded < %s
+        """, (self.agent_staff_id, *task_ids, days[0], days[-1] + timedelta(days=1)))
+        for row in cursor.fetchall():
+            existing.add((row[0], row[1]))
+        return existing
+
+    def flush(self) -> Dict[str, Any]:
+        """Write every queued comment in one transaction; returns {written, skipped, failed}"""
+        with self._flush_lock:
+            with self._lock:
+                batch = dict(self._queue)
+            if not batch:
+                return {'written': 0, 'skipped': 0, 'failed': 0}
+
+            started = time.time()
+            conn = None
+            lock_acquired = False
+            try:
+                conn = get_crm_connection(self.db_config)
+                cursor = conn.cursor()
+
+                # Serialize the check-then-insert against other monitor processes
+                cursor.execute("SELECT GET_LOCK(%s, %s)", (self._guard_lock_name(), GUARD_LOCK_TIMEOUT))
+                lock_acquired = cursor.fetchone()[0] == 1
+                if not lock_acquired:
+                    raise TimeoutError("Timed out waiting for the comment outbox lock")
+
+                existing = self._already_commented(cursor, list(batch))
+                rows = [entry for key, entry in batch.items() if key not in existing]
+
+                for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+                    chunk = rows[i:i + INSERT_CHUNK_SIZE]
+                    values = ', '.join(['(%s, %s, %s, %s)'] * len(chunk))
+                    params = []
+                    for task_id, dateadded, content in chunk:
+                        params.extend((task_id, self.agent_staff_id, dateadded, content))
+                    cursor.execute(
+                        f"INSERT INTO tbltask_comments (taskid, staffid, dateadded, content) VALUES {values}",
+                        tuple(params)
+                    )
+
+                conn.commit()
+                cursor.close()
+
+            except Exception as e:
+                if conn is not None:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+                self.stats['failed_flushes'] += 1
+                logger.error(f"Comment outbox flush failed, {len(batch)} comments stay queued: {e}")
+                return {'written': 0, 'skipped': 0, 'failed': len(batch)}
+
+            finally:
+                if conn is not None:
+                    if lock_acquired:
+                        try:
+                            release = conn.cursor()
+                            release.execute("SELECT RELEASE_LOCK(%s)", (self._guard_lock_name(),))
+                            release.fetchall()
+                            release.close()
+                        except Exception:
+                            pass
+                    conn.close()
+
+            with self._lock:
+                for key in batch:
+                    self._queue.pop(key, None)
+
+            elapsed_ms = (time.time() - started) * 1000
+            skipped = len(batch) - len(rows)
+            self.stats['flushes'] += 1
+            self.stats['written'] += len(rows)
+            self.stats['already_commented_skipped'] += skipped
+            self.stats['last_flush_ms'] = elapsed_ms
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed_ms)
+            self.stats['total_flush_ms'] += elapsed_ms
+            self.stats['last_batch_size'] = len(rows)
+
+            logger.info(f"Comment outbox flushed {len(rows)} comments ({skipped} already posted today) in {elapsed_ms:.0f}ms")
+            return {'written': len(rows), 'skipped': skipped, 'failed': 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        flushes = self.stats['flushes']
+        return {
+            **self.stats,
+            'queue_depth': self.queue_depth(),
+            'avg_flush_ms': self.stats['total_flush_ms'] / flushes if flushes else 0.0
+        }
+
+
+# Outboxes shared by every monitor in the process, per database and agent
+_outboxes: Dict[Tuple, CommentOutbox] = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_comment_outbox(db_config: Dict[str, Any], agent_staff_id: int) -> CommentOutbox:
+    """Get the process-wide outbox for a CRM database and agent"""
+    key = (db_config.get('host'), db_config.get('port'), db_config.get('database'), agent_staff_id)
+    with _outboxes_lock:
+        outbox = _outboxes.get(key)
+        if outbox is None:
+            outbox = CommentOutbox(db_config, agent_staff_id)
+            _outboxes[key] = outbox
+        return outbox
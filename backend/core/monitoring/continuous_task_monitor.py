@@ -13,7 +13,8 @@ Features:
 - Encouraging for good work, constructive for delays
 """
 
-import mysql.connector
+import os
+import sys
 import schedule
 import time
 import random
@@ -22,6 +23,10 @@ from typing import List, Dict, Tuple
 import logging
 from dataclasses import dataclass
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+from core.monitoring.comment_outbox import get_comment_outbox
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -58,6 +63,9 @@ class ContinuousTaskMonitor:
         # AI Agent staff ID for commenting
         self.agent_staff_id = 248
         
+        # Comments are queued and written in one batch per cycle
+        self.comment_outbox = get_comment_outbox(self.db_config, self.agent_staff_id)
+        
         # Human-like comment pools for different scenarios
         self.positive_comments = [
             "Hey {name}! 🌟 Absolutely crushing it on this task! Your consistency is inspiring the whole team",
@@ -113,7 +121,7 @@ class ContinuousTaskMonitor:
     def get_database_connection(self):
         """Establish database connection with retry logic"""
         try:
-            return mysql.connector.connect(**self.db_config)
+            return get_crm_connection(self.db_config)
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
             raise
@@ -263,32 +271,8 @@ class ContinuousTaskMonitor:
         return f"Hey {name}! 👋 Just checking in on this task. How's it going?"
 
     def add_comment_to_task(self, task_id: int, comment: str) -> bool:
-        """Add a comment to the task"""
-        try:
-            conn = self.get_database_connection()
-            cursor = conn.cursor()
-            
-            insert_query = """
-            INSERT INTO tbltask_comments (taskid, staffid, dateadded, comment)
-            VALUES (%s, %s, %s, %s)
-            """
-            
-            cursor.execute(insert_query, (
-                task_id,
-                self.agent_staff_id,
-                datetime.now(),
-                comment
-            ))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error adding comment to task {task_id}: {e}")
-            return False
+        """Queue a comment for the end-of-cycle outbox flush"""
+        return self.comment_outbox.enqueue(task_id, comment)
 
     def monitor_and_comment(self):
         """Main monitoring function - checks all tasks and adds comments"""
@@ -296,20 +280,22 @@ class ContinuousTaskMonitor:
         
         try:
             tasks = self.get_all_active_tasks()
-            comments_added = 0
+            comments_queued = 0
             
             for task in tasks:
                 if self.should_add_comment(task):
                     comment = self.get_appropriate_comment(task)
                     
                     if self.add_comment_to_task(task.task_id, comment):
-                        comments_added += 1
-                        logger.info(f"✅ Added comment to task {task.task_id} ({task.employee_name}): {comment[:50]}...")
-                        
-                        # Add small delay to avoid database overload
-                        time.sleep(0.5)
+                        comments_queued += 1
+                        logger.info(f"✅ Queued comment for task {task.task_id} ({task.employee_name}): {comment[:50]}...")
+            
+            # One transaction for every comment of this cycle; only written comments count as added
+            flushed = self.comment_outbox.flush()
+            outbox_stats = self.comment_outbox.get_stats()
             
-            logger.info(f"🎯 Monitoring cycle complete. Added {comments_added} comments to {len(tasks)} tasks")
+            logger.info(f"🎯 Monitoring cycle complete. Added {flushed['written']} comments to {len(tasks)} tasks ({comments_queued} queued, {flushed['failed']} still queued)")
+            logger.info(f"📝 Comment writes: {outbox_stats['last_flush_ms']:.0f}ms | Queue depth: {outbox_stats['queue_depth']}")
             
         except Exception as e:
             logger.error(f"Error in monitoring cycle: {e}")
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Due Date Scheduler
+==================
+Heap-based timer queue for the task monitoring engine.
+
+Instead of polling every open task to see whether it crossed an urgency
+boundary (2 days left, just overdue, 5 days late, ...), the engine arms one
+timer per task for its next boundary or rule re-check. The scheduler:
+- Keeps a min-heap of (fire time, task) with lazy invalidation, so re-arming
+  or cancelling a task is O(log n) and never scans the queue
+- Sleeps until the earliest timer (or an earlier one armed meanwhile)
+- Defers fire times outside working hours to the next working-hours start
+- Reports queue depth and the next fire time
+"""
+
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Tuple
+
+WORK_START_HOUR = 8
+WORK_END_HOUR = 18
+
+
+def is_working_hours(moment: datetime = None) -> bool:
+    """Check if it's reasonable working hours (like a human manager)"""
+    moment = moment or datetime.now()
+
+    # Work hours: 8 AM to 6 PM, Monday to Friday
+    is_weekday = moment.weekday() < 5
+    is_business_hours = WORK_START_HOUR <= moment.hour <= WORK_END_HOUR
+
+    return is_weekday and is_business_hours
+
+
+def next_working_time(moment: datetime) -> datetime:
+    """`moment` itself if it falls in working hours, otherwise the start of the next working period"""
+    if is_working_hours(moment):
+        return moment
+    candidate = moment.replace(hour=WORK_START_HOUR, minute=0, second=0, microsecond=0)
+    if moment.hour > WORK_END_HOUR or moment.weekday() >= 5:
+        candidate += timedelta(days=1)
+    while candidate.weekday() >= 5:
+        candidate += timedelta(days=1)
+    return candidate
+
+
+class DueDateScheduler:
+    """Min-heap of per-task timers; one live timer per task"""
+
+    def __init__(self, respect_working_hours: bool = True):
+        self.respect_working_hours = respect_working_hours
+
+        self._condition = threading.Condition()
+        self._heap: List[Tuple[datetime, int, int]] = []
+        # task_id -> (fire time, reason) of the live heap entry
+        self._live: Dict[int, Tuple[datetime, str]] = {}
+        self._seq = itertools.count()
+
+        self.stats = {
+            'scheduled': 0,
+            'fired': 0,
+            'cancelled': 0,
+            'deferred_to_working_hours': 0
+        }
+
+    def schedule(self, task_id: int, when: datetime, reason: str = '') -> datetime:
+        """Arm (or re-arm) the task's timer; returns the effective fire time"""
+        if self.respect_working_hours:
+            working_when = next_working_time(when)
+            if working_when != when:
+                self.stats['deferred_to_working_hours'] += 1
+                when = working_when
+
+        with self._condition:
+            current = self._live.get(task_id)
+            if current is not None and current[0] == when:
+                return when
+            self._live[task_id] = (when, reason)
+            heapq.heappush(self._heap, (when, next(self._seq), task_id))
+            self.stats['scheduled'] += 1
+
+            # Re-armed timers leave stale entries behind; rebuild once they dominate the heap
+            if len(self._heap) > 2 * len(self._live) + 1024:
+                self._heap = [(w, seq, tid) for w, seq, tid in self._heap if self._live.get(tid, (None,))[0] == w]
+                heapq.heapify(self._heap)
+
+            # Wake the sleeper so it can recompute its deadline
+            self._condition.notify_all()
+        return when
+
+    def cancel(self, task_id: int):
+        with self._condition:
+            if self._live.pop(task_id, None) is not None:
+                self.stats['cancelled'] += 1
+
+    def _discard_stale_head(self):
+        while self._heap:
+            when, _, task_id = self._heap[0]
+            live = self._live.get(task_id)
+            if live is not None and live[0] == when:
+                return
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: datetime = None) -> Dict[int, str]:
+        """Remove and return every task whose timer fired, as {task_id: reason}"""
+        now = now or datetime.now()
+        due = {}
+        with self._condition:
+            while True:
+                self._discard_stale_head()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, _, task_id = heapq.heappop(self._heap)
+                due[task_id] = self._live.pop(task_id)[1]
+            self.stats['fired'] += len(due)
+        return due
+
+    def next_fire(self) -> Optional[Tuple[datetime, int, str]]:
+        """(fire time, task_id, reason) of the earliest live timer"""
+        with self._condition:
+            self._discard_stale_head()
+            if not self._heap:
+                return None
+            when, _, task_id = self._heap[0]
+            return when, task_id, self._live[task_id][1]
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Sleep until the earliest timer is due, an earlier timer is armed, or `timeout` elapses
+        Returns: True when a timer is due
+        """
+        deadline = datetime.now() + timedelta(seconds=max(0.0, timeout))
+        with self._condition:
+            while True:
+                self._discard_stale_head()
+                now = datetime.now()
+                if self._heap and self._heap[0][0] <= now:
+                    return True
+                wake_at = min(deadline, self._heap[0][0]) if self._heap else deadline
+                remaining = (wake_at - now).total_seconds()
+                if remaining <= 0:
+                    return bool(self._heap) and self._heap[0][0] <= datetime.now()
+                self._condition.wait(remaining)
+
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._live)
+
+    def get_stats(self) -> Dict[str, Any]:
+        upcoming = self.next_fire()
+        with self._condition:
+            return {
+                **self.stats,
+                'queue_depth': len(self._live),
+                'heap_size': len(self._heap),
+                'next_fire_at': upcoming[0].isoformat() if upcoming else None,
+                'next_fire_task': upcoming[1] if upcoming else None,
+                'next_fire_reason': upcoming[2] if upcoming else None,
+                'respect_working_hours': self.respect_working_hours
+            }
@@ -6,7 +6,8 @@ Advanced monitoring system that tracks performance trends, provides
 intelligent human-like feedback, and runs continuously 24/7.
 """
 
-import mysql.connector
+import os
+import sys
 import schedule
 import time
 import random
@@ -17,6 +18,10 @@ import logging
 from dataclasses import dataclass, asdict
 from smart_comment_manager import SmartCommentManager
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+from core.monitoring.comment_outbox import get_comment_outbox
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -73,19 +78,25 @@ class EnhancedTaskMonitor:
         # Initialize smart comment manager
         self.comment_manager = SmartCommentManager(self.db_config, self.agent_staff_id)
         
+        # Comments are queued and written in one batch per cycle
+        self.comment_outbox = get_comment_outbox(self.db_config, self.agent_staff_id)
+        
         # Monitoring statistics
         self.stats = {
             'total_monitoring_cycles': 0,
             'total_comments_added': 0,
             'employees_monitored': 0,
             'last_cycle_time': None,
-            'performance_alerts': 0
+            'performance_alerts': 0,
+            'comment_queue_depth': 0,
+            'last_comment_write_ms': 0.0,
+            'comments_skipped_as_duplicate': 0
         }
 
     def get_database_connection(self):
         """Establish database connection with retry logic"""
         try:
-            return mysql.connector.connect(**self.db_config)
+            return get_crm_connection(self.db_config)
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
             raise
@@ -353,32 +364,8 @@ class EnhancedTaskMonitor:
         return False
 
     def add_comment_to_task(self, task_id: int, comment: str) -> bool:
-        """Add a comment to the task"""
-        try:
-            conn = self.get_database_connection()
-            cursor = conn.cursor()
-            
-            insert_query = """
-            INSERT INTO tbltask_comments (taskid, staffid, dateadded, comment)
-            VALUES (%s, %s, %s, %s)
-            """
-            
-            cursor.execute(insert_query, (
-                task_id,
-                self.agent_staff_id,
-                datetime.now(),
-                comment
-            ))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error adding comment to task {task_id}: {e}")
-            return False
+        """Queue a comment for the end-of-cycle outbox flush"""
+        return self.comment_outbox.enqueue(task_id, comment)
 
     def generate_performance_report(self) -> str:
         """Generate human-readable performance summary"""
@@ -420,7 +407,7 @@ class EnhancedTaskMonitor:
             self.update_employee_performance(tasks)
             
             # Process comments
-            comments_added = 0
+            comments_queued = 0
             critical_tasks = 0
             
             # Sort tasks by urgency score (highest first)
@@ -445,12 +432,19 @@ class EnhancedTaskMonitor:
                     comment = self.comment_manager.generate_contextual_comment(task_info)
                     
                     if comment and self.add_comment_to_task(task.task_id, comment):
-                        comments_added += 1
+                        comments_queued += 1
                         priority_emoji = {"critical": "🚨", "high": "🔴", "normal": "🟡", "low": "🟢"}
-                        logger.info(f"✅ {priority_emoji.get(task.priority, '📝')} Added comment to task {task.task_id} ({task.employee_name}): {comment[:60]}...")
-                        
-                        # Small delay to prevent database overload
-                        time.sleep(0.5)
+                        logger.info(f"✅ {priority_emoji.get(task.priority, '📝')} Queued comment for task {task.task_id} ({task.employee_name}): {comment[:60]}...")
+            
+            # One transaction for every comment of this cycle; only written comments count as added
+            flushed = self.comment_outbox.flush()
+            comments_added = flushed['written']
+            outbox_stats = self.comment_outbox.get_stats()
+            self.stats['comment_queue_depth'] = outbox_stats['queue_depth']
+            self.stats['last_comment_write_ms'] = outbox_stats['last_flush_ms']
+            self.stats['comments_skipped_as_duplicate'] = (
+                outbox_stats['duplicates_dropped'] + outbox_stats['already_commented_skipped']
+            )
             
             # Update statistics
             self.stats['total_monitoring_cycles'] += 1
@@ -460,8 +454,9 @@ class EnhancedTaskMonitor:
             
             cycle_duration = (datetime.now() - cycle_start).total_seconds()
             
-            logger.info(f"🎯 Cycle complete! Added {comments_added} comments to {len(tasks)} tasks")
+            logger.info(f"🎯 Cycle complete! Added {comments_added} comments to {len(tasks)} tasks ({comments_queued} queued, {flushed['failed']} still queued)")
             logger.info(f"📊 Critical tasks: {critical_tasks} | Duration: {cycle_duration:.1f}s")
+            logger.info(f"📝 Comment writes: {self.stats['last_comment_write_ms']:.0f}ms | Queue depth: {self.stats['comment_queue_depth']}")
             
             # Log performance report every 4 cycles
             if self.stats['total_monitoring_cycles'] % 4 == 0:
@@ -6,7 +6,6 @@ Fixed Task Monitor - Compatible with Both SQLite and MySQL
 import os
 import sys
 import sqlite3
-import mysql.connector
 import schedule
 import time
 import random
@@ -15,6 +14,9 @@ from typing import List, Dict, Tuple
 import logging
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+
 load_dotenv()
 
 # Configure logging
@@ -46,7 +48,7 @@ class DatabaseManager:
         """Get database connection based on type"""
         if self.database_type == 'mysql':
             try:
-                return mysql.connector.connect(**self.mysql_config)
+                return get_crm_connection(self.mysql_config)
             except Exception as e:
                 logger.error(f"MySQL connection failed: {e}")
                 return None
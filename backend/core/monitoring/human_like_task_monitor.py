@@ -9,7 +9,8 @@ Intelligent task monitoring system that works like a real human manager:
 - Respects human working hours and behavior patterns
 """
  
-import mysql.connector
+import os
+import sys
 import schedule
 import time
 import random
@@ -17,6 +18,11 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Tuple
 import logging
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+from core.monitoring.comment_outbox import get_comment_outbox
+from core.monitoring.due_date_scheduler import is_working_hours
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -76,19 +82,32 @@ class HumanLikeTaskMonitor:
             'checks_performed': 0,
             'comments_added': 0,
             'tasks_monitored': 0,
-            'last_check': None
+            'last_check': None,
+            'prefetch_queries': 0,
+            'last_prefetch_ms': 0.0,
+            'comment_queue_depth': 0,
+            'last_comment_write_ms': 0.0
         }
+        
+        # Per-cycle comment history, filled by prefetch_cycle_context() and read by the rule functions
+        self._cycle_context = None
+        
+        # Comments are queued and written in one batch per cycle
+        self.comment_outbox = get_comment_outbox(self.db_config, self.agent_staff_id)
 
     def get_database_connection(self):
         """Get database connection"""
         try:
-            return mysql.connector.connect(**self.db_config)
+            return get_crm_connection(self.db_config)
         except Exception as e:
             logger.error(f"Database connection failed: {e}")
             raise
 
     def has_commented_recently(self, task_id: int, employee_id: int) -> bool:
         """Check if we commented on this task within 24 hours (human-like behavior)"""
+        if self._cycle_context is not None and task_id in self._cycle_context['task_ids']:
+            return task_id in self._cycle_context['recent_agent_comments']
+        
         try:
             conn = self.get_database_connection()
             cursor = conn.cursor()
@@ -167,6 +186,73 @@ class HumanLikeTaskMonitor:
             logger.error(f"Error fetching tasks: {e}")
             return []
 
+    def prefetch_cycle_context(self, task_ids: List[int]) -> Dict:
+        """Load comment threads and our last-comment timestamps for all cycle tasks in two queries"""
+        task_ids = list(dict.fromkeys(task_ids))
+        context = {
+            'task_ids': set(task_ids),
+            'comments': {task_id: [] for task_id in task_ids},
+            'conversations': {},
+            'last_agent_comment': {},
+            'recent_agent_comments': set()
+        }
+        if not task_ids:
+            return context
+        
+        started = time.time()
+        conn = self.get_database_connection()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            placeholders = ','.join(['%s'] * len(task_ids))
+            
+            # 1. Every comment on every candidate task
+            cursor.execute(f"""
+            SELECT 
+                tc.taskid,
+                tc.content,
+                tc.dateadded,
+                tc.staffid,
+                s.firstname,
+                s.lastname,
+                CASE WHEN tc.staffid = %s THEN 'ai' ELSE 'human' END as comment_type
+            FROM tbltask_comments tc
+            LEFT JOIN tblstaff s ON tc.staffid = s.staffid
+            WHERE tc.taskid IN ({placeholders})
+            ORDER BY tc.taskid, tc.dateadded ASC
+            """, (self.agent_staff_id, *task_ids))
+            for comment in cursor.fetchall():
+                context['comments'][comment['taskid']].append(comment)
+            
+            # 2. Our last comment per task, with the 24h window evaluated on the DB clock
+            cursor.execute(f"""
+            SELECT 
+                taskid,
+                MAX(dateadded) as last_comment,
+                MAX(dateadded) >= DATE_SUB(NOW(), INTERVAL 24 HOUR) as is_recent
+            FROM tbltask_comments
+            WHERE staffid = %s AND taskid IN ({placeholders})
+            GROUP BY taskid
+            """, (self.agent_staff_id, *task_ids))
+            for row in cursor.fetchall():
+                context['last_agent_comment'][row['taskid']] = row['last_comment']
+                if row['is_recent']:
+                    context['recent_agent_comments'].add(row['taskid'])
+            
+            cursor.close()
+        finally:
+            conn.close()
+        
+        self.stats['prefetch_queries'] += 2
+        self.stats['last_prefetch_ms'] = (time.time() - started) * 1000
+        logger.info(f"Prefetched comment history for {len(task_ids)} tasks in {self.stats['last_prefetch_ms']:.0f}ms")
+        return context
+
+    def _record_cycle_comment(self, task_id: int):
+        """Keep the cycle context in sync after we comment (tasks can appear once per assignee)"""
+        if self._cycle_context is not None:
+            self._cycle_context['recent_agent_comments'].add(task_id)
+            self._cycle_context['last_agent_comment'][task_id] = datetime.now()
+
     def analyze_conversation_history(self, task_id: int) -> Dict:
         """Analyze previous comments to understand conversation context"""
         try:
@@ -278,6 +364,13 @@ class HumanLikeTaskMonitor:
 
     def analyze_full_conversation_history(self, task_id: int) -> Dict:
         """Analyze complete conversation history to understand full context"""
+        # Within a check cycle, analyze the prefetched thread once per task
+        if self._cycle_context is not None and task_id in self._cycle_context['task_ids']:
+            conversations = self._cycle_context['conversations']
+            if task_id not in conversations:
+                conversations[task_id] = self._build_conversation_context(self._cycle_context['comments'][task_id])
+            return conversations[task_id]
+        
         try:
             conn = self.get_database_connection()
             cursor = conn.cursor(dictionary=True)
@@ -300,6 +393,17 @@ class HumanLikeTaskMonitor:
             cursor.execute(query, (self.agent_staff_id, task_id))
             all_comments = cursor.fetchall()
             
+            cursor.close()
+            conn.close()
+            return self._build_conversation_context(all_comments)
+            
+        except Exception as e:
+            logger.error(f"Error analyzing full conversation: {e}")
+            return {'total_comments': 0, 'current_status': 'unknown', 'needs_followup': False}
+
+    def _build_conversation_context(self, all_comments: List[Dict]) -> Dict:
+        """Analyze conversation flow and content of a task's comment thread"""
+        try:
             # Analyze conversation flow and content
             context = {
                 'total_comments': len(all_comments),
@@ -369,8 +473,6 @@ class HumanLikeTaskMonitor:
             context['ai_comment_count'] = len(ai_comments)
             context['human_comment_count'] = len(human_comments)
             
-            cursor.close()
-            conn.close()
             return context
             
         except Exception as e:
@@ -605,44 +707,13 @@ class HumanLikeTaskMonitor:
         return self.generate_intelligent_comment(name, task)
 
     def add_comment_to_task(self, task_id: int, comment: str) -> bool:
-        """Add comment to task in database"""
-        try:
-            conn = self.get_database_connection()
-            cursor = conn.cursor()
-            
-            insert_query = """
-            INSERT INTO tbltask_comments (taskid, staffid, dateadded, content)
-            VALUES (%s, %s, %s, %s)
-            """
-            
-            cursor.execute(insert_query, (
-                task_id,
-                self.agent_staff_id,
-                datetime.now(),
-                comment
-            ))
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
-            
-            return True
-            
-        except Exception as e:
-            logger.error(f"Error adding comment to task {task_id}: {e}")
-            return False
+        """Queue a comment for the end-of-cycle outbox flush"""
+        return self.comment_outbox.enqueue(task_id, comment)
 
     def is_working_hours(self) -> bool:
         """Check if it's reasonable working hours (like a human manager)"""
-        now = datetime.now()
-        hour = now.hour
-        day = now.weekday()  # 0 = Monday, 6 = Sunday
-        
-        # Work hours: 8 AM to 6 PM, Monday to Friday
-        is_weekday = day < 5
-        is_business_hours = 8 <= hour <= 18
-        
-        return is_weekday and is_business_hours
+        # Shared with the monitoring engine's due-date scheduler
+        return is_working_hours(datetime.now())
 
     def run_human_like_check(self):
         """Main monitoring function - like a human manager checking tasks"""
@@ -679,12 +750,22 @@ class HumanLikeTaskMonitor:
             print(f"   ✅ Completed: {len(completed_tasks)} tasks")
             print(f"   📝 Normal: {len(normal_tasks)} tasks")
             
-            comments_added = 0
+            comments_queued = 0
             
             print(f"\n💬 Processing tasks for comments...")
             
+            # Limit to 50 tasks per check (human attention span)
+            candidates = tasks[:50]
+            
+            # Load comment history for the whole cycle up front (O(1) queries instead of O(tasks))
+            try:
+                self._cycle_context = self.prefetch_cycle_context([t['taskid'] for t in candidates])
+            except Exception as e:
+                logger.error(f"Comment history prefetch failed, falling back to per-task queries: {e}")
+                self._cycle_context = None
+            
             # Process tasks with human-like attention patterns
-            for i, task in enumerate(tasks[:50], 1):  # Limit to 50 tasks per check (human attention span)
+            for i, task in enumerate(candidates, 1):
                 
                 # Show progress
                 if i <= 10 or i % 10 == 0:  # Show first 10, then every 10th
@@ -699,8 +780,8 @@ class HumanLikeTaskMonitor:
                     current_status = context.get('current_status', 'unknown')
                     
                     if self.add_comment_to_task(task['taskid'], comment):
-                        comments_added += 1
-                        self.stats['comments_added'] += 1
+                        self._record_cycle_comment(task['taskid'])
+                        comments_queued += 1
                         
                         urgency_emoji = {
                             'completed': '✅',
@@ -733,14 +814,20 @@ class HumanLikeTaskMonitor:
                         if current_status != 'unknown':
                             print(f"      🧠 Context: Detected {current_status} status from conversation")
                         
-                        logger.info(f"Commented on task {task['taskid']} ({task['firstname']} {task['lastname']}): {comment[:50]}...")
-                        
-                        # Human-like pacing - small delay between comments
-                        time.sleep(random.uniform(1, 3))
+                        logger.info(f"Queued comment on task {task['taskid']} ({task['firstname']} {task['lastname']}): {comment[:50]}...")
+            
+            # One transaction for every comment of this cycle; only written comments count as added
+            flushed = self.comment_outbox.flush()
+            comments_added = flushed['written']
+            self.stats['comments_added'] += comments_added
+            outbox_stats = self.comment_outbox.get_stats()
+            self.stats['comment_queue_depth'] = outbox_stats['queue_depth']
+            self.stats['last_comment_write_ms'] = outbox_stats['last_flush_ms']
             
             # Final scan summary
             print(f"\n✨ ===== SCAN COMPLETE =====")
-            print(f"💬 Comments Added: {comments_added}")
+            print(f"💬 Comments Added: {comments_added} (queued {comments_queued}, {flushed['skipped']} already posted, {flushed['failed']} still queued)")
+            print(f"📝 Comment Write: {outbox_stats['last_flush_ms']:.0f}ms | Queue Depth: {outbox_stats['queue_depth']}")
             print(f"📊 Tasks Processed: {len(tasks)}")
             print(f"🎯 Session Total Comments: {self.stats['comments_added']}")
             
@@ -750,7 +837,7 @@ class HumanLikeTaskMonitor:
             
             # Log summary
             working_hours = "YES" if self.is_working_hours() else "NO"
-            logger.info(f"Check complete: {comments_added} new comments | {len(tasks)} tasks monitored | Working hours: {working_hours}")
+            logger.info(f"Check complete: {comments_added} new comments ({comments_queued} queued) | {len(tasks)} tasks monitored | Working hours: {working_hours}")
             
             # Occasional performance summary (like a human manager reviewing)
             if self.stats['checks_performed'] % 50 == 0:  # Every ~8 hours (50 * 10 min)
@@ -758,6 +845,8 @@ class HumanLikeTaskMonitor:
             
         except Exception as e:
             logger.error(f"Error in monitoring check: {e}")
+        finally:
+            self._cycle_context = None
 
     def start_human_like_monitoring(self):
         """Start the human-like monitoring system"""
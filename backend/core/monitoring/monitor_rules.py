@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Monitor Rules
+=============
+Pluggable comment-decision rules for the unified task monitoring engine.
+
+Each rule looks at one in-memory task state and either returns a
+CommentDecision or None. Rules never touch the database; the engine only
+evaluates them for tasks that changed or whose urgency bucket / timer expired,
+so a rule may also ask to be re-evaluated at a specific time via next_check().
+
+Strategies carried over from the standalone monitors:
+- Reply to human updates (completion / blocker mentions) - human-like monitor
+- Celebrate completed tasks once - continuous / human-like monitors
+- Follow up after 48h without a human reply - human-like monitor
+- Graduated overdue escalation (day 1, every 3 days, every 2 days) - continuous monitor
+- One reminder when a task becomes due soon - human-like / continuous monitors
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+# Urgency buckets as (name, last days_late value inside the bucket); the last bucket is open ended
+URGENCY_BUCKETS: List[Tuple[str, Optional[int]]] = [
+    ('normal', -3),
+    ('due_soon', 0),
+    ('just_overdue', 1),
+    ('overdue', 5),
+    ('late', 10),
+    ('very_late', None)
+]
+
+OVERDUE_BUCKETS = ('just_overdue', 'overdue', 'late', 'very_late')
+
+COMPLETION_WORDS = ('done', 'completed', 'finished', 'delivered', 'ready for review')
+BLOCKER_WORDS = ('issue', 'problem', 'blocked', 'stuck', 'error', 'bug', 'waiting for')
+
+
+def as_date(value) -> Optional[date]:
+    """Normalize DATE / DATETIME / string column values to a date"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def urgency_bucket(duedate: Optional[date], datefinished, today: date) -> Tuple[str, date, Optional[date]]:
+    """
+    Classify a task into its urgency bucket
+    Returns: (bucket name, first day of the bucket, first day of the next bucket or None)
+    """
+    if datefinished:
+        return 'completed', as_date(datefinished) or today, None
+    if duedate is None:
+        return 'normal', date.min, None
+
+    days_late = (today - duedate).days
+    lower = None
+    for name, upper in URGENCY_BUCKETS:
+        if upper is None or days_late <= upper:
+            since = duedate + timedelta(days=lower + 1) if lower is not None else date.min
+            next_change = duedate + timedelta(days=upper + 1) if upper is not None else None
+            return name, since, next_change
+        lower = upper
+
+
+@dataclass
+class TaskState:
+    """In-memory view of one monitored task, kept current from CRM deltas"""
+    task_id: int
+    title: str
+    status: int
+    duedate: Optional[date] = None
+    datefinished: Optional[datetime] = None
+    assignees: Dict[int, str] = field(default_factory=dict)
+    comment_count: int = 0
+    agent_comment_count: int = 0
+    last_comment_id: int = 0
+    last_agent_comment_at: Optional[datetime] = None
+    last_human_comment_at: Optional[datetime] = None
+    last_human_comment: str = ''
+    bucket: str = 'normal'
+    bucket_since: date = date.min
+    bucket_until: Optional[date] = None
+
+    def days_late(self, today: date) -> int:
+        if self.duedate is None:
+            return 0
+        end = as_date(self.datefinished) or today
+        return (end - self.duedate).days
+
+    def agent_commented_since(self, moment: datetime) -> bool:
+        return self.last_agent_comment_at is not None and self.last_agent_comment_at >= moment
+
+    def awaiting_reply(self) -> bool:
+        """Our last comment has not been answered by a human yet"""
+        if self.last_agent_comment_at is None:
+            return False
+        return self.last_human_comment_at is None or self.last_human_comment_at < self.last_agent_comment_at
+
+
+@dataclass
+class CommentDecision:
+    """A rule's verdict that a task should get a comment of a given kind"""
+    rule: str
+    kind: str
+    reason: str
+
+
+class MonitorRule:
+    """Base class for comment-decision rules"""
+
+    name = 'rule'
+
+    def evaluate(self, task: TaskState, now: datetime) -> Optional[CommentDecision]:
+        raise NotImplementedError
+
+    def next_check(self, task: TaskState, now: datetime) -> Optional[datetime]:
+        """When this rule could next change its verdict for the task (None = only on task changes)"""
+        return None
+
+    def decide(self, kind: str, reason: str) -> CommentDecision:
+        return CommentDecision(rule=self.name, kind=kind, reason=reason)
+
+
+class HumanReplyRule(MonitorRule):
+    """React to the latest human comment when it reports completion or a blocker"""
+
+    name = 'human_reply'
+
+    def evaluate(self, task, now):
+        if task.bucket == 'completed' or task.last_human_comment_at is None:
+            return None
+        if task.agent_commented_since(task.last_human_comment_at):
+            return None
+
+        text = task.last_human_comment.lower()
+        if any(word in text for word in COMPLETION_WORDS):
+            return self.decide('status_update_request', 'assignee reported the work as done')
+        if any(word in text for word in BLOCKER_WORDS):
+            return self.decide('offer_help', 'assignee reported a blocker')
+        return None
+
+
+class CompletionRule(MonitorRule):
+    """Acknowledge a finished task once"""
+
+    name = 'completion'
+
+    def evaluate(self, task, now):
+        if task.bucket != 'completed':
+            return None
+        finished_at = task.datefinished if isinstance(task.datefinished, datetime) else datetime.combine(task.bucket_since, datetime.min.time())
+        if task.agent_commented_since(finished_at):
+            return None
+        if task.days_late(now.date()) <= 0:
+            return self.decide('completed_on_time', 'task finished on time')
+        return self.decide('completed_late', f'task finished {task.days_late(now.date())} days late')
+
+
+class FollowUpRule(MonitorRule):
+    """Follow up when our last comment got no human reply within `wait_hours`"""
+
+    name = 'follow_up'
+
+    def __init__(self, wait_hours: float = 48):
+        self.wait = timedelta(hours=wait_hours)
+
+    def evaluate(self, task, now):
+        if task.bucket == 'completed' or not task.awaiting_reply():
+            return None
+        if now - task.last_agent_comment_at < self.wait:
+            return None
+        return self.decide('follow_up', f'no reply for {self.wait.total_seconds() / 3600:.0f}h')
+
+    def next_check(self, task, now):
+        if task.bucket == 'completed' or not task.awaiting_reply():
+            return None
+        return task.last_agent_comment_at + self.wait
+
+
+class OverdueEscalationRule(MonitorRule):
+    """Comment when a task enters an overdue bucket, then repeat at a bucket-specific cadence"""
+
+    name = 'overdue_escalation'
+
+    def __init__(self, repeat_days: Dict[str, Optional[int]] = None):
+        self.repeat_days = repeat_days or {
+            'just_overdue': None,
+            'overdue': 3,
+            'late': 3,
+            'very_late': 2
+        }
+
+    def _repeat_at(self, task: TaskState) -> Optional[datetime]:
+        interval = self.repeat_days.get(task.bucket)
+        if interval is None or task.last_agent_comment_at is None:
+            return None
+        return task.last_agent_comment_at + timedelta(days=interval)
+
+    def evaluate(self, task, now):
+        if task.bucket not in OVERDUE_BUCKETS:
+            return None
+        days_late = task.days_late(now.date())
+        bucket_start = datetime.combine(task.bucket_since, datetime.min.time())
+        if not task.agent_commented_since(bucket_start):
+            return self.decide(task.bucket, f'{days_late} days overdue')
+        repeat_at = self._repeat_at(task)
+        if repeat_at is not None and now >= repeat_at:
+            return self.decide(task.bucket, f'{days_late} days overdue, repeating')
+        return None
+
+    def next_check(self, task, now):
+        if task.bucket not in OVERDUE_BUCKETS:
+            return None
+        return self._repeat_at(task)
+
+
+class DueSoonRule(MonitorRule):
+    """One friendly reminder once the deadline is two days out"""
+
+    name = 'due_soon'
+
+    def evaluate(self, task, now):
+        if task.bucket != 'due_soon':
+            return None
+        if task.agent_commented_since(datetime.combine(task.bucket_since, datetime.min.time())):
+            return None
+        return self.decide('due_soon', f'due on {task.duedate}')
+
+
+def default_rules() -> List[MonitorRule]:
+    """Rule chain used by the engine; the first rule that returns a decision wins"""
+    return [
+        HumanReplyRule(),
+        CompletionRule(),
+        FollowUpRule(),
+        OverdueEscalationRule(),
+        DueSoonRule()
+    ]
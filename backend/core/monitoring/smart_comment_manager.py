@@ -6,12 +6,16 @@ Intelligent comment management system that tracks employee patterns,
 performance trends, and provides personalized human-like feedback.
 """
 
-import mysql.connector
+import os
+import sys
 from datetime import datetime, timedelta
 from typing import List, Dict, Set
 import random
 import logging
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from core.crm.connection_pool import get_crm_connection
+
 logger = logging.getLogger(__name__)
 
 class SmartCommentManager:
@@ -98,7 +102,7 @@ class SmartCommentManager:
     def analyze_employee_performance(self, employee_id: int) -> Dict:
         """Analyze employee's recent performance pattern"""
         try:
-            conn = mysql.connector.connect(**self.db_config)
+            conn = get_crm_connection(self.db_config)
             cursor = conn.cursor(dictionary=True)
             
             # Get recent task completion data
@@ -187,7 +191,7 @@ class SmartCommentManager:
     def check_comment_frequency(self, employee_id: int, task_id: int) -> Dict:
         """Check recent comment patterns to avoid spam"""
         try:
-            conn = mysql.connector.connect(**self.db_config)
+            conn = get_crm_connection(self.db_config)
             cursor = conn.cursor(dictionary=True)
             
             # Check recent comments to this employee
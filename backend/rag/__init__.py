@@ -16,6 +16,8 @@ This module implements:
 Components:
 - pipeline.py: Core RAG pipeline orchestration
 - embedding_service.py: Text embedding and vectorization
+- embedding_cache.py: Memory-mapped persistent embedding cache
+- answer_cache.py: Semantic answer cache for the pipeline
 - retrieval_service.py: Document retrieval and search
 - ai_service.py: AI response generation
 - integration.py: Complete integration and testing
@@ -59,12 +61,16 @@ from .embedding_service import (
     create_sentence_transformer_embedding_service,
     create_default_embedding_service
 )
+from .embedding_cache import EmbeddingCache
+from .answer_cache import SemanticAnswerCache
 
 # Retrieval services
 from .retrieval_service import (
     BaseRetrievalService,
     ChromaDBRetrievalService,
     MultiSourceRetrievalService,
+    CRMRetrievalSource,
+    ConversationMemoryRetrievalSource,
     HandbookDataProcessor,
     DocumentIndex,
     SearchFilter,
@@ -149,11 +155,15 @@ __all__ = [
     "create_openai_embedding_service",
     "create_sentence_transformer_embedding_service",
     "create_default_embedding_service",
+    "EmbeddingCache",
+    "SemanticAnswerCache",
     
     # Retrieval services
     "BaseRetrievalService",
     "ChromaDBRetrievalService",
     "MultiSourceRetrievalService",
+    "CRMRetrievalSource",
+    "ConversationMemoryRetrievalSource",
     "HandbookDataProcessor",
     "DocumentIndex", 
     "SearchFilter",
@@ -0,0 +1,327 @@
+"""
+Semantic Answer Cache - Task 1.4
+================================
+
+Semantic response cache for the RAG pipeline.
+
+Managers ask near-identical questions all day ("what is Hamza working on",
+"Hamza's tasks"). Instead of re-retrieving and re-calling the LLM for each
+paraphrase, the pipeline looks the query embedding up here first:
+
+Features:
+- Cosine-similarity lookup over normalized query embeddings (NumPy matrix per scope)
+- Entries scoped by user, filters and the staff names the query mentions, so
+  "what is Hamza working on" never answers "what is Ali working on"
+- Source-document invalidation: an entry is dropped as soon as any document it
+  was built from changes (``invalidate_documents``), or as soon as any source
+  it drew on is re-ingested wholesale (``invalidate_source``)
+- TTL expiry and capacity-based LRU eviction
+
+Author: AI Coordination Agent
+Version: 1.0.0
+Date: October 2025
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Iterable, Set
+
+import numpy as np
+
+from core.logging_config import get_logger
+from core.crm.staff_directory import normalize_name
+
+logger = get_logger(__name__)
+
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.93"))
+DEFAULT_TTL_SECONDS = float(os.getenv("RAG_ANSWER_CACHE_TTL", "900"))
+DEFAULT_CAPACITY = int(os.getenv("RAG_ANSWER_CACHE_CAPACITY", "1000"))
+
+# Every live cache, so document changes anywhere can invalidate them all
+_live_caches: "weakref.WeakSet[SemanticAnswerCache]" = weakref.WeakSet()
+
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def query_entities(text: str, name_tokens: Set[str]) -> List[str]:
+    """Normalized staff name tokens mentioned in a query, sorted"""
+    return sorted({
+        token for token in (normalize_name(word) for word in _WORD_RE.findall(text or ""))
+        if token in name_tokens
+    })
+
+
+def answer_cache_scope(user_id: Optional[str], filters: Any, entities: Iterable[str] = ()) -> str:
+    """Stable scope key for a user + filter + mentioned-entity combination"""
+    payload = json.dumps(
+        {"user": user_id, "filters": filters, "entities": sorted(entities)},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    """Cached pipeline answer"""
+    key: int
+    scope: str
+    query: str
+    embedding: np.ndarray
+    answer: str
+    sources: List[Any]
+    confidence: float
+    source_ids: Set[str]
+    source_names: Set[str] = field(default_factory=set)
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    Embedding-keyed answer cache with per-scope similarity search
+
+    Lookups compare the normalized query vector against every live entry of
+    the same scope with one matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        capacity: int = DEFAULT_CAPACITY
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.capacity = max(1, int(capacity))
+
+        self._lock = threading.RLock()
+        # key -> entry, ordered from least to most recently used
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._scopes: Dict[str, List[int]] = {}
+        self._scope_matrices: Dict[str, np.ndarray] = {}
+        self._by_source: Dict[str, Set[int]] = {}
+        self._by_source_name: Dict[str, Set[int]] = {}
+        self._next_key = 0
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+        _live_caches.add(self)
+
+    @staticmethod
+    def _normalize(embedding: Iterable[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not vector.size or norm == 0:
+            return None
+        return vector / norm
+
+    def _remove(self, key: int):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._scopes.get(entry.scope)
+        if keys is not None:
+            keys.remove(key)
+            if not keys:
+                del self._scopes[entry.scope]
+        self._scope_matrices.pop(entry.scope, None)
+        for source_id in entry.source_ids:
+            owners = self._by_source.get(source_id)
+            if owners is not None:
+                owners.discard(key)
+                if not owners:
+                    del self._by_source[source_id]
+        for source_name in entry.source_names:
+            owners = self._by_source_name.get(source_name)
+            if owners is not None:
+                owners.discard(key)
+                if not owners:
+                    del self._by_source_name[source_name]
+
+    def _is_expired(self, entry: CachedAnswer, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created_at > self.ttl_seconds
+
+    def _scope_matrix(self, scope: str) -> np.ndarray:
+        matrix = self._scope_matrices.get(scope)
+        if matrix is None:
+            matrix = np.vstack([self._entries[key].embedding for key in self._scopes[scope]])
+            self._scope_matrices[scope] = matrix
+        return matrix
+
+    def lookup(self, query_embedding: List[float], scope: str) -> Optional[Dict[str, Any]]:
+        """Best cached answer in scope above the similarity threshold, or None"""
+        query = self._normalize(query_embedding)
+        if query is None:
+            return None
+
+        with self._lock:
+            now = time.time()
+            expired = [key for key in self._scopes.get(scope, []) if self._is_expired(self._entries[key], now)]
+            for key in expired:
+                self._remove(key)
+            self.stats["expirations"] += len(expired)
+
+            keys = self._scopes.get(scope)
+            if not keys:
+                self.stats["misses"] += 1
+                return None
+
+            matrix = self._scope_matrix(scope)
+            if matrix.shape[1] != query.shape[0]:
+                self.stats["misses"] += 1
+                return None
+
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.similarity_threshold:
+                self.stats["misses"] += 1
+                return None
+
+            entry = self._entries[keys[best]]
+            entry.hits += 1
+            self._entries.move_to_end(entry.key)
+            self.stats["hits"] += 1
+
+            return {
+                "answer": entry.answer,
+                "sources": entry.sources,
+                "confidence": entry.confidence,
+                "similarity": similarity,
+                "cached_query": entry.query,
+                "age_seconds": now - entry.created_at
+            }
+
+    def store(
+        self,
+        query: str,
+        query_embedding: List[float],
+        scope: str,
+        answer: str,
+        sources: List[Any],
+        confidence: float
+    ):
+        """Cache an answer together with the ids of the documents it was built from"""
+        vector = self._normalize(query_embedding)
+        if vector is None:
+            return
+
+        with self._lock:
+            while len(self._entries) >= self.capacity:
+                evicted_key = next(iter(self._entries))
+                self._remove(evicted_key)
+                self.stats["evictions"] += 1
+
+            key = self._next_key
+            self._next_key += 1
+            source_ids = {str(getattr(doc, "id", doc)) for doc in sources}
+            source_names = {str(doc.source) for doc in sources if getattr(doc, "source", None)}
+
+            self._entries[key] = CachedAnswer(
+                key=key,
+                scope=scope,
+                query=query,
+                embedding=vector,
+                answer=answer,
+                sources=list(sources),
+                confidence=confidence,
+                source_ids=source_ids,
+                source_names=source_names
+            )
+            self._scopes.setdefault(scope, []).append(key)
+            self._scope_matrices.pop(scope, None)
+            for source_id in source_ids:
+                self._by_source.setdefault(source_id, set()).add(key)
+            for source_name in source_names:
+                self._by_source_name.setdefault(source_name, set()).add(key)
+            self.stats["stores"] += 1
+
+    def invalidate_documents(self, document_ids: Iterable[str]) -> int:
+        """Drop every entry built from any of the given documents"""
+        with self._lock:
+            keys = set()
+            for document_id in document_ids:
+                keys |= self._by_source.get(str(document_id), set())
+            for key in keys:
+                self._remove(key)
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every entry built from documents whose id starts with `prefix`"""
+        with self._lock:
+            return self.invalidate_documents([sid for sid in self._by_source if sid.startswith(prefix)])
+
+    def invalidate_source(self, source: str) -> int:
+        """Drop every entry built from any document of a source ('handbook', 'crm', ...)"""
+        with self._lock:
+            keys = set(self._by_source_name.get(source, set()))
+            for key in keys:
+                self._remove(key)
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+            self._scope_matrices.clear()
+            self._by_source.clear()
+            self._by_source_name.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "scopes": len(self._scopes),
+                "capacity": self.capacity,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+            }
+
+
+def invalidate_documents(document_ids: Iterable[str]) -> int:
+    """Invalidate cached answers built from these documents in every live cache"""
+    document_ids = list(document_ids)
+    if not document_ids:
+        return 0
+    return sum(cache.invalidate_documents(document_ids) for cache in list(_live_caches))
+
+
+def invalidate_prefix(prefix: str) -> int:
+    """Invalidate cached answers built from documents with this id prefix in every live cache"""
+    return sum(cache.invalidate_prefix(prefix) for cache in list(_live_caches))
+
+
+def invalidate_source(source: str) -> int:
+    """Invalidate cached answers built from any document of this source in every live cache"""
+    return sum(cache.invalidate_source(source) for cache in list(_live_caches))
+
+
+__all__ = [
+    "SemanticAnswerCache",
+    "CachedAnswer",
+    "answer_cache_scope",
+    "query_entities",
+    "invalidate_documents",
+    "invalidate_prefix",
+    "invalidate_source"
+]
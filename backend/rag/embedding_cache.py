@@ -0,0 +1,378 @@
+"""
+Embedding Cache - Task 1.4
+==========================
+
+Persistent embedding cache for the RAG pipeline backed by a single
+memory-mapped float32 store.
+
+The previous cache wrote one pickle file per embedding, paying an
+``os.path.exists`` + open + unpickle per lookup and producing huge
+directories. This engine keeps every vector in one contiguous array:
+
+Features:
+- ``vectors.f32`` memory-mapped float32 matrix (one row per cached text)
+- ``keys.bin`` holding each row's content hash, checked on every disk read
+- JSON ``index.json`` mapping content hash -> row (no pickle)
+- In-process LRU front for the hottest vectors
+- Bulk ``get_many`` / ``put_many`` for batch embedding
+- Size-bounded LRU eviction of rows once ``capacity`` is reached; evicted rows
+  are only reused after the index no longer points at them
+- One writer per cache directory (``fcntl`` lock); other processes keep an
+  in-memory LRU only
+- Model-versioned invalidation (model name, dimensions, format version)
+
+Author: AI Coordination Agent
+Version: 1.0.0
+Date: October 2025
+"""
+
+import os
+import json
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, assume a single process
+    fcntl = None
+
+from core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CACHE_FORMAT_VERSION = 2
+DEFAULT_CAPACITY = int(os.getenv("EMBEDDING_CACHE_CAPACITY", "50000"))
+DEFAULT_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "2048"))
+INITIAL_ROWS = 1024
+INDEX_FLUSH_EVERY = 256
+# Rows evicted at once when the store is full (one index write per batch)
+EVICTION_BATCH = 256
+KEY_BYTES = hashlib.sha256().digest_size
+
+
+def embedding_cache_key(text: str) -> str:
+    """Content hash used as the cache key"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Memory-mapped embedding store with an LRU front
+
+    Rows are allocated on demand; the backing file grows geometrically up to
+    ``capacity`` rows, after which the least recently used rows are evicted in
+    batches. An evicted row is reused only once the index on disk has been
+    rewritten without it, and every read checks the row's stored key, so a
+    crash between a put and the next index flush yields a miss, never another
+    text's vector.
+
+    Only the process holding the directory lock writes the files; any other
+    instance on the same directory falls back to the in-memory LRU.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_name: str,
+        dimensions: int,
+        capacity: int = DEFAULT_CAPACITY,
+        memory_items: int = DEFAULT_MEMORY_ITEMS
+    ):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.dimensions = int(dimensions)
+        self.capacity = max(1, int(capacity))
+        self.memory_items = max(0, int(memory_items))
+
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self.keys_path = os.path.join(cache_dir, "keys.bin")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, ".lock")
+
+        self._lock = threading.RLock()
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        # key -> row, ordered from least to most recently used
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._free_rows: List[int] = []
+        # Evicted rows the on-disk index may still reference (free after the next flush)
+        self._released_rows: List[int] = []
+        self._allocated_rows = 0
+        self._vectors: Optional[np.memmap] = None
+        self._row_keys: Optional[np.memmap] = None
+        self._dirty_puts = 0
+        self._lock_file = None
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "puts": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "key_mismatches": 0
+        }
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.persistent = self._acquire_directory_lock()
+        if self.persistent:
+            self._open()
+            # Persist rows written since the last periodic index flush
+            atexit.register(self.flush)
+        else:
+            logger.warning(
+                f"Embedding cache {cache_dir} is locked by another instance; "
+                "keeping embeddings in memory only"
+            )
+
+    # ------------------------------------------------------------------ storage
+
+    def _meta(self) -> Dict[str, Any]:
+        return {
+            "format_version": CACHE_FORMAT_VERSION,
+            "model": self.model_name,
+            "dimensions": self.dimensions
+        }
+
+    def _acquire_directory_lock(self) -> bool:
+        """Take the exclusive writer lock on the cache directory (held for the process lifetime)"""
+        if fcntl is None:
+            return True
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _open(self):
+        """Load the index and map the vector file, resetting on model/format mismatch"""
+        index = None
+        if all(os.path.exists(path) for path in (self.index_path, self.vectors_path, self.keys_path)):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except Exception as e:
+                logger.warning(f"Embedding cache index unreadable, rebuilding: {e}")
+
+        if index is not None and index.get("meta") != self._meta():
+            logger.info(
+                f"Embedding cache invalidated (was {index.get('meta')}, now {self._meta()})"
+            )
+            self.stats["invalidations"] += 1
+            index = None
+
+        if index is None:
+            self._reset_files()
+            return
+
+        self._allocated_rows = int(index.get("allocated_rows", 0))
+        expected_size = self._allocated_rows * self.dimensions * 4
+        if (os.path.getsize(self.vectors_path) < expected_size
+                or os.path.getsize(self.keys_path) < self._allocated_rows * KEY_BYTES):
+            logger.warning("Embedding cache vector file truncated, rebuilding")
+            self._reset_files()
+            return
+
+        self._rows = OrderedDict((key, int(row)) for key, row in index.get("rows", []))
+        used = set(self._rows.values())
+        self._free_rows = [row for row in range(self._allocated_rows) if row not in used]
+        self._map(self._allocated_rows)
+        logger.info(f"Embedding cache loaded: {len(self._rows)} vectors ({self.model_name})")
+
+    def _reset_files(self):
+        self._rows = OrderedDict()
+        self._free_rows = []
+        self._released_rows = []
+        self._allocated_rows = 0
+        self._map(0)
+        for path in (self.vectors_path, self.keys_path):
+            with open(path, "wb"):
+                pass
+        self._grow(min(INITIAL_ROWS, self.capacity))
+        self._write_index()
+
+    def _map(self, rows: int):
+        for mapped in (self._vectors, self._row_keys):
+            if mapped is not None:
+                mapped.flush()
+        self._vectors = self._row_keys = None
+        if rows:
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dimensions)
+            )
+            self._row_keys = np.memmap(
+                self.keys_path, dtype=np.uint8, mode="r+", shape=(rows, KEY_BYTES)
+            )
+
+    def _grow(self, rows: int):
+        """Extend the backing file to `rows` rows and remap it"""
+        rows = min(rows, self.capacity)
+        if rows <= self._allocated_rows:
+            return
+        with open(self.vectors_path, "r+b") as f:
+            f.truncate(rows * self.dimensions * 4)
+        with open(self.keys_path, "r+b") as f:
+            f.truncate(rows * KEY_BYTES)
+        self._free_rows.extend(range(self._allocated_rows, rows))
+        self._allocated_rows = rows
+        self._map(rows)
+
+    def _write_index(self):
+        payload = {
+            "meta": self._meta(),
+            "allocated_rows": self._allocated_rows,
+            "rows": list(self._rows.items())
+        }
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.index_path)
+        self._dirty_puts = 0
+        # The index on disk no longer references released rows
+        self._free_rows.extend(self._released_rows)
+        self._released_rows = []
+
+    def _allocate_row(self) -> int:
+        if not self._free_rows and self._allocated_rows < self.capacity:
+            self._grow(max(self._allocated_rows * 2, INITIAL_ROWS))
+        if not self._free_rows:
+            self._evict(min(EVICTION_BATCH, max(1, self.capacity // 64)))
+        return self._free_rows.pop()
+
+    def _evict(self, count: int):
+        """Drop the least recently used rows and flush so they can be reused"""
+        for _ in range(min(count, len(self._rows))):
+            evicted_key, row = self._rows.popitem(last=False)
+            self._memory.pop(evicted_key, None)
+            self._released_rows.append(row)
+            self.stats["evictions"] += 1
+        self.flush()
+
+    def _row_matches(self, row: int, key: str) -> bool:
+        return bytes(self._row_keys[row]) == bytes.fromhex(key)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if not self.memory_items:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    # ------------------------------------------------------------------ public API
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Look up embeddings for many texts in one call (None for misses)"""
+        results: List[Optional[List[float]]] = []
+        with self._lock:
+            for text in texts:
+                key = embedding_cache_key(text)
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    if key in self._rows:
+                        self._rows.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    results.append(vector.tolist())
+                    continue
+
+                row = self._rows.get(key)
+                if row is not None and self._vectors is not None and not self._row_matches(row, key):
+                    # Row rewritten for another text after the index was last flushed
+                    del self._rows[key]
+                    self._released_rows.append(row)
+                    self.stats["key_mismatches"] += 1
+                    row = None
+                if row is None or self._vectors is None:
+                    self.stats["misses"] += 1
+                    results.append(None)
+                    continue
+
+                vector = np.array(self._vectors[row], dtype=np.float32)
+                self._rows.move_to_end(key)
+                self._remember(key, vector)
+                self.stats["disk_hits"] += 1
+                results.append(vector.tolist())
+        return results
+
+    def get(self, text: str) -> Optional[List[float]]:
+        return self.get_many([text])[0]
+
+    def put_many(self, texts: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        """Store embeddings for many texts; rows beyond capacity evict the LRU entries"""
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                vector = np.asarray(embedding, dtype=np.float32)
+                if vector.shape != (self.dimensions,):
+                    logger.warning(
+                        f"Skipping embedding with shape {vector.shape}, cache expects ({self.dimensions},)"
+                    )
+                    continue
+                key = embedding_cache_key(text)
+                if not self.persistent:
+                    self._remember(key, vector)
+                    self.stats["puts"] += 1
+                    continue
+                row = self._rows.get(key)
+                if row is None:
+                    row = self._allocate_row()
+                # Vector before key: a torn write leaves a key mismatch, not a wrong vector
+                self._vectors[row] = vector
+                self._row_keys[row] = np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+                self._rows[key] = row
+                self._rows.move_to_end(key)
+                self._remember(key, vector)
+                self.stats["puts"] += 1
+                self._dirty_puts += 1
+
+            if self._dirty_puts >= INDEX_FLUSH_EVERY:
+                self.flush()
+
+    def put(self, text: str, embedding: Sequence[float]):
+        self.put_many([text], [embedding])
+
+    def flush(self):
+        """Persist vectors and the hash -> row index"""
+        with self._lock:
+            if not self.persistent:
+                return
+            for mapped in (self._vectors, self._row_keys):
+                if mapped is not None:
+                    mapped.flush()
+            self._write_index()
+
+    def clear(self):
+        """Drop every cached vector"""
+        with self._lock:
+            self._memory.clear()
+            if self.persistent:
+                self._reset_files()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            return {
+                **self.stats,
+                "entries": len(self._rows),
+                "memory_entries": len(self._memory),
+                "allocated_rows": self._allocated_rows,
+                "capacity": self.capacity,
+                "persistent": self.persistent,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "model": self.model_name,
+                "dimensions": self.dimensions
+            }
+
+
+__all__ = [
+    "EmbeddingCache",
+    "embedding_cache_key"
+]
@@ -23,9 +23,8 @@ from typing import List, Dict, Any, Optional, Union, Tuple
 from abc import ABC, abstractmethod
 import asyncio
 import hashlib
-import pickle
+import time
 from dataclasses import dataclass
-from datetime import datetime
 import numpy as np
 
 try:
@@ -47,6 +46,7 @@ except ImportError:
     CHROMADB_AVAILABLE = False
 
 from core.logging_config import get_logger
+from .embedding_cache import EmbeddingCache
 
 # Configure logging
 logger = get_logger(__name__)
@@ -144,13 +144,14 @@ class OpenAIEmbeddingService(BaseEmbeddingService):
         embeddings = []
         
         # Process in batches to respect API limits
+        loop = asyncio.get_running_loop()
         for i in range(0, len(texts), self.batch_size):
             batch = texts[i:i + self.batch_size]
             
             try:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch
+                # Run in thread pool so concurrent batches don't block the event loop
+                response = await loop.run_in_executor(
+                    None, lambda: self.client.embeddings.create(model=self.model, input=batch)
                 )
                 
                 batch_embeddings = [item.embedding for item in response.data]
@@ -198,7 +199,7 @@ class SentenceTransformerEmbeddingService(BaseEmbeddingService):
         """Embed single text using SentenceTransformers"""
         try:
             # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             embedding = await loop.run_in_executor(
                 None, lambda: self.model.encode([text], convert_to_numpy=True)[0]
             )
@@ -214,7 +215,7 @@ class SentenceTransformerEmbeddingService(BaseEmbeddingService):
         """Embed batch of texts using SentenceTransformers"""
         try:
             # Run in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             embeddings = await loop.run_in_executor(
                 None, lambda: self.model.encode(texts, convert_to_numpy=True, batch_size=self.batch_size)
             )
@@ -245,17 +246,40 @@ class EmbeddingService:
         cache_dir: Optional[str] = None,
         enable_caching: bool = True,
         chunk_size: int = 512,
-        chunk_overlap: int = 50
+        chunk_overlap: int = 50,
+        max_concurrent_batches: int = None
     ):
         self.provider = provider
         self.enable_caching = enable_caching
         self.cache_dir = cache_dir or "cache/embeddings"
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.max_concurrent_batches = max_concurrent_batches or int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+        
+        # Cumulative ingest statistics plus the most recent embed_document/embed_handbook_data run
+        self.ingest_stats = {
+            "documents": 0,
+            "chunks": 0,
+            "unique_chunks": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "provider_batches": 0,
+            "embedding_time": 0.0
+        }
+        self.last_ingest_stats: Dict[str, Any] = {}
         
-        # Initialize cache
+        # Initialize cache (memory-mapped vector store keyed by content hash)
+        self.cache: Optional[EmbeddingCache] = None
         if enable_caching:
-            os.makedirs(self.cache_dir, exist_ok=True)
+            try:
+                self.cache = EmbeddingCache(
+                    cache_dir=self.cache_dir,
+                    model_name=provider.get_model_name(),
+                    dimensions=provider.get_dimensions()
+                )
+            except Exception as e:
+                logger.warning(f"Embedding cache unavailable, continuing without it: {e}")
+                self.enable_caching = False
         
         logger.info(f"Embedding service initialized with {provider.get_model_name()}")
     
@@ -288,6 +312,29 @@ class EmbeddingService:
         
         return embedding
     
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed many texts, serving cached vectors and only sending misses to the provider
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            Embeddings in the same order as texts
+        """
+        processed = [self._preprocess_text(text) for text in texts]
+        embeddings = await self._get_cached_embeddings(processed)
+        
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if misses:
+            miss_texts = [processed[i] for i in misses]
+            new_embeddings = await self.provider.embed_batch(miss_texts)
+            for i, embedding in zip(misses, new_embeddings):
+                embeddings[i] = embedding
+            await self._cache_embeddings(miss_texts, new_embeddings)
+        
+        return embeddings
+    
     async def embed_document(self, text: str, source: str = "unknown") -> List[EmbeddingResult]:
         """
         Embed a document with chunking
@@ -302,29 +349,7 @@ class EmbeddingService:
         # Split text into chunks
         chunks = self._chunk_text(text, source)
         
-        # Embed chunks
-        embedding_results = []
-        chunk_texts = [chunk.text for chunk in chunks]
-        
-        # Batch embed for efficiency
-        embeddings = await self.provider.embed_batch(chunk_texts)
-        
-        for chunk, embedding in zip(chunks, embeddings):
-            result = EmbeddingResult(
-                text=chunk.text,
-                embedding=embedding,
-                model=self.provider.get_model_name(),
-                dimensions=self.provider.get_dimensions(),
-                processing_time=0.0,  # TODO: Add timing
-                metadata={
-                    "chunk_id": chunk.id,
-                    "source": chunk.source,
-                    "start_pos": chunk.start_pos,
-                    "end_pos": chunk.end_pos,
-                    **chunk.metadata
-                }
-            )
-            embedding_results.append(result)
+        embedding_results = await self._embed_chunks(chunks, documents=1)
         
         logger.info(f"Embedded document into {len(embedding_results)} chunks")
         return embedding_results
@@ -339,39 +364,118 @@ class EmbeddingService:
         Returns:
             List of embedding results
         """
-        embedding_results = []
+        # Chunk every section first so the whole handbook shares one cache lookup
+        chunks: List[TextChunk] = []
+        documents = 0
         
-        # Process different sections of handbook data
         for section_name, section_content in handbook_data.items():
             if isinstance(section_content, str):
                 # Simple text content
-                results = await self.embed_document(
-                    text=section_content,
-                    source=f"handbook_{section_name}"
-                )
-                embedding_results.extend(results)
-                
+                section_text = section_content
             elif isinstance(section_content, dict):
                 # Structured content - flatten and embed
-                flattened_text = self._flatten_dict_content(section_content)
-                results = await self.embed_document(
-                    text=flattened_text,
-                    source=f"handbook_{section_name}"
-                )
-                embedding_results.extend(results)
-                
+                section_text = self._flatten_dict_content(section_content)
             elif isinstance(section_content, list):
                 # List content - join and embed
-                joined_text = "\n".join(str(item) for item in section_content)
-                results = await self.embed_document(
-                    text=joined_text,
-                    source=f"handbook_{section_name}"
-                )
-                embedding_results.extend(results)
+                section_text = "\n".join(str(item) for item in section_content)
+            else:
+                continue
+            
+            chunks.extend(self._chunk_text(section_text, f"handbook_{section_name}"))
+            documents += 1
+        
+        embedding_results = await self._embed_chunks(chunks, documents=documents)
         
         logger.info(f"Embedded handbook data: {len(embedding_results)} chunks from {len(handbook_data)} sections")
         return embedding_results
     
+    async def _embed_chunks(self, chunks: List[TextChunk], documents: int = 1) -> List[EmbeddingResult]:
+        """
+        Embed chunks with content-hash dedupe, one bulk cache lookup and
+        concurrent provider batches for the misses
+        """
+        start_time = time.perf_counter()
+        
+        # Dedupe identical chunk texts (repeated boilerplate, re-ingested sections)
+        unique_texts: List[str] = []
+        seen: Dict[str, int] = {}
+        for chunk in chunks:
+            if chunk.text not in seen:
+                seen[chunk.text] = len(unique_texts)
+                unique_texts.append(chunk.text)
+        
+        embeddings = await self._get_cached_embeddings(unique_texts)
+        cached = [embedding is not None for embedding in embeddings]
+        misses = [i for i, hit in enumerate(cached) if not hit]
+        
+        batches = 0
+        if misses:
+            miss_texts = [unique_texts[i] for i in misses]
+            new_embeddings, batches = await self._embed_missing(miss_texts)
+            for i, embedding in zip(misses, new_embeddings):
+                embeddings[i] = embedding
+            await self._cache_embeddings(miss_texts, new_embeddings)
+        
+        elapsed = time.perf_counter() - start_time
+        hits = len(unique_texts) - len(misses)
+        
+        run_stats = {
+            "documents": documents,
+            "chunks": len(chunks),
+            "unique_chunks": len(unique_texts),
+            "cache_hits": hits,
+            "cache_misses": len(misses),
+            "provider_batches": batches,
+            "embedding_time": elapsed
+        }
+        for key, value in run_stats.items():
+            self.ingest_stats[key] += value
+        self.last_ingest_stats = run_stats
+        
+        model = self.provider.get_model_name()
+        dimensions = self.provider.get_dimensions()
+        per_chunk_time = elapsed / len(chunks) if chunks else 0.0
+        
+        embedding_results = []
+        for chunk in chunks:
+            index = seen[chunk.text]
+            result = EmbeddingResult(
+                text=chunk.text,
+                embedding=embeddings[index],
+                model=model,
+                dimensions=dimensions,
+                processing_time=per_chunk_time,
+                metadata={
+                    "chunk_id": chunk.id,
+                    "source": chunk.source,
+                    "start_pos": chunk.start_pos,
+                    "end_pos": chunk.end_pos,
+                    "cache_hit": cached[index],
+                    **chunk.metadata
+                }
+            )
+            embedding_results.append(result)
+        
+        logger.debug(
+            f"Embedded {len(chunks)} chunks ({len(unique_texts)} unique, {hits} cached, "
+            f"{len(misses)} embedded in {batches} batches) in {elapsed:.2f}s"
+        )
+        return embedding_results
+    
+    async def _embed_missing(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        """Send texts to the provider in provider-sized batches with bounded parallelism"""
+        batch_size = max(1, getattr(self.provider, "batch_size", 100))
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        
+        async def run_batch(batch: List[str]) -> List[List[float]]:
+            async with semaphore:
+                return await self.provider.embed_batch(batch)
+        
+        batch_results = await asyncio.gather(*(run_batch(batch) for batch in batches))
+        embeddings = [embedding for batch in batch_results for embedding in batch]
+        return embeddings, len(batches)
+    
     def _preprocess_text(self, text: str) -> str:
         """Preprocess text for embedding"""
         # Clean and normalize text
@@ -439,45 +543,32 @@ class EmbeddingService:
     
     async def _get_cached_embedding(self, text: str) -> Optional[List[float]]:
         """Get cached embedding if available"""
-        if not self.enable_caching:
-            return None
-        
-        # Create cache key
-        cache_key = hashlib.md5(f"{text}_{self.provider.get_model_name()}".encode()).hexdigest()
-        cache_path = os.path.join(self.cache_dir, f"{cache_key}.pkl")
+        return (await self._get_cached_embeddings([text]))[0]
+    
+    async def _get_cached_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Bulk cache lookup (None for every miss)"""
+        if not self.enable_caching or self.cache is None:
+            return [None] * len(texts)
         
         try:
-            if os.path.exists(cache_path):
-                with open(cache_path, "rb") as f:
-                    cached_data = pickle.load(f)
-                    return cached_data["embedding"]
+            return self.cache.get_many(texts)
         except Exception as e:
-            logger.warning(f"Failed to load cached embedding: {e}")
-        
-        return None
+            logger.warning(f"Failed to load cached embeddings: {e}")
+            return [None] * len(texts)
     
     async def _cache_embedding(self, text: str, embedding: List[float]):
         """Cache embedding for future use"""
-        if not self.enable_caching:
+        await self._cache_embeddings([text], [embedding])
+    
+    async def _cache_embeddings(self, texts: List[str], embeddings: List[List[float]]):
+        """Bulk cache insert"""
+        if not self.enable_caching or self.cache is None:
             return
         
-        # Create cache key
-        cache_key = hashlib.md5(f"{text}_{self.provider.get_model_name()}".encode()).hexdigest()
-        cache_path = os.path.join(self.cache_dir, f"{cache_key}.pkl")
-        
         try:
-            cache_data = {
-                "text": text,
-                "embedding": embedding,
-                "model": self.provider.get_model_name(),
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            
-            with open(cache_path, "wb") as f:
-                pickle.dump(cache_data, f)
-                
+            self.cache.put_many(texts, embeddings)
         except Exception as e:
-            logger.warning(f"Failed to cache embedding: {e}")
+            logger.warning(f"Failed to cache embeddings: {e}")
     
     def calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
         """
@@ -516,6 +607,9 @@ class EmbeddingService:
             "dimensions": self.provider.get_dimensions(),
             "caching_enabled": self.enable_caching,
             "cache_dir": self.cache_dir,
+            "cache_stats": self.cache.get_stats() if self.cache else None,
+            "ingest_stats": dict(self.ingest_stats),
+            "max_concurrent_batches": self.max_concurrent_batches,
             "chunk_size": self.chunk_size,
             "chunk_overlap": self.chunk_overlap
         }
@@ -135,6 +135,7 @@ class RAGIntegrationService:
         
         try:
             logger.info("Processing handbook data...")
+            start_time = datetime.utcnow()
             
             # 1. Process handbook data into embeddings
             embedding_results = await self.embedding_service.embed_handbook_data(handbook_data)
@@ -166,7 +167,8 @@ class RAGIntegrationService:
                 "indexed_documents": indexed_count,
                 "total_documents": stats["vector_service"]["total_documents"],
                 "handbook_documents": stats["vector_service"]["handbook_documents"],
-                "processing_time": datetime.utcnow().isoformat()
+                "embedding_stats": dict(self.embedding_service.last_ingest_stats),
+                "processing_time": (datetime.utcnow() - start_time).total_seconds()
             }
             
             logger.info(f"Handbook data processing completed: {result}")
@@ -9,6 +9,7 @@ Features:
 - Vector embedding and similarity search
 - Multi-source data retrieval (CRM, Handbook, Memory)
 - OpenAI integration for response generation
+- Semantic answer cache for near-identical queries
 - Query processing and context management
 - Response ranking and filtering
 
@@ -26,10 +27,14 @@ import asyncio
 import json
 
 from core.logging_config import get_logger
+from .answer_cache import SemanticAnswerCache, answer_cache_scope, query_entities
 
 # Configure logging
 logger = get_logger(__name__)
 
+NO_AI_SERVICE_ANSWER = "I'm sorry, I cannot process your request at this time."
+GENERATION_ERROR_ANSWER = "I encountered an error while processing your request. Please try again."
+
 @dataclass
 class RAGQuery:
     """RAG query structure"""
@@ -76,12 +81,24 @@ class RAGPipeline:
         embedding_service=None,
         retrieval_service=None,
         ai_service=None,
-        config: Optional[Dict[str, Any]] = None
+        config: Optional[Dict[str, Any]] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        name_tokens_loader=None
     ):
         self.embedding_service = embedding_service
         self.retrieval_service = retrieval_service
         self.ai_service = ai_service
-        self.config = config or self._get_default_config()
+        self.config = {**self._get_default_config(), **(config or {})}
+        
+        # Semantic answer cache in front of retrieval + generation
+        self.answer_cache = answer_cache
+        if self.answer_cache is None and self.config["answer_cache_enabled"]:
+            self.answer_cache = SemanticAnswerCache(
+                similarity_threshold=self.config["answer_cache_threshold"],
+                ttl_seconds=self.config["answer_cache_ttl"],
+                capacity=self.config["answer_cache_capacity"]
+            )
+        self._name_tokens_loader = name_tokens_loader or self._load_staff_name_tokens
         
         logger.info("RAG Pipeline initialized")
     
@@ -94,9 +111,35 @@ class RAGPipeline:
             "enable_reranking": True,
             "temperature": 0.7,
             "max_tokens": 500,
-            "model": "gpt-3.5-turbo"
+            "model": "gpt-3.5-turbo",
+            "answer_cache_enabled": os.getenv("RAG_ANSWER_CACHE_ENABLED", "true").lower() == "true",
+            "answer_cache_threshold": float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", "0.93")),
+            "answer_cache_ttl": float(os.getenv("RAG_ANSWER_CACHE_TTL", "900")),
+            "answer_cache_capacity": int(os.getenv("RAG_ANSWER_CACHE_CAPACITY", "1000"))
         }
     
+    @staticmethod
+    def _load_staff_name_tokens():
+        from core.crm.staff_directory import get_staff_directory
+        return get_staff_directory().known_name_tokens()
+    
+    def _answer_cache_scope(self, query: RAGQuery) -> Optional[str]:
+        """
+        Cache scope for a query, or None when the answer cache must be skipped
+        
+        Paraphrases about different employees embed almost identically, so the
+        staff names a query mentions are part of its scope. Without a staff
+        list those names can't be told apart and the query is not cached.
+        """
+        try:
+            name_tokens = self._name_tokens_loader()
+        except Exception as e:
+            logger.warning(f"Answer cache skipped, staff names unavailable: {e}")
+            return None
+        if not name_tokens:
+            return None
+        return answer_cache_scope(query.user_id, query.filters, query_entities(query.text, name_tokens))
+    
     async def process_query(self, query: RAGQuery) -> RAGResponse:
         """
         Process a RAG query through the complete pipeline
@@ -117,29 +160,71 @@ class RAGPipeline:
             
             # Step 1: Query Input Processing
             processed_query = await self._process_query_input(query)
+            query_embedding = await self._embed_query(processed_query)
+            
+            # Semantic cache: near-identical questions in the same scope skip retrieval + LLM
+            cache_scope = self._answer_cache_scope(query) if self.answer_cache else None
+            if cache_scope and query_embedding is not None:
+                cached = self.answer_cache.lookup(query_embedding, cache_scope)
+                if cached:
+                    processing_time = (datetime.utcnow() - start_time).total_seconds()
+                    logger.info(
+                        "RAG answer served from cache",
+                        extra={"processing_time": processing_time, "similarity": cached["similarity"]}
+                    )
+                    return RAGResponse(
+                        query=query.text,
+                        answer=cached["answer"],
+                        sources=cached["sources"][:query.max_results],
+                        confidence=cached["confidence"],
+                        processing_time=processing_time,
+                        metadata={
+                            "retrieved_docs_count": len(cached["sources"]),
+                            "model_used": self.config["model"],
+                            "timestamp": datetime.utcnow().isoformat(),
+                            "cache_hit": True,
+                            "cache_similarity": cached["similarity"],
+                            "cached_query": cached["cached_query"],
+                            "cache_age_seconds": cached["age_seconds"]
+                        }
+                    )
             
             # Step 2: Retrieve relevant documents
-            retrieved_docs = await self._retrieve_documents(processed_query)
+            retrieved_docs = await self._retrieve_documents(processed_query, query_embedding)
             
             # Step 3: AI Processing with retrieved context
             answer = await self._generate_response(processed_query, retrieved_docs)
             
             # Step 4: Format response output
             processing_time = (datetime.utcnow() - start_time).total_seconds()
+            confidence = self._calculate_confidence(retrieved_docs, answer)
             
             response = RAGResponse(
                 query=query.text,
                 answer=answer,
                 sources=retrieved_docs[:query.max_results],
-                confidence=self._calculate_confidence(retrieved_docs, answer),
+                confidence=confidence,
                 processing_time=processing_time,
                 metadata={
                     "retrieved_docs_count": len(retrieved_docs),
                     "model_used": self.config["model"],
-                    "timestamp": datetime.utcnow().isoformat()
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "cache_hit": False
                 }
             )
             
+            # Only grounded, successful answers are cached (they can be invalidated by source)
+            if (cache_scope and query_embedding is not None and retrieved_docs
+                    and answer not in (NO_AI_SERVICE_ANSWER, GENERATION_ERROR_ANSWER)):
+                self.answer_cache.store(
+                    query=query.text,
+                    query_embedding=query_embedding,
+                    scope=cache_scope,
+                    answer=answer,
+                    sources=retrieved_docs,
+                    confidence=confidence
+                )
+            
             logger.info(
                 f"RAG query processed successfully",
                 extra={
@@ -180,12 +265,36 @@ class RAGPipeline:
         logger.debug(f"Query processed: {processed_text[:100]}...")
         return query
     
-    async def _retrieve_documents(self, query: RAGQuery) -> List[RetrievedDocument]:
+    async def _embed_query(self, query: RAGQuery) -> Optional[List[float]]:
+        """
+        Embed the query once for both the answer cache and retrieval
+        
+        Args:
+            query: Processed query
+            
+        Returns:
+            Query embedding, or None if no embedding service is available
+        """
+        if not self.embedding_service:
+            return None
+        
+        try:
+            return await self.embedding_service.embed_query(query.text)
+        except Exception as e:
+            logger.error(f"Query embedding error: {e}", exc_info=True)
+            return None
+    
+    async def _retrieve_documents(
+        self,
+        query: RAGQuery,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[RetrievedDocument]:
         """
         Retrieve relevant documents from all sources
         
         Args:
             query: Processed query
+            query_embedding: Precomputed query embedding
             
         Returns:
             List of retrieved documents
@@ -196,14 +305,16 @@ class RAGPipeline:
         
         try:
             # Get query embedding
-            query_embedding = await self.embedding_service.embed_query(query.text)
+            if query_embedding is None:
+                query_embedding = await self.embedding_service.embed_query(query.text)
             
             # Search across all sources
             results = await self.retrieval_service.search(
                 query_embedding=query_embedding,
                 filters=query.filters,
                 max_results=self.config["max_retrieved_docs"],
-                min_score=query.min_score
+                min_score=query.min_score,
+                query_text=query.text
             )
             
             # Filter by minimum relevance score
@@ -258,7 +369,7 @@ class RAGPipeline:
         """
         if not self.ai_service:
             logger.warning("No AI service configured")
-            return "I'm sorry, I cannot process your request at this time."
+            return NO_AI_SERVICE_ANSWER
         
         try:
             # Build context from retrieved documents
@@ -276,7 +387,7 @@ class RAGPipeline:
             
         except Exception as e:
             logger.error(f"AI response generation error: {e}", exc_info=True)
-            return "I encountered an error while processing your request. Please try again."
+            return GENERATION_ERROR_ANSWER
     
     def _build_context(self, documents: List[RetrievedDocument]) -> str:
         """
@@ -385,6 +496,7 @@ class RAGPipeline:
                 "retrieval_service": bool(self.retrieval_service),
                 "ai_service": bool(self.ai_service)
             },
+            "answer_cache": self.answer_cache.get_stats() if self.answer_cache else None,
             "status": "healthy" if all([
                 self.embedding_service,
                 self.retrieval_service,
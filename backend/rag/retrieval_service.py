@@ -7,6 +7,7 @@ Implements vector similarity search with multiple backends and filtering.
 
 Features:
 - Multi-source document retrieval (Handbook, CRM, Memory)
+- Concurrent source search with per-source timeouts and early return
 - Vector similarity search with ChromaDB
 - Advanced filtering and ranking
 - Metadata-based search enhancement
@@ -22,10 +23,14 @@ import logging
 from typing import List, Dict, Any, Optional, Union, Tuple
 from abc import ABC, abstractmethod
 import asyncio
+import functools
 import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from datetime import datetime
-import uuid
 
 try:
     import chromadb
@@ -42,10 +47,58 @@ except ImportError:
 
 from core.logging_config import get_logger
 from .pipeline import RetrievedDocument
+from .answer_cache import invalidate_documents, invalidate_prefix, invalidate_source
 
 # Configure logging
 logger = get_logger(__name__)
 
+# Blocking ChromaDB / MySQL / SQLite calls run on bounded executors so a slow
+# backend never stalls the event loop (or spawns unbounded threads). The CRM
+# source has its own pool: asyncio.wait_for only cancels the await, so calls
+# that overrun their timeout keep a worker busy and must not starve the
+# vector and memory searches.
+RETRIEVAL_EXECUTOR_WORKERS = int(os.getenv("RAG_RETRIEVAL_WORKERS", "8"))
+CRM_RETRIEVAL_WORKERS = int(os.getenv("RAG_CRM_WORKERS", "2"))
+DEFAULT_SOURCE_TIMEOUTS = {
+    "vector": float(os.getenv("RAG_VECTOR_TIMEOUT", "3.0")),
+    "crm": float(os.getenv("RAG_CRM_TIMEOUT", "2.0")),
+    "memory": float(os.getenv("RAG_MEMORY_TIMEOUT", "1.5"))
+}
+EARLY_RETURN_SCORE = float(os.getenv("RAG_EARLY_RETURN_SCORE", "0.8"))
+
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_crm_executor: Optional[ThreadPoolExecutor] = None
+_retrieval_executor_lock = threading.Lock()
+
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    """Shared bounded executor for blocking retrieval backends"""
+    global _retrieval_executor
+    if _retrieval_executor is None:
+        with _retrieval_executor_lock:
+            if _retrieval_executor is None:
+                _retrieval_executor = ThreadPoolExecutor(
+                    max_workers=RETRIEVAL_EXECUTOR_WORKERS,
+                    thread_name_prefix="rag-retrieval"
+                )
+    return _retrieval_executor
+
+def get_crm_executor() -> ThreadPoolExecutor:
+    """Bounded executor reserved for the CRM source"""
+    global _crm_executor
+    if _crm_executor is None:
+        with _retrieval_executor_lock:
+            if _crm_executor is None:
+                _crm_executor = ThreadPoolExecutor(
+                    max_workers=CRM_RETRIEVAL_WORKERS,
+                    thread_name_prefix="rag-crm"
+                )
+    return _crm_executor
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the retrieval executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_retrieval_executor(), functools.partial(func, *args, **kwargs))
+
 @dataclass
 class DocumentIndex:
     """Document index entry"""
@@ -94,7 +147,8 @@ class BaseRetrievalService(ABC):
         query_embedding: List[float],
         filters: Optional[SearchFilter] = None,
         max_results: int = 10,
-        min_score: float = 0.0
+        min_score: float = 0.0,
+        query_text: Optional[str] = None
     ) -> List[RetrievedDocument]:
         """Search for similar documents"""
         pass
@@ -143,7 +197,8 @@ class ChromaDBRetrievalService(BaseRetrievalService):
     async def add_document(self, document: DocumentIndex) -> bool:
         """Add single document to ChromaDB"""
         try:
-            self.collection.add(
+            await run_blocking(
+                self.collection.add,
                 ids=[document.id],
                 embeddings=[document.embedding],
                 documents=[document.content],
@@ -154,6 +209,7 @@ class ChromaDBRetrievalService(BaseRetrievalService):
                 }]
             )
             
+            invalidate_documents([document.id])
             logger.debug(f"Added document to ChromaDB: {document.id}")
             return True
             
@@ -178,13 +234,15 @@ class ChromaDBRetrievalService(BaseRetrievalService):
             } for doc in documents]
             
             # Add batch to collection
-            self.collection.add(
+            await run_blocking(
+                self.collection.add,
                 ids=ids,
                 embeddings=embeddings,
                 documents=contents,
                 metadatas=metadatas
             )
             
+            invalidate_documents(ids)
             logger.info(f"Added {len(documents)} documents to ChromaDB")
             return len(documents)
             
@@ -197,7 +255,8 @@ class ChromaDBRetrievalService(BaseRetrievalService):
         query_embedding: List[float],
         filters: Optional[SearchFilter] = None,
         max_results: int = 10,
-        min_score: float = 0.0
+        min_score: float = 0.0,
+        query_text: Optional[str] = None
     ) -> List[RetrievedDocument]:
         """Search for similar documents in ChromaDB"""
         try:
@@ -205,7 +264,8 @@ class ChromaDBRetrievalService(BaseRetrievalService):
             where_clause = self._build_where_clause(filters)
             
             # Perform similarity search
-            results = self.collection.query(
+            results = await run_blocking(
+                self.collection.query,
                 query_embeddings=[query_embedding],
                 n_results=max_results,
                 where=where_clause
@@ -273,7 +333,8 @@ class ChromaDBRetrievalService(BaseRetrievalService):
     async def delete_document(self, document_id: str) -> bool:
         """Delete document from ChromaDB"""
         try:
-            self.collection.delete(ids=[document_id])
+            await run_blocking(self.collection.delete, ids=[document_id])
+            invalidate_documents([document_id])
             logger.debug(f"Deleted document from ChromaDB: {document_id}")
             return True
             
@@ -286,7 +347,8 @@ class ChromaDBRetrievalService(BaseRetrievalService):
         try:
             if source:
                 # Count with source filter
-                results = self.collection.query(
+                results = await run_blocking(
+                    self.collection.query,
                     query_embeddings=[[0.0] * 384],  # Dummy embedding
                     n_results=1,
                     where={"source": source}
@@ -295,85 +357,338 @@ class ChromaDBRetrievalService(BaseRetrievalService):
                 return len(results['ids'][0]) if results['ids'] else 0
             else:
                 # Get all collection info
-                return self.collection.count()
+                return await run_blocking(self.collection.count)
                 
         except Exception as e:
             logger.error(f"Failed to get document count: {e}")
             return 0
 
+def _parse_timestamp(value: Any) -> datetime:
+    """Best-effort naive UTC timestamp for ranking (falls back to now)"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if value:
+        try:
+            return datetime.fromisoformat(str(value).replace("Z", "")).replace(tzinfo=None)
+        except ValueError:
+            pass
+    return datetime.utcnow()
+
+class CRMRetrievalSource:
+    """
+    CRM retriever over the local CRM search index (employees, projects, tasks)
+    
+    The n-gram index answers from SQLite on the CRM executor; the index refreshes
+    against MySQL on its own background thread, never on the request path.
+    """
+    
+    def __init__(self, search_index=None, max_per_kind: int = 5):
+        self._search_index = search_index
+        self.max_per_kind = max_per_kind
+    
+    def _get_index(self):
+        if self._search_index is None:
+            from core.crm.search_index import get_crm_search_index
+            self._search_index = get_crm_search_index()
+        if not getattr(self, "_listening", False):
+            self._search_index.add_change_listener(self._on_index_change)
+            self._listening = True
+        return self._search_index
+    
+    @staticmethod
+    def _on_index_change(full_rebuild: bool, changed: Dict[str, List[int]]):
+        """Invalidate cached answers built from CRM records that just changed"""
+        if full_rebuild:
+            invalidate_prefix("crm_")
+            return
+        invalidate_documents(
+            f"crm_{kind}_{record_id}" for kind, record_ids in changed.items() for record_id in record_ids
+        )
+    
+    async def search(
+        self,
+        query_text: Optional[str],
+        query_embedding: Optional[List[float]] = None,
+        filters: Optional[SearchFilter] = None,
+        max_results: int = 10
+    ) -> List[RetrievedDocument]:
+        """Search CRM records matching the query text"""
+        if not query_text:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_crm_executor(), functools.partial(self._search_sync, query_text, max_results)
+        )
+    
+    def _search_sync(self, query_text: str, max_results: int) -> List[RetrievedDocument]:
+        search_index = self._get_index()
+        search_index.ensure_fresh()
+        if not search_index.is_warm():
+            return []
+        
+        words = [w for w in re.findall(r"\w+", query_text.lower()) if len(w) > 2]
+        if not words:
+            return []
+        
+        hits = search_index.search(words, query_text.lower(), limit=min(self.max_per_kind, max_results))
+        
+        documents = []
+        for kind, records in (("employee", hits["employees"]), ("project", hits["projects"]), ("task", hits["tasks"])):
+            for rank, record in enumerate(records):
+                content = self._format_record(kind, record)
+                documents.append(RetrievedDocument(
+                    id=f"crm_{kind}_{record.get('staffid') or record.get('id')}",
+                    content=content,
+                    source="crm",
+                    score=self._lexical_score(words, content, rank),
+                    metadata={
+                        "source": "crm",
+                        "type": kind,
+                        "record_id": record.get("staffid") or record.get("id")
+                    },
+                    timestamp=_parse_timestamp(record.get("dateadded") or record.get("project_created"))
+                ))
+        return documents
+    
+    @staticmethod
+    def _lexical_score(words: List[str], content: str, rank: int) -> float:
+        """Share of query words present in the record, decayed by index rank"""
+        content_lower = content.lower()
+        coverage = sum(1 for w in words if w in content_lower) / len(words)
+        return max(0.3, coverage) * (1.0 - min(rank, 9) * 0.03)
+    
+    @staticmethod
+    def _format_record(kind: str, record: Dict[str, Any]) -> str:
+        if kind == "employee":
+            parts = [f"Employee: {record.get('firstname', '')} {record.get('lastname', '')}".strip()]
+            if record.get("email"):
+                parts.append(f"Email: {record['email']}")
+            if record.get("role"):
+                parts.append(f"Role: {record['role']}")
+        elif kind == "project":
+            parts = [f"Project: {record.get('name', '')}"]
+            if record.get("client_name"):
+                parts.append(f"Client: {record['client_name']}")
+            if record.get("progress") is not None:
+                parts.append(f"Progress: {record['progress']}%")
+            if record.get("deadline"):
+                parts.append(f"Deadline: {record['deadline']}")
+            if record.get("description"):
+                parts.append(f"Description: {str(record['description'])[:300]}")
+        else:
+            parts = [f"Task: {record.get('name', '')}"]
+            if record.get("project_name"):
+                parts.append(f"Project: {record['project_name']}")
+            if record.get("status_name"):
+                parts.append(f"Status: {record['status_name']}")
+            if record.get("priority_name"):
+                parts.append(f"Priority: {record['priority_name']}")
+            if record.get("duedate"):
+                parts.append(f"Due: {record['duedate']}")
+            if record.get("description"):
+                parts.append(f"Description: {str(record['description'])[:300]}")
+        return " | ".join(parts)
+
+class ConversationMemoryRetrievalSource:
+    """
+    Conversation-memory retriever over the ``conversations`` ChromaDB collection
+    (written by VectorDatabaseService.store_conversation_context)
+    """
+    
+    def __init__(self, vector_db_service=None):
+        self._vector_db_service = vector_db_service
+        self._init_lock = threading.Lock()
+    
+    def _get_collection(self):
+        if self._vector_db_service is None:
+            with self._init_lock:
+                if self._vector_db_service is None:
+                    from services.vector_service import VectorDatabaseService
+                    self._vector_db_service = VectorDatabaseService()
+        return self._vector_db_service.conversation_collection
+    
+    async def search(
+        self,
+        query_text: Optional[str],
+        query_embedding: Optional[List[float]] = None,
+        filters: Optional[SearchFilter] = None,
+        max_results: int = 10
+    ) -> List[RetrievedDocument]:
+        """Search previous conversations relevant to the query"""
+        return await run_blocking(self._search_sync, query_text, query_embedding, max_results)
+    
+    def _search_sync(
+        self,
+        query_text: Optional[str],
+        query_embedding: Optional[List[float]],
+        max_results: int
+    ) -> List[RetrievedDocument]:
+        collection = self._get_collection()
+        if collection is None:
+            return []
+        
+        include = ["documents", "metadatas", "distances"]
+        results = None
+        if query_embedding:
+            try:
+                # Reuse the pipeline's query vector (no extra embedding request)
+                results = collection.query(query_embeddings=[query_embedding], n_results=max_results, include=include)
+            except Exception as e:
+                logger.debug(f"Memory search by embedding failed, retrying by text: {e}")
+        if results is None:
+            if not query_text:
+                return []
+            results = collection.query(query_texts=[query_text], n_results=max_results, include=include)
+        
+        documents = []
+        if results["ids"] and results["ids"][0]:
+            for i, doc_id in enumerate(results["ids"][0]):
+                metadata = results["metadatas"][0][i] or {}
+                # Collection uses the default squared-L2 space; for unit vectors cos = 1 - d/2
+                score = max(0.0, 1.0 - results["distances"][0][i] / 2.0)
+                documents.append(RetrievedDocument(
+                    id=doc_id,
+                    content=results["documents"][0][i],
+                    source="memory",
+                    score=score,
+                    metadata={"source": "memory", **{k: v for k, v in metadata.items() if v is not None}},
+                    timestamp=_parse_timestamp(metadata.get("timestamp"))
+                ))
+        return documents
+
 class MultiSourceRetrievalService:
     """
     Multi-source retrieval service that combines different data sources
+    
+    Sources are searched concurrently; each has its own timeout, and the search
+    returns early once enough high-score results have arrived.
     """
     
     def __init__(
         self,
         vector_service: BaseRetrievalService,
         crm_service: Optional[Any] = None,
-        memory_service: Optional[Any] = None
+        memory_service: Optional[Any] = None,
+        source_timeouts: Optional[Dict[str, float]] = None,
+        early_return_score: float = EARLY_RETURN_SCORE
     ):
         self.vector_service = vector_service
         self.crm_service = crm_service
         self.memory_service = memory_service
+        self.source_timeouts = {**DEFAULT_SOURCE_TIMEOUTS, **(source_timeouts or {})}
+        self.early_return_score = early_return_score
+        
+        self.source_stats = {
+            name: {"calls": 0, "timeouts": 0, "errors": 0, "cancelled": 0, "total_time": 0.0}
+            for name in ("vector", "crm", "memory")
+        }
+        self.early_returns = 0
         
         logger.info("Multi-source retrieval service initialized")
     
+    @staticmethod
+    def _coerce_filters(filters: Any) -> Optional[SearchFilter]:
+        """Accept SearchFilter or the plain dict carried by RAGQuery.filters"""
+        if filters is None or isinstance(filters, SearchFilter):
+            return filters
+        if isinstance(filters, dict):
+            known = {k: filters[k] for k in ("sources", "date_range", "metadata_filters", "content_length_range") if k in filters}
+            return SearchFilter(**known)
+        return None
+    
+    @staticmethod
+    def _source_enabled(filters: Optional[SearchFilter], name: str) -> bool:
+        return not filters or not filters.sources or name in filters.sources
+    
+    async def _timed_source(self, name: str, coro) -> List[RetrievedDocument]:
+        """Run one source under its timeout, recording latency and failures"""
+        stats = self.source_stats[name]
+        stats["calls"] += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(coro, timeout=self.source_timeouts[name])
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            logger.warning(f"{name} search timed out after {self.source_timeouts[name]}s")
+            return []
+        except asyncio.CancelledError:
+            stats["cancelled"] += 1
+            raise
+        except Exception as e:
+            stats["errors"] += 1
+            logger.error(f"{name.capitalize()} search error: {e}")
+            return []
+        finally:
+            stats["total_time"] += time.perf_counter() - started
+    
     async def search(
         self,
         query_embedding: List[float],
         filters: Optional[SearchFilter] = None,
         max_results: int = 10,
-        min_score: float = 0.0
+        min_score: float = 0.0,
+        query_text: Optional[str] = None
     ) -> List[RetrievedDocument]:
         """
-        Search across all available sources
+        Search across all available sources concurrently
         
         Args:
             query_embedding: Query embedding vector
             filters: Search filters
             max_results: Maximum results to return
             min_score: Minimum similarity score
+            query_text: Original query text (used by the CRM keyword source)
             
         Returns:
             Combined and ranked results from all sources
         """
-        all_results = []
+        filters = self._coerce_filters(filters)
         
         # 1. Vector similarity search (handbook, indexed documents)
-        try:
-            vector_results = await self.vector_service.search(
+        sources = {
+            "vector": self.vector_service.search(
                 query_embedding=query_embedding,
                 filters=filters,
                 max_results=max_results * 2,  # Get more for better ranking
                 min_score=min_score
             )
-            all_results.extend(vector_results)
-            logger.debug(f"Vector search returned {len(vector_results)} results")
-            
-        except Exception as e:
-            logger.error(f"Vector search error: {e}")
+        }
         
         # 2. CRM data search (if available and not filtered out)
-        if (self.crm_service and 
-            (not filters or not filters.sources or 'crm' in filters.sources)):
-            try:
-                crm_results = await self._search_crm_data(query_embedding, filters, max_results)
-                all_results.extend(crm_results)
-                logger.debug(f"CRM search returned {len(crm_results)} results")
-                
-            except Exception as e:
-                logger.error(f"CRM search error: {e}")
+        if self.crm_service and self._source_enabled(filters, "crm"):
+            sources["crm"] = self._search_crm_data(query_embedding, filters, max_results, query_text)
         
         # 3. Memory/conversation search (if available)
-        if (self.memory_service and 
-            (not filters or not filters.sources or 'memory' in filters.sources)):
-            try:
-                memory_results = await self._search_memory_data(query_embedding, filters, max_results)
-                all_results.extend(memory_results)
-                logger.debug(f"Memory search returned {len(memory_results)} results")
+        if self.memory_service and self._source_enabled(filters, "memory"):
+            sources["memory"] = self._search_memory_data(query_embedding, filters, max_results, query_text)
+        
+        tasks = {
+            asyncio.ensure_future(self._timed_source(name, coro)): name
+            for name, coro in sources.items()
+        }
+        
+        all_results = []
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    source_results = task.result()
+                    all_results.extend(source_results)
+                    logger.debug(f"{tasks[task].capitalize()} search returned {len(source_results)} results")
                 
-            except Exception as e:
-                logger.error(f"Memory search error: {e}")
+                # Early return once enough strong matches are in hand
+                strong = sum(1 for r in all_results if r.score >= self.early_return_score)
+                if pending and strong >= max_results:
+                    self.early_returns += 1
+                    logger.debug(
+                        f"Early return with {strong} strong results; skipping "
+                        f"{', '.join(tasks[t] for t in pending)}"
+                    )
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
         
         # 4. Rank and filter combined results
         ranked_results = self._rank_and_filter_results(
@@ -389,29 +704,31 @@ class MultiSourceRetrievalService:
         self,
         query_embedding: List[float],
         filters: Optional[SearchFilter],
-        max_results: int
+        max_results: int,
+        query_text: Optional[str] = None
     ) -> List[RetrievedDocument]:
-        """Search CRM data sources"""
-        # TODO: Implement CRM-specific search logic
-        # This would search CRM projects, tasks, clients, etc.
-        # For now, return empty list
-        
-        logger.debug("CRM data search not yet implemented")
-        return []
+        """Search CRM data sources (projects, tasks, employees)"""
+        return await self.crm_service.search(
+            query_text=query_text,
+            query_embedding=query_embedding,
+            filters=filters,
+            max_results=max_results
+        )
     
     async def _search_memory_data(
         self,
         query_embedding: List[float],
         filters: Optional[SearchFilter],
-        max_results: int
+        max_results: int,
+        query_text: Optional[str] = None
     ) -> List[RetrievedDocument]:
         """Search conversation memory and context"""
-        # TODO: Implement memory-specific search logic
-        # This would search previous conversations, decisions, context
-        # For now, return empty list
-        
-        logger.debug("Memory data search not yet implemented")
-        return []
+        return await self.memory_service.search(
+            query_text=query_text,
+            query_embedding=query_embedding,
+            filters=filters,
+            max_results=max_results
+        )
     
     def _rank_and_filter_results(
         self,
@@ -499,7 +816,11 @@ class MultiSourceRetrievalService:
     
     async def add_handbook_documents(self, documents: List[DocumentIndex]) -> int:
         """Add handbook documents to vector index"""
-        return await self.vector_service.add_documents(documents)
+        added = await self.vector_service.add_documents(documents)
+        # Re-ingested sections get new chunk ids, so drop every answer drawn from the handbook
+        if added:
+            invalidate_source("handbook")
+        return added
     
     async def get_service_stats(self) -> Dict[str, Any]:
         """Get retrieval service statistics"""
@@ -512,7 +833,16 @@ class MultiSourceRetrievalService:
                 "vector_service": bool(self.vector_service),
                 "crm_service": bool(self.crm_service),
                 "memory_service": bool(self.memory_service)
-            }
+            },
+            "source_stats": {
+                name: {
+                    **source_stats,
+                    "avg_time": source_stats["total_time"] / source_stats["calls"] if source_stats["calls"] else 0.0
+                }
+                for name, source_stats in self.source_stats.items()
+            },
+            "source_timeouts": self.source_timeouts,
+            "early_returns": self.early_returns
         }
         
         return stats
@@ -542,7 +872,7 @@ class HandbookDataProcessor:
             if isinstance(section_content, dict):
                 # Process structured sections
                 for subsection, content in section_content.items():
-                    doc_id = f"handbook_{section_name}_{subsection}_{uuid.uuid4().hex[:8]}"
+                    doc_id = f"handbook_{section_name}_{subsection}"
                     
                     # Format content for embedding
                     if isinstance(content, list):
@@ -568,7 +898,7 @@ class HandbookDataProcessor:
             
             elif isinstance(section_content, str):
                 # Process simple text content
-                doc_id = f"handbook_{section_name}_{uuid.uuid4().hex[:8]}"
+                doc_id = f"handbook_{section_name}"
                 
                 document = DocumentIndex(
                     id=doc_id,
@@ -602,12 +932,20 @@ def create_chromadb_retrieval_service(
 def create_multi_source_retrieval_service(
     vector_service: Optional[BaseRetrievalService] = None,
     crm_service: Optional[Any] = None,
-    memory_service: Optional[Any] = None
+    memory_service: Optional[Any] = None,
+    enable_crm: bool = True,
+    enable_memory: bool = True
 ) -> MultiSourceRetrievalService:
-    """Create multi-source retrieval service"""
+    """Create multi-source retrieval service (CRM and memory sources on by default)"""
     if not vector_service:
         vector_service = create_chromadb_retrieval_service()
     
+    if crm_service is None and enable_crm:
+        crm_service = CRMRetrievalSource()
+    
+    if memory_service is None and enable_memory and CHROMADB_AVAILABLE:
+        memory_service = ConversationMemoryRetrievalSource()
+    
     return MultiSourceRetrievalService(
         vector_service=vector_service,
         crm_service=crm_service,
@@ -619,6 +957,8 @@ __all__ = [
     "BaseRetrievalService",
     "ChromaDBRetrievalService", 
     "MultiSourceRetrievalService",
+    "CRMRetrievalSource",
+    "ConversationMemoryRetrievalSource",
     "HandbookDataProcessor",
     "DocumentIndex",
     "SearchFilter",
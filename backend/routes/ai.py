@@ -223,6 +223,20 @@ def clear_employee_cache():
             'error': str(e)
         }), 500
 
+@ai_bp.route('/employee-analysis/cache-stats', methods=['GET'])
+def employee_cache_stats():
+    """Hit/miss/eviction counters of the employee performance cache"""
+    try:
+        return jsonify({
+            'success': True,
+            'cache': employee_analyst.get_cache_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @ai_bp.route('/search/chat', methods=['POST'])
 def search_chat():
     """
@@ -582,6 +582,15 @@ def get_vector_database_stats():
     except Exception as e:
         return jsonify({'error': f'Failed to get stats: {str(e)}'}), 500
 
+@api_bp.route('/database/pool-stats', methods=['GET'])
+def get_crm_pool_stats():
+    """Get checkout, wait-time and failure metrics for the shared CRM connection pools"""
+    try:
+        from core.crm.connection_pool import get_all_pool_stats
+        return jsonify({'pools': get_all_pool_stats()})
+    except Exception as e:
+        return jsonify({'error': f'Failed to get pool stats: {str(e)}'}), 500
+
 # Task 1.1 Completion Endpoints
 @api_bp.route('/database/status', methods=['GET'])
 def get_database_status():
@@ -8,61 +8,49 @@ using direct CRM database queries for accurate results.
 """
 
 from flask import Blueprint, jsonify, request
-import mysql.connector
 from datetime import datetime
-import os
 from dotenv import load_dotenv
+from core.crm.connection_pool import get_crm_connection
+from core.crm.staff_directory import get_staff_directory
+from core.crm.employee_task_rollup import get_employee_task_rollup
 
 load_dotenv()
 
 employee_overdue_api = Blueprint('employee_overdue_api', __name__)
 
 def get_database_connection():
-    """Get direct MySQL database connection"""
+    """Get a pooled MySQL database connection (close() returns it to the pool)"""
     try:
-        connection = mysql.connector.connect(
-            host=os.getenv('DB_HOST', '92.113.22.65'),
-            database=os.getenv('DB_NAME', 'u906714182_sqlrrefdvdv'),
-            user=os.getenv('DB_USER', 'u906714182_sqlrrefdvdv'),
-            password=os.getenv('DB_PASSWORD', '3@6*t:lU'),
-            port=int(os.getenv('DB_PORT', '3306'))
-        )
-        return connection
-    except mysql.connector.Error as e:
+        return get_crm_connection()
+    except Exception as e:
         print(f"❌ Database connection error: {e}")
         return None
 
 def find_employee_id(employee_name):
-    """Find employee ID from staff table"""
-    connection = get_database_connection()
-    if not connection:
-        return None
-    
+    """Find employee ID via the shared in-memory staff directory (no DB round trip)
+    Former (inactive) staff still resolve so their task history stays reachable"""
     try:
-        cursor = connection.cursor(dictionary=True)
-        
-        # Search for employee in staff table
-        search_query = """
-        SELECT staffid, firstname, lastname, CONCAT(firstname, ' ', lastname) as full_name
-        FROM tblstaff 
-        WHERE LOWER(firstname) LIKE %s 
-           OR LOWER(lastname) LIKE %s
-           OR LOWER(CONCAT(firstname, ' ', lastname)) LIKE %s
-        """
-        
-        search_term = f"%{employee_name.lower()}%"
-        cursor.execute(search_query, (search_term, search_term, search_term))
-        results = cursor.fetchall()
-        
-        if results:
-            return results[0]['staffid'], results[0]['full_name']
-        return None, None
-        
+        employee = get_staff_directory().find(employee_name, include_inactive=True)
     except Exception as e:
         print(f"❌ Error finding employee: {e}")
         return None, None
-    finally:
-        connection.close()
+    
+    if employee:
+        return employee['staffid'], employee['full_name']
+    return None, None
+
+def as_date(value):
+    """datetime -> date (DATE columns already come back as date)"""
+    return value.date() if isinstance(value, datetime) else value
+
+def get_task_counts(employee_id):
+    """Per-employee task counters from the maintained rollup (None if unavailable)
+    Only the aggregate summary endpoint uses these; list endpoints count the rows they return"""
+    try:
+        return get_employee_task_rollup().get_summary(employee_id)
+    except Exception as e:
+        print(f"⚠️ Task rollup unavailable: {e}")
+        return None
 
 @employee_overdue_api.route('/api/employee/<employee_name>/overdue-tasks', methods=['GET'])
 def get_employee_overdue_tasks(employee_name):
@@ -346,6 +334,12 @@ def get_employee_completed_tasks(employee_name):
         cursor.execute(stats_query, (employee_id,))
         stats_result = cursor.fetchone()
         
+        # On-time / delay figures from the same rows as the list
+        graded = [(as_date(task['datefinished']), as_date(task['duedate'])) for task in completed_tasks
+                  if task['datefinished'] and task['duedate']]
+        delays = [(finished - due).days for finished, due in graded if finished > due]
+        on_time_count = len(graded) - len(delays)
+        
         # Format completed tasks
         for task in completed_tasks:
             if task['datefinished']:
@@ -385,7 +379,9 @@ def get_employee_completed_tasks(employee_name):
             'stats': {
                 'total_tasks': stats_result['total_tasks'] or 0,
                 'completed_count': len(completed_tasks),
-                'completion_rate': round((len(completed_tasks) / max(stats_result['total_tasks'], 1)) * 100, 1)
+                'completion_rate': round((len(completed_tasks) / max(stats_result['total_tasks'], 1)) * 100, 1),
+                'on_time_rate': round(on_time_count / len(graded) * 100, 1) if graded else 0,
+                'average_delay_days': round(sum(delays) / len(delays), 1) if delays else 0
             },
             'analysis': {
                 'priority_breakdown': priority_breakdown,
@@ -574,6 +570,23 @@ def get_employee_task_summary(employee_name):
             'error': f'Employee "{employee_name}" not found'
         }), 404
     
+    counts = get_task_counts(employee_id)
+    if counts is not None:
+        return jsonify({
+            'success': True,
+            'employee_name': full_name,
+            'employee_id': employee_id,
+            'summary': {
+                'total_tasks': counts['total_tasks'],
+                'completed_tasks': counts['completed_tasks'],
+                'overdue_tasks': counts['overdue_tasks'],
+                'upcoming_tasks': counts['upcoming_tasks'],
+                'completion_rate': counts['completion_rate'],
+                'on_time_rate': counts['on_time_rate'],
+                'average_delay_days': counts['average_delay_days']
+            }
+        })
+    
     connection = get_database_connection()
     if not connection:
         return jsonify({
@@ -590,7 +603,13 @@ def get_employee_task_summary(employee_name):
             COUNT(*) as total_tasks,
             SUM(CASE WHEN t.status = 5 THEN 1 ELSE 0 END) as completed_tasks,
             SUM(CASE WHEN t.status != 5 AND t.duedate IS NOT NULL AND t.duedate < CURDATE() THEN 1 ELSE 0 END) as overdue_tasks,
-            SUM(CASE WHEN t.status != 5 AND t.duedate IS NOT NULL AND t.duedate >= CURDATE() THEN 1 ELSE 0 END) as upcoming_tasks
+            SUM(CASE WHEN t.status != 5 AND t.duedate IS NOT NULL AND t.duedate >= CURDATE() THEN 1 ELSE 0 END) as upcoming_tasks,
+            SUM(CASE WHEN t.status = 5 AND t.datefinished IS NOT NULL AND t.duedate IS NOT NULL
+                     AND DATE(t.datefinished) <= t.duedate THEN 1 ELSE 0 END) as on_time_tasks,
+            SUM(CASE WHEN t.status = 5 AND t.datefinished IS NOT NULL AND t.duedate IS NOT NULL
+                     AND DATE(t.datefinished) > t.duedate THEN 1 ELSE 0 END) as late_tasks,
+            SUM(CASE WHEN t.status = 5 AND t.datefinished IS NOT NULL AND t.duedate IS NOT NULL
+                     AND DATE(t.datefinished) > t.duedate THEN DATEDIFF(t.datefinished, t.duedate) ELSE 0 END) as delay_days
         FROM tbltasks t
         INNER JOIN tbltask_assigned ta ON t.id = ta.taskid
         WHERE ta.staffid = %s
@@ -603,6 +622,13 @@ def get_employee_task_summary(employee_name):
         if result['total_tasks'] > 0:
             completion_rate = round((result['completed_tasks'] / result['total_tasks']) * 100, 1)
         
+        # Same on-time / delay definitions as the task rollup
+        on_time_tasks = int(result['on_time_tasks'] or 0)
+        late_tasks = int(result['late_tasks'] or 0)
+        graded = on_time_tasks + late_tasks
+        on_time_rate = round(on_time_tasks / graded * 100, 1) if graded else 0
+        average_delay_days = round(int(result['delay_days'] or 0) / late_tasks, 1) if late_tasks else 0
+        
         return jsonify({
             'success': True,
             'employee_name': full_name,
@@ -612,7 +638,9 @@ def get_employee_task_summary(employee_name):
                 'completed_tasks': result['completed_tasks'] or 0,
                 'overdue_tasks': result['overdue_tasks'] or 0,
                 'upcoming_tasks': result['upcoming_tasks'] or 0,
-                'completion_rate': completion_rate
+                'completion_rate': completion_rate,
+                'on_time_rate': on_time_rate,
+                'average_delay_days': average_delay_days
             }
         })
         
@@ -622,4 +650,12 @@ def get_employee_task_summary(employee_name):
             'error': f'Summary query failed: {str(e)}'
         }), 500
     finally:
-        connection.close()
\ No newline at end of file
+        connection.close()
+
+@employee_overdue_api.route('/api/employee-task-rollup/stats', methods=['GET'])
+def get_task_rollup_stats():
+    """Load / refresh counters of the per-employee task rollup"""
+    return jsonify({
+        'success': True,
+        'stats': get_employee_task_rollup().get_stats()
+    })
\ No newline at end of file
@@ -61,7 +61,8 @@ class HandbookDataResponse(BaseModel):
     processed_sections: int
     indexed_documents: int
     total_documents: int
-    processing_time: str
+    processing_time: float
+    embedding_stats: Optional[Dict[str, Any]] = None
 
 class RAGStatusResponse(BaseModel):
     """RAG system status response"""
@@ -216,7 +217,8 @@ async def process_handbook_data(
             processed_sections=result["processed_sections"],
             indexed_documents=result["indexed_documents"],
             total_documents=result["total_documents"],
-            processing_time=result["processing_time"]
+            processing_time=result["processing_time"],
+            embedding_stats=result.get("embedding_stats")
         )
         
         logger.info(
@@ -5,7 +5,6 @@ Handles bidirectional data synchronization for Task 1.1 completion
 """
 
 import os
-import mysql.connector
 from datetime import datetime, timedelta
 import json
 import logging
@@ -13,6 +12,7 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 from flask_sqlalchemy import SQLAlchemy
 from models.models import db, Task, Project, Comment, User, Notification, Employee
+from core.crm.connection_pool import get_crm_connection
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -37,16 +37,16 @@ class CRMSyncService:
         self.last_sync = {}  # Track last sync timestamps
         
     def get_crm_connection(self):
-        """Get connection to CRM MySQL database"""
+        """Get a pooled connection to the CRM MySQL database"""
         try:
-            return mysql.connector.connect(
-                host=self.config.host,
-                user=self.config.user,
-                password=self.config.password,
-                database=self.config.database,
-                port=self.config.port,
-                autocommit=True
-            )
+            return get_crm_connection({
+                'host': self.config.host,
+                'user': self.config.user,
+                'password': self.config.password,
+                'database': self.config.database,
+                'port': self.config.port,
+                'autocommit': True
+            })
         except Exception as e:
             logger.error(f"Failed to connect to CRM database: {e}")
             raise
@@ -8,13 +8,60 @@ about employee performance and provide detailed insights and recommendations.
 import os
 import json
 import re
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 import openai
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
 from models.models import db, Task, Project
 from .enhanced_task_analysis_service import EnhancedTaskAnalysisService
+from core.crm.connection_pool import get_crm_connection
+from core.crm.staff_directory import get_staff_directory
+from core.crm.employee_cache import get_employee_data_cache
+from utils.intent_classifier import get_intent_classifier
+from utils.analysis_cache import get_analysis_cache
+
+# Bump when the analyze_query_with_ai prompt changes so cached analyses are dropped
+QUERY_ANALYSIS_PROMPT_VERSION = '1'
+
+# Dual-perspective queries run their task and employee branches concurrently under one deadline
+DUAL_PERSPECTIVE_WORKERS = int(os.getenv('DUAL_PERSPECTIVE_WORKERS', '4'))
+DUAL_PERSPECTIVE_TIMEOUT_SECONDS = float(os.getenv('DUAL_PERSPECTIVE_TIMEOUT_SECONDS', '30'))
+
+_dual_perspective_executor = None
+_dual_perspective_executor_lock = threading.Lock()
+# One slot per worker, held until the branch finishes (including branches past their deadline)
+_dual_perspective_slots = threading.BoundedSemaphore(max(1, DUAL_PERSPECTIVE_WORKERS))
+
+def get_dual_perspective_executor() -> ThreadPoolExecutor:
+    """Shared bounded executor for dual-perspective analysis branches"""
+    global _dual_perspective_executor
+    if _dual_perspective_executor is None:
+        with _dual_perspective_executor_lock:
+            if _dual_perspective_executor is None:
+                _dual_perspective_executor = ThreadPoolExecutor(
+                    max_workers=max(1, DUAL_PERSPECTIVE_WORKERS),
+                    thread_name_prefix="dual-perspective"
+                )
+    return _dual_perspective_executor
+
+def try_start_dual_perspective_branch(func, *args) -> Optional[Future]:
+    """
+    Submit a branch only if a worker is free right now; None means the caller runs it inline
+    Never queues, so the shared deadline only ever covers running branches.
+    """
+    if not _dual_perspective_slots.acquire(blocking=False):
+        return None
+    try:
+        future = get_dual_perspective_executor().submit(func, *args)
+    except Exception:
+        _dual_perspective_slots.release()
+        raise
+    future.add_done_callback(lambda _: _dual_perspective_slots.release())
+    return future
 
 # Import the text preprocessor for better name detection
 try:
@@ -76,22 +123,28 @@ class EmployeeAnalystService:
             self.text_preprocessor = None
             print("⚠️ Text preprocessor not available")
         
-        # In-memory cache for employee performance data
-        self.employee_cache = {}
-        # Cache expiry time (5 minutes)
-        self.cache_expiry_minutes = 5
-        self.cache_expiry = {}
+        # Shared LRU/TTL cache for performance data and task lists, invalidated on CRM task changes
+        self.employee_cache = get_employee_data_cache()
+        
+        # Local intent classifier; OpenAI query analysis only runs when it isn't confident
+        self.intent_classifier = get_intent_classifier('employee_analyst')
+        self.analysis_cache = get_analysis_cache()
         self.cache_duration = 300  # 5 minutes
         
         # Conversation memory for intelligent context
         self.conversation_memory = {}
         self.session_contexts = {}
+        self._memory_lock = threading.Lock()  # dual-perspective branches update memory concurrently
         self.max_conversation_history = 10
     
+    def _get_crm_connection(self):
+        """Check out a pooled CRM connection (default CRM settings, read at first checkout); close() returns it to the pool"""
+        return get_crm_connection()
+    
     def analyze_query_with_ai(self, user_query: str, session_id: str = "default") -> QueryAnalysis:
         """Use OpenAI to analyze user query and extract employee information with conversation memory"""
         if not self.openai_available:
-            return self._fallback_query_analysis(user_query, session_id)
+            return self._fallback_query_analysis(user_query)
         
         # Check for greetings FIRST before any processing or context building
         print(f"🔍 Checking '{user_query}' for greeting in analyze_query_with_ai...")
@@ -121,6 +174,25 @@ class EmployeeAnalystService:
         # Get conversation context
         context = self.get_conversation_context(session_id)
         
+        # Without conversation context the analysis depends only on the query, so it can be
+        # answered locally (when the classifier's similarity confirms the rules) or shared
+        prediction = None
+        if not context:
+            local_analysis = self._fallback_query_analysis(user_query)
+            prediction = self.intent_classifier.classify(
+                preprocessed_query, rule_intent=local_analysis.query_type, rule_confidence=local_analysis.confidence
+            )
+            if (prediction.confident and prediction.intent == local_analysis.query_type and
+                    (not local_analysis.employee_name or get_staff_directory().find(local_analysis.employee_name))):
+                print(f"⚡ Local intent classifier: {prediction.intent} ({prediction.confidence:.2f}, {prediction.method})")
+                local_analysis.confidence = round(prediction.confidence, 3)
+                return local_analysis
+            
+            cached_analysis = self.analysis_cache.get('employee_analyst', preprocessed_query, QUERY_ANALYSIS_PROMPT_VERSION)
+            if cached_analysis is not None:
+                print(f"♻️ Cached query analysis: {cached_analysis.get('query_type')}")
+                return QueryAnalysis(**cached_analysis)
+        
         try:
             prompt = f"""
 You are an expert AI analyst for employee performance and productivity systems. Analyze user queries about employee activities, tasks, time tracking, productivity, and behavior patterns.
@@ -225,8 +297,10 @@ Examples:
                 if json_start != -1 and json_end > json_start:
                     json_text = response_text[json_start:json_end]
                     analysis_data = json.loads(json_text)
+                    if prediction is not None:  # context-free answers only
+                        self.intent_classifier.learn(preprocessed_query, analysis_data.get('query_type'), prediction)
                     
-                    return QueryAnalysis(
+                    analysis = QueryAnalysis(
                         is_employee_query=analysis_data.get('is_employee_query', False),
                         employee_name=analysis_data.get('employee_name'),
                         intent=analysis_data.get('intent', 'unknown'),
@@ -234,6 +308,9 @@ Examples:
                         query_type=analysis_data.get('query_type', 'general'),
                         additional_context=analysis_data.get('additional_context', {})
                     )
+                    if not context:
+                        self.analysis_cache.put('employee_analyst', preprocessed_query, QUERY_ANALYSIS_PROMPT_VERSION, asdict(analysis))
+                    return analysis
                 else:
                     raise ValueError("No JSON found in response")
                     
@@ -402,21 +479,8 @@ Examples:
         
         # Get dynamic Turkish names from CRM database
         try:
-            from core.crm.real_crm_server import get_all_employees
-            employees = get_all_employees()
-            known_employees = set()
-            
-            if employees:
-                for emp in employees:
-                    if emp.get('firstname'):
-                        known_employees.add(self._normalize_turkish(emp['firstname']).lower())
-                    if emp.get('lastname'):
-                        known_employees.add(self._normalize_turkish(emp['lastname']).lower())
-                    # Also add original names with Turkish characters
-                    if emp.get('firstname'):
-                        known_employees.add(emp['firstname'].lower())
-                    if emp.get('lastname'):
-                        known_employees.add(emp['lastname'].lower())
+            # Normalized name tokens are precomputed by the shared staff directory
+            known_employees = get_staff_directory().known_name_tokens()
         except Exception as e:
             print(f"Warning: Could not fetch employee names from CRM: {e}")
             # Fallback to known names including Turkish names
@@ -486,6 +550,12 @@ Examples:
     
     def get_employee_tasks(self, employee_name: str) -> Dict[str, Any]:
         """Fetch comprehensive task data for an employee from the CRM database"""
+        cache_key = self._cache_key(employee_name)
+        cached = self.employee_cache.get('crm_tasks', cache_key)
+        if cached is not None:
+            print(f"Using cached task data for {employee_name}")
+            return cached
+        
         try:
             # Import CRM functions
             from core.crm.real_crm_server import find_employee_by_name, get_database_connection
@@ -661,7 +731,7 @@ Examples:
                 print(f"  - Overdue: {overdue_tasks}")
                 print(f"  - Completion Rate: {completion_rate}%")
                 
-                return {
+                result = {
                     'employee_name': employee['full_name'],
                     'total_tasks': total_tasks,
                     'completed_tasks': completed_tasks,
@@ -672,6 +742,9 @@ Examples:
                     'tasks': task_list,
                     'success': True
                 }
+                self.employee_cache.put('crm_tasks', cache_key, result, staffid=employee_id,
+                                        ttl_seconds=self.cache_duration)
+                return result
                 
             except Exception as db_error:
                 print(f"❌ Database query error: {db_error}")
@@ -716,35 +789,28 @@ Examples:
             print(f"🔗 Fetching tasks for {employee_name} using corrected API endpoints")
             
             # Determine if we should filter to specific task types based on query
-            filter_overdue_only = False
-            filter_current_only = False
-            
-            if query_analysis:
-                intent = query_analysis.intent.lower()
-                query_type = query_analysis.query_type.lower()
-                data_focus = query_analysis.additional_context.get('data_focus', 'all')
+            filter_type = self._task_filter_type(query_analysis)
+            filter_overdue_only = filter_type == 'overdue_only'
+            filter_current_only = filter_type == 'current_only'
+            
+            cache_key = self._cache_key(employee_name)
+            cached_lists = self.employee_cache.get('api_tasks', cache_key)
+            if cached_lists is not None:
+                print(f"Using cached task lists for {employee_name}")
+                current_data, overdue_data = cached_lists
+            else:
+                # Get current tasks using our fixed endpoint
+                current_response = requests.get(f"{base_url}/tasks/employee/{employee_name}/current")
+                current_data = current_response.json()
                 
-                # Check if user specifically asked for overdue tasks only
-                if ('overdue' in intent or 'late' in intent or 
-                    query_type == 'overdue_focus' or 
-                    data_focus == 'overdue'):
-                    filter_overdue_only = True
-                    print(f"🎯 Filtering to show ONLY overdue tasks based on query: {query_type}, data_focus: {data_focus}")
-                elif ('current' in intent or 'active' in intent or 
-                      query_type in ['current_focus', 'task_overview'] or 
-                      data_focus == 'current'):
-                    filter_current_only = True
-                    print(f"🎯 Filtering to show ONLY current tasks based on query: {query_type}, data_focus: {data_focus}")
-                else:
-                    print(f"📊 Showing all tasks for query type: {query_type}, data_focus: {data_focus}")
-            
-            # Get current tasks using our fixed endpoint
-            current_response = requests.get(f"{base_url}/tasks/employee/{employee_name}/current")
-            current_data = current_response.json()
-            
-            # Get overdue tasks using our fixed endpoint  
-            overdue_response = requests.get(f"{base_url}/tasks/employee/{employee_name}/overdue")
-            overdue_data = overdue_response.json()
+                # Get overdue tasks using our fixed endpoint  
+                overdue_response = requests.get(f"{base_url}/tasks/employee/{employee_name}/overdue")
+                overdue_data = overdue_response.json()
+                
+                if current_data.get('success') and overdue_data.get('success'):
+                    self.employee_cache.put('api_tasks', cache_key, (current_data, overdue_data),
+                                            staffid=self._staffid_for(employee_name),
+                                            ttl_seconds=self.cache_duration)
             
             if not current_data.get('success') or not overdue_data.get('success'):
                 return {
@@ -820,6 +886,29 @@ Examples:
                 'tasks': []
             }
     
+    def _task_filter_type(self, query_analysis: QueryAnalysis = None) -> str:
+        """Which task lists a query asks for: 'overdue_only', 'current_only' or 'all'"""
+        if not query_analysis:
+            return 'all'
+        
+        intent = query_analysis.intent.lower()
+        query_type = query_analysis.query_type.lower()
+        data_focus = query_analysis.additional_context.get('data_focus', 'all')
+        
+        # Check if user specifically asked for overdue tasks only
+        if ('overdue' in intent or 'late' in intent or 
+            query_type == 'overdue_focus' or 
+            data_focus == 'overdue'):
+            print(f"🎯 Filtering to show ONLY overdue tasks based on query: {query_type}, data_focus: {data_focus}")
+            return 'overdue_only'
+        if ('current' in intent or 'active' in intent or 
+              query_type in ['current_focus', 'task_overview'] or 
+              data_focus == 'current'):
+            print(f"🎯 Filtering to show ONLY current tasks based on query: {query_type}, data_focus: {data_focus}")
+            return 'current_only'
+        print(f"📊 Showing all tasks for query type: {query_type}, data_focus: {data_focus}")
+        return 'all'
+    
     def _map_task_status(self, status_id: int) -> str:
         """Map CRM task status ID to readable status"""
         # CRM task status mapping based on typical Perfex CRM values
@@ -945,14 +1034,7 @@ Examples:
         avg_duration = sum(task_durations) / len(task_durations) if task_durations else None
         
         # Determine trend
-        if completion_rate >= 80:
-            trend = "Excellent"
-        elif completion_rate >= 60:
-            trend = "Good"
-        elif completion_rate >= 40:
-            trend = "Average"
-        else:
-            trend = "Needs Improvement"
+        trend = self._performance_trend(completion_rate)
         
         return EmployeePerformance(
             employee_name=employee_name or "Unknown Employee",
@@ -966,10 +1048,19 @@ Examples:
             performance_trend=trend
         )
     
+    def _performance_trend(self, completion_rate: float) -> str:
+        if completion_rate >= 80:
+            return "Excellent"
+        elif completion_rate >= 60:
+            return "Good"
+        elif completion_rate >= 40:
+            return "Average"
+        return "Needs Improvement"
+    
     def generate_ai_analysis(self, performance: EmployeePerformance, query: str, query_analysis: Optional[QueryAnalysis] = None) -> str:
         """Generate intelligent AI analysis using OpenAI with enhanced context understanding"""
         if not self.api_key:
-            return self._generate_fallback_analysis(performance, query_analysis)
+            return self._generate_performance_fallback_analysis(performance, query_analysis)
         
         try:
             context_info = ""
@@ -1035,9 +1126,9 @@ Be insightful, constructive, and human-like. Think like an experienced HR manage
             
         except Exception as e:
             print(f"OpenAI analysis failed: {e}")
-            return self._generate_fallback_analysis(performance, query_analysis)
+            return self._generate_performance_fallback_analysis(performance, query_analysis)
     
-    def _generate_fallback_analysis(self, performance: EmployeePerformance, query_analysis: Optional[QueryAnalysis] = None) -> str:
+    def _generate_performance_fallback_analysis(self, performance: EmployeePerformance, query_analysis: Optional[QueryAnalysis] = None) -> str:
         """Generate enhanced fallback analysis when OpenAI is not available"""
         
         if performance.completion_rate >= 90:
@@ -1120,32 +1211,36 @@ Detailed Analysis:
         
         return analysis
     
-    def get_cached_performance(self, employee_name: str) -> Optional[EmployeePerformance]:
-        """Get cached performance data if still valid"""
-        cache_key = employee_name.lower().strip()
-        
-        if cache_key in self.employee_cache:
-            if datetime.now().timestamp() < self.cache_expiry.get(cache_key, 0):
-                return self.employee_cache[cache_key]
-            else:
-                del self.employee_cache[cache_key]
-                if cache_key in self.cache_expiry:
-                    del self.cache_expiry[cache_key]
-        
-        return None
+    def _cache_key(self, employee_name: str) -> str:
+        return employee_name.lower().strip()
     
-    def cache_performance(self, employee_name: str, performance: EmployeePerformance):
-        """Cache performance data"""
-        cache_key = employee_name.lower().strip()
-        self.employee_cache[cache_key] = performance
-        self.cache_expiry[cache_key] = datetime.now().timestamp() + self.cache_duration
+    def _staffid_for(self, employee_name: str) -> Optional[int]:
+        """Staff id used to tag cache entries so CRM task changes invalidate them"""
+        try:
+            employee = get_staff_directory().find(employee_name)
+            return employee['staffid'] if employee else None
+        except Exception as e:
+            print(f"⚠️ Staff lookup for cache tagging failed: {e}")
+            return None
+    
+    def get_cached_performance(self, employee_name: str) -> Optional[Dict[str, Any]]:
+        """Cached {performance_data, tasks} of an unfiltered analysis, if still valid"""
+        return self.employee_cache.get('performance', self._cache_key(employee_name))
+    
+    def cache_performance(self, employee_name: str, performance: Dict[str, Any]):
+        """Cache the performance data and task list an unfiltered analysis is built from"""
+        self.employee_cache.put('performance', self._cache_key(employee_name), performance,
+                                staffid=self._staffid_for(employee_name), ttl_seconds=self.cache_duration)
     
     def clear_cache(self):
         """Clear the performance cache"""
         self.employee_cache.clear()
-        self.cache_expiry.clear()
         print("Performance cache cleared")
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the employee data cache"""
+        return self.employee_cache.get_stats()
+    
     def analyze_employee(self, employee_name: str, query: str, session_id: str = "default") -> Dict[str, Any]:
         """
         Main method to analyze employee performance with intelligent NLP processing and conversation memory
@@ -1254,55 +1349,56 @@ Detailed Analysis:
             
             print(f"Analyzing performance for: {target_employee}")
             
-            # Step 3: Check cache first
-            cached_performance = self.get_cached_performance(target_employee)
-            if cached_performance:
+            # Step 3: Check cache first (cached data covers the unfiltered task set only)
+            cached = None
+            if self._task_filter_type(query_analysis) == 'all':
+                cached = self.get_cached_performance(target_employee)
+            if cached:
                 print("Using cached performance data")
-                analysis = self.generate_ai_analysis(cached_performance, query, query_analysis)
-                return {
-                    'success': True,
-                    'employee': target_employee,
-                    'analysis': analysis,
-                    'performance_data': cached_performance.__dict__,
-                    'query_analysis': query_analysis.__dict__,
-                    'cached': True
-                }
-            
-            # Step 4: Fetch fresh data from corrected API endpoints with query-specific filtering
-            task_data = self.get_employee_tasks_from_api(target_employee, query_analysis)
-            
-            if not task_data['success']:
-                return {
-                    'success': False,
-                    'error': f"Failed to fetch tasks for {target_employee}: {task_data['error']}",
-                    'query_analysis': query_analysis.__dict__
-                }
-            
-            if task_data['total_tasks'] == 0:
-                return {
-                    'success': False,
-                    'error': f"No tasks found for employee '{target_employee}'. Please check the spelling or try a different name.",
-                    'suggestions': [
-                        'Check if the name is spelled correctly',
-                        'Try using just the first name',
-                        'Make sure the employee has tasks assigned in the system'
-                    ],
-                    'query_analysis': query_analysis.__dict__
+                performance_data, tasks = dict(cached['performance_data']), cached['tasks']
+            else:
+                # Step 4: Fetch fresh data from corrected API endpoints with query-specific filtering
+                task_data = self.get_employee_tasks_from_api(target_employee, query_analysis)
+                
+                if not task_data['success']:
+                    return {
+                        'success': False,
+                        'error': f"Failed to fetch tasks for {target_employee}: {task_data['error']}",
+                        'query_analysis': query_analysis.__dict__
+                    }
+                
+                if task_data['total_tasks'] == 0:
+                    return {
+                        'success': False,
+                        'error': f"No tasks found for employee '{target_employee}'. Please check the spelling or try a different name.",
+                        'suggestions': [
+                            'Check if the name is spelled correctly',
+                            'Try using just the first name',
+                            'Make sure the employee has tasks assigned in the system'
+                        ],
+                        'query_analysis': query_analysis.__dict__
+                    }
+                
+                # Step 5: Analyze performance metrics  
+                performance_data = {
+                    'employee_name': task_data['employee_name'],
+                    'total_tasks': task_data['total_tasks'],
+                    'completed_tasks': task_data['completed_tasks'],
+                    'in_progress_tasks': task_data['in_progress_tasks'],
+                    'overdue_tasks': task_data['overdue_tasks'],
+                    'completion_rate': task_data['completion_rate'],
+                    'avg_task_duration': task_data['avg_task_duration']
                 }
+                tasks = task_data['tasks']
+                
+                if task_data.get('filter_type') == 'all':
+                    self.cache_performance(target_employee, {
+                        'performance_data': dict(performance_data),
+                        'tasks': tasks
+                    })
             
-            # Step 5: Analyze performance metrics  
-            performance_data = {
-                'employee_name': task_data['employee_name'],
-                'total_tasks': task_data['total_tasks'],
-                'completed_tasks': task_data['completed_tasks'],
-                'in_progress_tasks': task_data['in_progress_tasks'],
-                'overdue_tasks': task_data['overdue_tasks'],
-                'completion_rate': task_data['completion_rate'],
-                'avg_task_duration': task_data['avg_task_duration']
-            }
-            
-            # Step 6: Generate intelligent AI analysis based on query context
-            analysis = self.generate_ai_analysis_from_data(performance_data, task_data['tasks'], query, query_analysis)
+            # Step 6: Generate intelligent AI analysis based on query context (same path for cache hits)
+            analysis = self.generate_ai_analysis_from_data(performance_data, tasks, query, query_analysis)
             
             print(f"Analysis complete for {target_employee}")
             
@@ -1313,7 +1409,7 @@ Detailed Analysis:
                 'analysis': analysis,
                 'performance_data': performance_data,
                 'query_analysis': query_analysis.__dict__,
-                'cached': False
+                'cached': cached is not None
             }
             
             # Update conversation memory
@@ -1474,19 +1570,20 @@ Detailed Analysis:
     
     def update_conversation_memory(self, session_id: str, user_query: str, ai_response: str):
         """Update conversation memory for a session"""
-        if session_id not in self.session_contexts:
-            self.session_contexts[session_id] = []
-        
-        # Add new conversation turn
-        self.session_contexts[session_id].append({
-            'timestamp': datetime.now().isoformat(),
-            'user_query': user_query,
-            'ai_response': ai_response
-        })
-        
-        # Keep only recent conversations
-        if len(self.session_contexts[session_id]) > self.max_conversation_history:
-            self.session_contexts[session_id] = self.session_contexts[session_id][-self.max_conversation_history:]
+        with self._memory_lock:
+            if session_id not in self.session_contexts:
+                self.session_contexts[session_id] = []
+            
+            # Add new conversation turn
+            self.session_contexts[session_id].append({
+                'timestamp': datetime.now().isoformat(),
+                'user_query': user_query,
+                'ai_response': ai_response
+            })
+            
+            # Keep only recent conversations
+            if len(self.session_contexts[session_id]) > self.max_conversation_history:
+                self.session_contexts[session_id] = self.session_contexts[session_id][-self.max_conversation_history:]
     
     def build_conversation_prompt(self, session_id: str, current_query: str) -> str:
         """Build a prompt that includes conversation history"""
@@ -1784,17 +1881,7 @@ Examples of good responses:
             print(f"🎯 Handling specific task assignment for: '{task_name}'")
             
             # Connect to database
-            import mysql.connector
-            import os
-            from dotenv import load_dotenv
-            load_dotenv()
-            
-            connection = mysql.connector.connect(
-                host='92.113.22.65',
-                user='u906714182_sqlrrefdvdv',
-                password=os.getenv('DB_PASSWORD', '3@6*t:lU'),
-                database='u906714182_sqlrrefdvdv'
-            )
+            connection = self._get_crm_connection()
             cursor = connection.cursor(dictionary=True)
             
             # Query to get task details with who created it
@@ -2005,17 +2092,7 @@ Examples of good responses:
         """🔒 Safely execute SQL query with proper error handling"""
         try:
             # Connect to database
-            import mysql.connector
-            import os
-            from dotenv import load_dotenv
-            load_dotenv()
-            
-            connection = mysql.connector.connect(
-                host='92.113.22.65',
-                user='u906714182_sqlrrefdvdv',
-                password=os.getenv('DB_PASSWORD', '3@6*t:lU'),
-                database='u906714182_sqlrrefdvdv'
-            )
+            connection = self._get_crm_connection()
             cursor = connection.cursor(dictionary=True)
             
             # Execute the query
@@ -2243,17 +2320,7 @@ Examples of good responses:
             print(f"🔄 Using fallback query handler for: '{query}'")
             
             # Connect to database
-            import mysql.connector
-            import os
-            from dotenv import load_dotenv
-            load_dotenv()
-            
-            connection = mysql.connector.connect(
-                host='92.113.22.65',
-                user='u906714182_sqlrrefdvdv',
-                password=os.getenv('DB_PASSWORD', '3@6*t:lU'),
-                database='u906714182_sqlrrefdvdv'
-            )
+            connection = self._get_crm_connection()
             cursor = connection.cursor(dictionary=True)
             
             # Basic task statistics
@@ -2312,24 +2379,77 @@ Examples of good responses:
         """
         try:
             print(f"🔄 Starting DUAL PERSPECTIVE analysis for: '{query}'")
+            started = time.perf_counter()
             
-            # 📊 STEP 1: Get task-based analysis
-            print(f"📋 PHASE 1: Task-based analysis...")
-            task_analysis = self._handle_general_task_query(query, session_id)
-            
-            # 👤 STEP 2: Get employee-based analysis  
-            print(f"👤 PHASE 2: Employee-based analysis...")
-            employee_analysis = self._get_employee_focused_analysis(query, query_analysis, session_id)
+            # 📊👤 STEP 1+2: Task-based and employee-based analysis run concurrently
+            print(f"📋👤 PHASE 1+2: Task-based and employee-based analysis in parallel...")
+            branch_specs = {
+                'task_perspective': ('Task', self._handle_general_task_query, (query, session_id)),
+                'employee_perspective': ('Employee', self._get_employee_focused_analysis, (query, query_analysis, session_id))
+            }
+            deadline = time.perf_counter() + DUAL_PERSPECTIVE_TIMEOUT_SECONDS
+            branches, inline = {}, []
+            for name, (title, analysis_func, args) in branch_specs.items():
+                future = try_start_dual_perspective_branch(self._run_perspective_branch, title, analysis_func, *args)
+                if future is None:
+                    inline.append(name)
+                else:
+                    branches[name] = future
+            # Pool busy (e.g. with branches past their deadline): degrade to the request thread
+            for name in inline:
+                title, analysis_func, args = branch_specs[name]
+                print(f"⚠️ No free dual-perspective worker, running {title.lower()} analysis inline")
+                branches[name] = Future()
+                branches[name].set_result(self._run_perspective_branch(title, analysis_func, *args))
+            wait(list(branches.values()), timeout=max(0.0, deadline - time.perf_counter()))
+            
+            # Whatever missed the shared deadline comes back as a failed (partial) perspective
+            results, timings, timed_out = {}, {}, []
+            for name, future in branches.items():
+                if future.done():
+                    results[name], timings[name] = future.result()
+                else:
+                    timed_out.append(name)
+                    title = name.split('_')[0].capitalize()
+                    print(f"⏱️ {title} analysis missed the {DUAL_PERSPECTIVE_TIMEOUT_SECONDS:g}s deadline")
+                    results[name] = {
+                        'success': False,
+                        'error': f'{title} analysis timed out after {DUAL_PERSPECTIVE_TIMEOUT_SECONDS:g}s',
+                        'timed_out': True
+                    }
+                    timings[name] = {
+                        'status': 'timed_out',
+                        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+                    }
+            task_analysis = results['task_perspective']
+            employee_analysis = results['employee_perspective']
             
             # 🔍 STEP 3: Cross-verification and deep search
             print(f"🔍 PHASE 3: Cross-verification and deep search...")
+            verification_started = time.perf_counter()
             verification_results = self._cross_verify_results(task_analysis, employee_analysis, query)
+            timings['verification'] = {
+                'status': 'ok',
+                'elapsed_ms': round((time.perf_counter() - verification_started) * 1000, 1)
+            }
             
             # 🎯 STEP 4: Combine and enhance results
             combined_analysis = self._combine_dual_analysis(
                 query, task_analysis, employee_analysis, verification_results, session_id
             )
             
+            combined_analysis['metadata'] = {
+                'timings': timings,
+                'total_ms': round((time.perf_counter() - started) * 1000, 1),
+                'deadline_seconds': DUAL_PERSPECTIVE_TIMEOUT_SECONDS,
+                'timed_out': timed_out,
+                'ran_inline': inline,
+                'partial': bool(timed_out)
+            }
+            print(f"⏱️ Dual perspective timings: " + ", ".join(
+                f"{name}={timing['elapsed_ms']}ms ({timing['status']})" for name, timing in timings.items()
+            ))
+            
             return combined_analysis
             
         except Exception as e:
@@ -2344,6 +2464,23 @@ Examples of good responses:
                 ]
             }
 
+    def _run_perspective_branch(self, title: str, analysis_func, *args) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Run one dual-perspective branch (pooled or inline); returns (result, timing)"""
+        started = time.perf_counter()
+        try:
+            result = analysis_func(*args)
+        except Exception as e:
+            print(f"❌ {title} analysis error: {e}")
+            result = {
+                'success': False,
+                'error': f'{title} analysis failed: {str(e)}'
+            }
+        timing = {
+            'status': 'ok' if result.get('success') else 'failed',
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+        return result, timing
+
     def _get_employee_focused_analysis(self, query: str, query_analysis, session_id: str) -> Dict[str, Any]:
         """Get employee-focused analysis for dual perspective processing"""
         try:
@@ -2576,17 +2713,7 @@ Examples of good responses:
             print(f"👤 Analyzing specific employee: {employee_name}")
             
             # Connect to database (using correct production database)
-            import mysql.connector
-            import os
-            from dotenv import load_dotenv
-            load_dotenv()
-            
-            connection = mysql.connector.connect(
-                host='92.113.22.65',
-                user='u906714182_sqlrrefdvdv',
-                password=os.getenv('DB_PASSWORD', '3@6*t:lU'),
-                database='u906714182_sqlrrefdvdv'
-            )
+            connection = self._get_crm_connection()
             cursor = connection.cursor(dictionary=True)
             
             # Get employee tasks with date filtering if specified
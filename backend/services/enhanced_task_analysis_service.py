@@ -9,18 +9,24 @@ import sys
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 import json
-import mysql.connector
 from dotenv import load_dotenv
 
 from .nlp_intent_detector import NLPIntentDetector, TaskIntent
 from .vector_database_service_simple import TaskVectorDatabase
+from .task_filter_compiler import compile_task_filters, TASK_STATUS_NAMES, TASK_PRIORITY_NAMES
 
 # Add parent directory to path for utils import
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.status_mapper import TaskStatusMapper
+from core.crm.staff_directory import get_staff_directory
+from core.crm.employee_task_rollup import get_employee_task_rollup
+from core.crm.connection_pool import get_crm_connection
 
 load_dotenv()
 
+REPORT_PAGE_SIZE = 15  # Tasks shown per overdue/completed/in-progress answer
+REPORT_MAX_ROWS = 500  # Upper bound when the user asks for the full list
+
 class EnhancedTaskAnalysisService:
     """🚀 Advanced task analysis with NLP intent detection and vector-based semantic search"""
     
@@ -339,13 +345,9 @@ class EnhancedTaskAnalysisService:
                 'entire list', 'show all', 'list all', 'full overdue'
             ])
             
-            # Use our new API to get overdue tasks
-            import requests
-            base_url = "http://127.0.0.1:5001"
-            
+            # Filters are pushed down to SQL; counts come back from the server
             try:
-                response = requests.get(f"{base_url}/api/employee/{employee_name}/overdue-tasks")
-                data = response.json()
+                data = self._get_task_report('overdue', employee_name, filters, show_full_list)
                 
                 if not data.get('success'):
                     return {
@@ -379,7 +381,8 @@ class EnhancedTaskAnalysisService:
                 # Format overdue tasks analysis
                 analysis = f"🚨 **OVERDUE TASKS ALERT for {employee_name}**\n\n"
                 analysis += f"📊 **Summary:**\n"
-                analysis += f"• **{len(overdue_tasks)} overdue tasks** out of {stats.get('total_tasks', 0)} total\n"
+                matching_count = data.get('matching_count', len(overdue_tasks))
+                analysis += f"• **{matching_count} overdue tasks** out of {stats.get('total_tasks', 0)} total\n"
                 analysis += f"• Completion Rate: {stats.get('completed_count', 0)}/{stats.get('total_tasks', 0)} ({round((stats.get('completed_count', 0) / max(stats.get('total_tasks', 1), 1)) * 100, 1)}%)\n\n"
                 
                 # Show overdue tasks - more if full list requested
@@ -400,9 +403,9 @@ class EnhancedTaskAnalysisService:
                         analysis += f"   🚀 Project: {task['project_name']}\n"
                     analysis += "\n"
                 
-                if not show_full_list and len(overdue_tasks) > max_tasks_to_show:
-                    analysis += f"... and **{len(overdue_tasks) - max_tasks_to_show} more** overdue tasks\n"
-                    analysis += f"💡 *Ask for 'full list of overdue tasks' to see all {len(overdue_tasks)} tasks*\n\n"
+                if not show_full_list and matching_count > max_tasks_to_show:
+                    analysis += f"... and **{matching_count - max_tasks_to_show} more** overdue tasks\n"
+                    analysis += f"💡 *Ask for 'full list of overdue tasks' to see all {matching_count} tasks*\n\n"
                 elif show_full_list:
                     analysis += f"📋 **Showing all {len(overdue_tasks)} overdue tasks above**\n\n"
                 
@@ -412,7 +415,7 @@ class EnhancedTaskAnalysisService:
                     analysis += f"📈 **Priority Breakdown:**\n"
                     for priority in ['Urgent', 'High', 'Medium', 'Low']:
                         if priority in priority_breakdown:
-                            count = len(priority_breakdown[priority])
+                            count = priority_breakdown[priority]
                             emoji = "🔴" if priority == "Urgent" else "🟠" if priority == "High" else "🟡" if priority == "Medium" else "🟢"
                             analysis += f"• {emoji} {priority}: {count} tasks\n"
                     analysis += "\n"
@@ -440,10 +443,10 @@ class EnhancedTaskAnalysisService:
                     'raw_data': data
                 }
                 
-            except requests.RequestException as e:
+            except Exception as e:
                 return {
                     'success': True,
-                    'analysis': f"❌ Could not connect to overdue tasks API: {str(e)}",
+                    'analysis': f"❌ Could not query overdue tasks: {str(e)}",
                     'intent_type': 'overdue_tasks',
                     'employee': employee_name
                 }
@@ -471,13 +474,9 @@ class EnhancedTaskAnalysisService:
                 'entire list', 'show all', 'list all', 'full completed'
             ])
             
-            # Use our new API to get completed tasks
-            import requests
-            base_url = "http://127.0.0.1:5001"
-            
+            # Filters are pushed down to SQL; counts come back from the server
             try:
-                response = requests.get(f"{base_url}/api/employee/{employee_name}/completed-tasks")
-                data = response.json()
+                data = self._get_task_report('completed', employee_name, filters, show_full_list)
                 
                 if not data.get('success'):
                     return {
@@ -510,7 +509,8 @@ class EnhancedTaskAnalysisService:
                 # Format completed tasks analysis
                 analysis = f"✅ **COMPLETED TASKS for {employee_name}**\n\n"
                 analysis += f"📊 **Summary:**\n"
-                analysis += f"• **{len(completed_tasks)} completed tasks** out of {stats.get('total_tasks', 0)} total\n"
+                matching_count = data.get('matching_count', len(completed_tasks))
+                analysis += f"• **{matching_count} completed tasks** out of {stats.get('total_tasks', 0)} total\n"
                 analysis += f"• Completion Rate: {stats.get('completion_rate', 0)}%\n\n"
                 
                 # Show completed tasks
@@ -531,9 +531,9 @@ class EnhancedTaskAnalysisService:
                         analysis += f"   ⏱️ Duration: {task['completion_days']} days\n"
                     analysis += "\n"
                 
-                if not show_full_list and len(completed_tasks) > max_tasks_to_show:
-                    analysis += f"... and **{len(completed_tasks) - max_tasks_to_show} more** completed tasks\n"
-                    analysis += f"💡 *Ask for 'full list of completed tasks' to see all {len(completed_tasks)} tasks*\n\n"
+                if not show_full_list and matching_count > max_tasks_to_show:
+                    analysis += f"... and **{matching_count - max_tasks_to_show} more** completed tasks\n"
+                    analysis += f"💡 *Ask for 'full list of completed tasks' to see all {matching_count} tasks*\n\n"
                 elif show_full_list:
                     analysis += f"📋 **Showing all {len(completed_tasks)} completed tasks above**\n\n"
                 
@@ -543,7 +543,7 @@ class EnhancedTaskAnalysisService:
                     analysis += f"📈 **Completed Tasks by Priority:**\n"
                     for priority in ['Urgent', 'High', 'Medium', 'Low']:
                         if priority in priority_breakdown:
-                            count = len(priority_breakdown[priority])
+                            count = priority_breakdown[priority]
                             emoji = "🔴" if priority == "Urgent" else "🟠" if priority == "High" else "🟡" if priority == "Medium" else "🟢"
                             analysis += f"• {emoji} {priority}: {count} tasks\n"
                     analysis += "\n"
@@ -559,10 +559,10 @@ class EnhancedTaskAnalysisService:
                     'raw_data': data
                 }
                 
-            except requests.RequestException as e:
+            except Exception as e:
                 return {
                     'success': True,
-                    'analysis': f"❌ Could not connect to completed tasks API: {str(e)}",
+                    'analysis': f"❌ Could not query completed tasks: {str(e)}",
                     'intent_type': 'completed_tasks',
                     'employee': employee_name
                 }
@@ -590,13 +590,9 @@ class EnhancedTaskAnalysisService:
                 'entire list', 'show all', 'list all', 'full progress'
             ])
             
-            # Use our new API to get in-progress tasks
-            import requests
-            base_url = "http://127.0.0.1:5001"
-            
+            # Filters are pushed down to SQL; counts come back from the server
             try:
-                response = requests.get(f"{base_url}/api/employee/{employee_name}/inprogress-tasks")
-                data = response.json()
+                data = self._get_task_report('inprogress', employee_name, filters, show_full_list)
                 
                 if not data.get('success'):
                     return {
@@ -629,7 +625,8 @@ class EnhancedTaskAnalysisService:
                 # Format in-progress tasks analysis
                 analysis = f"🔄 **IN-PROGRESS TASKS for {employee_name}**\n\n"
                 analysis += f"📊 **Summary:**\n"
-                analysis += f"• **{len(inprogress_tasks)} active tasks** out of {stats.get('total_tasks', 0)} total\n"
+                matching_count = data.get('matching_count', len(inprogress_tasks))
+                analysis += f"• **{matching_count} active tasks** out of {stats.get('total_tasks', 0)} total\n"
                 analysis += f"• Progress Rate: {stats.get('inprogress_rate', 0)}%\n\n"
                 
                 # Show in-progress tasks
@@ -658,9 +655,9 @@ class EnhancedTaskAnalysisService:
                         analysis += f"   🚀 Project: {task['project_name']}\n"
                     analysis += "\n"
                 
-                if not show_full_list and len(inprogress_tasks) > max_tasks_to_show:
-                    analysis += f"... and **{len(inprogress_tasks) - max_tasks_to_show} more** active tasks\n"
-                    analysis += f"💡 *Ask for 'full list of in-progress tasks' to see all {len(inprogress_tasks)} tasks*\n\n"
+                if not show_full_list and matching_count > max_tasks_to_show:
+                    analysis += f"... and **{matching_count - max_tasks_to_show} more** active tasks\n"
+                    analysis += f"💡 *Ask for 'full list of in-progress tasks' to see all {matching_count} tasks*\n\n"
                 elif show_full_list:
                     analysis += f"📋 **Showing all {len(inprogress_tasks)} active tasks above**\n\n"
                 
@@ -670,7 +667,7 @@ class EnhancedTaskAnalysisService:
                     analysis += f"📈 **Tasks by Status:**\n"
                     for status in ['In Progress', 'Testing', 'Awaiting Feedback']:
                         if status in status_breakdown:
-                            count = len(status_breakdown[status])
+                            count = status_breakdown[status]
                             emoji = "🔄" if status == "In Progress" else "🧪" if status == "Testing" else "⏳"
                             analysis += f"• {emoji} {status}: {count} tasks\n"
                     analysis += "\n"
@@ -686,10 +683,10 @@ class EnhancedTaskAnalysisService:
                     'raw_data': data
                 }
                 
-            except requests.RequestException as e:
+            except Exception as e:
                 return {
                     'success': True,
-                    'analysis': f"❌ Could not connect to in-progress tasks API: {str(e)}",
+                    'analysis': f"❌ Could not query in-progress tasks: {str(e)}",
                     'intent_type': 'inprogress_tasks',
                     'employee': employee_name
                 }
@@ -703,26 +700,25 @@ class EnhancedTaskAnalysisService:
         try:
             print(f"🔢 Processing TASK_COUNT for {employee_name}")
             
-            # Get all tasks for counting
-            all_tasks = self._get_filtered_tasks(employee_name, filters)
+            # Count every matching task server-side (no row limit)
+            counts = self._query_tasks(employee_name, filters, limit=0, with_counts=True)['counts']
             
-            # Calculate various counts
-            total_count = len(all_tasks)
+            total_count = counts['matching']
             status_counts = {}
             priority_counts = {}
             
-            for task in all_tasks:
-                status = task.get('status', 'Unknown')
-                priority = task.get('priority', 0)
-                
-                status_counts[status] = status_counts.get(status, 0) + 1
-                
+            for status, count in counts['by_status'].items():
+                status_name = TASK_STATUS_NAMES.get(status, f"Status {status}")
+                status_counts[status_name] = status_counts.get(status_name, 0) + count
+            
+            for priority, count in counts['by_priority'].items():
+                priority = priority or 0
                 if priority >= 3:
-                    priority_counts['High'] = priority_counts.get('High', 0) + 1
+                    priority_counts['High'] = priority_counts.get('High', 0) + count
                 elif priority == 2:
-                    priority_counts['Medium'] = priority_counts.get('Medium', 0) + 1
+                    priority_counts['Medium'] = priority_counts.get('Medium', 0) + count
                 else:
-                    priority_counts['Low'] = priority_counts.get('Low', 0) + 1
+                    priority_counts['Low'] = priority_counts.get('Low', 0) + count
             
             # Format response
             analysis = f"Task statistics for {employee_name}:\n\n"
@@ -856,72 +852,159 @@ class EnhancedTaskAnalysisService:
             return self._fallback_response(query, str(e))
 
     # Helper methods...
+    def _get_rollup_summary(self, employee_name: str) -> Optional[Dict]:
+        """📦 Maintained per-employee task counters (None when the employee or rollup is unavailable)"""
+        if not employee_name:
+            return None
+        try:
+            employee = get_staff_directory().find(employee_name, include_inactive=True)
+            if not employee:
+                return None
+            return get_employee_task_rollup().get_summary(employee['staffid'])
+        except Exception as e:
+            print(f"⚠️ Task rollup unavailable, counting from task rows: {e}")
+            return None
+
     def _get_filtered_tasks(self, employee_name: str, filters: Dict, limit: int = 50) -> List[Dict]:
         """📊 Get tasks from MySQL with applied filters"""
         try:
-            connection = mysql.connector.connect(**self.db_config)
+            return self._query_tasks(employee_name, filters, limit=limit)['tasks']
+        except Exception as e:
+            print(f"❌ Error getting filtered tasks: {e}")
+            return []
+
+    def _resolve_staff_id(self, employee_name: str) -> Optional[int]:
+        """👤 Staff id for an employee name via the shared staff directory (inactive staff included)"""
+        if not employee_name:
+            return None
+        try:
+            employee = get_staff_directory().find(employee_name, include_inactive=True)
+        except Exception as e:
+            print(f"⚠️ Staff directory unavailable: {e}")
+            return None
+        return employee['staffid'] if employee else None
+
+    def _query_tasks(self, employee_name: str, filters: Dict, view: str = 'all', limit: int = 50,
+                     after: Optional[List] = None, with_counts: bool = False,
+                     staffid: Optional[int] = None) -> Dict[str, Any]:
+        """🧮 Run the compiled filter query: one page of tasks, its keyset cursor and optional server-side counts"""
+        if staffid is None:
+            staffid = self._resolve_staff_id(employee_name)
+        compiled = compile_task_filters(filters, view=view, staffid=staffid,
+                                        employee_name=None if staffid is not None else employee_name)
+        
+        result = {'tasks': [], 'next_cursor': None, 'counts': None}
+        connection = get_crm_connection(self.db_config)
+        try:
             cursor = connection.cursor(dictionary=True)
             
-            # Build SQL query with filters
-            sql = """
-            SELECT 
-                t.id, t.name, t.status, t.priority, t.dateadded, t.duedate,
-                s.firstname, s.lastname
-            FROM tbltasks t
-            LEFT JOIN tblstaff s ON t.addedfrom = s.staffid
-            WHERE 1=1
-            """
-            params = []
-            
-            # Employee filter
-            if employee_name:
-                sql += " AND (s.firstname LIKE %s OR s.lastname LIKE %s)"
-                params.extend([f"%{employee_name}%", f"%{employee_name}%"])
-            
-            # Time filters
-            time_period = filters.get('time_period')
-            if time_period == 'today':
-                sql += " AND DATE(t.dateadded) = CURDATE()"
-            elif time_period == 'week':
-                sql += " AND t.dateadded >= DATE_SUB(NOW(), INTERVAL 1 WEEK)"
-            elif time_period == 'month':
-                sql += " AND t.dateadded >= DATE_SUB(NOW(), INTERVAL 1 MONTH)"
-            elif time_period == 'recent':
-                sql += " AND t.dateadded >= DATE_SUB(NOW(), INTERVAL 2 WEEK)"
-            
-            # Status filter
-            if filters.get('status'):
-                status_map = {
-                    'completed': ['Completed', 'Done', 'Finished'],
-                    'pending': ['Pending', 'Not Started', 'Waiting'],
-                    'in_progress': ['In Progress', 'Active', 'Working']
-                }
-                statuses = status_map.get(filters['status'], [filters['status']])
-                placeholders = ','.join(['%s'] * len(statuses))
-                sql += f" AND t.status IN ({placeholders})"
-                params.extend(statuses)
-            
-            # Priority filter
-            if filters.get('priority'):
-                priority_map = {'urgent': 4, 'high': 3, 'medium': 2, 'low': 1}
-                min_priority = priority_map.get(filters['priority'], 1)
-                sql += " AND t.priority >= %s"
-                params.append(min_priority)
-            
-            sql += " ORDER BY t.dateadded DESC LIMIT %s"
-            params.append(limit)
-            
-            cursor.execute(sql, params)
-            tasks = cursor.fetchall()
+            if limit:
+                # One extra row tells us whether another page exists
+                sql, params = compiled.select(limit=limit + 1, after=after)
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    result['next_cursor'] = compiled.cursor_for(rows[-1])
+                for row in rows:
+                    for i in range(len(compiled.order)):
+                        row.pop(f"sort_key_{i}", None)
+                    row['status_name'] = TASK_STATUS_NAMES.get(row['status'], f"Status {row['status']}")
+                    row['priority_name'] = TASK_PRIORITY_NAMES.get(row['priority'], f"Priority {row['priority']}")
+                result['tasks'] = rows
+            
+            if with_counts:
+                sql, params = compiled.count()
+                cursor.execute(sql, params)
+                counts = {'matching': 0, 'by_status': {}, 'by_priority': {},
+                          'critical_count': 0, 'urgent_count': 0, 'recent_count': 0}
+                for row in cursor.fetchall():
+                    task_count = int(row['task_count'])
+                    counts['matching'] += task_count
+                    counts['by_status'][row['status']] = counts['by_status'].get(row['status'], 0) + task_count
+                    counts['by_priority'][row['priority']] = counts['by_priority'].get(row['priority'], 0) + task_count
+                    for key in ('critical_count', 'urgent_count', 'recent_count'):
+                        counts[key] += int(row[key] or 0)
+                result['counts'] = counts
             
             cursor.close()
+        finally:
             connection.close()
-            
-            return tasks
-            
-        except Exception as e:
-            print(f"❌ Error getting filtered tasks: {e}")
-            return []
+        
+        return result
+
+    def _get_task_report(self, view: str, employee_name: str, filters: Dict, show_full_list: bool = False) -> Dict[str, Any]:
+        """📋 Overdue / completed / in-progress report: one page (or the full list) plus server-side breakdowns"""
+        staffid = self._resolve_staff_id(employee_name)
+        if staffid is None:
+            return {'success': False, 'error': f'Employee "{employee_name}" not found'}
+        
+        page = self._query_tasks(employee_name, filters, view=view, limit=REPORT_PAGE_SIZE,
+                                 with_counts=True, staffid=staffid)
+        tasks = page['tasks']
+        counts = page['counts']
+        next_cursor = page['next_cursor']
+        while show_full_list and next_cursor and len(tasks) < REPORT_MAX_ROWS:
+            page = self._query_tasks(employee_name, filters, view=view, limit=REPORT_PAGE_SIZE * 4,
+                                     after=next_cursor, staffid=staffid)
+            tasks.extend(page['tasks'])
+            next_cursor = page['next_cursor']
+        
+        for task in tasks:
+            for field in ('duedate', 'startdate', 'datefinished'):
+                if task.get(field) and hasattr(task[field], 'strftime'):
+                    task[field] = task[field].strftime('%Y-%m-%d')
+        
+        matching = counts['matching']
+        summary = self._get_rollup_summary(employee_name) or {}
+        total_tasks = summary.get('total_tasks', matching)
+        if view == 'overdue':
+            stats = {
+                'total_tasks': total_tasks,
+                'overdue_count': matching,
+                'completed_count': summary.get('completed_tasks', 0),
+                'upcoming_count': summary.get('upcoming_tasks', 0)
+            }
+        elif view == 'completed':
+            stats = {
+                'total_tasks': total_tasks,
+                'completed_count': matching,
+                'completion_rate': round(matching / max(total_tasks, 1) * 100, 1)
+            }
+        else:
+            stats = {
+                'total_tasks': total_tasks,
+                'inprogress_count': matching,
+                'inprogress_rate': round(matching / max(total_tasks, 1) * 100, 1)
+            }
+        
+        priority_breakdown = {}
+        for priority, count in counts['by_priority'].items():
+            name = TASK_PRIORITY_NAMES.get(priority, f"Priority {priority}")
+            priority_breakdown[name] = priority_breakdown.get(name, 0) + count
+        status_breakdown = {}
+        for status, count in counts['by_status'].items():
+            name = TASK_STATUS_NAMES.get(status, f"Status {status}")
+            status_breakdown[name] = status_breakdown.get(name, 0) + count
+        
+        return {
+            'success': True,
+            'employee_name': employee_name,
+            'employee_id': staffid,
+            f'{view}_tasks': tasks,
+            'matching_count': matching,
+            'next_cursor': [str(value) for value in next_cursor] if next_cursor else None,
+            'stats': stats,
+            'analysis': {
+                'priority_breakdown': priority_breakdown,
+                'status_breakdown': status_breakdown,
+                'urgency_analysis': {
+                    'critical_count': counts['critical_count'],
+                    'urgent_count': counts['urgent_count'],
+                    'recent_count': counts['recent_count']
+                } if view == 'overdue' else {}
+            }
+        }
 
     def _generate_ai_summary(self, query: str, relevant_tasks: List[Dict], employee_name: str, 
                            summary_type: str, additional_data: Dict = None) -> str:
@@ -1042,6 +1125,20 @@ class EnhancedTaskAnalysisService:
     def _calculate_performance_metrics(self, employee_name: str, filters: Dict) -> Dict:
         """📊 Calculate performance metrics for an employee"""
         try:
+            summary = self._get_rollup_summary(employee_name)
+            if summary is not None:
+                return {
+                    'total_tasks': summary['total_tasks'],
+                    'completed_tasks': summary['completed_tasks'],
+                    'completion_rate': summary['completion_rate'],
+                    'high_priority_tasks': summary['high_priority_tasks'],
+                    'overdue_tasks': summary['overdue_tasks'],
+                    'on_time_rate': summary['on_time_rate'],
+                    'average_delay_days': summary['average_delay_days'],
+                    'recent_activity_30d': summary['added_last_30d'],
+                    'average_tasks_per_week': round(summary['added_last_30d'] / 4.3, 1) if summary['added_last_30d'] > 0 else 0
+                }
+            
             tasks = self._get_filtered_tasks(employee_name, {}, limit=100)
             
             total_tasks = len(tasks)
@@ -1087,6 +1184,22 @@ class EnhancedTaskAnalysisService:
     def _calculate_progress_metrics(self, employee_name: str) -> Dict:
         """📈 Calculate progress-related metrics with human-readable status names"""
         try:
+            summary = self._get_rollup_summary(employee_name)
+            if summary is not None:
+                status_codes = summary['status_counts']
+                return {
+                    'total_tasks': summary['total_tasks'],
+                    'recent_week_tasks': summary['added_last_7d'],
+                    'recent_completed': summary['completed_last_7d'],
+                    'status_distribution': {
+                        TaskStatusMapper.get_status_info(code)['name']: count for code, count in status_codes.items()
+                    },
+                    'status_distribution_detailed': TaskStatusMapper.format_status_distribution(list(status_codes.items())),
+                    'active_tasks': summary['active_tasks'],
+                    'overdue_tasks': summary['overdue_tasks'],
+                    'upcoming_tasks': summary['upcoming_tasks']
+                }
+            
             all_tasks = self._get_filtered_tasks(employee_name, {}, limit=100)
             recent_tasks = self._get_filtered_tasks(employee_name, {'time_period': 'week'})
             
@@ -9,6 +9,16 @@ import os
 from typing import Dict, List, Optional, Tuple
 from enum import Enum
 import json
+import sys
+
+# Add parent directory to path for utils import
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.intent_classifier import get_intent_classifier, PatternMatcher
+from utils.analysis_cache import get_analysis_cache
+from core.crm.staff_directory import get_staff_directory, normalize_name
+
+# Bump when the _ai_based_detection prompt changes so cached analyses are dropped
+AI_DETECTION_PROMPT_VERSION = '1'
 
 class TaskIntent(Enum):
     """Supported task-related intents"""
@@ -29,6 +39,46 @@ class TaskIntent(Enum):
 class NLPIntentDetector:
     """🔍 Advanced NLP service for intent detection and entity extraction"""
     
+    # Seed examples for the local similarity classifier (grows with every LLM answer)
+    SEED_EXAMPLES = {
+        TaskIntent.LIST_TASKS.value: [
+            "show me hamza's ai monitoring tasks", "list all tasks for ali", "give me nawaz tasks"
+        ],
+        TaskIntent.OVERDUE_TASKS.value: [
+            "hamza's overdue tasks", "show overdue tasks for ali", "which tasks are late for deniz"
+        ],
+        TaskIntent.COMPLETED_TASKS.value: [
+            "hamza's completed tasks", "show finished tasks for ali", "what has nawaz completed"
+        ],
+        TaskIntent.INPROGRESS_TASKS.value: [
+            "hamza's in-progress tasks", "what is ali currently working on", "show active tasks for deniz"
+        ],
+        TaskIntent.PERFORMANCE_ANALYSIS.value: [
+            "how is john performing this week", "performance analysis for hamza", "how productive is ali"
+        ],
+        TaskIntent.TASK_SUMMARY.value: [
+            "summarize recent tasks", "give me an overview of hamza's work", "brief summary of ali's tasks"
+        ]
+    }
+    
+    # Task filter keywords as ((filter, value), substrings); earlier values of a filter win
+    TASK_FILTER_PATTERNS = [
+        (('time_period', 'today'), ['today']),
+        (('time_period', 'week'), ['this week', 'weekly']),
+        (('time_period', 'month'), ['this month', 'monthly']),
+        (('time_period', 'recent'), ['recent', 'latest']),
+        (('status', 'completed'), ['completed', 'finished']),
+        (('status', 'pending'), ['pending', 'waiting']),
+        (('status', 'in_progress'), ['in progress', 'ongoing']),
+        (('priority', 'urgent'), ['urgent', 'high priority']),
+        (('priority', 'high'), ['important']),
+        (('task_type', 'monitoring'), ['monitoring']),
+        (('task_type', 'ai'), ['ai', 'artificial intelligence']),
+        (('task_type', 'development'), ['development', 'dev'])
+    ]
+    # Filters whose keywords must match whole words ("ai" is not a filter in "Aiza" or "said")
+    WHOLE_WORD_FILTERS = {'task_type'}
+    
     def __init__(self):
         self.openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
         
@@ -106,6 +156,34 @@ class NLPIntentDetector:
             r'(\w+)\s+(?:tasks?|assignments?|work)'
         ]
         
+        # Intent patterns and task filter keywords compiled into one matcher: a single
+        # scan of the query serves pattern detection, the local classifier and filters
+        self.pattern_matcher = PatternMatcher(
+            [(intent.value, patterns) for intent, patterns in self.intent_patterns.items()] +
+            [(label, [rf'\b{re.escape(keyword)}\b' if label[0] in self.WHOLE_WORD_FILTERS else re.escape(keyword)
+                      for keyword in keywords])
+             for label, keywords in self.TASK_FILTER_PATTERNS],
+            flags=0  # _scan() lowercases the query, as the patterns expect
+        )
+        self._last_scan = (None, {})
+        
+        # Local classifier answers confident cases; the LLM is only asked below its threshold.
+        # Specific intents outrank the broad list/"show ... tasks" patterns.
+        specific_first = [
+            TaskIntent.OVERDUE_TASKS, TaskIntent.COMPLETED_TASKS, TaskIntent.INPROGRESS_TASKS,
+            TaskIntent.RECENT_TASKS, TaskIntent.TASK_COUNT, TaskIntent.PERFORMANCE_ANALYSIS,
+            TaskIntent.PROGRESS_REPORT, TaskIntent.TASK_SUMMARY, TaskIntent.LIST_TASKS
+        ]
+        self.intent_classifier = get_intent_classifier(
+            'nlp_intent_detector',
+            rules={intent.value: patterns for intent, patterns in self.intent_patterns.items()},
+            priority=[intent.value for intent in specific_first],
+            examples=self.SEED_EXAMPLES
+        )
+        
+        # Shared memo of LLM analyses keyed by the canonical query
+        self.analysis_cache = get_analysis_cache()
+        
         print("🧠 NLP Intent Detector initialized with pattern matching and OpenAI integration")
 
     def detect_intent_and_entities(self, query: str) -> Dict:
@@ -113,14 +191,42 @@ class NLPIntentDetector:
         try:
             print(f"🔍 Analyzing query: '{query}'")
             
-            # First try pattern-based detection for speed
-            pattern_result = self._pattern_based_detection(query)
+            # Same phrasing (with any employee name) analysed by the LLM before
+            cached_result = self.analysis_cache.get('nlp_intent_detector', query, AI_DETECTION_PROMPT_VERSION)
+            if cached_result is not None:
+                cached_result['query'] = query
+                print(f"♻️ Cached analysis: {cached_result['intent']}, Employee: {cached_result.get('employee_name', 'None')}")
+                return cached_result
             
-            # Use AI for complex cases or validation
-            ai_result = self._ai_based_detection(query)
+            # First try pattern-based detection for speed
+            matches = self._scan(query)
+            pattern_result = self._pattern_based_detection(query, matches)
             
-            # Combine results with AI having higher priority
-            final_result = self._combine_results(pattern_result, ai_result, query)
+            # Local classification; the LLM is only consulted when it is not confident
+            prediction = self.intent_classifier.classify(query, matches=matches)
+            if prediction.confident and self._name_resolved_locally(query, pattern_result.get('employee_name')):
+                final_result = pattern_result.copy()
+                final_result.update({
+                    'intent': prediction.intent,
+                    'confidence': prediction.confidence,
+                    'method': 'local_classifier',
+                    'query': query,
+                    'pattern_detected': pattern_result.get('intent'),
+                    'ai_detected': None,
+                    'local_classification': prediction.to_dict(),
+                    'processing_methods': [pattern_result.get('method'), 'local_classifier']
+                })
+            else:
+                # Use AI for complex cases
+                ai_result = self._ai_based_detection(query)
+                if ai_result.get('method') == 'ai_analysis':
+                    self.intent_classifier.learn(query, ai_result.get('intent'), prediction)
+                
+                # Combine results with AI having higher priority
+                final_result = self._combine_results(pattern_result, ai_result, query)
+                final_result['local_classification'] = prediction.to_dict()
+                if ai_result.get('method') == 'ai_analysis':
+                    self.analysis_cache.put('nlp_intent_detector', query, AI_DETECTION_PROMPT_VERSION, final_result)
             
             print(f"🎯 Final Intent: {final_result['intent']}, Employee: {final_result.get('employee_name', 'None')}")
             return final_result
@@ -135,21 +241,24 @@ class NLPIntentDetector:
                 'query': query
             }
 
-    def _pattern_based_detection(self, query: str) -> Dict:
+    def _scan(self, query: str) -> Dict:
+        """🔎 One pass of the combined matcher: matched intent/filter labels → first position"""
+        last_query, last_matches = self._last_scan
+        if query == last_query:
+            return last_matches
+        matches = self.pattern_matcher.scan(query.lower())
+        self._last_scan = (query, matches)
+        return matches
+
+    def _pattern_based_detection(self, query: str, matches: Optional[Dict] = None) -> Dict:
         """⚡ Fast pattern-based intent detection"""
-        query_lower = query.lower()
-        detected_intent = TaskIntent.GENERAL_QUERY
-        confidence = 0.5
+        if matches is None:
+            matches = self._scan(query)
         
-        # Check each intent pattern
-        for intent, patterns in self.intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, query_lower):
-                    detected_intent = intent
-                    confidence = 0.8
-                    break
-            if detected_intent != TaskIntent.GENERAL_QUERY:
-                break
+        # First intent (in pattern order) that matched anywhere wins
+        matched = [intent for intent in self.intent_patterns if intent.value in matches]
+        detected_intent = matched[0] if matched else TaskIntent.GENERAL_QUERY
+        confidence = 0.8 if matched else 0.5
         
         # Extract employee name
         employee_name = self._extract_employee_name(query)
@@ -158,7 +267,8 @@ class NLPIntentDetector:
             'intent': detected_intent.value,
             'employee_name': employee_name,
             'confidence': confidence,
-            'method': 'pattern_matching'
+            'method': 'pattern_matching',
+            'matched_intents': {intent.value: matches[intent.value] for intent in matched}
         }
 
     def _ai_based_detection(self, query: str) -> Dict:
@@ -237,6 +347,19 @@ class NLPIntentDetector:
                     return name
         return None
 
+    def _name_resolved_locally(self, query: str, employee_name: Optional[str]) -> bool:
+        """👤 Whether the regex name is trustworthy without the LLM: it resolves to a
+        staff member, or there is no name to extract (no staff name token in the query)"""
+        try:
+            directory = get_staff_directory()
+            if employee_name:
+                return directory.find(employee_name) is not None
+            name_tokens = directory.known_name_tokens()
+        except Exception as e:
+            print(f"⚠️ Staff directory unavailable, asking the LLM for the name: {e}")
+            return False
+        return not any(token in name_tokens for token in re.findall(r"\w+", normalize_name(query)))
+
     def _combine_results(self, pattern_result: Dict, ai_result: Dict, query: str) -> Dict:
         """🔄 Combine pattern and AI results intelligently"""
         
@@ -281,38 +404,11 @@ class NLPIntentDetector:
     def extract_task_filters(self, query: str) -> Dict:
         """🔍 Extract task filtering criteria from query"""
         filters = {}
-        query_lower = query.lower()
+        matches = self._scan(query)
         
-        # Time-based filters
-        if 'today' in query_lower:
-            filters['time_period'] = 'today'
-        elif 'this week' in query_lower or 'weekly' in query_lower:
-            filters['time_period'] = 'week'
-        elif 'this month' in query_lower or 'monthly' in query_lower:
-            filters['time_period'] = 'month'
-        elif 'recent' in query_lower or 'latest' in query_lower:
-            filters['time_period'] = 'recent'
-            
-        # Status filters
-        if 'completed' in query_lower or 'finished' in query_lower:
-            filters['status'] = 'completed'
-        elif 'pending' in query_lower or 'waiting' in query_lower:
-            filters['status'] = 'pending'
-        elif 'in progress' in query_lower or 'ongoing' in query_lower:
-            filters['status'] = 'in_progress'
-            
-        # Priority filters
-        if 'urgent' in query_lower or 'high priority' in query_lower:
-            filters['priority'] = 'urgent'
-        elif 'important' in query_lower:
-            filters['priority'] = 'high'
-            
-        # Type filters
-        if 'monitoring' in query_lower:
-            filters['task_type'] = 'monitoring'
-        elif 'ai' in query_lower or 'artificial intelligence' in query_lower:
-            filters['task_type'] = 'ai'
-        elif 'development' in query_lower or 'dev' in query_lower:
-            filters['task_type'] = 'development'
+        # Time, status, priority and type filters; the first matching value of each wins
+        for (name, value), _ in self.TASK_FILTER_PATTERNS:
+            if name not in filters and (name, value) in matches:
+                filters[name] = value
             
         return filters
\ No newline at end of file
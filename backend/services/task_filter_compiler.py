@@ -0,0 +1,177 @@
+"""
+🧮 Task Filter Compiler
+Compiles the filter dict produced by NLP intent detection into parameterized
+SQL predicates, ORDER BY and keyset pagination over tbltasks
+"""
+
+from typing import Dict, List, Any, Optional, Sequence, Tuple
+
+COMPLETED_STATUS = 5
+
+# filters['status'] -> CRM status codes
+STATUS_FILTER_CODES = {
+    'completed': [5],
+    'pending': [1, 4],
+    'in_progress': [2, 3, 4]
+}
+
+# filters['priority'] -> minimum CRM priority
+PRIORITY_FILTER_MIN = {'urgent': 4, 'high': 3, 'medium': 2, 'low': 1}
+
+# filters['task_type'] -> task name keywords (any match)
+TASK_TYPE_KEYWORDS = {
+    'monitoring': ['monitor'],
+    'ai': ['artificial intelligence', 'ai '],
+    'development': ['develop']
+}
+
+# filters['time_period'] -> predicate on the view's date column
+TIME_PERIOD_PREDICATES = {
+    'today': "DATE({column}) = CURDATE()",
+    'week': "{column} >= DATE_SUB(NOW(), INTERVAL 1 WEEK)",
+    'month': "{column} >= DATE_SUB(NOW(), INTERVAL 1 MONTH)",
+    'recent': "{column} >= DATE_SUB(NOW(), INTERVAL 2 WEEK)"
+}
+
+# view -> (base predicate, date column for time filters, sort keys); every sort ends on t.id so keys are unique
+TASK_VIEWS = {
+    'all': (None, "t.dateadded", [("t.dateadded", "DESC"), ("t.id", "DESC")]),
+    'overdue': ("t.status != 5 AND t.duedate IS NOT NULL AND t.duedate < CURDATE()", "t.duedate",
+                [("t.duedate", "ASC"), ("t.id", "ASC")]),
+    'completed': ("t.status = 5", "t.datefinished",
+                  [("COALESCE(t.datefinished, t.dateadded)", "DESC"), ("t.id", "DESC")]),
+    'inprogress': ("t.status IN (2, 3, 4)", "t.dateadded",
+                   [("COALESCE(t.priority, 0)", "DESC"), ("COALESCE(t.duedate, '9999-12-31')", "ASC"), ("t.id", "ASC")])
+}
+
+# Same labels as the /api/employee/<name>/... endpoints
+TASK_STATUS_NAMES = {1: 'Not Started', 2: 'In Progress', 3: 'Testing', 4: 'Awaiting Feedback', 5: 'Complete'}
+TASK_PRIORITY_NAMES = {1: 'Low', 2: 'Medium', 3: 'High', 4: 'Urgent'}
+
+TASK_COLUMNS = """
+    t.id, t.id AS task_id, t.name, t.name AS task_name, t.status, t.priority,
+    t.dateadded, t.startdate, t.duedate, t.datefinished, p.name AS project_name,
+    DATEDIFF(CURDATE(), t.duedate) AS days_overdue,
+    DATEDIFF(t.duedate, CURDATE()) AS days_until_due,
+    DATEDIFF(t.datefinished, t.startdate) AS completion_days
+"""
+TASK_FROM = """
+    FROM tbltasks t
+    LEFT JOIN tblprojects p ON t.rel_id = p.id AND t.rel_type = 'project'
+"""
+
+
+def _like(term: str) -> str:
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class CompiledTaskQuery:
+    """Parameterized WHERE / ORDER BY for one filter set, with keyset pagination"""
+
+    def __init__(self, predicates: List[str], params: List[Any], order: List[Tuple[str, str]]):
+        self.predicates = predicates
+        self.params = params
+        self.order = order
+
+    def where_sql(self) -> str:
+        return " AND ".join(f"({predicate})" for predicate in self.predicates) or "1=1"
+
+    def _keyset(self, after: Sequence[Any]) -> Tuple[str, List[Any]]:
+        """Rows strictly after the cursor in sort order: (k0 > a0) OR (k0 = a0 AND k1 > a1) ..."""
+        if len(after) != len(self.order):
+            raise ValueError(f"Cursor has {len(after)} values, expected {len(self.order)}")
+        clauses, params = [], []
+        for i, (expression, direction) in enumerate(self.order):
+            parts = [f"{self.order[j][0]} = %s" for j in range(i)]
+            parts.append(f"{expression} {'<' if direction == 'DESC' else '>'} %s")
+            clauses.append("(" + " AND ".join(parts) + ")")
+            params.extend(after[:i + 1])
+        return "(" + " OR ".join(clauses) + ")", params
+
+    def select(self, limit: Optional[int] = None, after: Optional[Sequence[Any]] = None) -> Tuple[str, List[Any]]:
+        """SELECT of one page; each row carries sort_key_N columns for cursor_for()"""
+        sort_keys = ", ".join(f"{expression} AS sort_key_{i}" for i, (expression, _) in enumerate(self.order))
+        where = self.where_sql()
+        params = list(self.params)
+        if after:
+            keyset, keyset_params = self._keyset(after)
+            where += f" AND {keyset}"
+            params.extend(keyset_params)
+
+        sql = f"SELECT {TASK_COLUMNS}, {sort_keys} {TASK_FROM} WHERE {where}"
+        sql += " ORDER BY " + ", ".join(f"{expression} {direction}" for expression, direction in self.order)
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+        return sql, params
+
+    def count(self) -> Tuple[str, List[Any]]:
+        """Server-side counts of every matching row, grouped by status and priority"""
+        sql = f"""
+            SELECT t.status, t.priority, COUNT(*) AS task_count,
+                   SUM(CASE WHEN DATEDIFF(CURDATE(), t.duedate) > 30 THEN 1 ELSE 0 END) AS critical_count,
+                   SUM(CASE WHEN DATEDIFF(CURDATE(), t.duedate) BETWEEN 8 AND 30 THEN 1 ELSE 0 END) AS urgent_count,
+                   SUM(CASE WHEN DATEDIFF(CURDATE(), t.duedate) BETWEEN 1 AND 7 THEN 1 ELSE 0 END) AS recent_count
+            FROM tbltasks t
+            WHERE {self.where_sql()}
+            GROUP BY t.status, t.priority
+        """
+        return sql, list(self.params)
+
+    def cursor_for(self, row: Dict[str, Any]) -> List[Any]:
+        """Keyset cursor that resumes right after `row`"""
+        return [row[f"sort_key_{i}"] for i in range(len(self.order))]
+
+
+def compile_task_filters(filters: Optional[Dict], view: str = 'all', staffid: Optional[int] = None,
+                         employee_name: Optional[str] = None) -> CompiledTaskQuery:
+    """
+    Compile NLP filters for one view ('all', 'overdue', 'completed', 'inprogress')
+    Tasks are scoped to staffid's assignments; employee_name (creator name match) is the
+    fallback scope when the name could not be resolved to a staff id
+    """
+    if view not in TASK_VIEWS:
+        raise ValueError(f"Unknown task view: {view}")
+    filters = filters or {}
+    base_predicate, date_column, order = TASK_VIEWS[view]
+    predicates, params = [], []
+
+    if base_predicate:
+        predicates.append(base_predicate)
+
+    if staffid is not None:
+        predicates.append("EXISTS (SELECT 1 FROM tbltask_assigned ta WHERE ta.taskid = t.id AND ta.staffid = %s)")
+        params.append(staffid)
+    elif employee_name:
+        predicates.append(
+            "EXISTS (SELECT 1 FROM tblstaff s WHERE s.staffid = t.addedfrom AND (s.firstname LIKE %s OR s.lastname LIKE %s))"
+        )
+        params.extend([_like(employee_name), _like(employee_name)])
+
+    time_period = filters.get('time_period')
+    if time_period in TIME_PERIOD_PREDICATES:
+        predicates.append(TIME_PERIOD_PREDICATES[time_period].format(column=date_column))
+
+    # The overdue/completed/in-progress views fix the status themselves; a status filter
+    # (often a stray "waiting" or "finished" in the phrasing) would only contradict or narrow them
+    status = filters.get('status') if base_predicate is None else None
+    if status:
+        codes = STATUS_FILTER_CODES.get(status)
+        if codes is None:
+            codes = [status]
+        predicates.append(f"t.status IN ({', '.join(['%s'] * len(codes))})")
+        params.extend(codes)
+
+    priority = filters.get('priority')
+    if priority:
+        predicates.append("t.priority >= %s")
+        params.append(PRIORITY_FILTER_MIN.get(priority, 1))
+
+    keywords = list(filters.get('keywords') or [])
+    keywords.extend(TASK_TYPE_KEYWORDS.get(filters.get('task_type'), []))
+    if keywords:
+        predicates.append(" OR ".join(["t.name LIKE %s"] * len(keywords)))
+        params.extend(_like(keyword) for keyword in keywords)
+
+    return CompiledTaskQuery(predicates, params, order)
@@ -13,6 +13,7 @@ Structure:
 - config.py: Configuration and constants
 - nlp_utils.py: Intent detection + name extraction  
 - retriever.py: MySQL queries + vector index build/retrieval
+- indexer.py: Incremental task embedding index sync
 - generator.py: OpenAI response generation (GPT-4o)
 - scheduler.py: Daily AI summary job
 - crm_connector.py: CRM API / MySQL interface for staff table
@@ -34,6 +35,7 @@ Structure:
 - config.py: Configuration and constants
 - nlp_utils.py: Intent detection + name extraction  
 - retriever.py: MySQL queries + vector index build/retrieval
+- indexer.py: Incremental task embedding index sync
 - generator.py: OpenAI response generation (GPT-4o)
 - scheduler.py: Daily AI summary job
 - crm_connector.py: CRM API / MySQL interface for staff table
@@ -47,6 +49,7 @@ from .logger import get_logger, log_info, log_warning, log_error
 from .crm_connector import get_crm_connector, CRMConnector
 from .nlp_utils import get_nlp_processor, NLPProcessor
 from .retriever import get_task_retriever, TaskRetriever
+from .indexer import get_task_indexer, IncrementalTaskIndexer
 from .generator import get_response_generator, TaskResponseGenerator
 from .scheduler import get_task_scheduler, start_scheduler, stop_scheduler
 
@@ -171,6 +174,7 @@ __all__ = [
     'get_crm_connector', 'CRMConnector',
     'get_nlp_processor', 'NLPProcessor', 
     'get_task_retriever', 'TaskRetriever',
+    'get_task_indexer', 'IncrementalTaskIndexer',
     'get_response_generator', 'TaskResponseGenerator',
     'get_task_scheduler', 'start_scheduler', 'stop_scheduler',
     'rag_bp',
@@ -295,6 +299,7 @@ __all__ = [
     'get_crm_connector', 'CRMConnector',
     'get_nlp_processor', 'NLPProcessor', 
     'get_task_retriever', 'TaskRetriever',
+    'get_task_indexer', 'IncrementalTaskIndexer',
     'get_response_generator', 'TaskResponseGenerator',
     'get_task_scheduler', 'start_scheduler', 'stop_scheduler',
     'rag_bp',
@@ -21,6 +21,12 @@ class Config:
         'port': int(os.getenv('DB_PORT', 3306)),
         'charset': 'utf8mb4'
     }
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))  # Max open connections per process
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a free connection
+    DB_POOL_MAX_LIFETIME = int(os.getenv('DB_POOL_MAX_LIFETIME', 1800))  # Recycle connections older than this
+    DB_POOL_PING_INTERVAL = 30  # Ping connections idle longer than this before reuse
+    DB_CONNECT_RETRIES = 3
+    DB_CONNECT_BACKOFF = 0.5  # Seconds before the first retry, doubled each attempt
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
@@ -33,6 +39,9 @@ class Config:
     VECTOR_DB_TYPE = os.getenv('VECTOR_DB_TYPE', 'chroma')  # 'chroma' or 'faiss'
     CHROMA_PERSIST_DIR = os.path.join(os.path.dirname(__file__), '..', 'chroma_db')
     FAISS_INDEX_PATH = os.path.join(os.path.dirname(__file__), '..', 'faiss_index')
+    TASK_INDEX_STATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'cache', 'task_index_state.json')
+    # Full hash reconcile of the task index (catches edits/deletes incremental runs can't see)
+    TASK_INDEX_RECONCILE_CRON = os.getenv('TASK_INDEX_RECONCILE_CRON', '30 3 * * *')
     
     # NLP Configuration
     SPACY_MODEL = 'en_core_web_sm'
@@ -83,6 +92,9 @@ class Config:
     # Scheduler Configuration
     SCHEDULER_TIMEZONE = 'UTC'
     DAILY_SUMMARY_TIME = '06:00'  # Run daily summaries at 6 AM UTC
+    SCHEDULER_MAX_WORKERS = int(os.getenv('SCHEDULER_MAX_WORKERS', 8))  # Concurrent employees per fan-out job
+    SCHEDULER_LLM_CALLS_PER_MINUTE = int(os.getenv('SCHEDULER_LLM_CALLS_PER_MINUTE', 60))
+    SUMMARY_SAVE_BATCH_SIZE = 50  # daily_summaries rows per batched write
     
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -101,6 +113,9 @@ class Config:
     EMBEDDING_BATCH_SIZE = 100
     EMBEDDING_DIMENSION = 1536  # text-embedding-3-small dimension
     TASK_PAGINATION_SIZE = 20
+    TASK_BULK_CHUNK_SIZE = 500  # Rows per fetch when streaming the bulk task load
+    TASK_RECENT_DAYS = 30  # Finished tasks younger than this are included in bulk loads
+    TASK_REPORT_HISTORY_DAYS = 365  # Finished-task window for the weekly performance report bulk load
     
     # Cache Configuration
     CACHE_TTL_SECONDS = 3600  # 1 hour cache for employee data
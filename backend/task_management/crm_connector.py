@@ -4,42 +4,66 @@ Handles staff table queries and employee data management
 """
 
 import pymysql
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator
 import time
+from datetime import datetime
 from .config import Config
 from .logger import get_logger
+from core.crm.connection_pool import get_crm_pool
+from core.crm.staff_directory import get_staff_directory
+from core.crm.task_changes import get_task_change_column
 
 logger = get_logger()
 
+# Completed, Cancelled, Approved, Rejected, Archived
+CLOSED_TASK_STATUSES = [5, 7, 9, 10, 11]
+
+DAILY_SUMMARIES_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS daily_summaries (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        employee_id INT NOT NULL,
+        summary_date DATE NOT NULL,
+        summary_data JSON NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY unique_employee_date (employee_id, summary_date),
+        FOREIGN KEY (employee_id) REFERENCES tblstaff(staffid)
+    )
+"""
+
+DAILY_SUMMARY_UPSERT_QUERY = """
+    INSERT INTO daily_summaries (employee_id, summary_date, summary_data)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE 
+        summary_data = VALUES(summary_data),
+        updated_at = CURRENT_TIMESTAMP
+"""
+
 class CRMConnector:
     """Connector for CRM database operations"""
     
     def __init__(self):
         self.config = Config.DB_CONFIG
-        self.connection = None
+        self.pool = get_crm_pool(
+            self.config,
+            pool_size=Config.DB_POOL_SIZE,
+            connect=pymysql.connect,
+            checkout_timeout=Config.DB_POOL_TIMEOUT,
+            ping_interval=Config.DB_POOL_PING_INTERVAL,
+            max_lifetime=Config.DB_POOL_MAX_LIFETIME,
+            connect_retries=Config.DB_CONNECT_RETRIES,
+            retry_backoff=Config.DB_CONNECT_BACKOFF
+        )
         self._employee_cache = {}
         self._cache_timestamp = None
         
     def _get_connection(self):
-        """Get database connection with retry logic"""
-        if self.connection is None or not self._is_connection_alive():
-            try:
-                self.connection = pymysql.connect(**self.config)
-                logger.info("Database connection established")
-            except Exception as e:
-                logger.error("Failed to connect to database", error=e)
-                raise
-        return self.connection
+        """Check out a pooled database connection; close() returns it to the pool"""
+        return self.pool.get_connection()
     
-    def _is_connection_alive(self) -> bool:
-        """Check if database connection is alive"""
-        try:
-            if self.connection:
-                self.connection.ping(reconnect=True)
-                return True
-        except:
-            pass
-        return False
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """Connection pool utilization and wait-time metrics"""
+        return self.pool.get_stats()
     
     def get_all_employees(self, force_refresh: bool = False) -> List[Dict[str, Any]]:
         """
@@ -89,6 +113,8 @@ class CRMConnector:
         finally:
             if 'cursor' in locals():
                 cursor.close()
+            if 'connection' in locals():
+                connection.close()
     
     def find_employee_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         """
@@ -97,22 +123,21 @@ class CRMConnector:
             name: Employee name (can be partial)
         Returns: Employee dictionary or None
         """
-        employees = self.get_all_employees()
-        name_lower = name.lower().strip()
-        
-        # Exact full name match
-        for emp in employees:
-            if emp['full_name'].lower() == name_lower:
-                logger.debug(f"Found exact match for '{name}': {emp['full_name']}")
-                return emp
+        try:
+            employee = get_staff_directory().find(name)
+        except Exception as e:
+            logger.error("Staff directory lookup failed", error=e)
+            employee = None
         
-        # Partial name match (firstname or lastname)
-        for emp in employees:
-            if (name_lower in emp['firstname'].lower() or 
-                name_lower in emp['lastname'].lower() or
-                name_lower in emp['full_name'].lower()):
-                logger.debug(f"Found partial match for '{name}': {emp['full_name']}")
-                return emp
+        if employee:
+            logger.debug(f"Staff directory match for '{name}': {employee['full_name']}")
+            return {
+                'id': employee['staffid'],
+                'firstname': employee.get('firstname'),
+                'lastname': employee.get('lastname'),
+                'email': employee.get('email'),
+                'full_name': employee['full_name']
+            }
         
         logger.debug(f"No employee found matching '{name}'")
         return None
@@ -203,6 +228,103 @@ class CRMConnector:
         finally:
             if 'cursor' in locals():
                 cursor.close()
+            if 'connection' in locals():
+                connection.close()
+    
+    def iter_task_chunks(self, chunk_size: int = None,
+                         recent_days: int = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream all open and recently finished tasks with their assignees
+        Uses one server-side cursor query, so memory stays bounded by the chunk size.
+        Unlike get_tasks_for_employee, tasks finished more than recent_days ago are
+        left out; callers that report on history should pass a wider window.
+        Args:
+            chunk_size: Tasks per yielded chunk
+            recent_days: How far back finished tasks are included
+        Yields: Lists of task dictionaries with an assignee_ids list
+        """
+        start_time = time.time()
+        chunk_size = chunk_size or Config.TASK_BULK_CHUNK_SIZE
+        recent_days = Config.TASK_RECENT_DAYS if recent_days is None else recent_days
+        rows_streamed = 0
+        
+        connection = self._get_connection()
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        
+        try:
+            closed_placeholders = ','.join(['%s'] * len(CLOSED_TASK_STATUSES))
+            query = f"""
+                SELECT 
+                    t.id,
+                    t.name,
+                    t.description,
+                    t.status,
+                    t.priority,
+                    t.startdate,
+                    t.duedate,
+                    t.datefinished,
+                    t.rel_type,
+                    t.rel_id,
+                    p.name as project_name,
+                    c.company as client_name,
+                    GROUP_CONCAT(DISTINCT ta.staffid ORDER BY ta.staffid) as assigned_ids
+                FROM tbltasks t
+                INNER JOIN tbltask_assigned ta ON t.id = ta.taskid
+                LEFT JOIN tblprojects p ON t.rel_id = p.id AND t.rel_type = 'project'
+                LEFT JOIN tblclients c ON p.clientid = c.userid
+                WHERE t.status NOT IN ({closed_placeholders})
+                    OR t.datefinished >= DATE_SUB(NOW(), INTERVAL %s DAY)
+                GROUP BY t.id
+                ORDER BY t.priority DESC, t.duedate ASC
+            """
+            cursor.execute(query, [*CLOSED_TASK_STATUSES, recent_days])
+            
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    row['assignee_ids'] = [int(staff_id) for staff_id in str(row.pop('assigned_ids') or '').split(',') if staff_id]
+                rows_streamed += len(rows)
+                yield rows
+            
+            execution_time = time.time() - start_time
+            logger.log_db_operation('SELECT', 'tbltasks', True, execution_time, rows_streamed)
+            
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.log_db_operation('SELECT', 'tbltasks', False, execution_time, rows_streamed)
+            logger.error("Failed to stream tasks", error=e)
+            raise
+        finally:
+            # Closing an unbuffered cursor drains any unread rows so the connection stays usable
+            cursor.close()
+            connection.close()
+    
+    def build_employee_task_index(self, chunk_size: int = None,
+                                  recent_days: int = None) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Build a staffid -> tasks index from one streamed bulk query
+        Multi-assignee tasks appear in every assignee's list (the same dict is shared).
+        Args:
+            chunk_size: Tasks per streamed chunk
+            recent_days: How far back finished tasks are included
+        Returns: {staff ID: task list}, each list ordered like get_tasks_for_employee
+        """
+        start_time = time.time()
+        index = {}
+        task_count = 0
+        
+        for chunk in self.iter_task_chunks(chunk_size, recent_days):
+            task_count += len(chunk)
+            for task in chunk:
+                for staff_id in task['assignee_ids']:
+                    index.setdefault(staff_id, []).append(task)
+        
+        logger.info(f"Built employee task index: {task_count} tasks for {len(index)} employees",
+                   extra_data={'processing_time': time.time() - start_time})
+        
+        return index
     
     def get_task_by_id(self, task_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -258,6 +380,108 @@ class CRMConnector:
         finally:
             if 'cursor' in locals():
                 cursor.close()
+            if 'connection' in locals():
+                connection.close()
+    
+    def get_tasks_changed_since(self, since: Optional[datetime] = None,
+                                employee_id: int = None) -> List[Dict[str, Any]]:
+        """
+        Get tasks changed at or after a high-water mark in a single query
+        Args:
+            since: Only return tasks whose dateupdated/dateadded is >= this value (None = all tasks).
+                Without a dateupdated column only newly added tasks pass this filter;
+                edits are only seen by a full (since=None) scan
+            employee_id: Optional assignee filter
+        Returns: List of task dictionaries with comma-separated assigned_ids and changed_at
+        """
+        start_time = time.time()
+        
+        try:
+            connection = self._get_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+            change_column = get_task_change_column(cursor)
+            
+            query = f"""
+                SELECT 
+                    t.id,
+                    t.name,
+                    t.description,
+                    t.status,
+                    t.priority,
+                    t.duedate,
+                    t.rel_type,
+                    t.rel_id,
+                    p.name as project_name,
+                    GROUP_CONCAT(DISTINCT ta.staffid ORDER BY ta.staffid) as assigned_ids,
+                    {change_column} as changed_at
+                FROM tbltasks t
+                LEFT JOIN tbltask_assigned ta ON t.id = ta.taskid
+                LEFT JOIN tblprojects p ON t.rel_id = p.id AND t.rel_type = 'project'
+                WHERE 1=1
+            """
+            params = []
+            
+            if since is not None:
+                query += f" AND {change_column} >= %s"
+                params.append(since)
+            
+            if employee_id:
+                query += " AND t.id IN (SELECT taskid FROM tbltask_assigned WHERE staffid = %s)"
+                params.append(employee_id)
+            
+            query += " GROUP BY t.id ORDER BY changed_at ASC"
+            
+            cursor.execute(query, params)
+            tasks = cursor.fetchall()
+            
+            execution_time = time.time() - start_time
+            logger.log_db_operation('SELECT', 'tbltasks', True, execution_time, len(tasks))
+            
+            return tasks
+            
+        except Exception as e:
+            execution_time = time.time() - start_time
+            logger.log_db_operation('SELECT', 'tbltasks', False, execution_time)
+            logger.error("Failed to fetch changed tasks", error=e,
+                        extra_data={'since': since, 'employee_id': employee_id})
+            raise
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'connection' in locals():
+                connection.close()
+    
+    def get_task_change_summary(self, since: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Get the latest task change timestamp and how many tasks changed after `since`
+        Returns: Dictionary with latest_change and pending_changes
+        """
+        try:
+            connection = self._get_connection()
+            cursor = connection.cursor(pymysql.cursors.DictCursor)
+            change_column = get_task_change_column(cursor)
+            
+            cursor.execute(f"""
+                SELECT 
+                    MAX({change_column}) as latest_change,
+                    SUM(CASE WHEN %s IS NULL OR {change_column} > %s THEN 1 ELSE 0 END) as pending_changes
+                FROM tbltasks t
+            """, [since, since])
+            row = cursor.fetchone() or {}
+            
+            return {
+                'latest_change': row.get('latest_change'),
+                'pending_changes': int(row.get('pending_changes') or 0)
+            }
+            
+        except Exception as e:
+            logger.error("Failed to fetch task change summary", error=e)
+            return {'latest_change': None, 'pending_changes': None}
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'connection' in locals():
+                connection.close()
     
     def save_daily_summary(self, employee_id: int, summary_date: str, 
                           summary_data: Dict[str, Any]) -> bool:
@@ -276,31 +500,11 @@ class CRMConnector:
             cursor = connection.cursor()
             
             # Create table if it doesn't exist
-            create_table_query = """
-                CREATE TABLE IF NOT EXISTS daily_summaries (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    employee_id INT NOT NULL,
-                    summary_date DATE NOT NULL,
-                    summary_data JSON NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                    UNIQUE KEY unique_employee_date (employee_id, summary_date),
-                    FOREIGN KEY (employee_id) REFERENCES tblstaff(staffid)
-                )
-            """
-            cursor.execute(create_table_query)
+            cursor.execute(DAILY_SUMMARIES_TABLE_QUERY)
             
             # Insert or update summary
-            insert_query = """
-                INSERT INTO daily_summaries (employee_id, summary_date, summary_data)
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                    summary_data = VALUES(summary_data),
-                    updated_at = CURRENT_TIMESTAMP
-            """
-            
             import json
-            cursor.execute(insert_query, [employee_id, summary_date, json.dumps(summary_data)])
+            cursor.execute(DAILY_SUMMARY_UPSERT_QUERY, [employee_id, summary_date, json.dumps(summary_data)])
             connection.commit()
             
             execution_time = time.time() - start_time
@@ -318,6 +522,55 @@ class CRMConnector:
         finally:
             if 'cursor' in locals():
                 cursor.close()
+            if 'connection' in locals():
+                connection.close()
+    
+    def save_daily_summaries(self, summary_date: str, summaries: Dict[int, Dict[str, Any]],
+                             batch_size: int = None) -> int:
+        """
+        Save daily summaries for many employees in one transaction
+        Args:
+            summary_date: Date in YYYY-MM-DD format
+            summaries: {staff ID: summary data to store as JSON}
+            batch_size: Rows per executemany call
+        Returns: Number of summaries saved (0 if the transaction was rolled back)
+        """
+        start_time = time.time()
+        
+        if not summaries:
+            return 0
+        
+        batch_size = batch_size or Config.SUMMARY_SAVE_BATCH_SIZE
+        
+        try:
+            import json
+            connection = self._get_connection()
+            cursor = connection.cursor()
+            cursor.execute(DAILY_SUMMARIES_TABLE_QUERY)
+            
+            rows = [(employee_id, summary_date, json.dumps(data)) for employee_id, data in summaries.items()]
+            for i in range(0, len(rows), batch_size):
+                cursor.executemany(DAILY_SUMMARY_UPSERT_QUERY, rows[i:i + batch_size])
+            connection.commit()
+            
+            execution_time = time.time() - start_time
+            logger.log_db_operation('INSERT/UPDATE', 'daily_summaries', True, execution_time, len(rows))
+            
+            return len(rows)
+            
+        except Exception as e:
+            if 'connection' in locals():
+                connection.rollback()
+            execution_time = time.time() - start_time
+            logger.log_db_operation('INSERT/UPDATE', 'daily_summaries', False, execution_time)
+            logger.error("Failed to save daily summaries", error=e,
+                        extra_data={'employee_count': len(summaries), 'summary_date': summary_date})
+            return 0
+        finally:
+            if 'cursor' in locals():
+                cursor.close()
+            if 'connection' in locals():
+                connection.close()
     
     def _is_cache_valid(self) -> bool:
         """Check if employee cache is still valid"""
@@ -328,11 +581,9 @@ class CRMConnector:
         return cache_age < Config.CACHE_TTL_SECONDS
     
     def close_connection(self):
-        """Close database connection"""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
-            logger.info("Database connection closed")
+        """Close idle pooled database connections"""
+        self.pool.close_all()
+        logger.info("Database connections closed")
 
 # Global CRM connector instance
 crm_connector = CRMConnector()
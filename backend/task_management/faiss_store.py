@@ -0,0 +1,302 @@
+"""
+FAISS Task Store - local ANN backend for task embeddings
+Task-id mapped FAISS index with a JSON metadata sidecar for employee/status
+filters, periodic atomic saves to FAISS_INDEX_PATH and mmap loading at startup
+"""
+
+import os
+import json
+import math
+import time
+import atexit
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Any
+
+from .logger import get_logger
+
+logger = get_logger()
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+SIDECAR_FORMAT_VERSION = 1
+
+class FaissTaskStore:
+    """
+    FAISS-backed vector store for task embeddings
+
+    Small corpora live in an IndexIDMap2 over a flat inner-product index. Once
+    the corpus reaches `ivf_threshold` vectors it is retrained into an IVF index
+    (HNSW coarse quantizer for large nlist) that maps task ids natively, which
+    keeps remove/update correct. Vectors are L2-normalized so scores are cosine.
+    """
+
+    def __init__(self, index_path: str, dimension: int, ivf_threshold: int = None,
+                 nprobe: int = None, save_interval: float = None, use_mmap: bool = None):
+        if not FAISS_AVAILABLE:
+            raise ImportError("faiss is not installed")
+
+        self.index_path = index_path
+        self.sidecar_path = f"{index_path}.meta.json"
+        self.dimension = int(dimension)
+        self.ivf_threshold = ivf_threshold or int(os.getenv('FAISS_IVF_THRESHOLD', '20000'))
+        self.nprobe = nprobe or int(os.getenv('FAISS_NPROBE', '16'))
+        self.save_interval = save_interval if save_interval is not None else float(os.getenv('FAISS_SAVE_INTERVAL', '60'))
+        self.use_mmap = use_mmap if use_mmap is not None else os.getenv('FAISS_MMAP', 'true').lower() == 'true'
+
+        self._lock = threading.RLock()
+        self.index = None
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self._mmapped = False
+        self._dirty = False
+        self._last_save = time.time()
+
+        os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+        self._load()
+
+        # Persist writes made since the last periodic save
+        atexit.register(self.save)
+
+    # ------------------------------------------------------------------ persistence
+
+    def _sidecar_meta(self) -> Dict[str, Any]:
+        return {
+            'format_version': SIDECAR_FORMAT_VERSION,
+            'dimension': self.dimension
+        }
+
+    def _new_flat_index(self):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+
+    def _load(self):
+        """Load the index (memory-mapped when possible) and its metadata sidecar"""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.sidecar_path)):
+            self.index = self._new_flat_index()
+            return
+
+        try:
+            with open(self.sidecar_path, 'r', encoding='utf-8') as f:
+                sidecar = json.load(f)
+            if sidecar.get('meta') != self._sidecar_meta():
+                raise ValueError(f"sidecar meta {sidecar.get('meta')} does not match {self._sidecar_meta()}")
+
+            if self.use_mmap:
+                try:
+                    self.index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                    self._mmapped = True
+                except Exception:
+                    self.index = faiss.read_index(self.index_path)
+            else:
+                self.index = faiss.read_index(self.index_path)
+
+            if self.index.d != self.dimension:
+                raise ValueError(f"index dimension {self.index.d} does not match {self.dimension}")
+
+            self.tasks = sidecar.get('tasks', {})
+            self._configure_search()
+            logger.info(f"FAISS index loaded: {self.index.ntotal} vectors"
+                       f"{' (memory-mapped)' if self._mmapped else ''}")
+
+        except Exception as e:
+            logger.error("Failed to load FAISS index, starting empty", error=e)
+            self.index = self._new_flat_index()
+            self.tasks = {}
+            self._mmapped = False
+
+    def _ensure_writable(self):
+        """Memory-mapped indexes are read-only; load a writable copy before the first write"""
+        if self._mmapped:
+            self.index = faiss.read_index(self.index_path)
+            self._configure_search()
+            self._mmapped = False
+
+    def save(self, force: bool = True):
+        """Atomically write the index and sidecar (only when there are unsaved changes)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            if not force and time.time() - self._last_save < self.save_interval:
+                return
+
+            try:
+                index_tmp = f"{self.index_path}.tmp"
+                sidecar_tmp = f"{self.sidecar_path}.tmp"
+
+                faiss.write_index(self.index, index_tmp)
+                with open(sidecar_tmp, 'w', encoding='utf-8') as f:
+                    json.dump({'meta': self._sidecar_meta(), 'tasks': self.tasks}, f)
+
+                os.replace(index_tmp, self.index_path)
+                os.replace(sidecar_tmp, self.sidecar_path)
+
+                self._dirty = False
+                self._last_save = time.time()
+                logger.debug(f"FAISS index saved: {self.index.ntotal} vectors")
+
+            except Exception as e:
+                logger.error("Failed to save FAISS index", error=e)
+
+    # ------------------------------------------------------------------ index management
+
+    def _is_ivf(self) -> bool:
+        return not isinstance(self.index, faiss.IndexIDMap)
+
+    def _configure_search(self):
+        if self._is_ivf():
+            faiss.extract_index_ivf(self.index).nprobe = self.nprobe
+
+    def _normalize(self, vectors) -> np.ndarray:
+        matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension))
+        faiss.normalize_L2(matrix)
+        return matrix
+
+    def _maybe_train_ivf(self):
+        """Move from the flat index to a trained IVF index once the corpus is large enough"""
+        if self._is_ivf() or self.index.ntotal < self.ivf_threshold:
+            return
+
+        start_time = time.time()
+        ntotal = self.index.ntotal
+        vectors = self.index.index.reconstruct_n(0, ntotal)
+        ids = faiss.vector_to_array(self.index.id_map).astype(np.int64)
+
+        # ~4*sqrt(n) lists, keeping at least 39 training points per list
+        nlist = max(1, min(int(4 * math.sqrt(ntotal)), ntotal // 39))
+        quantizer = 'HNSW32' if nlist >= 1024 else ''
+        description = f"IVF{nlist}_{quantizer},Flat" if quantizer else f"IVF{nlist},Flat"
+
+        ivf_index = faiss.index_factory(self.dimension, description, faiss.METRIC_INNER_PRODUCT)
+        ivf_index.train(vectors)
+        # Hashtable direct map keeps reconstruct() and remove_ids() working
+        ivf_index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        ivf_index.add_with_ids(vectors, ids)
+
+        self.index = ivf_index
+        self._configure_search()
+        logger.info(f"FAISS index retrained as {description} over {ntotal} vectors "
+                   f"in {time.time() - start_time:.2f}s")
+
+    # ------------------------------------------------------------------ public API
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]],
+               documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Insert or replace task vectors and their metadata"""
+        if not ids:
+            return
+
+        with self._lock:
+            self._ensure_writable()
+
+            int_ids = np.asarray([int(task_id) for task_id in ids], dtype=np.int64)
+            self.index.remove_ids(faiss.IDSelectorBatch(int_ids))
+            self.index.add_with_ids(self._normalize(embeddings), int_ids)
+
+            for task_id, document, metadata in zip(ids, documents, metadatas):
+                self.tasks[str(task_id)] = {**metadata, 'document': document}
+
+            self._maybe_train_ivf()
+            self._dirty = True
+
+        self.save(force=False)
+
+    def delete(self, ids: List[str]):
+        """Remove task vectors and their metadata"""
+        if not ids:
+            return
+
+        with self._lock:
+            self._ensure_writable()
+
+            int_ids = np.asarray([int(task_id) for task_id in ids], dtype=np.int64)
+            self.index.remove_ids(faiss.IDSelectorBatch(int_ids))
+            for task_id in ids:
+                self.tasks.pop(str(task_id), None)
+            self._dirty = True
+
+        self.save(force=False)
+
+    def get_ids(self) -> set:
+        """Ids of every stored task"""
+        with self._lock:
+            return set(self.tasks)
+
+    def get_embeddings(self, ids: List[str]) -> Dict[str, List[float]]:
+        """Stored (normalized) vectors for the given task ids"""
+        embeddings = {}
+        with self._lock:
+            for task_id in ids:
+                if str(task_id) not in self.tasks:
+                    continue
+                try:
+                    embeddings[str(task_id)] = self.index.reconstruct(int(task_id)).tolist()
+                except Exception:
+                    # Index without a direct map; caller embeds the task instead
+                    continue
+        return embeddings
+
+    def search(self, query_embedding: List[float], top_k: int = 10,
+               employee_id: int = None, status: List[int] = None) -> List[Dict[str, Any]]:
+        """
+        Nearest tasks by cosine similarity
+        Args:
+            query_embedding: Query vector
+            top_k: Number of results to return
+            employee_id: Only return tasks assigned to this employee
+            status: Only return tasks in these statuses
+        Returns: List of {task_id, similarity_score, document, metadata}
+        """
+        with self._lock:
+            ntotal = self.index.ntotal
+            if ntotal == 0:
+                return []
+
+            query = self._normalize(query_embedding)
+            has_filter = employee_id is not None or status
+            # Over-fetch when filtering and widen until enough matches survive the filter
+            fetch = min(ntotal, top_k * 4 if has_filter else top_k)
+
+            while True:
+                scores, labels = self.index.search(query, fetch)
+                results = []
+                for score, label in zip(scores[0], labels[0]):
+                    if label < 0:
+                        continue
+                    metadata = self.tasks.get(str(label))
+                    if metadata is None or not self._matches(metadata, employee_id, status):
+                        continue
+                    results.append({
+                        'task_id': int(label),
+                        'similarity_score': float(score),
+                        'document': metadata.get('document', ''),
+                        'metadata': {k: v for k, v in metadata.items() if k != 'document'}
+                    })
+                    if len(results) >= top_k:
+                        return results
+
+                if fetch >= ntotal:
+                    return results
+                fetch = min(ntotal, fetch * 4)
+
+    @staticmethod
+    def _matches(metadata: Dict[str, Any], employee_id: Optional[int], status: Optional[List[int]]) -> bool:
+        if employee_id is not None and f",{int(employee_id)}," not in metadata.get('assigned_ids', f",{metadata.get('employee_id')},"):
+            return False
+        if status and metadata.get('status') not in status:
+            return False
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'index_type': type(self.index).__name__,
+                'vectors': int(self.index.ntotal),
+                'tasks': len(self.tasks),
+                'memory_mapped': self._mmapped,
+                'nprobe': self.nprobe if self._is_ivf() else None,
+                'unsaved_changes': self._dirty,
+                'index_path': self.index_path
+            }
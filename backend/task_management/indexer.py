@@ -0,0 +1,314 @@
+"""
+Incremental Task Indexer - keeps the task embedding index in sync with the CRM
+Pulls only tasks changed since the last high-water mark and re-embeds only tasks
+whose content hash changed. tbltasks has no dateupdated in the stock Perfex
+schema, so incremental runs only see new tasks; status/name edits and deletions
+are picked up by full runs (the scheduler's nightly reconcile), which scan
+every task, re-embed changed hashes and drop vectors for deleted tasks
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, Any
+
+from .config import Config
+from .crm_connector import get_crm_connector
+from .retriever import get_task_retriever
+from .logger import get_logger
+
+# Initialize components
+logger = get_logger()
+crm = get_crm_connector()
+
+STATE_FORMAT_VERSION = 1
+
+class IncrementalTaskIndexer:
+    """Incremental, content-hash based builder for the task embedding index"""
+
+    def __init__(self, state_path: str = None):
+        self.state_path = state_path or Config.TASK_INDEX_STATE_PATH
+        self.retriever = get_task_retriever()
+        self._lock = threading.Lock()
+        self.is_running = False
+        self.last_run = None
+        self.totals = {
+            'runs': 0,
+            'failed_runs': 0,
+            'rows_scanned': 0,
+            'tasks_embedded': 0,
+            'tasks_deleted': 0,
+            'embedding_time': 0.0
+        }
+        self._load_state()
+
+    def _state_meta(self) -> Dict[str, Any]:
+        return {
+            'format_version': STATE_FORMAT_VERSION,
+            'vector_db_type': Config.VECTOR_DB_TYPE,
+            'model': Config.OPENAI_MODEL_EMBEDDING
+        }
+
+    def _load_state(self):
+        """Load the high-water mark and content hashes, resetting on backend/model change"""
+        self.high_water_mark = None
+        self.hashes: Dict[str, str] = {}
+
+        if not os.path.exists(self.state_path):
+            return
+
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            logger.warning(f"Task index state unreadable, starting from scratch: {e}")
+            return
+
+        if state.get('meta') != self._state_meta():
+            logger.info("Task index state belongs to a different vector backend or model, reindexing")
+            return
+
+        if state.get('high_water_mark'):
+            self.high_water_mark = datetime.fromisoformat(state['high_water_mark'])
+        self.hashes = state.get('hashes', {})
+
+    def _save_state(self):
+        """Atomically persist the high-water mark and content hashes"""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        payload = {
+            'meta': self._state_meta(),
+            'high_water_mark': self.high_water_mark.isoformat() if self.high_water_mark else None,
+            'hashes': self.hashes
+        }
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _prepare_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the embedding text, metadata and content hash for a CRM row"""
+        task['status_name'] = Config.TASK_STATUS_MAP.get(task['status'], 'Unknown')
+        task['priority_name'] = Config.TASK_PRIORITY_MAP.get(task['priority'], 'Unknown')
+
+        assigned_ids = [int(staff_id) for staff_id in str(task.get('assigned_ids') or '').split(',') if staff_id]
+        text = self.retriever._get_task_text(task)
+        content_hash = hashlib.sha1(
+            json.dumps([text, assigned_ids], ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+
+        return {
+            'id': str(task['id']),
+            'text': text,
+            'hash': content_hash,
+            'assigned_ids': assigned_ids,
+            'metadata': {
+                'task_id': task['id'],
+                'employee_id': assigned_ids[0] if assigned_ids else 0,
+                # Comma-delimited so multi-assignee tasks can be matched with a substring filter
+                'assigned_ids': f",{','.join(map(str, assigned_ids))},",
+                'status': task['status'],
+                'priority': task['priority'],
+                'project_name': task.get('project_name') or '',
+                'updated_at': int(time.time())
+            }
+        }
+
+    def run(self, full: bool = False, employee_id: int = None) -> Dict[str, Any]:
+        """
+        Sync the embedding index with the CRM
+        Args:
+            full: Scan every task instead of only those past the high-water mark
+            employee_id: Restrict the scan to one assignee (does not move the high-water mark)
+        Returns: Status dictionary with per-run throughput
+        """
+        if not self.retriever.vector_db:
+            return {
+                'success': False,
+                'error': 'No vector database available'
+            }
+
+        if not self._lock.acquire(blocking=False):
+            return {
+                'success': False,
+                'error': 'Index refresh already in progress'
+            }
+
+        start_time = time.time()
+        self.is_running = True
+        stats = {
+            'mode': 'employee' if employee_id else ('full' if full or self.high_water_mark is None else 'incremental'),
+            'employee_id': employee_id,
+            'rows_scanned': 0,
+            'tasks_embedded': 0,
+            'tasks_unchanged': 0,
+            'tasks_deleted': 0,
+            'embedding_time': 0.0
+        }
+
+        try:
+            since = self.high_water_mark if stats['mode'] == 'incremental' else None
+
+            # Vectors missing from the store (e.g. a wiped collection) must be re-embedded
+            if stats['mode'] == 'full':
+                indexed_ids = self.retriever.get_indexed_task_ids()
+                if indexed_ids is not None:
+                    self.hashes = {task_id: h for task_id, h in self.hashes.items() if task_id in indexed_ids}
+
+            changed_rows = crm.get_tasks_changed_since(since=since, employee_id=employee_id)
+            stats['rows_scanned'] = len(changed_rows)
+
+            to_embed = []
+            unassigned = []
+            seen_ids = set()
+            new_high_water_mark = self.high_water_mark
+
+            for row in changed_rows:
+                if row.get('changed_at') and (new_high_water_mark is None or row['changed_at'] > new_high_water_mark):
+                    new_high_water_mark = row['changed_at']
+
+                prepared = self._prepare_task(row)
+                seen_ids.add(prepared['id'])
+                if not prepared['assigned_ids']:
+                    # Only assigned tasks are searchable per employee
+                    if prepared['id'] in self.hashes:
+                        unassigned.append(prepared['id'])
+                    continue
+                if self.hashes.get(prepared['id']) == prepared['hash']:
+                    stats['tasks_unchanged'] += 1
+                    continue
+                to_embed.append(prepared)
+
+            # Embed and upsert changed tasks in provider-sized batches
+            batch_size = Config.EMBEDDING_BATCH_SIZE
+            for i in range(0, len(to_embed), batch_size):
+                batch = to_embed[i:i + batch_size]
+
+                embed_start = time.time()
+                embeddings = self.retriever.embed_texts([item['text'] for item in batch])
+                stats['embedding_time'] += time.time() - embed_start
+
+                self.retriever.upsert_task_vectors(
+                    ids=[item['id'] for item in batch],
+                    embeddings=embeddings,
+                    texts=[item['text'] for item in batch],
+                    metadatas=[item['metadata'] for item in batch]
+                )
+                for item in batch:
+                    self.hashes[item['id']] = item['hash']
+                stats['tasks_embedded'] += len(batch)
+                logger.debug(f"Indexed batch {i//batch_size + 1}: {len(batch)} tasks")
+
+            # Drop vectors for tasks no longer assigned; a full scan saw every task,
+            # so anything indexed that it didn't return was deleted from the CRM
+            removed = set(unassigned)
+            if stats['mode'] == 'full':
+                removed |= set(self.hashes) - seen_ids
+            if removed:
+                self.retriever.delete_task_vectors(sorted(removed))
+                for task_id in removed:
+                    self.hashes.pop(task_id, None)
+            stats['tasks_deleted'] = len(removed)
+
+            # Local vector stores (FAISS) persist alongside the high-water mark
+            if hasattr(self.retriever.vector_db, 'save'):
+                self.retriever.vector_db.save()
+
+            if not employee_id:
+                self.high_water_mark = new_high_water_mark
+            self._save_state()
+
+            processing_time = time.time() - start_time
+            stats.update({
+                'success': True,
+                'indexed_count': stats['tasks_embedded'],
+                'processing_time': processing_time,
+                'rows_per_second': stats['rows_scanned'] / processing_time if processing_time else 0.0,
+                'embeddings_per_second': (
+                    stats['tasks_embedded'] / stats['embedding_time'] if stats['embedding_time'] else 0.0
+                ),
+                'high_water_mark': self.high_water_mark.isoformat() if self.high_water_mark else None,
+                'vector_db_type': Config.VECTOR_DB_TYPE
+            })
+
+            logger.log_embedding_operation(
+                f"index_{stats['mode']}", stats['tasks_embedded'], True, processing_time
+            )
+
+        except Exception as e:
+            processing_time = time.time() - start_time
+            # Keep the hashes of batches that did land so the next run resumes from there
+            try:
+                self._save_state()
+            except Exception:
+                pass
+            self.totals['failed_runs'] += 1
+            stats.update({
+                'success': False,
+                'error': str(e),
+                'processing_time': processing_time
+            })
+            logger.log_embedding_operation(f"index_{stats['mode']}", stats['tasks_embedded'], False, processing_time)
+            logger.error("Failed to sync embeddings index", error=e)
+
+        finally:
+            self.is_running = False
+            self._lock.release()
+
+        self.totals['runs'] += 1
+        for key in ('rows_scanned', 'tasks_embedded', 'tasks_deleted', 'embedding_time'):
+            self.totals[key] += stats[key]
+        stats['finished_at'] = datetime.now().isoformat()
+        self.last_run = stats
+
+        return stats
+
+    def get_status(self) -> Dict[str, Any]:
+        """Index lag against the CRM plus last-run and cumulative throughput"""
+        change_summary = crm.get_task_change_summary(self.high_water_mark)
+        latest_change = change_summary.get('latest_change')
+
+        lag_seconds = None
+        if latest_change is not None:
+            lag_seconds = (
+                max(0.0, (latest_change - self.high_water_mark).total_seconds())
+                if self.high_water_mark else None
+            )
+
+        return {
+            'vector_db_type': Config.VECTOR_DB_TYPE,
+            'vector_db_available': self.retriever.vector_db is not None,
+            'vector_db_stats': (
+                self.retriever.vector_db.get_stats()
+                if hasattr(self.retriever.vector_db, 'get_stats') else None
+            ),
+            'is_running': self.is_running,
+            'indexed_tasks': len(self.hashes),
+            'high_water_mark': self.high_water_mark.isoformat() if self.high_water_mark else None,
+            'crm_latest_change': latest_change.isoformat() if latest_change else None,
+            'lag_seconds': lag_seconds,
+            'pending_changes': change_summary.get('pending_changes'),
+            'last_run': self.last_run,
+            'totals': {
+                **self.totals,
+                'embeddings_per_second': (
+                    self.totals['tasks_embedded'] / self.totals['embedding_time']
+                    if self.totals['embedding_time'] else 0.0
+                )
+            }
+        }
+
+# Global indexer instance
+task_indexer = None
+_indexer_lock = threading.Lock()
+
+def get_task_indexer() -> IncrementalTaskIndexer:
+    """Get the global task indexer instance"""
+    global task_indexer
+    if task_indexer is None:
+        with _indexer_lock:
+            if task_indexer is None:
+                task_indexer = IncrementalTaskIndexer()
+    return task_indexer
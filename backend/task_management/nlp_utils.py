@@ -10,10 +10,12 @@ import openai
 from .config import Config
 from .crm_connector import get_crm_connector
 from .logger import get_logger
+from utils.intent_classifier import get_intent_classifier
 
 # Initialize components
 logger = get_logger()
 crm = get_crm_connector()
+intent_classifier = get_intent_classifier('task_management_nlp')
 
 # Try to import spaCy, fall back to regex if not available
 try:
@@ -323,9 +325,20 @@ class NLPProcessor:
                         best_intent = intent
                         best_confidence = confidence
         
-        # Use OpenAI for complex intent detection if pattern matching fails
+        # Use OpenAI for complex intent detection if pattern matching fails,
+        # unless the local classifier recognises the query from earlier OpenAI answers
         if best_confidence < 0.7:
+            prediction = intent_classifier.classify(query)
+            if prediction.confident:
+                logger.debug(f"Local intent classifier: {prediction.intent} ({prediction.confidence:.2f})")
+                return {
+                    'intent': prediction.intent,
+                    'confidence': prediction.confidence
+                }
+            
             openai_result = self._detect_intent_with_openai(query)
+            if openai_result['confidence'] > 0:
+                intent_classifier.learn(query, openai_result['intent'], prediction)
             if openai_result['confidence'] > best_confidence:
                 best_intent = openai_result['intent']
                 best_confidence = openai_result['confidence']
@@ -1,6 +1,6 @@
 """
 RAG API Routes for Task Management AI System
-Flask routes: /ai/query, /ai/reindex, /ai/daily-summary
+Flask routes: /ai/query, /ai/reindex, /ai/index-status, /ai/daily-summary
 """
 
 from flask import Blueprint, request, jsonify
@@ -74,29 +74,20 @@ def process_query():
 def rebuild_embeddings():
     """
     Rebuild embedding index: POST /ai/reindex
-    Optional body: { "employee_id": 123 } to reindex specific employee
+    Optional body: { "employee_id": 123 } to reindex specific employee,
+                   { "full": true } to rescan every task instead of only changed ones
     """
     start_time = time.time()
     
     try:
         # Get optional employee filter
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         employee_id = data.get('employee_id')
+        full = bool(data.get('full', False))
         
-        # Rebuild embeddings (placeholder for when vector DB is ready)
-        from .retriever import TaskRetriever
-        from .config import Config
-        
-        retriever = TaskRetriever(Config())
-        # result = retriever.build_embeddings_index(employee_id=employee_id)
+        from .indexer import get_task_indexer
         
-        # For now, return a placeholder response
-        result = {
-            'success': True,
-            'message': 'Reindexing completed (placeholder - vector DB not yet configured)',
-            'employee_id': employee_id,
-            'indexed_tasks': 0
-        }
+        result = get_task_indexer().run(full=full, employee_id=employee_id)
         
         # Add response metadata
         result['response_time'] = time.time() - start_time
@@ -121,6 +112,30 @@ def rebuild_embeddings():
             'response_time': response_time
         }), 500
 
+@rag_bp.route('/index-status', methods=['GET'])
+def get_index_status():
+    """
+    Embedding index sync status: GET /ai/index-status
+    Reports lag behind the CRM (high-water mark vs latest task change),
+    pending changes and indexing throughput
+    """
+    try:
+        from .indexer import get_task_indexer
+        
+        status = get_task_indexer().get_status()
+        
+        return jsonify({
+            'success': True,
+            'index': status
+        })
+        
+    except Exception as e:
+        logger.error("Error getting index status", error=e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @rag_bp.route('/daily-summary', methods=['POST'])
 def generate_daily_summary():
     """
@@ -248,7 +263,8 @@ def get_system_status():
                 'scheduled_jobs': len(scheduler_status['jobs']),
                 'sample_employees': [emp['full_name'] for emp in employees[:5]]  # Show first 5 employees
             },
-            'scheduler': scheduler_status
+            'scheduler': scheduler_status,
+            'db_pool': crm.get_pool_stats()
         }
         
         return jsonify(status)
@@ -278,6 +294,7 @@ def not_found(error):
         'available_endpoints': [
             'POST /ai/query',
             'POST /ai/reindex', 
+            'GET /ai/index-status',
             'POST /ai/daily-summary',
             'GET /ai/test-queries',
             'GET /ai/system-status',
@@ -25,12 +25,11 @@ except ImportError:
     CHROMA_AVAILABLE = False
     logger.warning("ChromaDB not available")
 
-try:
-    import faiss
-    FAISS_AVAILABLE = True
+# faiss itself is only used by the FAISS store
+from .faiss_store import FAISS_AVAILABLE
+if FAISS_AVAILABLE:
     logger.info("FAISS available")
-except ImportError:
-    FAISS_AVAILABLE = False
+else:
     logger.warning("FAISS not available")
 
 class TaskRetriever:
@@ -68,25 +67,20 @@ class TaskRetriever:
             self.vector_db = None
     
     def _init_faiss(self):
-        """Initialize FAISS"""
+        """Initialize FAISS (loads FAISS_INDEX_PATH memory-mapped if it exists)"""
         try:
-            import os
-            os.makedirs(os.path.dirname(Config.FAISS_INDEX_PATH), exist_ok=True)
+            from .faiss_store import FaissTaskStore
             
-            # Create or load FAISS index
-            if os.path.exists(Config.FAISS_INDEX_PATH):
-                self.vector_db = faiss.read_index(Config.FAISS_INDEX_PATH)
-            else:
-                # Create new index
-                self.vector_db = faiss.IndexFlatIP(Config.EMBEDDING_DIMENSION)
+            self.vector_db = FaissTaskStore(Config.FAISS_INDEX_PATH, Config.EMBEDDING_DIMENSION)
             
-            logger.info("FAISS initialized successfully")
+            logger.info("FAISS initialized successfully", extra_data=self.vector_db.get_stats())
         except Exception as e:
             logger.error("Failed to initialize FAISS", error=e)
             self.vector_db = None
     
     def retrieve_tasks_for_employee(self, employee_id: int, intent: str, 
-                                   query: str, limit: int = None, task_filters: Dict[str, Any] = None) -> Dict[str, Any]:
+                                   query: str, limit: int = None, task_filters: Dict[str, Any] = None,
+                                   prefetched_tasks: List[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Retrieve tasks for employee based on intent and query
         Args:
@@ -95,13 +89,15 @@ class TaskRetriever:
             query: Original user query
             limit: Maximum number of tasks to return
             task_filters: Dictionary with task filters (overdue, completed, etc.)
+            prefetched_tasks: Employee's tasks already loaded by a bulk query (skips the MySQL query)
         Returns: Dictionary with retrieved tasks and metadata
         """
         start_time = time.time()
         
         try:
             # Get basic task data from MySQL
-            tasks = self._get_mysql_tasks(employee_id, intent, limit or Config.TASK_PAGINATION_SIZE, task_filters)
+            tasks = self._get_mysql_tasks(employee_id, intent, limit or Config.TASK_PAGINATION_SIZE, task_filters,
+                                          prefetched_tasks=prefetched_tasks)
             
             
             if not tasks:
@@ -145,14 +141,11 @@ class TaskRetriever:
                 'processing_time': time.time() - start_time
             }
     
-    def _get_mysql_tasks(self, employee_id: int, intent: str, limit: int, task_filters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
-        """Get tasks from MySQL based on intent and filters"""
+    def resolve_status_filter(self, intent: str, task_filters: Dict[str, Any] = None) -> Optional[List[int]]:
+        """Status IDs to query for an intent and its task filters (None = all statuses)"""
         
         task_filters = task_filters or {}
         
-        # Debug logging
-        logger.info(f"_get_mysql_tasks: task_filters={task_filters}, intent={intent}")
-        
         # Determine status filter based on intent and task filters
         status_filter = None
         if task_filters.get('completed'):
@@ -185,14 +178,32 @@ class TaskRetriever:
         else:
             logger.info(f"No filter applied, using None: {status_filter}")
         
+        return status_filter
+    
+    def _get_mysql_tasks(self, employee_id: int, intent: str, limit: int, task_filters: Dict[str, Any] = None,
+                         prefetched_tasks: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Get tasks from MySQL (or an already fetched task list) based on intent and filters"""
+        
+        task_filters = task_filters or {}
+        
+        # Debug logging
+        logger.info(f"_get_mysql_tasks: task_filters={task_filters}, intent={intent}")
+        
+        status_filter = self.resolve_status_filter(intent, task_filters)
+        
         logger.info(f"Final status_filter: {status_filter}")
         
-        # Get tasks from CRM
-        tasks = crm.get_tasks_for_employee(
-            employee_id=employee_id,
-            status_filter=status_filter,
-            limit=limit * 2  # Get more for filtering
-        )
+        if prefetched_tasks is not None:
+            # Bulk jobs fetch every employee's tasks up front; copy so computed fields stay per call
+            tasks = [dict(task) for task in prefetched_tasks
+                     if not status_filter or task['status'] in status_filter][:limit * 2]
+        else:
+            # Get tasks from CRM
+            tasks = crm.get_tasks_for_employee(
+                employee_id=employee_id,
+                status_filter=status_filter,
+                limit=limit * 2  # Get more for filtering
+            )
         
         # Add computed fields
         for task in tasks:
@@ -233,30 +244,101 @@ class TaskRetriever:
     
     def _enhance_with_vector_similarity(self, tasks: List[Dict[str, Any]], 
                                        query: str) -> List[Dict[str, Any]]:
-        """Enhance tasks with vector similarity scores"""
+        """Enhance tasks with vector similarity scores (one batched embed + one matrix product)"""
         try:
             # Generate query embedding
-            query_embedding = self._get_embedding(query)
+            query_embedding = np.asarray(self._get_embedding(query), dtype=np.float32)
             
-            # Calculate similarity scores for each task
-            for task in tasks:
-                task_text = self._get_task_text(task)
-                task_embedding = self._get_embedding(task_text)
-                
-                # Calculate cosine similarity
-                similarity = self._cosine_similarity(query_embedding, task_embedding)
-                task['similarity_score'] = similarity
+            # Reuse vectors already stored by build_embeddings_index
+            stored = self._get_stored_embeddings([str(task['id']) for task in tasks])
+            
+            # Embed only the tasks the index doesn't have yet, in a single request
+            missing = [task for task in tasks if str(task['id']) not in stored]
+            if missing:
+                missing_embeddings = self._get_embeddings_batch([self._get_task_text(task) for task in missing])
+                for task, embedding in zip(missing, missing_embeddings):
+                    stored[str(task['id'])] = embedding
+            
+            # Cosine similarity for all tasks at once
+            task_matrix = np.asarray([stored[str(task['id'])] for task in tasks], dtype=np.float32)
+            norms = np.linalg.norm(task_matrix, axis=1) * np.linalg.norm(query_embedding)
+            dot_products = task_matrix @ query_embedding
+            similarities = np.divide(dot_products, norms, out=np.zeros_like(dot_products), where=norms > 0)
+            
+            for task, similarity in zip(tasks, similarities):
+                task['similarity_score'] = float(similarity)
             
             # Sort by similarity score (descending)
             tasks.sort(key=lambda x: x.get('similarity_score', 0), reverse=True)
             
-            logger.debug(f"Enhanced {len(tasks)} tasks with vector similarity")
+            logger.debug(f"Enhanced {len(tasks)} tasks with vector similarity "
+                         f"({len(tasks) - len(missing)} from index, {len(missing)} embedded)")
             
         except Exception as e:
             logger.error("Failed to enhance with vector similarity", error=e)
         
         return tasks
     
+    def _get_stored_embeddings(self, task_ids: List[str]) -> Dict[str, List[float]]:
+        """Fetch existing task vectors from the vector database by task id"""
+        if not task_ids or not self.vector_db:
+            return {}
+        
+        try:
+            if Config.VECTOR_DB_TYPE == 'faiss':
+                return self.vector_db.get_embeddings(task_ids)
+            
+            results = self.vector_db.get(ids=task_ids, include=['embeddings'])
+            embeddings = results.get('embeddings')
+            if embeddings is None:
+                return {}
+            return {
+                task_id: list(embedding)
+                for task_id, embedding in zip(results.get('ids', []), embeddings)
+                if embedding is not None and len(embedding) > 0
+            }
+        except Exception as e:
+            logger.error("Failed to fetch stored task embeddings", error=e)
+            return {}
+    
+    def _get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Get embeddings for many texts with one API request for the uncached ones"""
+        missing = [text for text in dict.fromkeys(texts) if text not in self.embeddings_cache]
+        
+        if missing:
+            try:
+                for text, embedding in zip(missing, self.embed_texts(missing)):
+                    self.embeddings_cache[text] = embedding
+            except Exception:
+                pass  # Already logged by embed_texts
+        
+        # Zero vector fallback for anything that failed, matching _get_embedding
+        return [self.embeddings_cache.get(text, [0.0] * Config.EMBEDDING_DIMENSION) for text in texts]
+    
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts with one API request, bypassing the in-memory cache
+        Raises on failure so callers never store zero vectors
+        """
+        start_time = time.time()
+        
+        try:
+            response = self.openai_client.embeddings.create(
+                model=Config.OPENAI_MODEL_EMBEDDING,
+                input=texts
+            )
+            
+            logger.log_openai_request(
+                Config.OPENAI_MODEL_EMBEDDING, response.usage.total_tokens,
+                time.time() - start_time, True
+            )
+            
+            return [item.embedding for item in response.data]
+            
+        except Exception as e:
+            logger.log_openai_request(Config.OPENAI_MODEL_EMBEDDING, 0, 0, False, str(e))
+            raise
+    
     def _get_embedding(self, text: str) -> List[float]:
         """Get embedding for text, with caching"""
         
@@ -337,97 +419,47 @@ class TaskRetriever:
             employee_id: If specified, build index only for this employee
         Returns: Status dictionary
         """
-        start_time = time.time()
-        
-        try:
-            if not self.vector_db:
-                return {
-                    'success': False,
-                    'error': 'No vector database available'
-                }
-            
-            # Get tasks to index
-            if employee_id:
-                all_tasks = crm.get_tasks_for_employee(employee_id)
-                logger.info(f"Building index for employee {employee_id}: {len(all_tasks)} tasks")
-            else:
-                # Get all employees and their tasks
-                employees = crm.get_all_employees()
-                all_tasks = []
-                for emp in employees:
-                    emp_tasks = crm.get_tasks_for_employee(emp['id'])
-                    all_tasks.extend(emp_tasks)
-                logger.info(f"Building index for all employees: {len(all_tasks)} tasks")
-            
-            if not all_tasks:
-                return {
-                    'success': True,
-                    'indexed_count': 0,
-                    'message': 'No tasks to index'
-                }
-            
-            # Process tasks in batches
-            batch_size = Config.EMBEDDING_BATCH_SIZE
-            indexed_count = 0
-            
-            for i in range(0, len(all_tasks), batch_size):
-                batch = all_tasks[i:i + batch_size]
-                
-                # Prepare batch data
-                texts = [self._get_task_text(task) for task in batch]
-                ids = [str(task['id']) for task in batch]
-                metadatas = [{
-                    'task_id': task['id'],
-                    'employee_id': task['assigned'],
-                    'status': task['status'],
-                    'priority': task['priority'],
-                    'project_name': task.get('project_name', ''),
-                    'updated_at': int(time.time())
-                } for task in batch]
-                
-                # Generate embeddings
-                embeddings = []
-                for text in texts:
-                    embedding = self._get_embedding(text)
-                    embeddings.append(embedding)
-                
-                # Store in vector database
-                if Config.VECTOR_DB_TYPE == 'chroma':
-                    self.vector_db.upsert(
-                        ids=ids,
-                        embeddings=embeddings,
-                        documents=texts,
-                        metadatas=metadatas
-                    )
-                elif Config.VECTOR_DB_TYPE == 'faiss':
-                    # FAISS implementation would go here
-                    pass
-                
-                indexed_count += len(batch)
-                logger.debug(f"Indexed batch {i//batch_size + 1}: {len(batch)} tasks")
-            
-            processing_time = time.time() - start_time
-            
-            logger.log_embedding_operation(
-                'build_index', indexed_count, True, processing_time
-            )
-            
-            return {
-                'success': True,
-                'indexed_count': indexed_count,
-                'processing_time': processing_time,
-                'vector_db_type': Config.VECTOR_DB_TYPE
-            }
-            
-        except Exception as e:
-            processing_time = time.time() - start_time
-            logger.log_embedding_operation('build_index', 0, False, processing_time)
-            logger.error("Failed to build embeddings index", error=e)
+        if not self.vector_db:
             return {
                 'success': False,
-                'error': str(e),
-                'processing_time': processing_time
+                'error': 'No vector database available'
             }
+        
+        # Full scan of CRM tasks; unchanged tasks are skipped by content hash
+        from .indexer import get_task_indexer
+        return get_task_indexer().run(full=True, employee_id=employee_id)
+    
+    def upsert_task_vectors(self, ids: List[str], embeddings: List[List[float]],
+                            texts: List[str], metadatas: List[Dict[str, Any]]):
+        """Write task vectors to the vector database (Chroma and FAISS share the upsert signature)"""
+        if not self.vector_db:
+            return
+        self.vector_db.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=metadatas
+        )
+    
+    def delete_task_vectors(self, ids: List[str]):
+        """Remove task vectors from the vector database"""
+        if not ids:
+            return
+        if Config.VECTOR_DB_TYPE == 'chroma':
+            self.vector_db.delete(ids=ids)
+        elif Config.VECTOR_DB_TYPE == 'faiss':
+            self.vector_db.delete(ids)
+    
+    def get_indexed_task_ids(self) -> Optional[set]:
+        """Ids of every task stored in the vector database (None if unknown)"""
+        try:
+            if Config.VECTOR_DB_TYPE == 'chroma':
+                return set(self.vector_db.get(include=[])['ids'])
+            if Config.VECTOR_DB_TYPE == 'faiss':
+                return self.vector_db.get_ids()
+        except Exception as e:
+            logger.error("Failed to list indexed task ids", error=e)
+        return None
     
     def search_similar_tasks(self, query: str, employee_id: int = None, 
                            top_k: int = 10) -> List[Dict[str, Any]]:
@@ -472,6 +504,12 @@ class TaskRetriever:
                 
                 return similar_tasks
             
+            elif Config.VECTOR_DB_TYPE == 'faiss':
+                # Employee filter is applied against the metadata sidecar
+                return self.vector_db.search(query_embedding, top_k=top_k, employee_id=employee_id)
+            
+            return []
+            
         except Exception as e:
             logger.error("Failed to search similar tasks", error=e)
             return []
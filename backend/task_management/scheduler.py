@@ -4,6 +4,8 @@ Handles automated daily summaries and periodic tasks
 """
 
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -14,6 +16,7 @@ import json
 from .config import Config
 from .crm_connector import get_crm_connector
 from .retriever import get_task_retriever
+from .indexer import get_task_indexer
 from .generator import get_response_generator
 from .logger import get_logger
 
@@ -23,12 +26,39 @@ crm = get_crm_connector()
 retriever = get_task_retriever()
 generator = get_response_generator()
 
+class RateLimiter:
+    """Thread-safe limiter that spaces calls evenly to stay under `calls_per_minute`"""
+    
+    def __init__(self, calls_per_minute: int):
+        self.interval = 60.0 / calls_per_minute if calls_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+    
+    def acquire(self) -> float:
+        """Block until the caller may make its call; returns the seconds waited"""
+        if not self.interval:
+            return 0.0
+        
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
 class TaskScheduler:
     """Manages scheduled tasks for the task management system"""
     
     def __init__(self):
         self.scheduler = BackgroundScheduler(timezone=Config.SCHEDULER_TIMEZONE)
         self.is_running = False
+        self.max_workers = max(1, Config.SCHEDULER_MAX_WORKERS)
+        self.llm_rate_limiter = RateLimiter(Config.SCHEDULER_LLM_CALLS_PER_MINUTE)
+        self._progress_lock = threading.Lock()
+        self.job_progress = {}
         self._setup_jobs()
         
         # Register shutdown handler
@@ -67,6 +97,17 @@ class TaskScheduler:
             coalesce=True
         )
         
+        # Nightly full reconcile: re-hashes every task so edits and deletions reach the index
+        self.scheduler.add_job(
+            func=self.refresh_embeddings,
+            kwargs={'full': True},
+            trigger=CronTrigger.from_crontab(Config.TASK_INDEX_RECONCILE_CRON),
+            id='reconcile_embeddings',
+            name='Reconcile Task Embeddings',
+            max_instances=1,
+            coalesce=True
+        )
+        
         # Daily anomaly detection - runs at 9 AM UTC
         self.scheduler.add_job(
             func=self.detect_anomalies,
@@ -93,6 +134,95 @@ class TaskScheduler:
             self.is_running = False
             logger.info("Task scheduler stopped")
     
+    def _start_progress(self, job_id: str, total: int):
+        """Reset the progress record of a fan-out job"""
+        with self._progress_lock:
+            self.job_progress[job_id] = {
+                'state': 'running',
+                'total': total,
+                'completed': 0,
+                'errors': 0,
+                'saved': 0,
+                'llm_wait_seconds': 0.0,
+                'started_at': time.time(),
+                'finished_at': None,
+                'error': None
+            }
+    
+    def _update_progress(self, job_id: str, **changes):
+        """Add numeric deltas to (or overwrite other fields of) a job's progress record"""
+        with self._progress_lock:
+            progress = self.job_progress.get(job_id)
+            if progress is None:
+                return
+            for key, value in changes.items():
+                if isinstance(value, (int, float)) and isinstance(progress.get(key), (int, float)):
+                    progress[key] += value
+                else:
+                    progress[key] = value
+    
+    def _finish_progress(self, job_id: str, error: str = None):
+        with self._progress_lock:
+            progress = self.job_progress.get(job_id)
+            if progress is None:
+                return
+            progress['state'] = 'failed' if error else 'completed'
+            progress['error'] = error
+            progress['finished_at'] = time.time()
+    
+    def get_job_progress(self) -> Dict[str, Any]:
+        """Progress and throughput of the latest run of each fan-out job"""
+        snapshot = {}
+        with self._progress_lock:
+            for job_id, progress in self.job_progress.items():
+                elapsed = (progress['finished_at'] or time.time()) - progress['started_at']
+                snapshot[job_id] = {
+                    **progress,
+                    'started_at': datetime.fromtimestamp(progress['started_at']).isoformat(),
+                    'finished_at': datetime.fromtimestamp(progress['finished_at']).isoformat() if progress['finished_at'] else None,
+                    'elapsed_seconds': round(elapsed, 2),
+                    'percent_complete': round(100 * progress['completed'] / progress['total'], 1) if progress['total'] else 100.0,
+                    'employees_per_second': round(progress['completed'] / elapsed, 3) if elapsed > 0 else 0.0
+                }
+        return snapshot
+    
+    def _fan_out(self, job_id: str, employees: List[Dict[str, Any]], work) -> List[tuple]:
+        """
+        Run `work(employee, tasks)` for every employee on a bounded worker pool
+        Every employee's tasks come from one streamed bulk query on the calling thread,
+        so workers only spend time on retrieval post-processing and LLM calls.
+        Returns: List of (employee, result) pairs in completion order
+        """
+        self._start_progress(job_id, len(employees))
+        
+        tasks_by_employee = crm.build_employee_task_index()
+        
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=job_id) as pool:
+            futures = {
+                pool.submit(work, employee, tasks_by_employee.get(employee['id'], [])): employee
+                for employee in employees
+            }
+            for future in as_completed(futures):
+                employee = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Worker failed for {employee['full_name']}", error=e)
+                    result = {'success': False, 'error': str(e)}
+                
+                self._update_progress(job_id, completed=1, errors=0 if result.get('success') else 1)
+                results.append((employee, result))
+        
+        return results
+    
+    def _generate_llm_response(self, job_id: str, **kwargs) -> Dict[str, Any]:
+        """generator.generate_response behind the scheduler's LLM rate limiter"""
+        waited = self.llm_rate_limiter.acquire()
+        if waited:
+            self._update_progress(job_id, llm_wait_seconds=waited)
+        return generator.generate_response(**kwargs)
+    
     def generate_daily_summaries(self):
         """Generate daily summaries for all employees"""
         start_time = time.time()
@@ -107,35 +237,24 @@ class TaskScheduler:
                 logger.warning("No employees found for daily summary")
                 return
             
-            summaries_generated = 0
-            errors = 0
+            results = self._fan_out('daily_summaries', employees, self._generate_employee_daily_summary)
             
-            for employee in employees:
-                try:
-                    summary = self._generate_employee_daily_summary(employee)
-                    
-                    if summary['success']:
-                        # Save to database
-                        today = datetime.now().strftime('%Y-%m-%d')
-                        save_success = crm.save_daily_summary(
-                            employee['id'], 
-                            today, 
-                            summary['data']
-                        )
-                        
-                        if save_success:
-                            summaries_generated += 1
-                            logger.debug(f"Daily summary saved for {employee['full_name']}")
-                        else:
-                            errors += 1
-                            logger.error(f"Failed to save daily summary for {employee['full_name']}")
-                    else:
-                        errors += 1
-                        logger.error(f"Failed to generate daily summary for {employee['full_name']}")
-                
-                except Exception as e:
-                    errors += 1
-                    logger.error(f"Error processing daily summary for {employee['full_name']}", error=e)
+            summaries = {}
+            for employee, summary in results:
+                if summary['success']:
+                    summaries[employee['id']] = summary['data']
+                else:
+                    logger.error(f"Failed to generate daily summary for {employee['full_name']}")
+            
+            # Save to database in one batched transaction
+            today = datetime.now().strftime('%Y-%m-%d')
+            summaries_generated = crm.save_daily_summaries(today, summaries)
+            if summaries and not summaries_generated:
+                logger.error("Failed to save daily summaries", extra_data={'summary_count': len(summaries)})
+            
+            errors = len(employees) - summaries_generated
+            self._update_progress('daily_summaries', saved=summaries_generated)
+            self._finish_progress('daily_summaries')
             
             processing_time = time.time() - start_time
             
@@ -143,21 +262,25 @@ class TaskScheduler:
                 'summaries_generated': summaries_generated,
                 'errors': errors,
                 'total_employees': len(employees),
-                'processing_time': processing_time
+                'processing_time': processing_time,
+                'max_workers': self.max_workers
             })
             
         except Exception as e:
+            self._finish_progress('daily_summaries', error=str(e))
             logger.error("Failed to generate daily summaries", error=e)
     
-    def _generate_employee_daily_summary(self, employee: Dict[str, Any]) -> Dict[str, Any]:
-        """Generate daily summary for a single employee"""
+    def _generate_employee_daily_summary(self, employee: Dict[str, Any],
+                                         tasks: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Generate daily summary for a single employee (from prefetched tasks when given)"""
         try:
             # Retrieve tasks for the employee
             retrieved_data = retriever.retrieve_tasks_for_employee(
                 employee_id=employee['id'],
                 intent='task_summary',
                 query=f"Daily summary for {employee['full_name']}",
-                limit=50
+                limit=50,
+                prefetched_tasks=tasks
             )
             
             if retrieved_data.get('error'):
@@ -167,7 +290,8 @@ class TaskScheduler:
                 }
             
             # Generate AI summary
-            response = generator.generate_response(
+            response = self._generate_llm_response(
+                'daily_summaries',
                 intent='task_summary',
                 employee=employee['full_name'],
                 retrieved_data=retrieved_data,
@@ -213,6 +337,8 @@ class TaskScheduler:
             logger.info("Starting weekly report generation")
             
             employees = crm.get_all_employees()
+            # Performance reports look at completion history, not just the last TASK_RECENT_DAYS
+            tasks_by_employee = crm.build_employee_task_index(recent_days=Config.TASK_REPORT_HISTORY_DAYS)
             reports_generated = 0
             errors = 0
             
@@ -223,7 +349,8 @@ class TaskScheduler:
                         employee_id=employee['id'],
                         intent='performance_report',
                         query=f"Weekly performance report for {employee['full_name']}",
-                        limit=100  # More tasks for performance analysis
+                        limit=100,  # More tasks for performance analysis
+                        prefetched_tasks=tasks_by_employee.get(employee['id'], [])
                     )
                     
                     if not retrieved_data.get('error'):
@@ -273,19 +400,21 @@ class TaskScheduler:
         except Exception as e:
             logger.error("Failed to generate weekly reports", error=e)
     
-    def refresh_embeddings(self):
-        """Refresh embeddings for recently updated tasks"""
+    def refresh_embeddings(self, full: bool = False):
+        """Refresh embeddings for recently updated tasks (full=True rescans and re-hashes every task)"""
         start_time = time.time()
         
         try:
-            logger.info("Starting embeddings refresh")
+            logger.info("Starting embeddings refresh", extra_data={'full': full})
             
-            # Build embeddings index (this will update existing embeddings)
-            result = retriever.build_embeddings_index()
+            # Incremental: only tasks past the high-water mark; full: every task, changed hashes re-embedded
+            result = get_task_indexer().run(full=full)
             
             if result.get('success'):
                 logger.info("Embeddings refresh completed", extra_data={
+                    'rows_scanned': result.get('rows_scanned', 0),
                     'indexed_count': result.get('indexed_count', 0),
+                    'deleted_count': result.get('tasks_deleted', 0),
                     'processing_time': result.get('processing_time', 0)
                 })
             else:
@@ -305,44 +434,14 @@ class TaskScheduler:
             total_anomalies = 0
             critical_anomalies = 0
             
-            for employee in employees:
-                try:
-                    # Retrieve tasks for anomaly detection
-                    retrieved_data = retriever.retrieve_tasks_for_employee(
-                        employee_id=employee['id'],
-                        intent='anomaly_check',
-                        query=f"Check for anomalies in {employee['full_name']}'s tasks",
-                        limit=50
-                    )
-                    
-                    if not retrieved_data.get('error'):
-                        # Generate anomaly report
-                        response = generator.generate_response(
-                            intent='anomaly_check',
-                            employee=employee['full_name'],
-                            retrieved_data=retrieved_data,
-                            original_query=f"Daily anomaly check for {employee['full_name']}"
-                        )
-                        
-                        if not response.get('error'):
-                            anomalies = response.get('anomalies', [])
-                            total_anomalies += len(anomalies)
-                            
-                            # Count critical anomalies
-                            critical_count = len([a for a in anomalies if a.get('severity') == 'high'])
-                            critical_anomalies += critical_count
-                            
-                            # Log critical anomalies
-                            if critical_count > 0:
-                                logger.warning(f"Critical anomalies detected for {employee['full_name']}", 
-                                             extra_data={
-                                                 'employee': employee['full_name'],
-                                                 'critical_anomalies': critical_count,
-                                                 'total_anomalies': len(anomalies)
-                                             })
-                
-                except Exception as e:
-                    logger.error(f"Error in anomaly detection for {employee['full_name']}", error=e)
+            results = self._fan_out('anomaly_detection', employees, self._check_employee_anomalies)
+            
+            for employee, result in results:
+                if result['success']:
+                    total_anomalies += result['anomaly_count']
+                    critical_anomalies += result['critical_count']
+            
+            self._finish_progress('anomaly_detection')
             
             processing_time = time.time() - start_time
             
@@ -350,12 +449,66 @@ class TaskScheduler:
                 'total_anomalies': total_anomalies,
                 'critical_anomalies': critical_anomalies,
                 'employees_checked': len(employees),
-                'processing_time': processing_time
+                'processing_time': processing_time,
+                'max_workers': self.max_workers
             })
             
         except Exception as e:
+            self._finish_progress('anomaly_detection', error=str(e))
             logger.error("Failed to run anomaly detection", error=e)
     
+    def _check_employee_anomalies(self, employee: Dict[str, Any],
+                                  tasks: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run anomaly detection for a single employee (from prefetched tasks when given)"""
+        try:
+            # Retrieve tasks for anomaly detection
+            retrieved_data = retriever.retrieve_tasks_for_employee(
+                employee_id=employee['id'],
+                intent='anomaly_check',
+                query=f"Check for anomalies in {employee['full_name']}'s tasks",
+                limit=50,
+                prefetched_tasks=tasks
+            )
+            
+            if retrieved_data.get('error'):
+                return {'success': False, 'error': retrieved_data['error']}
+            
+            # Generate anomaly report
+            response = self._generate_llm_response(
+                'anomaly_detection',
+                intent='anomaly_check',
+                employee=employee['full_name'],
+                retrieved_data=retrieved_data,
+                original_query=f"Daily anomaly check for {employee['full_name']}"
+            )
+            
+            if response.get('error'):
+                return {'success': False, 'error': response['error']}
+            
+            anomalies = response.get('anomalies', [])
+            
+            # Count critical anomalies
+            critical_count = len([a for a in anomalies if a.get('severity') == 'high'])
+            
+            # Log critical anomalies
+            if critical_count > 0:
+                logger.warning(f"Critical anomalies detected for {employee['full_name']}", 
+                             extra_data={
+                                 'employee': employee['full_name'],
+                                 'critical_anomalies': critical_count,
+                                 'total_anomalies': len(anomalies)
+                             })
+            
+            return {
+                'success': True,
+                'anomaly_count': len(anomalies),
+                'critical_count': critical_count
+            }
+            
+        except Exception as e:
+            logger.error(f"Error in anomaly detection for {employee['full_name']}", error=e)
+            return {'success': False, 'error': str(e)}
+    
     def run_manual_job(self, job_name: str) -> Dict[str, Any]:
         """Run a scheduled job manually"""
         try:
@@ -368,6 +521,9 @@ class TaskScheduler:
             elif job_name == 'refresh_embeddings':
                 self.refresh_embeddings()
                 return {'success': True, 'message': 'Embeddings refreshed'}
+            elif job_name == 'reconcile_embeddings':
+                self.refresh_embeddings(full=True)
+                return {'success': True, 'message': 'Embeddings reconciled'}
             elif job_name == 'anomaly_detection':
                 self.detect_anomalies()
                 return {'success': True, 'message': 'Anomaly detection completed'}
@@ -393,7 +549,12 @@ class TaskScheduler:
         
         return {
             'scheduler_running': self.is_running,
-            'jobs': jobs
+            'jobs': jobs,
+            'job_progress': self.get_job_progress(),
+            'fan_out': {
+                'max_workers': self.max_workers,
+                'llm_calls_per_minute': Config.SCHEDULER_LLM_CALLS_PER_MINUTE
+            }
         }
 
 # Global scheduler instance
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Query Analysis Cache
+====================
+Shared memo of the structured intent/entity analyses the LLM returns.
+
+The same phrasings ("show hamza tasks", "overdue tasks for ali") used to go to
+the intent LLM every time. Analyses are now cached under a canonical form of
+the query, so any employee's name in the same phrasing is a hit:
+- Canonical key: lowercase, Turkish-folded, whitespace-collapsed, with known
+  staff name tokens replaced by ordered slots ("show {name0} tasks")
+- Names in the cached analysis are stored as slot placeholders and filled
+  back in from the new query on a hit (keeping the LLM's capitalization)
+- Analyses that mention staff names not present in the query (resolved from
+  conversation context or guessed) are not cached
+- LRU bound plus TTL, persisted to a JSON file across restarts
+- Every entry carries the prompt version of its call site; a version bump
+  drops the old entries
+"""
+
+import os
+import re
+import json
+import time
+import atexit
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, List, Set, Tuple
+
+from utils.intent_classifier import normalize_text
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '2048'))
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv('ANALYSIS_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+ANALYSIS_CACHE_SAVE_SECONDS = int(os.getenv('ANALYSIS_CACHE_SAVE_SECONDS', '30'))
+ANALYSIS_CACHE_PATH = os.getenv(
+    'ANALYSIS_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'analysis_cache.json')
+)
+
+_SLOT_RE = re.compile(r'\{\{name(\d+):(\w+)\}\}')
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+_TOKEN_SPLIT_RE = re.compile(r"^(\W*)([^\W_]+?)((?:['’]\w*)?\W*)$", re.UNICODE)
+
+
+def _default_name_tokens() -> Set[str]:
+    from core.crm.staff_directory import get_staff_directory
+    return get_staff_directory().known_name_tokens()
+
+
+def canonicalize_query(query: str, name_tokens: Set[str]) -> Tuple[str, List[str]]:
+    """
+    Canonical cache key text and the name slots it abstracts
+    "Show İlahe's tasks" -> ("show {name0}'s tasks", ["İlahe"])
+    """
+    canonical, names = [], []
+    for raw in (query or '').split():
+        word = normalize_text(raw)
+        match = _TOKEN_SPLIT_RE.match(raw)
+        if match and normalize_text(match.group(2)) in name_tokens:
+            canonical.append(f"{normalize_text(match.group(1))}{{name{len(names)}}}{normalize_text(match.group(3))}")
+            names.append(match.group(2))
+        else:
+            canonical.append(word)
+    return ' '.join(canonical), names
+
+
+def _case_style(text: str) -> str:
+    if text.isupper() and len(text) > 1:
+        return 'upper'
+    if text.islower():
+        return 'lower'
+    if text[:1].isupper():
+        return 'title'
+    return 'asis'
+
+
+def _apply_case(text: str, style: str) -> str:
+    if style == 'upper':
+        return text.upper()
+    if style == 'lower':
+        return text.replace('İ', 'i').lower()
+    if style == 'title':
+        return text[:1].upper() + text[1:]
+    return text
+
+
+def _map_strings(value: Any, transform: Callable[[str], str]) -> Any:
+    if isinstance(value, str):
+        return transform(value)
+    if isinstance(value, dict):
+        return {key: _map_strings(item, transform) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_map_strings(item, transform) for item in value]
+    return value
+
+
+def _abstract_names(value: Any, names: List[str]) -> Any:
+    """Replace each slot's name in every string of the analysis with a placeholder"""
+    folded = {normalize_text(name): index for index, name in enumerate(names)}
+
+    def replace(text: str) -> str:
+        def substitute(match):
+            index = folded.get(normalize_text(match.group(0)))
+            if index is None:
+                return match.group(0)
+            return f"{{{{name{index}:{_case_style(match.group(0))}}}}}"
+        return _WORD_RE.sub(substitute, text)
+
+    return _map_strings(value, replace) if folded else value
+
+
+def _fill_names(value: Any, names: List[str]) -> Any:
+    def fill(text: str) -> str:
+        return _SLOT_RE.sub(lambda m: _apply_case(names[int(m.group(1))], m.group(2)), text)
+    return _map_strings(value, fill)
+
+
+def _mentions_names(value: Any, name_tokens: Set[str]) -> bool:
+    found = []
+
+    def scan(text: str) -> str:
+        if not found and any(normalize_text(word) in name_tokens for word in _WORD_RE.findall(_SLOT_RE.sub(' ', text))):
+            found.append(text)
+        return text
+
+    _map_strings(value, scan)
+    return bool(found)
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'version', 'expires_at')
+
+    def __init__(self, value: Any, version: str, expires_at: float):
+        self.value = value
+        self.version = version
+        self.expires_at = expires_at
+
+
+class QueryAnalysisCache:
+    """Bounded, persisted cache of LLM query analyses keyed by (namespace, canonical query)"""
+
+    def __init__(self, max_entries: int = None, ttl_seconds: int = None, path: Optional[str] = ANALYSIS_CACHE_PATH,
+                 save_seconds: int = None, name_tokens: Callable[[], Set[str]] = None):
+        self.max_entries = max(1, max_entries or ANALYSIS_CACHE_MAX_ENTRIES)
+        self.ttl_seconds = ANALYSIS_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.save_seconds = ANALYSIS_CACHE_SAVE_SECONDS if save_seconds is None else save_seconds
+        self.path = path
+        self._name_tokens = name_tokens or _default_name_tokens
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[Tuple[str, str], _CacheEntry]" = OrderedDict()
+        self._dirty = False
+        self._saved_at = time.time()
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'puts': 0,
+            'skipped_puts': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'version_invalidations': 0,
+            'saves': 0,
+            'save_errors': 0
+        }
+        self._load()
+
+    # ------------------------------------------------------------------ keys
+
+    def _known_names(self) -> Set[str]:
+        try:
+            return self._name_tokens() or set()
+        except Exception as e:
+            logger.warning(f"Analysis cache: name tokens unavailable, caching without name slots: {e}")
+            return set()
+
+    def key_for(self, query: str) -> Tuple[str, List[str]]:
+        return canonicalize_query(query, self._known_names())
+
+    # ------------------------------------------------------------------ entries
+
+    def get(self, namespace: str, query: str, version: str) -> Optional[Any]:
+        """Cached analysis with this query's names filled in, or None"""
+        canonical, names = self.key_for(query)
+        if not canonical:
+            return None
+        cache_key = (namespace, canonical)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry.version != version:
+                del self._entries[cache_key]
+                self._dirty = True
+                self.stats['version_invalidations'] += 1
+                self.stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[cache_key]
+                self._dirty = True
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.stats['hits'] += 1
+            value = entry.value
+        return _fill_names(value, names)
+
+    def put(self, namespace: str, query: str, version: str, value: Any) -> bool:
+        """Cache an analysis; returns False when it depends on more than the query text"""
+        name_tokens = self._known_names()
+        canonical, names = canonicalize_query(query, name_tokens)
+        if not canonical:
+            return False
+        abstracted = _abstract_names(value, names)
+        if _mentions_names(abstracted, name_tokens):
+            self.stats['skipped_puts'] += 1
+            return False
+
+        cache_key = (namespace, canonical)
+        with self._lock:
+            self._entries.pop(cache_key, None)
+            self._entries[cache_key] = _CacheEntry(abstracted, version, time.time() + self.ttl_seconds)
+            self.stats['puts'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+            self._dirty = True
+        if time.time() - self._saved_at >= self.save_seconds:
+            self.save()
+        return True
+
+    def invalidate(self, namespace: Optional[str] = None) -> int:
+        """Drop every entry (of one namespace); returns the number dropped"""
+        with self._lock:
+            keys = [key for key in self._entries if namespace is None or key[0] == namespace]
+            for key in keys:
+                del self._entries[key]
+            self._dirty = self._dirty or bool(keys)
+        return len(keys)
+
+    # ------------------------------------------------------------------ persistence
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as handle:
+                stored = json.load(handle)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Analysis cache: could not read {self.path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for item in stored.get('entries', [])[-self.max_entries:]:
+                try:
+                    if item['expires_at'] > now:
+                        self._entries[(item['namespace'], item['query'])] = _CacheEntry(
+                            item['value'], item['version'], item['expires_at']
+                        )
+                except (KeyError, TypeError):
+                    continue
+        logger.info(f"Analysis cache: loaded {len(self._entries)} entries from {self.path}")
+
+    def save(self):
+        """Write the cache to disk (oldest first, so LRU order survives a restart)"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [
+                {'namespace': namespace, 'query': query, 'version': entry.version,
+                 'expires_at': entry.expires_at, 'value': entry.value}
+                for (namespace, query), entry in self._entries.items()
+            ]
+            self._dirty = False
+            self._saved_at = time.time()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as handle:
+                json.dump({'entries': entries}, handle, ensure_ascii=False, default=str)
+            os.replace(temp_path, self.path)
+            self.stats['saves'] += 1
+        except (OSError, TypeError, ValueError) as e:
+            self._dirty = True
+            self.stats['save_errors'] += 1
+            logger.warning(f"Analysis cache: could not write {self.path}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            lookups = stats['hits'] + stats['misses']
+            namespaces: Dict[str, int] = {}
+            for namespace, _ in self._entries:
+                namespaces[namespace] = namespaces.get(namespace, 0) + 1
+            stats.update({
+                'entries': len(self._entries),
+                'entries_per_namespace': namespaces,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hit_rate': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+                'path': self.path
+            })
+        return stats
+
+
+_cache: Optional[QueryAnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_analysis_cache() -> QueryAnalysisCache:
+    """Process-wide query analysis cache (saved on interpreter exit)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryAnalysisCache()
+                atexit.register(_cache.save)
+    return _cache
@@ -0,0 +1,392 @@
+"""
+Local Intent Classification Engine
+
+Answers intent questions locally so the chat-completion intent calls are only
+made for queries the local engine is unsure about. Two signals are fused:
+
+- Rule verdict: the per-intent keyword/regex rules compiled once into a
+  ``PatternMatcher`` (every matching intent and its position), or a verdict
+  supplied by the caller's existing rule-based analysis
+- Similarity: a nearest-centroid classifier over word and character-trigram
+  features, trained on the intents the LLM returned for earlier queries
+  (persisted as a JSONL log, so it keeps learning across restarts)
+
+``classify()`` returns an ``IntentPrediction`` with a confidence score;
+callers consult the LLM only when ``prediction.confident`` is False and feed
+its answer back with ``learn()``.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import threading
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Iterable, Any, Hashable, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTENT_LOCAL_CONFIDENCE = float(os.getenv('INTENT_LOCAL_CONFIDENCE', '0.7'))
+INTENT_CLASSIFIER_DIR = os.getenv(
+    'INTENT_CLASSIFIER_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'intent_classifier')
+)
+INTENT_LOG_MAX_ENTRIES = int(os.getenv('INTENT_LOG_MAX_ENTRIES', '5000'))
+
+MIN_EXAMPLES_PER_INTENT = 3  # Intents with fewer examples don't take part in similarity scoring
+RULE_UNIQUE_CONFIDENCE = 0.85  # Exactly one intent's automaton matched
+RULE_AMBIGUOUS_CONFIDENCE = 0.65  # Several intents' automata matched
+UNTRAINED_RULE_WEIGHT = 0.85  # Rule verdicts count a little less until similarity can confirm them
+AGREEMENT_BONUS = 0.1
+DISAGREEMENT_PENALTY = 0.6
+
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.3
+
+_TURKISH_FOLD = str.maketrans({
+    'İ': 'i', 'I': 'i', 'ı': 'i', 'Ğ': 'g', 'ğ': 'g', 'Ü': 'u', 'ü': 'u',
+    'Ş': 's', 'ş': 's', 'Ö': 'o', 'ö': 'o', 'Ç': 'c', 'ç': 'c'
+})
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, fold Turkish characters and collapse whitespace"""
+    return ' '.join((text or '').translate(_TURKISH_FOLD).lower().split())
+
+
+def featurize(text: str) -> Dict[str, float]:
+    """L2-normalized sparse vector of word and character-trigram features"""
+    features: Dict[str, float] = {}
+    for token in _TOKEN_RE.findall(normalize_text(text)):
+        features['w:' + token] = features.get('w:' + token, 0.0) + WORD_WEIGHT
+        padded = f"#{token}#"
+        for i in range(len(padded) - 2):
+            gram = 'c:' + padded[i:i + 3]
+            features[gram] = features.get(gram, 0.0) + TRIGRAM_WEIGHT
+    norm = math.sqrt(sum(value * value for value in features.values()))
+    if norm:
+        for key in features:
+            features[key] /= norm
+    return features
+
+
+# Patterns made of word characters and (escaped) spaces only match themselves
+_LITERAL_PATTERN_RE = re.compile(r"(?:\w|\\? )+")
+
+
+class PatternMatcher:
+    """
+    Several labelled pattern sets compiled once and scanned together
+    scan() reports every label that matches anywhere in the text together with its
+    first (leftmost) position, the same answer a separate re.search per label gives.
+    Each label is one precompiled alternation; labels made only of plain keywords
+    (e.g. re.escape()d words) are located with str.find instead of the regex engine.
+    """
+
+    def __init__(self, groups: Sequence[Tuple[Hashable, Iterable[str]]], flags: int = re.IGNORECASE):
+        self.labels: List[Hashable] = []
+        self._searchers: List[Tuple[Hashable, Any]] = []
+        self._keywords: List[Tuple[Hashable, List[str]]] = []
+        for label, patterns in groups:
+            patterns = list(patterns)
+            if not patterns or label in self.labels:
+                continue
+            self.labels.append(label)
+            if not flags & (re.IGNORECASE | re.VERBOSE) and all(_LITERAL_PATTERN_RE.fullmatch(p) for p in patterns):
+                self._keywords.append((label, [p.replace('\\ ', ' ') for p in patterns]))
+            else:
+                self._searchers.append((label, re.compile('|'.join(f'(?:{p})' for p in patterns), flags).search))
+
+    def scan(self, text: str) -> Dict[Hashable, int]:
+        """Every matched label mapped to the start of its first match"""
+        found: Dict[Hashable, int] = {}
+        if not text:
+            return found
+        for label, search in self._searchers:
+            match = search(text)
+            if match is not None:
+                found[label] = match.start()
+        for label, keywords in self._keywords:
+            positions = [position for position in map(text.find, keywords) if position >= 0]
+            if positions:
+                found[label] = min(positions)
+        return found
+
+
+@dataclass
+class IntentPrediction:
+    """Local classification result"""
+    intent: Optional[str]
+    confidence: float
+    method: str
+    rule_intent: Optional[str] = None
+    similarity_intent: Optional[str] = None
+    similarity_scores: Dict[str, float] = field(default_factory=dict)
+    latency_ms: float = 0.0
+    threshold: float = INTENT_LOCAL_CONFIDENCE
+    confirmed: bool = True  # False for a caller-supplied verdict similarity hasn't confirmed
+
+    @property
+    def confident(self) -> bool:
+        return self.intent is not None and self.confirmed and self.confidence >= self.threshold
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'intent': self.intent,
+            'confidence': round(self.confidence, 3),
+            'method': self.method,
+            'rule_intent': self.rule_intent,
+            'similarity_intent': self.similarity_intent,
+            'confirmed': self.confirmed,
+            'latency_ms': round(self.latency_ms, 3)
+        }
+
+
+class _Centroid:
+    """Running sum of example vectors for one intent"""
+
+    __slots__ = ('sums', 'count', '_norm')
+
+    def __init__(self):
+        self.sums: Dict[str, float] = {}
+        self.count = 0
+        self._norm = None
+
+    def add(self, vector: Dict[str, float]):
+        for key, value in vector.items():
+            self.sums[key] = self.sums.get(key, 0.0) + value
+        self.count += 1
+        self._norm = None
+
+    def cosine(self, vector: Dict[str, float]) -> float:
+        if self._norm is None:
+            self._norm = math.sqrt(sum(value * value for value in self.sums.values())) or 1.0
+        sums = self.sums
+        return sum(value * sums.get(key, 0.0) for key, value in vector.items()) / self._norm
+
+
+class LocalIntentClassifier:
+    """Rule automata + nearest-centroid similarity with a confidence-gated LLM fallback"""
+
+    def __init__(self, name: str, rules: Optional[Dict[str, Iterable[str]]] = None,
+                 examples: Optional[Dict[str, Iterable[str]]] = None,
+                 priority: Optional[List[str]] = None, threshold: float = None,
+                 log_dir: Optional[str] = INTENT_CLASSIFIER_DIR):
+        self.name = name
+        self.threshold = INTENT_LOCAL_CONFIDENCE if threshold is None else threshold
+
+        # All intent rules compiled into one matcher over the lowercased text;
+        # rule_intents is the priority order
+        rules = rules or {}
+        order = list(priority or []) + [intent for intent in rules if intent not in (priority or [])]
+        self.rule_intents = [intent for intent in order if rules.get(intent)]
+        self.rule_matcher = PatternMatcher([(intent, rules[intent]) for intent in self.rule_intents], flags=0) \
+            if self.rule_intents else None
+
+        self._lock = threading.Lock()
+        self._centroids: Dict[str, _Centroid] = {}
+        self._log_path = os.path.join(log_dir, f"{name}.jsonl") if log_dir else None
+        self._log_lines = 0
+
+        self.stats = {
+            'classified': 0,
+            'answered_locally': 0,
+            'llm_consults': 0,
+            'learned': 0,
+            'llm_agreements': 0,
+            'total_latency_ms': 0.0
+        }
+
+        for intent, texts in (examples or {}).items():
+            for text in texts:
+                self._add_example(text, intent)
+        self._load_log()
+
+    # ------------------------------------------------------------------ training
+
+    def _add_example(self, text: str, intent: str):
+        vector = featurize(text)
+        if not vector or not intent:
+            return
+        with self._lock:
+            centroid = self._centroids.get(intent)
+            if centroid is None:
+                centroid = self._centroids[intent] = _Centroid()
+            centroid.add(vector)
+
+    def _load_log(self):
+        if not self._log_path or not os.path.exists(self._log_path):
+            return
+        try:
+            with open(self._log_path, 'r', encoding='utf-8') as handle:
+                lines = handle.readlines()
+            self._log_lines = len(lines)
+            for line in lines[-INTENT_LOG_MAX_ENTRIES:]:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._add_example(entry.get('text', ''), entry.get('intent'))
+            logger.info(f"Intent classifier '{self.name}': loaded {min(len(lines), INTENT_LOG_MAX_ENTRIES)} logged intents")
+        except OSError as e:
+            logger.warning(f"Intent classifier '{self.name}': could not read training log: {e}")
+
+    def _append_log(self, entry: Dict[str, Any]):
+        if not self._log_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self._log_path), exist_ok=True)
+            with self._lock:
+                with open(self._log_path, 'a', encoding='utf-8') as handle:
+                    handle.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                self._log_lines += 1
+                if self._log_lines > 2 * INTENT_LOG_MAX_ENTRIES:
+                    # Compact to the newest entries
+                    with open(self._log_path, 'r', encoding='utf-8') as handle:
+                        lines = handle.readlines()[-INTENT_LOG_MAX_ENTRIES:]
+                    with open(self._log_path, 'w', encoding='utf-8') as handle:
+                        handle.writelines(lines)
+                    self._log_lines = len(lines)
+        except OSError as e:
+            logger.warning(f"Intent classifier '{self.name}': could not write training log: {e}")
+
+    def learn(self, text: str, intent: Optional[str], prediction: Optional[IntentPrediction] = None):
+        """Record the LLM's intent for a query as a training example"""
+        if not text or not intent:
+            return
+        self._add_example(text, intent)
+        self.stats['learned'] += 1
+        if prediction is not None and prediction.intent == intent:
+            self.stats['llm_agreements'] += 1
+        self._append_log({
+            'text': text,
+            'intent': intent,
+            'local_intent': prediction.intent if prediction else None,
+            'local_confidence': round(prediction.confidence, 3) if prediction else None,
+            'ts': time.time()
+        })
+
+    # ------------------------------------------------------------------ classification
+
+    def _rule_verdict(self, matches: Dict[Hashable, int], scores: Dict[str, float]):
+        matched = [intent for intent in self.rule_intents if intent in matches]
+        if not matched:
+            return None, 0.0
+        if len(matched) == 1:
+            return matched[0], RULE_UNIQUE_CONFIDENCE
+        # Several automata fired: let similarity arbitrate, priority order breaks ties
+        best = max(matched, key=lambda intent: (scores.get(intent, 0.0), -matched.index(intent)))
+        return best, RULE_AMBIGUOUS_CONFIDENCE
+
+    def similarity_scores(self, text: str) -> Dict[str, float]:
+        """Cosine similarity to every trained intent centroid"""
+        vector = featurize(text)
+        if not vector:
+            return {}
+        with self._lock:
+            return {
+                intent: centroid.cosine(vector)
+                for intent, centroid in self._centroids.items()
+                if centroid.count >= MIN_EXAMPLES_PER_INTENT
+            }
+
+    def classify(self, text: str, rule_intent: Optional[str] = None,
+                 rule_confidence: Optional[float] = None,
+                 matches: Optional[Dict[Hashable, int]] = None) -> IntentPrediction:
+        """
+        Classify a query locally
+        rule_intent / rule_confidence carry a verdict from the caller's own rule-based
+        analysis and are used when this classifier has no compiled rules; such a verdict
+        is never answered locally unless similarity picks the same intent. matches is a
+        PatternMatcher.scan() result over the same rules the caller already computed
+        """
+        started = time.perf_counter()
+        scores = self.similarity_scores(text)
+
+        caller_verdict = self.rule_matcher is None and rule_intent is not None
+        if self.rule_matcher is not None:
+            if matches is None:
+                matches = self.rule_matcher.scan(text.lower())
+            rule_intent, rule_confidence = self._rule_verdict(matches, scores)
+        elif rule_intent is None:
+            rule_confidence = 0.0
+        else:
+            rule_confidence = RULE_UNIQUE_CONFIDENCE if rule_confidence is None else rule_confidence
+
+        similarity_intent, similarity_confidence = None, 0.0
+        if scores:
+            ranked = sorted(scores.values(), reverse=True)
+            similarity_intent = max(scores, key=scores.get)
+            runner_up = ranked[1] if len(ranked) > 1 else 0.0
+            similarity_confidence = max(0.0, min(1.0, ranked[0] - 0.5 * runner_up))
+
+        if rule_intent is None:
+            intent, confidence, method = similarity_intent, similarity_confidence, 'similarity'
+        elif rule_intent not in scores:
+            intent, confidence, method = rule_intent, rule_confidence * UNTRAINED_RULE_WEIGHT, 'rules'
+        elif similarity_intent == rule_intent:
+            intent = rule_intent
+            confidence = min(0.99, max(rule_confidence, similarity_confidence) + AGREEMENT_BONUS)
+            method = 'rules+similarity'
+        else:
+            intent = rule_intent if rule_confidence >= similarity_confidence else similarity_intent
+            confidence = max(rule_confidence, similarity_confidence) * DISAGREEMENT_PENALTY
+            method = 'rules_vs_similarity'
+
+        prediction = IntentPrediction(
+            intent=intent,
+            confidence=confidence,
+            method=method,
+            rule_intent=rule_intent,
+            similarity_intent=similarity_intent,
+            similarity_scores={key: round(value, 3) for key, value in scores.items()},
+            latency_ms=(time.perf_counter() - started) * 1000,
+            threshold=self.threshold,
+            confirmed=not caller_verdict or (rule_intent in scores and similarity_intent == rule_intent)
+        )
+
+        self.stats['classified'] += 1
+        self.stats['total_latency_ms'] += prediction.latency_ms
+        if prediction.confident:
+            self.stats['answered_locally'] += 1
+        else:
+            self.stats['llm_consults'] += 1
+        return prediction
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        classified = stats['classified']
+        with self._lock:
+            examples = {intent: centroid.count for intent, centroid in self._centroids.items()}
+        stats.update({
+            'name': self.name,
+            'threshold': self.threshold,
+            'local_rate': round(stats['answered_locally'] / classified, 3) if classified else 0.0,
+            'avg_latency_ms': round(stats['total_latency_ms'] / classified, 3) if classified else 0.0,
+            'llm_agreement_rate': round(stats['llm_agreements'] / stats['learned'], 3) if stats['learned'] else None,
+            'examples_per_intent': examples,
+            'log_path': self._log_path
+        })
+        return stats
+
+
+_classifiers: Dict[str, LocalIntentClassifier] = {}
+_classifiers_lock = threading.Lock()
+
+
+def get_intent_classifier(name: str, **kwargs) -> LocalIntentClassifier:
+    """Process-wide classifier per label space (kwargs only apply on first creation)"""
+    classifier = _classifiers.get(name)
+    if classifier is None:
+        with _classifiers_lock:
+            classifier = _classifiers.get(name)
+            if classifier is None:
+                classifier = _classifiers[name] = LocalIntentClassifier(name, **kwargs)
+    return classifier
+
+
+def get_all_classifier_stats() -> List[Dict[str, Any]]:
+    return [classifier.get_stats() for classifier in list(_classifiers.values())]
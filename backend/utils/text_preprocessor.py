@@ -45,6 +45,23 @@ class TextPreprocessor:
         # Combine all words that should be separated
         self.separator_words = self.greeting_words + self.question_words + self.function_words
         
+        # Regex separation passes, in order: greeting, question word, modal, action verb or
+        # preposition followed by a name (HelloJohn, WhatAli, CanAlex, ShowNawaz, AboutDeniz)
+        self.regex_separator_words = [
+            'hello', 'hi', 'hey', 'hiya',
+            'what', 'who', 'where', 'when', 'why', 'how', 'which',
+            'can', 'could', 'would', 'should', 'will', 'may', 'might',
+            'give', 'show', 'tell', 'get', 'find', 'see',
+            'about', 'for', 'with', 'from', 'to'
+        ]
+        # Compiled once: a single alternation to find candidate words and one splitter per pass
+        self._separator_candidate_re = re.compile(
+            r'\b(?:' + '|'.join(self.regex_separator_words) + r')[A-Z][a-zA-Z]+\b', re.IGNORECASE
+        )
+        self._separator_split_res = [
+            re.compile(rf'({word})([A-Z][a-zA-Z]+)', re.IGNORECASE) for word in self.regex_separator_words
+        ]
+        
         # Try to load spaCy model, fallback to regex if not available
         self.nlp = None
         if SPACY_AVAILABLE:
@@ -104,44 +121,25 @@ class TextPreprocessor:
         """
         Use regex patterns to separate attached words while preserving case
         """
-        # Handle specific common patterns more precisely
-        # Pattern: HelloJohn, HiAli, etc. - greeting + capitalized name
-        for greeting in ['hello', 'hi', 'hey', 'hiya']:
-            # Case insensitive matching but preserve original case in replacement
-            pattern = rf'\b({greeting})([A-Z][a-zA-Z]+)\b'
-            def replace_func(match):
-                return f"{match.group(1)} {match.group(2)}"
-            text = re.sub(pattern, replace_func, text, flags=re.IGNORECASE)
-        
-        # Pattern: WhatJohn, WhoAli, etc. - question word + capitalized name
-        for question in ['what', 'who', 'where', 'when', 'why', 'how', 'which']:
-            pattern = rf'\b({question})([A-Z][a-zA-Z]+)\b'
-            def replace_func(match):
-                return f"{match.group(1)} {match.group(2)}"
-            text = re.sub(pattern, replace_func, text, flags=re.IGNORECASE)
-        
-        # Pattern: CanJohn, CouldAli, etc. - modal verb + capitalized name
-        for modal in ['can', 'could', 'would', 'should', 'will', 'may', 'might']:
-            pattern = rf'\b({modal})([A-Z][a-zA-Z]+)\b'
-            def replace_func(match):
-                return f"{match.group(1)} {match.group(2)}"
-            text = re.sub(pattern, replace_func, text, flags=re.IGNORECASE)
-        
-        # Pattern: GiveJohn, ShowAli, etc. - action verb + capitalized name
-        for verb in ['give', 'show', 'tell', 'get', 'find', 'see']:
-            pattern = rf'\b({verb})([A-Z][a-zA-Z]+)\b'
-            def replace_func(match):
-                return f"{match.group(1)} {match.group(2)}"
-            text = re.sub(pattern, replace_func, text, flags=re.IGNORECASE)
-        
-        # Pattern: AboutJohn, ForAli, etc. - preposition + capitalized name
-        for prep in ['about', 'for', 'with', 'from', 'to']:
-            pattern = rf'\b({prep})([A-Z][a-zA-Z]+)\b'
-            def replace_func(match):
-                return f"{match.group(1)} {match.group(2)}"
-            text = re.sub(pattern, replace_func, text, flags=re.IGNORECASE)
-        
-        return text
+        # One scan finds the words any separator pass could split; only those are processed
+        return self._separator_candidate_re.sub(self._split_attached_word, text)
+    
+    def _split_attached_word(self, match) -> str:
+        """
+        Split one candidate word exactly as the ordered separator passes would:
+        each pass splits a piece at most once and later passes see the new pieces
+        """
+        pieces = [match.group(0)]
+        for split_re in self._separator_split_res:
+            split_pieces = []
+            for piece in pieces:
+                split = split_re.fullmatch(piece)
+                if split:
+                    split_pieces.extend(split.groups())
+                else:
+                    split_pieces.append(piece)
+            pieces = split_pieces
+        return ' '.join(pieces)
     
     def _check_for_attached_words(self, token: str) -> str:
         """